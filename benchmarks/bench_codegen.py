@@ -0,0 +1,128 @@
+"""Compares the code from the linear scan register allocator with the code
+which keeps every value on the stack, by the time to generate it and the
+running time of the programs, with gcc -O0 for reference.
+
+    python -m benchmarks.bench_codegen [--runs N]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pycc.codegen import generate
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.lower import lower
+from pycc.opt import optimize
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+
+PROGRAMS = {
+    "sieve": """
+        int printf(const char *, ...);
+        char flags[100000];
+        int main(void) {
+            int count = 0;
+            for (int round = 0; round < 50; round++) {
+                count = 0;
+                for (int i = 0; i < 100000; i++)
+                    flags[i] = 1;
+                for (int i = 2; i < 100000; i++) {
+                    if (flags[i]) {
+                        count++;
+                        for (int j = i + i; j < 100000; j += i)
+                            flags[j] = 0;
+                    }
+                }
+            }
+            printf("%d\\n", count);
+            return 0;
+        }
+    """,
+    "matmul": """
+        int printf(const char *, ...);
+        long a[120][120], b[120][120], c[120][120];
+        int main(void) {
+            for (int i = 0; i < 120; i++)
+                for (int j = 0; j < 120; j++) {
+                    a[i][j] = i + j;
+                    b[i][j] = i - j;
+                }
+            for (int r = 0; r < 10; r++)
+                for (int i = 0; i < 120; i++)
+                    for (int j = 0; j < 120; j++) {
+                        long s = 0;
+                        for (int k = 0; k < 120; k++)
+                            s += a[i][k] * b[k][j];
+                        c[i][j] = s;
+                    }
+            printf("%ld\\n", c[7][9]);
+            return 0;
+        }
+    """,
+    "fib": """
+        int printf(const char *, ...);
+        int fib(int n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+        int main(void) { printf("%d\\n", fib(30)); return 0; }
+    """,
+}
+
+
+def build(text: str, allocator: str, path: str) -> float:
+    """Compiles ``text`` to an executable at ``path`` and returns the time
+    spent generating code."""
+    reporter = Reporter()
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    module = lower(parser.iter_declarations(), reporter)
+    optimize(module)
+    start = time.perf_counter()
+    assembly = generate(module, allocator)
+    elapsed = time.perf_counter() - start
+    with open(path + ".s", "w") as f:
+        f.write(assembly)
+    subprocess.run(["gcc", "-o", path, path + ".s"], check=True)
+    return elapsed
+
+
+def run(path: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([path], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+    if shutil.which("gcc") is None:
+        parser.error("gcc is needed to assemble and link")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text in PROGRAMS.items():
+            times = {}
+            for allocator in ("naive", "linear-scan"):
+                path = os.path.join(tmp, f"{name}-{allocator}")
+                generating = build(text, allocator, path)
+                times[allocator] = run(path, args.runs)
+                print(
+                    f"{name:>8} {allocator:>12} {generating * 1e3:8.2f}ms codegen "
+                    f"{times[allocator]:8.3f}s run"
+                )
+            source = os.path.join(tmp, f"{name}.c")
+            with open(source, "w") as f:
+                f.write(text)
+            reference = os.path.join(tmp, f"{name}-gcc")
+            subprocess.run(["gcc", "-w", "-O0", "-o", reference, source], check=True)
+            gcc = run(reference, args.runs)
+            print(
+                f"{name:>8} {'gcc -O0':>12} {'':>16} {gcc:8.3f}s run "
+                f"{times['naive'] / times['linear-scan']:6.2f}x faster than naive"
+            )
+
+
+if __name__ == "__main__":
+    main()
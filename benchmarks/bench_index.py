@@ -0,0 +1,83 @@
+"""Indexes a generated tree of C files, updates it again unchanged and after
+touching a few files, and times queries by name, prefix and location.
+
+    python -m benchmarks.bench_index [--files N] [--jobs 1,4]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from pycc.index import Index
+
+TEMPLATE = """
+typedef struct node{n} {{ struct node{n} *next; long value; }} node{n};
+extern long total{n}(node{n} *n);
+static long weight{n} = {n};
+long total{n}(node{n} *n) {{
+    long s = 0;
+    for (; n; n = n->next)
+        s += n->value * weight{n} + helper(s, n->value);
+    return s;
+}}
+int check{n}(int c) {{ return c > {n} ? total{n}(0) : helper(c, weight{n}); }}
+"""
+
+
+def write(directory: str, files: int) -> list:
+    filenames = []
+    for n in range(files):
+        filename = os.path.join(directory, f"file{n}.c")
+        with open(filename, "w") as fp:
+            fp.write("long helper(long, long);\n" + TEMPLATE.format(n=n) * 4)
+        filenames.append(filename)
+    return filenames
+
+
+def timed(function, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--jobs", default="1,4")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = write(directory, args.files)
+        for jobs in [int(x) for x in args.jobs.split(",")]:
+            database = os.path.join(directory, f"index{jobs}.db")
+            with Index(database) as index:
+                start = time.perf_counter()
+                stats = index.update(filenames, jobs)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{jobs:3} jobs: {stats.indexed} files {stats.symbols} symbols "
+                    f"in {elapsed:7.3f}s {stats.indexed / elapsed:8.1f} files/s"
+                )
+        with Index(database) as index:
+            elapsed = timed(lambda: index.update(filenames))
+            print(f"unchanged update {elapsed:7.3f}s")
+            for filename in filenames[:10]:
+                with open(filename, "a") as fp:
+                    fp.write("int touched;\n")
+            elapsed = timed(lambda: index.update(filenames))
+            print(f"update after touching 10 files {elapsed:7.3f}s")
+            middle = filenames[len(filenames) // 2]
+            queries = [
+                ("lookup helper", lambda: index.lookup("helper")),
+                ("lookup total7", lambda: index.lookup("total7")),
+                ("prefix check1", lambda: index.prefix("check1")),
+                ("prefix w, 50", lambda: index.prefix("w", limit=50)),
+                ("at line 9", lambda: index.at(middle, 9, 30)),
+            ]
+            for name, query in queries:
+                count = len(query())
+                print(f"{name:16} {timed(query, 20) * 1e3:8.3f}ms {count:8} results")
+
+
+if __name__ == "__main__":
+    main()
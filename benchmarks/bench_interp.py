@@ -0,0 +1,270 @@
+"""Compares the closure-compiling interpreter against a naive tree-walking
+one, which dispatches on every node on every evaluation, looks names up in a
+chain of dicts and unwinds loops and calls with exceptions.
+
+    python -m benchmarks.bench_interp [--repeat N]
+"""
+import argparse
+import time
+
+from pycc import ast
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.interp import Interpreter
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+from pycc.token import Token
+from pycc.types import INT
+
+PROGRAMS = {
+    "fib": ("int f(int n) { return n < 2 ? n : f(n - 1) + f(n - 2); }", 18),
+    "sum": (
+        """
+        int f(int n) {
+            int total = 0;
+            for (int i = 0; i < n; i++)
+                total += i * i ^ (total >> 3);
+            return total;
+        }
+        """,
+        20000,
+    ),
+    "sieve": (
+        """
+        int f(int n) {
+            char composite[8192];
+            int count = 0;
+            for (int i = 0; i < n; i++)
+                composite[i] = 0;
+            for (int i = 2; i < n; i++) {
+                if (composite[i])
+                    continue;
+                count++;
+                for (int j = i * i; j < n; j += i)
+                    composite[j] = 1;
+            }
+            return count;
+        }
+        """,
+        8192,
+    ),
+    "gcd": (
+        """
+        int gcd(int a, int b) {
+            while (b) {
+                int t = a % b;
+                a = b;
+                b = t;
+            }
+            return a;
+        }
+        int f(int n) {
+            int total = 0;
+            for (int i = 1; i < n; i++)
+                total += gcd(i * 7919, n);
+            return total;
+        }
+        """,
+        3000,
+    ),
+}
+
+
+class _Break(Exception):
+    pass
+
+
+class _Continue(Exception):
+    pass
+
+
+class _Return(Exception):
+    def __init__(self, value):
+        self.value = value
+
+
+def _wrap(value: int) -> int:
+    return INT.wrap(value)
+
+
+class TreeWalker:
+    """Evaluates the AST of the int-only subset the programs above use."""
+
+    def __init__(self, decls):
+        self.functions = {
+            x.name: x for x in decls if isinstance(x, ast.FunctionDecl) and x.body
+        }
+        self.scopes = []
+
+    def call(self, name, *args):
+        fn = self.functions[name]
+        saved = self.scopes
+        self.scopes = [{p.name: v for p, v in zip(fn.params, args)}]
+        try:
+            self.execute(fn.body)
+        except _Return as e:
+            return e.value
+        finally:
+            self.scopes = saved
+        return 0
+
+    def lookup(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope
+        raise KeyError(name)
+
+    def execute(self, stmt):
+        getattr(self, "execute_" + type(stmt).__name__)(stmt)
+
+    def execute_CompoundStmt(self, stmt):
+        self.scopes.append({})
+        try:
+            for x in stmt.stmts:
+                self.execute(x)
+        finally:
+            self.scopes.pop()
+
+    def execute_DeclStmt(self, stmt):
+        for decl in stmt.decls:
+            if decl.type.is_scalar:
+                value = 0 if decl.init is None else self.evaluate(decl.init)
+            else:
+                value = [0] * decl.type.length
+            self.scopes[-1][decl.name] = value
+
+    def execute_ExprStmt(self, stmt):
+        self.evaluate(stmt.expr)
+
+    def execute_IfStmt(self, stmt):
+        if self.evaluate(stmt.cond):
+            self.execute(stmt.then)
+        elif stmt.otherwise is not None:
+            self.execute(stmt.otherwise)
+
+    def execute_WhileStmt(self, stmt):
+        while self.evaluate(stmt.cond):
+            try:
+                self.execute(stmt.body)
+            except _Break:
+                break
+            except _Continue:
+                pass
+
+    def execute_ForStmt(self, stmt):
+        self.scopes.append({})
+        try:
+            self.execute(stmt.init)
+            while self.evaluate(stmt.cond):
+                try:
+                    self.execute(stmt.body)
+                except _Break:
+                    break
+                except _Continue:
+                    pass
+                self.evaluate(stmt.step)
+        finally:
+            self.scopes.pop()
+
+    def execute_ContinueStmt(self, stmt):
+        raise _Continue
+
+    def execute_BreakStmt(self, stmt):
+        raise _Break
+
+    def execute_ReturnStmt(self, stmt):
+        raise _Return(self.evaluate(stmt.expr))
+
+    def evaluate(self, expr):
+        return getattr(self, "evaluate_" + type(expr).__name__)(expr)
+
+    def evaluate_IntegerConstant(self, expr):
+        return expr.value
+
+    def evaluate_ParenExpr(self, expr):
+        return self.evaluate(expr.expr)
+
+    def evaluate_RefDeclExpr(self, expr):
+        return self.lookup(expr.name)[expr.name]
+
+    def evaluate_SubscriptExpr(self, expr):
+        return self.evaluate(expr.base)[self.evaluate(expr.index)]
+
+    def evaluate_CallExpr(self, expr):
+        args = [self.evaluate(x) for x in expr.args]
+        return self.call(expr.callee.name, *args)
+
+    def evaluate_ConditionalExpr(self, expr):
+        if self.evaluate(expr.cond):
+            return self.evaluate(expr.then)
+        return self.evaluate(expr.otherwise)
+
+    def evaluate_PostfixExpr(self, expr):
+        scope = self.lookup(expr.operand.name)
+        value = scope[expr.operand.name]
+        step = 1 if expr.op == Token.PLUS_PLUS else -1
+        scope[expr.operand.name] = _wrap(value + step)
+        return value
+
+    def assign(self, target, value):
+        if isinstance(target, ast.SubscriptExpr):
+            self.evaluate(target.base)[self.evaluate(target.index)] = value
+        else:
+            self.lookup(target.name)[target.name] = value
+        return value
+
+    def evaluate_BinaryExpr(self, expr):
+        op = expr.op
+        if op == Token.EQUALS:
+            return self.assign(expr.left, self.evaluate(expr.right))
+        if op == Token.PLUS_EQUALS:
+            value = self.evaluate(expr.left) + self.evaluate(expr.right)
+            return self.assign(expr.left, _wrap(value))
+        a = self.evaluate(expr.left)
+        b = self.evaluate(expr.right)
+        if op == Token.PLUS:
+            return _wrap(a + b)
+        if op == Token.MINUS:
+            return _wrap(a - b)
+        if op == Token.STAR:
+            return _wrap(a * b)
+        if op == Token.PERCENT:
+            return a - b * int(a / b)
+        if op == Token.CARET:
+            return a ^ b
+        if op == Token.GREATER_THAN_GREATER_THAN:
+            return a >> (b & 31)
+        if op == Token.LESS_THAN:
+            return int(a < b)
+        raise NotImplementedError(op)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    for name, (source, argument) in PROGRAMS.items():
+        reporter = Reporter()
+        scanner = Scanner(File(name + ".c", source), reporter)
+        decls = list(Parser(TokenStream(scanner), reporter).iter_declarations())
+        interp = Interpreter(reporter).load(decls)
+        walker = TreeWalker(decls)
+        times = {}
+        results = {}
+        for label, run in (("closures", interp.call), ("tree", walker.call)):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results[label] = run("f", argument)
+                best = min(best, time.perf_counter() - start)
+            times[label] = best
+        assert results["closures"] == results["tree"], results
+        print(
+            f"{name:6} closures {times['closures'] * 1e3:8.2f}ms, "
+            f"tree walker {times['tree'] * 1e3:8.2f}ms, "
+            f"{times['tree'] / times['closures']:.1f}x faster"
+        )
+
+
+if __name__ == "__main__":
+    main()
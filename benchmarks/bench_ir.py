@@ -0,0 +1,67 @@
+"""Measures lowering, SSA construction and the optimisation passes as
+functions grow, to check that the cost per instruction stays flat.
+
+    python -m benchmarks.bench_ir [--statements N]
+"""
+import argparse
+import time
+
+from pycc import lower
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.ir import Module
+from pycc.opt import optimize
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+from pycc.ssa import construct_ssa
+
+
+def source(statements: int) -> str:
+    body = "".join(
+        f"if (x > {k}) y = y + x * {k}; else x = x - y;\n" for k in range(statements)
+    )
+    return f"int f(int x) {{ int y = 0;\n{body} return x + y; }}"
+
+
+def measure(statements: int, report: bool = False) -> None:
+    reporter = Reporter()
+    text = source(statements)
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    decls = list(parser.iter_declarations())
+    ssa = []
+
+    def timed(fn):
+        start = time.perf_counter()
+        construct_ssa(fn)
+        ssa.append(time.perf_counter() - start)
+
+    lower.construct_ssa = timed
+    try:
+        start = time.perf_counter()
+        [fn] = lower.lower(decls, reporter).functions
+        total = time.perf_counter() - start
+    finally:
+        lower.construct_ssa = construct_ssa
+    start = time.perf_counter()
+    manager = optimize(Module([fn]))
+    passes = time.perf_counter() - start
+    per = (total + passes) / len(fn) * 1e6
+    print(
+        f"{len(fn):>9} instructions {total - ssa[0]:8.3f}s lowering "
+        f"{ssa[0]:8.3f}s ssa {passes:8.3f}s passes {per:6.2f}us/instruction"
+    )
+    if report:
+        print(manager.report(), end="")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--statements", type=int, default=8000)
+    args = parser.parse_args(argv)
+    for n in (args.statements // 8, args.statements // 4, args.statements // 2):
+        measure(n)
+    measure(args.statements, report=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Prints the memory report of a generated translation unit, and the time
+of the front end with the memory accounting against without it.
+
+    python -m benchmarks.bench_memory [--functions N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.memory import account
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+
+FUNCTION = """
+long f{n}(long *a, int n, long k) {{
+    long s = {n};
+    for (int i = 0; i < n; i++) {{
+        long x = a[i] * k + (a[i] >> 3);
+        if (x % 7 == {m})
+            s += x;
+        else
+            s -= x ^ {n};
+    }}
+    return s + k * {m};
+}}
+"""
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=1000)
+    args = parser.parse_args(argv)
+    text = "".join(FUNCTION.format(n=n, m=n % 7) for n in range(args.functions))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "unit.c")
+        with open(path, "w") as fp:
+            fp.write(text)
+        start = time.perf_counter()
+        reporter = Reporter()
+        parser = Parser(TokenStream(Scanner(File.open(path), reporter)), reporter)
+        list(parser.iter_declarations())
+        plain = time.perf_counter() - start
+        start = time.perf_counter()
+        report = account(path, Reporter()).report
+        accounted = time.perf_counter() - start
+    print(report.format())
+    print(
+        f"front end {plain * 1e3:8.2f}ms, accounted {accounted * 1e3:8.2f}ms "
+        f"({accounted / plain:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
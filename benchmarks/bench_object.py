@@ -0,0 +1,86 @@
+"""Compares writing an object file directly with generating assembly text
+and running it through the system assembler.
+
+    python -m benchmarks.bench_object [--runs N] [--functions N]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pycc.codegen import generate, generate_object
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.lower import lower
+from pycc.opt import optimize
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+
+FUNCTION = """
+long f{n}(long *a, int n, long k) {{
+    long s = 0;
+    for (int i = 0; i < n; i++) {{
+        if (a[i] > k)
+            s += a[i] * {n};
+        else
+            s -= a[i] / (k | 1);
+    }}
+    return s + g{n};
+}}
+"""
+
+
+def source(functions: int) -> str:
+    globals_ = "".join(f"long g{n} = {n};\n" for n in range(functions))
+    return globals_ + "".join(FUNCTION.format(n=n) for n in range(functions))
+
+
+def best(fn, runs: int) -> float:
+    result = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        result = min(result, time.perf_counter() - start)
+    return result
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--functions", type=int, default=200)
+    args = parser.parse_args(argv)
+    if shutil.which("as") is None:
+        parser.error("the system assembler is needed for comparison")
+
+    reporter = Reporter()
+    text = source(args.functions)
+    parser_ = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    module = lower(parser_.iter_declarations(), reporter)
+    optimize(module)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "a")
+
+        def external():
+            with open(path + ".s", "w") as f:
+                f.write(generate(module))
+            subprocess.run(["as", "-o", path + ".o", path + ".s"], check=True)
+
+        def direct():
+            with open(path + ".o", "wb") as f:
+                f.write(generate_object(module))
+
+        assembling = best(external, args.runs)
+        writing = best(direct, args.runs)
+    print(f"{args.functions} functions")
+    print(f"  text + as     {assembling * 1e3:8.2f}ms")
+    print(
+        f"  object writer {writing * 1e3:8.2f}ms "
+        f"{assembling / writing:6.2f}x faster"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Compares the running time of C kernels compiled at each optimization
+level, to show what inlining and the loop optimizations buy.
+
+    python -m benchmarks.bench_opt [--runs N] [--levels 1,2,3]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pycc.codegen import generate
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.lower import lower
+from pycc.opt import optimize
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+
+KERNELS = {
+    "matmul": """
+        int printf(const char *, ...);
+        long a[120][120], b[120][120], c[120][120];
+        int main(void) {
+            for (int i = 0; i < 120; i++)
+                for (int j = 0; j < 120; j++) {
+                    a[i][j] = i + j;
+                    b[i][j] = i - j;
+                }
+            for (int r = 0; r < 10; r++)
+                for (int i = 0; i < 120; i++)
+                    for (int j = 0; j < 120; j++) {
+                        long s = 0;
+                        for (int k = 0; k < 120; k++)
+                            s += a[i][k] * b[k][j];
+                        c[i][j] = s;
+                    }
+            printf("%ld\\n", c[7][9]);
+            return 0;
+        }
+    """,
+    "stencil": """
+        int printf(const char *, ...);
+        static inline int clamp(int v, int lo, int hi) {
+            return v < lo ? lo : v > hi ? hi : v;
+        }
+        static inline int at(int *p, int width, int x, int y) {
+            return p[y * width + x];
+        }
+        int src[200 * 150], dst[200 * 150];
+        int main(void) {
+            int width = 200, height = 150;
+            for (int i = 0; i < width * height; i++)
+                src[i] = i * 7 % 256;
+            for (int round = 0; round < 20; round++)
+                for (int y = 1; y < height - 1; y++)
+                    for (int x = 1; x < width - 1; x++) {
+                        int v = 4 * at(src, width, x, y) - at(src, width, x - 1, y)
+                            - at(src, width, x + 1, y) - at(src, width, x, y - 1)
+                            - at(src, width, x, y + 1);
+                        dst[y * width + x] = clamp(v, 0, 255);
+                    }
+            printf("%d\\n", dst[width * 75 + 100]);
+            return 0;
+        }
+    """,
+    "hash": """
+        int printf(const char *, ...);
+        static unsigned mix(unsigned h, unsigned v) {
+            h ^= v;
+            h *= 16777619u;
+            return h;
+        }
+        unsigned table[4096];
+        int main(void) {
+            unsigned h = 2166136261u;
+            for (int r = 0; r < 300; r++)
+                for (int i = 0; i < 4096; i++) {
+                    table[i] = mix(table[i], i * 2654435761u + r);
+                    h = mix(h, table[i]);
+                }
+            printf("%u\\n", h);
+            return 0;
+        }
+    """,
+}
+
+
+def build(text: str, level: int, path: str) -> float:
+    """Compiles ``text`` at ``-O<level>`` to an executable at ``path`` and
+    returns the time spent optimizing."""
+    reporter = Reporter()
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    module = lower(parser.iter_declarations(), reporter)
+    start = time.perf_counter()
+    optimize(module, level=level)
+    elapsed = time.perf_counter() - start
+    with open(path + ".s", "w") as f:
+        f.write(generate(module))
+    subprocess.run(["gcc", "-o", path, path + ".s"], check=True)
+    return elapsed
+
+
+def run(path: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([path], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--levels", default="1,2,3")
+    args = parser.parse_args(argv)
+    if shutil.which("gcc") is None:
+        parser.error("gcc is needed to assemble and link")
+    levels = [int(x) for x in args.levels.split(",")]
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text in KERNELS.items():
+            baseline = None
+            for level in levels:
+                path = os.path.join(tmp, f"{name}-O{level}")
+                optimizing = build(text, level, path)
+                elapsed = run(path, args.runs)
+                if baseline is None:
+                    baseline = elapsed
+                print(
+                    f"{name:>8} -O{level} {optimizing * 1e3:8.2f}ms optimize "
+                    f"{elapsed:8.3f}s run {baseline / elapsed:6.2f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Compiles one generated translation unit of many functions with the
+functions spread over a process pool, and reports the time of the
+optimizer and code generator by number of jobs against a serial build.
+
+    python -m benchmarks.bench_parallel [--functions N] [--jobs 1,2,4,8] [-O N]
+"""
+import argparse
+import os
+import time
+
+from pycc.codegen import generate_object
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.lower import lower
+from pycc.opt import optimize
+from pycc.parallel import compile_module
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+
+FUNCTION = """
+long f{n}(long *a, int n, long k) {{
+    long s = {n};
+    for (int i = 0; i < n; i++) {{
+        long x = a[i] * k + (a[i] >> 3);
+        if (x % 7 == {m})
+            s += x;
+        else
+            s -= x ^ {n};
+    }}
+    while (k > 1)
+        k = k & 1 ? 3 * k + 1 : k / 2;
+    return s + k * {m};
+}}
+"""
+
+
+def source(functions: int) -> str:
+    return "".join(FUNCTION.format(n=n, m=n % 7) for n in range(functions))
+
+
+def lowered(text: str):
+    reporter = Reporter()
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    return lower(parser.iter_declarations(), reporter)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=2000)
+    parser.add_argument("--jobs", default="1,2,4,8")
+    parser.add_argument("-O", dest="level", type=int, default=1)
+    args = parser.parse_args()
+    text = source(args.functions)
+    print(f"{args.functions} functions at -O{args.level}, {os.cpu_count()} CPUs")
+
+    module = lowered(text)
+    start = time.perf_counter()
+    optimize(module, level=args.level)
+    expected = generate_object(module)
+    serial = time.perf_counter() - start
+    print(f"{'serial':<10} {serial:8.2f}s")
+    for jobs in (int(x) for x in args.jobs.split(",")):
+        module = lowered(text)
+        start = time.perf_counter()
+        output = compile_module(module, args.level, jobs, obj=True)
+        seconds = time.perf_counter() - start
+        same = "identical" if output == expected else "DIFFERENT"
+        print(f"{f'-j{jobs}':<10} {seconds:8.2f}s {serial / seconds:6.2f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
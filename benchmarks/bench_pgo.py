@@ -0,0 +1,152 @@
+"""Compares programs built at -O2 with the same programs rebuilt with
+-fprofile-use from a profile of an instrumented run, by their running time.
+
+    python -m benchmarks.bench_pgo [--runs N]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pycc.driver import main as pycc
+
+PROGRAMS = {
+    # rare error paths in the middle of a hot loop
+    "checks": """
+        int printf(const char *, ...);
+        int data[4096];
+        int main(void) {
+            long sum = 0;
+            int errors = 0;
+            for (int i = 0; i < 4096; i++)
+                data[i] = i * 7 % 1000;
+            for (int r = 0; r < 3000; r++) {
+                for (int i = 0; i < 4096; i++) {
+                    int x = data[i];
+                    if (x < 0) {
+                        printf("negative value %d at %d\\n", x, i);
+                        errors++;
+                        continue;
+                    }
+                    if (x > 100000) {
+                        printf("value %d out of range at %d\\n", x, i);
+                        errors += 2;
+                        x = 100000;
+                    }
+                    if (x == 12345) {
+                        printf("sentinel at %d\\n", i);
+                        break;
+                    }
+                    sum += x;
+                }
+            }
+            printf("%ld %d\\n", sum, errors);
+            return 0;
+        }
+    """,
+    # a branch whose likely side comes second in the source
+    "skewed": """
+        int printf(const char *, ...);
+        int main(void) {
+            unsigned h = 2166136261u;
+            long odd = 0;
+            for (int i = 0; i < 50000000; i++) {
+                if ((i & 1023) == 1023) {
+                    h = (h ^ i) * 16777619u;
+                    odd += h & 1;
+                } else {
+                    h += i;
+                }
+            }
+            printf("%u %ld\\n", h, odd);
+            return 0;
+        }
+    """,
+    # a call too large to inline without knowing that it is hot
+    "calls": """
+        int printf(const char *, ...);
+        long mix(long a, long b, int n) {
+            long x = a ^ b;
+            for (int round = 0; round < 2; round++) {
+                x = x * 31 + n;
+                x ^= x >> 13;
+                x = x * 17 + (a & 255);
+                x ^= x >> 7;
+                x = x * 13 + (b & 127);
+                x ^= x >> 11;
+                x = x * 7 + (n & 63);
+                x ^= x >> 5;
+                x = x * 5 + (a >> 3);
+                x ^= x >> 17;
+                x = x * 3 + (b >> 5);
+                x ^= x >> 3;
+            }
+            x = x * 11 + (a >> 7);
+            x ^= x >> 9;
+            x = x * 19 + (b >> 2);
+            x ^= x >> 15;
+            x = x * 23 + (n & 7);
+            x ^= x >> 6;
+            if (x < 0)
+                x = -x;
+            if (n == 99)
+                printf("%ld\\n", x);
+            return x % 1000003;
+        }
+        int main(void) {
+            long h = 1;
+            for (int i = 0; i < 10000000; i++)
+                h = mix(h, i, i & 15);
+            printf("%ld\\n", h);
+            return 0;
+        }
+    """,
+}
+
+
+def build(source: str, binary: str, *flags: str) -> None:
+    obj = binary + ".o"
+    if pycc(["-c", "-O2", *flags, source, "-o", obj]) != 0:
+        raise SystemExit(f"cannot compile {source}")
+    subprocess.run(["gcc", "-o", binary, obj], check=True)
+
+
+def run(path: str, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([path], check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+    if shutil.which("gcc") is None:
+        parser.error("gcc is needed to link")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, text in PROGRAMS.items():
+            source = os.path.join(tmp, f"{name}.c")
+            with open(source, "w") as f:
+                f.write(text)
+            profile = ["-fprofile-path", os.path.join(tmp, f"{name}.profile")]
+            base = os.path.join(tmp, name)
+            build(source, base)
+            build(source, base + "-instrumented", "-fprofile-generate", *profile)
+            instrumented = base + "-instrumented"
+            subprocess.run([instrumented], check=True, stdout=subprocess.DEVNULL)
+            build(source, base + "-pgo", "-fprofile-use", *profile)
+            plain = run(base, args.runs)
+            guided = run(base + "-pgo", args.runs)
+            print(
+                f"{name:>8} -O2 {plain:8.3f}s  -fprofile-use {guided:8.3f}s "
+                f"{plain / guided:6.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Measures scanning throughput on literal-heavy input.
+
+    python -m benchmarks.bench_scanner [--lines N]
+"""
+import argparse
+import timeit
+
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.parser import tokenize
+from pycc.scanner import Scanner
+
+LINE = (
+    '{ 12345, 0x7fffffff, 0777, 3.25e10, 0x1.8p3, \'a\', \'\\n\', '
+    '"format string %d\\n", "a somewhat longer message without escapes" },\n'
+)
+
+
+def scan(source, decode):
+    tokens = list(tokenize(Scanner(File("", source), Reporter())))
+    if decode:
+        for tok in tokens:
+            tok.value
+    return len(tokens)
+
+
+def measure(label, source, decode):
+    count = scan(source, decode)
+    elapsed = min(timeit.repeat(lambda: scan(source, decode), number=1, repeat=5))
+    print(f"{label:<24} {elapsed:8.3f}s {count / elapsed:12.0f} tokens/s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    source = LINE * args.lines
+    measure("scan only", source, False)
+    measure("scan and decode", source, True)
+
+
+if __name__ == "__main__":
+    main()
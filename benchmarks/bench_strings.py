@@ -0,0 +1,71 @@
+"""Measures what pooling string literals saves on a translation unit which
+repeats the same format strings, as logging-heavy code does.
+
+    python -m benchmarks.bench_strings [--functions N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from pycc.codegen import generate
+from pycc.error import Reporter
+from pycc.file import File
+from pycc.lower import lower
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+from pycc.strings import share_suffixes
+
+FORMATS = [
+    '"%s:%d: error: " "unexpected value %ld\\n"',
+    '"%s:%d: warning: " "unexpected value %ld\\n"',
+    '"unexpected value %ld\\n"',
+    '"value %ld\\n"',
+    '"\\n"',
+]
+
+
+def source(functions: int) -> str:
+    lines = ["int printf(const char *, ...);"]
+    for n in range(functions):
+        lines.append(f"void report{n}(const char *file, int line, long v) {{")
+        for text in FORMATS:
+            lines.append(f"    printf({text}, file, line, v);")
+        lines.append("}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=500)
+    args = parser.parse_args(argv)
+    text = source(args.functions)
+    reporter = Reporter()
+    tracemalloc.start()
+    start = time.perf_counter()
+    p = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    declarations = list(p.iter_declarations())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    module = lower(declarations, reporter)
+    literals = [(g.name, g.data) for g in module.globals if g.literal]
+    shared = share_suffixes(literals)
+    total = args.functions * sum(len(data) for _, data in literals)
+    pooled = sum(len(data) for _, data in literals)
+    emitted = sum(len(data) for name, data in literals if name not in shared)
+    print(
+        f"parse {elapsed * 1e3:8.2f}ms peak {peak / 1e6:6.2f}MB "
+        f"{p.strings.hits} of {len(p.strings.strings) + p.strings.hits} "
+        "literals interned"
+    )
+    print(
+        f"literal bytes: {total} written, {pooled} after pooling, "
+        f"{emitted} after suffix sharing ({len(shared)} shared)"
+    )
+    start = time.perf_counter()
+    generate(module)
+    print(f"generate {(time.perf_counter() - start) * 1e3:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Parses many in-memory buffers from a thread pool and reports how the
+throughput scales with the number of threads. With the GIL the threads only
+interleave; a free-threaded build of CPython runs them in parallel.
+
+    python -m benchmarks.bench_threads [--buffers N] [--threads 1,2,4,8]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pycc.error import RecordingReporter
+from pycc.file import File
+from pycc.parser import Parser, TokenStream
+from pycc.scanner import Scanner
+
+SOURCE = """
+typedef struct node { struct node *next; long value; } node;
+static int compare(const void *a, const void *b) { return *(int *)a - *(int *)b; }
+long total(node *n) {
+    long s = 0;
+    for (; n; n = n->next)
+        s += n->value * 3 + (n->value >> 2);
+    return s;
+}
+int classify(int c) {
+    switch (c) {
+    case 'a': return 1;
+    case 'b': return 2;
+    default: return c > 0x7f ? -1 : 0;
+    }
+}
+"""
+
+
+def parse(file: File) -> int:
+    reporter = RecordingReporter()
+    parser = Parser(TokenStream(Scanner(file, reporter)), reporter)
+    return sum(1 for _ in parser.iter_declarations())
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--buffers", type=int, default=400)
+    parser.add_argument("--threads", default="1,2,4,8")
+    args = parser.parse_args(argv)
+    files = [File(f"buffer{n}.c", SOURCE * 4) for n in range(args.buffers)]
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{args.buffers} buffers, GIL {'enabled' if gil else 'disabled'}")
+    baseline = None
+    for threads in [int(x) for x in args.threads.split(",")]:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            declarations = sum(pool.map(parse, files))
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = elapsed
+        print(
+            f"{threads:3} threads {elapsed:8.3f}s "
+            f"{args.buffers / elapsed:8.1f} buffers/s {baseline / elapsed:6.2f}x "
+            f"({declarations} declarations)"
+        )
+
+
+if __name__ == "__main__":
+    main()
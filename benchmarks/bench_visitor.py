@@ -0,0 +1,77 @@
+"""Compares the iterative visitor against a naive recursive one.
+
+    python -m benchmarks.bench_visitor [--nodes N]
+"""
+import argparse
+import sys
+import time
+
+from pycc import ast
+from pycc.file import Location
+from pycc.visitor import Visitor, fuse
+
+L = Location("", 0, 1, 0)
+
+
+def build(nodes: int) -> ast.CompoundStmt:
+    # each statement is ExprStmt(ParenExpr(ParenExpr(RefDeclExpr)))
+    stmts = []
+    for i in range(nodes // 4):
+        expr = ast.ParenExpr(L, L, ast.ParenExpr(L, L, ast.RefDeclExpr(L, L, "x")))
+        stmts.append(ast.ExprStmt(L, L, expr))
+    return ast.CompoundStmt(L, L, stmts)
+
+
+def naive_count(node) -> int:
+    if isinstance(node, ast.CompoundStmt):
+        return sum(naive_count(x) for x in node.stmts)
+    elif isinstance(node, ast.ExprStmt):
+        return naive_count(node.expr)
+    elif isinstance(node, ast.ParenExpr):
+        return naive_count(node.expr)
+    elif isinstance(node, ast.RefDeclExpr):
+        return 1
+    return 0
+
+
+class Counter(Visitor):
+    def __init__(self):
+        self.count = 0
+
+    def visit_RefDeclExpr(self, node):
+        self.count += 1
+
+
+def measure(label, fn):
+    start = time.perf_counter()
+    fn()
+    print(f"{label:<32} {time.perf_counter() - start:8.3f}s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    tree = build(args.nodes)
+    print(f"{args.nodes} nodes")
+    measure("naive recursive", lambda: naive_count(tree))
+    measure("Visitor", lambda: Counter().visit(tree))
+    measure("naive recursive x3", lambda: [naive_count(tree) for _ in range(3)])
+    measure("Visitor x3", lambda: [Counter().visit(tree) for _ in range(3)])
+    fused = fuse(Counter(), Counter(), Counter())
+    measure("fuse(Visitor x3)", lambda: fused.visit(tree))
+
+    deep = ast.RefDeclExpr(L, L, "x")
+    for _ in range(sys.getrecursionlimit() * 10):
+        deep = ast.ParenExpr(L, L, deep)
+    try:
+        naive_count(deep)
+        print("naive recursive on deep tree     ok")
+    except RecursionError:
+        print("naive recursive on deep tree     RecursionError")
+    measure("Visitor on deep tree", lambda: Counter().visit(deep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Builds a generated set of files under a watcher, then changes one file at
+a time and compares the latency of each rebuild with the first build.
+
+    python -m benchmarks.bench_watch [--files N] [--changes N]
+"""
+import argparse
+import os
+import tempfile
+
+from pycc.cache import FileCache
+from pycc.driver import compile
+from pycc.error import RecordingReporter
+from pycc.session import cached_tokens
+from pycc.watch import Watcher
+
+TEMPLATE = """
+struct item{n} {{ long key; long value; struct item{n} *next; }};
+long lookup{n}(struct item{n} *p, long key) {{
+    for (; p; p = p->next)
+        if (p->key == key)
+            return p->value * {n} + (key >> 3);
+    return -1;
+}}
+"""
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=10)
+    args = parser.parse_args(argv)
+    cache = FileCache()
+
+    def build(filename):
+        tokens, _ = cached_tokens(cache.get(filename))
+        reporter = RecordingReporter()
+        compile(cache.get(filename).file, reporter, "syntax-only", 0, tokens)
+        return reporter.diagnostics
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = []
+        for n in range(args.files):
+            filename = os.path.join(directory, f"file{n}.c")
+            with open(filename, "w") as fp:
+                fp.write(TEMPLATE.format(n=n) * 8)
+            filenames.append(filename)
+        watcher = Watcher(filenames, build, cache)
+        first = watcher.build_all().seconds
+        print(f"first build of {args.files} files {first * 1e3:9.2f}ms")
+        latencies = []
+        for n in range(args.changes):
+            filename = filenames[n * len(filenames) // args.changes]
+            with open(filename, "a") as fp:
+                fp.write(f"int changed{n};\n")
+            st = os.stat(filename)
+            os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+            rebuild = watcher.rebuild(watcher.poll())
+            latencies.append(rebuild.seconds)
+            assert len(rebuild.units) == 1
+        average = sum(latencies) / len(latencies)
+        print(
+            f"rebuild of 1 changed file {average * 1e3:9.2f}ms average, "
+            f"{max(latencies) * 1e3:.2f}ms worst, {first / average:.0f}x faster"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import dataclasses
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .ir import NONE
+from .x86 import RCX, RIP, Imm, Inst, Label, Mem, Sym, fits_imm32
+
+# relocation types of the x86-64 psABI
+R_X86_64_64 = 1
+R_X86_64_PC32 = 2
+R_X86_64_PLT32 = 4
+R_X86_64_GOTPCREL = 9
+
+_CONDITION_CODES = {
+    "e": 0x4,
+    "ne": 0x5,
+    "l": 0xC,
+    "le": 0xE,
+    "g": 0xF,
+    "ge": 0xD,
+    "b": 0x2,
+    "be": 0x6,
+    "a": 0x7,
+    "ae": 0x3,
+}
+# the /digit of the immediate form and the base opcode of the others
+_ARITHMETIC = {"add": 0, "or": 1, "and": 4, "sub": 5, "xor": 6, "cmp": 7}
+_SHIFTS = {"shl": 4, "shr": 5, "sar": 7}
+_UNARY = {"not": 2, "neg": 3, "div": 6, "idiv": 7}
+_SCALES = {1: 0, 2: 1, 4: 2, 8: 3}
+
+
+class EncodingError(Exception):
+    pass
+
+
+def _fits_imm8(value: int) -> bool:
+    return -128 <= value < 128
+
+
+def _immediate(value: int, size: int) -> bytes:
+    """Encodes an immediate of ``size`` bytes, at most 4 since 64-bit
+    operations sign-extend a 32-bit immediate."""
+    size = min(size, 4)
+    return (value & ((1 << (8 * size)) - 1)).to_bytes(size, "little")
+
+
+@dataclasses.dataclass
+class Relocation:
+    offset: int
+    symbol: str
+    type: int
+    addend: int
+
+
+@dataclasses.dataclass
+class Assembler:
+    """Encodes machine instructions into the bytes of a code section.
+
+    Jumps to labels are resolved when the labels are known, and references
+    to symbols are left as relocations. Every jump takes a 32-bit
+    displacement, so the size of an instruction never depends on where its
+    target ends up and one pass suffices.
+    """
+
+    code: bytearray = dataclasses.field(default_factory=bytearray)
+    relocations: List[Relocation] = dataclasses.field(default_factory=list)
+    labels: Dict[str, int] = dataclasses.field(default_factory=dict)
+    # (offset of the displacement, label)
+    _jumps: List[Tuple[int, str]] = dataclasses.field(default_factory=list)
+
+    def label(self, name: str) -> None:
+        self.labels[name] = len(self.code)
+
+    def assemble(self, code: Sequence[Union[str, Inst]]) -> None:
+        """Appends instructions; strings are labels."""
+        for x in code:
+            if isinstance(x, str):
+                self.label(x)
+            else:
+                self.instruction(x)
+
+    def resolve(self, elsewhere: Optional[Dict[str, Tuple[str, int]]] = None) -> None:
+        """Fills in the displacements of the jumps to labels. ``elsewhere``
+        maps labels in other sections to the section and offset there; the
+        jumps to them are left as relocations against the section."""
+        for offset, name in self._jumps:
+            target = self.labels.get(name)
+            if target is None and elsewhere and name in elsewhere:
+                section, at = elsewhere[name]
+                self.relocations.append(
+                    Relocation(offset, section, R_X86_64_PC32, at - 4)
+                )
+                continue
+            if target is None:
+                raise EncodingError(f"undefined label {name}")
+            struct.pack_into("<i", self.code, offset, target - (offset + 4))
+        self._jumps = []
+
+    # encoding
+
+    def _emit(
+        self,
+        opcode: bytes,
+        reg: int,
+        rm: Union[int, Mem],
+        size: int = 4,
+        imm: bytes = b"",
+        wide: Optional[bool] = None,
+        byte_registers: Sequence[int] = (),
+    ) -> None:
+        """Emits an instruction with a ModRM byte: ``reg`` is a register or
+        an opcode extension and ``rm`` a register or memory operand."""
+        rex = 0x08 if (size == 8 if wide is None else wide) else 0
+        if reg >= 8:
+            rex |= 0x04
+        if isinstance(rm, int):
+            if rm >= 8:
+                rex |= 0x01
+            tail = bytes([0xC0 | (reg & 7) << 3 | (rm & 7)])
+            relocation = None
+        else:
+            tail, bits, relocation = self._memory(reg, rm)
+            rex |= bits
+        # spl, bpl, sil and dil exist only with a REX prefix
+        needs_rex = any(4 <= r < 8 for r in byte_registers)
+        out = self.code
+        if size == 2:
+            out.append(0x66)
+        if rex or needs_rex:
+            out.append(0x40 | rex)
+        out += opcode
+        if relocation is not None:
+            symbol, kind, disp, at = relocation
+            # the displacement is relative to the end of the instruction
+            addend = disp - (len(tail) - at) - len(imm)
+            self.relocations.append(Relocation(len(out) + at, symbol, kind, addend))
+        out += tail
+        out += imm
+
+    def _memory(self, reg: int, mem: Mem):
+        """Returns the ModRM, SIB and displacement bytes of a memory
+        operand, the REX bits it needs and its relocation, if any."""
+        reg = (reg & 7) << 3
+        if mem.base == RIP:
+            kind = R_X86_64_GOTPCREL if mem.got else R_X86_64_PC32
+            relocation = (mem.symbol, kind, mem.disp, 1)
+            return bytes([reg | 5]) + bytes(4), 0, relocation
+        base, index, disp = mem.base, mem.index, mem.disp
+        if not fits_imm32(disp):
+            raise EncodingError(f"displacement {disp} does not fit in 32 bits")
+        bits = 0
+        if index != NONE:
+            if index & 7 == 4 and index < 8:
+                raise EncodingError("%rsp cannot be an index")
+            if index >= 8:
+                bits |= 0x02
+        if base == NONE:
+            # no base: disp32 with a SIB byte whose base field is 101
+            sib = _SCALES[mem.scale] << 6 | ((index & 7) if index != NONE else 4) << 3
+            return bytes([reg | 4, sib | 5]) + struct.pack("<i", disp), bits, None
+        if base >= 8:
+            bits |= 0x01
+        if disp == 0 and base & 7 != 5:
+            mod, tail = 0x00, b""
+        elif _fits_imm8(disp):
+            mod, tail = 0x40, struct.pack("<b", disp)
+        else:
+            mod, tail = 0x80, struct.pack("<i", disp)
+        if index != NONE or base & 7 == 4:
+            sib = _SCALES[mem.scale] << 6 | ((index & 7) if index != NONE else 4) << 3
+            return bytes([mod | reg | 4, sib | base & 7]) + tail, bits, None
+        return bytes([mod | reg | base & 7]) + tail, bits, None
+
+    def _jump(self, opcode: bytes, label: Label) -> None:
+        self.code += opcode
+        self._jumps.append((len(self.code), label.name))
+        self.code += bytes(4)
+
+    def instruction(self, inst: Inst) -> None:
+        op = inst.op
+        size = inst.size
+        args = inst.args
+        byte = size == 1
+        if op == "mov":
+            src, dst = args
+            if isinstance(src, Imm):
+                if size == 8 and not fits_imm32(src.value):
+                    rex = 0x49 if dst >= 8 else 0x48
+                    self.code += bytes([rex, 0xB8 + (dst & 7)])
+                    self.code += (src.value & ((1 << 64) - 1)).to_bytes(8, "little")
+                    return
+                opcode = b"\xc6" if byte else b"\xc7"
+                regs = [dst] if byte and isinstance(dst, int) else []
+                imm = _immediate(src.value, size)
+                self._emit(opcode, 0, dst, size, imm, None, regs)
+            elif isinstance(src, int):
+                regs = [src, dst] if byte and isinstance(dst, int) else [src] * byte
+                opcode = b"\x88" if byte else b"\x89"
+                self._emit(opcode, src, dst, size, b"", None, regs)
+            else:
+                regs = [dst] if byte else []
+                opcode = b"\x8a" if byte else b"\x8b"
+                self._emit(opcode, dst, src, size, b"", None, regs)
+        elif op == "movs" or op == "movz":
+            src, dst = args
+            regs = [src] if inst.src_size == 1 and isinstance(src, int) else []
+            if inst.src_size == 4:
+                if op == "movz":
+                    # writing a 32-bit register clears the upper half
+                    self._emit(b"\x8b", dst, src, 4)
+                else:
+                    self._emit(b"\x63", dst, src, 8)
+                return
+            if op == "movs":
+                opcode = b"\x0f\xbe" if inst.src_size == 1 else b"\x0f\xbf"
+            else:
+                opcode = b"\x0f\xb6" if inst.src_size == 1 else b"\x0f\xb7"
+            self._emit(opcode, dst, src, size, b"", None, regs)
+        elif op == "lea":
+            self._emit(b"\x8d", args[1], args[0], size)
+        elif op in _ARITHMETIC:
+            src, dst = args
+            n = _ARITHMETIC[op]
+            if isinstance(src, Imm):
+                regs = [dst] if byte and isinstance(dst, int) else []
+                if byte:
+                    imm = _immediate(src.value, 1)
+                    self._emit(b"\x80", n, dst, size, imm, None, regs)
+                elif _fits_imm8(src.value):
+                    imm = _immediate(src.value, 1)
+                    self._emit(b"\x83", n, dst, size, imm)
+                else:
+                    self._emit(b"\x81", n, dst, size, _immediate(src.value, size))
+            elif isinstance(src, int):
+                regs = [src, dst] if byte and isinstance(dst, int) else [src] * byte
+                opcode = bytes([n * 8 + (0 if byte else 1)])
+                self._emit(opcode, src, dst, size, b"", None, regs)
+            else:
+                regs = [dst] if byte else []
+                opcode = bytes([n * 8 + (2 if byte else 3)])
+                self._emit(opcode, dst, src, size, b"", None, regs)
+        elif op == "test":
+            src, dst = args
+            regs = [src, dst] if byte else []
+            self._emit(b"\x84" if byte else b"\x85", src, dst, size, b"", None, regs)
+        elif op == "imul":
+            if len(args) == 3 or isinstance(args[0], Imm):
+                imm, src, dst = args if len(args) == 3 else (args[0], args[1], args[1])
+                if _fits_imm8(imm.value):
+                    self._emit(b"\x6b", dst, src, size, _immediate(imm.value, 1))
+                else:
+                    self._emit(b"\x69", dst, src, size, _immediate(imm.value, size))
+            else:
+                self._emit(b"\x0f\xaf", args[1], args[0], size)
+        elif op in _SHIFTS:
+            count, dst = args
+            n = _SHIFTS[op]
+            regs = [dst] if byte and isinstance(dst, int) else []
+            if isinstance(count, Imm):
+                opcode = b"\xc0" if byte else b"\xc1"
+                self._emit(opcode, n, dst, size, _immediate(count.value, 1), None, regs)
+            else:
+                if count != RCX:
+                    raise EncodingError("a shift count must be in %cl")
+                self._emit(b"\xd2" if byte else b"\xd3", n, dst, size, b"", None, regs)
+        elif op in _UNARY:
+            regs = [args[0]] if byte and isinstance(args[0], int) else []
+            opcode = b"\xf6" if byte else b"\xf7"
+            self._emit(opcode, _UNARY[op], args[0], size, b"", None, regs)
+        elif op == "set":
+            opcode = bytes([0x0F, 0x90 + _CONDITION_CODES[inst.cond]])
+            self._emit(opcode, 0, args[0], 1, b"", None, [args[0]])
+        elif op == "j":
+            self._jump(bytes([0x0F, 0x80 + _CONDITION_CODES[inst.cond]]), args[0])
+        elif op == "jmp":
+            self._jump(b"\xe9", args[0])
+        elif op == "call":
+            target = args[0]
+            if isinstance(target, Sym):
+                self.code.append(0xE8)
+                # calls go through the PLT if the linker needs one
+                offset = len(self.code)
+                self.relocations.append(
+                    Relocation(offset, target.name, R_X86_64_PLT32, -4)
+                )
+                self.code += bytes(4)
+            else:
+                self._emit(b"\xff", 2, target, 4)
+        elif op == "cqto":
+            self.code += b"\x48\x99" if size == 8 else b"\x99"
+        elif op == "push" or op == "pop":
+            reg = args[0]
+            if reg >= 8:
+                self.code.append(0x41)
+            self.code.append((0x50 if op == "push" else 0x58) + (reg & 7))
+        elif op == "leave":
+            self.code.append(0xC9)
+        elif op == "ret":
+            self.code.append(0xC3)
+        else:
+            raise EncodingError(f"cannot encode {inst}")
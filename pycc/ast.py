@@ -1,6 +1,9 @@
 import dataclasses
+from typing import List, Optional
 
 from .file import Location
+from .token import Suffix, Token
+from .types import Type
 
 
 @dataclasses.dataclass
@@ -17,6 +20,7 @@ class Expr(Node):
 class IntegerConstant(Expr):
     text: str
     value: int
+    suffix: Suffix = Suffix.NONE
 
 
 @dataclasses.dataclass
@@ -25,6 +29,7 @@ class FloatingConstant(Expr):
     end: Location
     text: str
     value: float
+    suffix: Suffix = Suffix.NONE
 
 
 @dataclasses.dataclass
@@ -49,15 +54,255 @@ class ParenExpr(Expr):
     expr: Expr
 
 
+@dataclasses.dataclass
+class UnaryExpr(Expr):
+    op: Token
+    operand: Expr
+
+
+@dataclasses.dataclass
+class BinaryExpr(Expr):
+    op: Token
+    left: Expr
+    right: Expr
+
+
+@dataclasses.dataclass
+class ConditionalExpr(Expr):
+    cond: Expr
+    then: Expr
+    otherwise: Expr
+
+
+@dataclasses.dataclass
+class PostfixExpr(Expr):
+    op: Token
+    operand: Expr
+
+
+@dataclasses.dataclass
+class CallExpr(Expr):
+    callee: Expr
+    args: List[Expr]
+
+
+@dataclasses.dataclass
+class SubscriptExpr(Expr):
+    base: Expr
+    index: Expr
+
+
+@dataclasses.dataclass
+class MemberExpr(Expr):
+    base: Expr
+    name: str
+    arrow: bool
+
+
+@dataclasses.dataclass
+class CastExpr(Expr):
+    type: Type
+    expr: Expr
+
+
+@dataclasses.dataclass
+class SizeofExpr(Expr):
+    # Token.SIZEOF or Token.ALIGNOF; exactly one of type and operand is set
+    op: Token
+    type: Optional[Type]
+    operand: Optional[Expr]
+
+
+@dataclasses.dataclass
+class Designator(Node):
+    # .field or [index]
+    field: Optional[str]
+    index: Optional[Expr]
+
+
+@dataclasses.dataclass
+class DesignatedInitExpr(Expr):
+    designators: List[Designator]
+    init: Expr
+
+
+@dataclasses.dataclass
+class InitListExpr(Expr):
+    inits: List[Expr]
+
+
 class Stmt(Node):
     pass
 
 
+class Decl(Node):
+    pass
+
+
+@dataclasses.dataclass
+class ErrorStmt(Stmt):
+    pass
+
+
 @dataclasses.dataclass
 class ExprStmt(Stmt):
     expr: Expr
 
 
 @dataclasses.dataclass
-class TranslationUnit(Node):
+class CompoundStmt(Stmt):
+    stmts: List[Stmt]
+
+
+@dataclasses.dataclass
+class NullStmt(Stmt):
+    pass
+
+
+@dataclasses.dataclass
+class DeclStmt(Stmt):
+    decls: List[Decl]
+
+
+@dataclasses.dataclass
+class IfStmt(Stmt):
+    cond: Expr
+    then: Stmt
+    otherwise: Optional[Stmt]
+
+
+@dataclasses.dataclass
+class SwitchStmt(Stmt):
+    cond: Expr
+    body: Stmt
+
+
+@dataclasses.dataclass
+class WhileStmt(Stmt):
+    cond: Expr
+    body: Stmt
+
+
+@dataclasses.dataclass
+class DoStmt(Stmt):
+    body: Stmt
+    cond: Expr
+
+
+@dataclasses.dataclass
+class ForStmt(Stmt):
+    # a DeclStmt or ExprStmt
+    init: Optional[Stmt]
+    cond: Optional[Expr]
+    step: Optional[Expr]
+    body: Stmt
+
+
+@dataclasses.dataclass
+class ReturnStmt(Stmt):
+    expr: Optional[Expr]
+
+
+@dataclasses.dataclass
+class BreakStmt(Stmt):
     pass
+
+
+@dataclasses.dataclass
+class ContinueStmt(Stmt):
+    pass
+
+
+@dataclasses.dataclass
+class GotoStmt(Stmt):
+    label: str
+
+
+@dataclasses.dataclass
+class LabelStmt(Stmt):
+    name: str
+    stmt: Stmt
+
+
+@dataclasses.dataclass
+class CaseStmt(Stmt):
+    expr: Expr
+    stmt: Stmt
+
+
+@dataclasses.dataclass
+class DefaultStmt(Stmt):
+    stmt: Stmt
+
+
+@dataclasses.dataclass
+class ErrorDecl(Decl):
+    pass
+
+
+@dataclasses.dataclass
+class VarDecl(Decl):
+    name: str
+    type: Type
+    storage: Optional[Token]
+    init: Optional[Expr]
+
+
+@dataclasses.dataclass
+class ParamDecl(Decl):
+    name: Optional[str]
+    type: Type
+
+
+@dataclasses.dataclass
+class FunctionDecl(Decl):
+    name: str
+    type: Type
+    storage: Optional[Token]
+    params: List[ParamDecl]
+    # None for a declaration without a definition
+    body: Optional[CompoundStmt]
+    inline: bool = False
+
+
+@dataclasses.dataclass
+class TypedefDecl(Decl):
+    name: str
+    type: Type
+
+
+@dataclasses.dataclass
+class FieldDecl(Decl):
+    name: Optional[str]
+    type: Type
+    bit_width: Optional[Expr]
+
+
+@dataclasses.dataclass
+class RecordDecl(Decl):
+    type: Type
+    fields: List[FieldDecl]
+
+
+@dataclasses.dataclass
+class EnumConstantDecl(Decl):
+    name: str
+    value: int
+    init: Optional[Expr]
+
+
+@dataclasses.dataclass
+class EnumDecl(Decl):
+    type: Type
+    constants: List[EnumConstantDecl]
+
+
+@dataclasses.dataclass
+class StaticAssertDecl(Decl):
+    cond: Expr
+    message: Optional[Expr]
+
+
+@dataclasses.dataclass
+class TranslationUnit(Node):
+    decls: List[Decl]
@@ -0,0 +1,64 @@
+import dataclasses
+import hashlib
+import os
+from typing import Dict, Optional
+
+from .file import File, record_open
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    file: File
+    mtime: int
+    size: int
+    digest: bytes
+    # results derived from the file contents, keyed by analysis name
+    derived: Dict[str, object] = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass
+class FileCache:
+    """Caches file contents and results derived from them.
+
+    An entry is reused as long as the file's mtime and size are unchanged.
+    When they change the file is read again, and the derived results are only
+    dropped if the content digest differs as well. Entries are keyed by
+    absolute path, so that every spelling of a file shares one.
+    """
+
+    entries: Dict[str, CacheEntry] = dataclasses.field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    def get(self, filename: str) -> CacheEntry:
+        key = os.path.abspath(filename)
+        st = os.stat(filename)
+        entry = self.entries.get(key)
+        if (
+            entry is not None
+            and entry.mtime == st.st_mtime_ns
+            and entry.size == st.st_size
+        ):
+            self.hits += 1
+            record_open(filename)
+            return entry
+
+        file = File.open(filename)
+        digest = hashlib.sha256(file.source.encode("utf-8", "surrogatepass")).digest()
+        if entry is not None and entry.digest == digest:
+            self.hits += 1
+            entry.file = file
+            entry.mtime = st.st_mtime_ns
+            entry.size = st.st_size
+            return entry
+
+        self.misses += 1
+        entry = CacheEntry(file, st.st_mtime_ns, st.st_size, digest)
+        self.entries[key] = entry
+        return entry
+
+    def invalidate(self, filename: Optional[str] = None) -> None:
+        if filename is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(os.path.abspath(filename), None)
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+from typing import List, Optional
+
+
+class ServerError(Exception):
+    pass
+
+
+def default_socket_path() -> str:
+    path = os.environ.get("PYCC_SERVER_SOCKET")
+    if path:
+        return path
+    return os.path.join(tempfile.gettempdir(), f"pycc-{os.getuid()}.sock")
+
+
+def request(message: dict, path: Optional[str] = None) -> dict:
+    """Sends one request to a running compile server and returns its response.
+
+    Raises ``OSError`` if no server is listening on ``path``.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or default_socket_path())
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as fp:
+            line = fp.readline()
+    if not line:
+        raise ServerError("connection closed by server")
+    return json.loads(line)
+
+
+def compile(
+    filenames: List[str], mode: str = "syntax-only", path: Optional[str] = None
+) -> list:
+    """Compiles ``filenames`` on the compile server if one is running, or in
+    this process otherwise. Relative names are made absolute first, since
+    the server runs in a directory of its own."""
+    from .session import Result
+
+    filenames = [os.path.abspath(x) for x in filenames]
+    message = {"command": "compile", "files": filenames, "mode": mode}
+    try:
+        response = request(message, path)
+    except OSError:
+        from .session import Session
+
+        session = Session()
+        return [session.compile(x, mode) for x in filenames]
+    if response["status"] != "ok":
+        raise ServerError(response["message"])
+    return [Result.from_json(x) for x in response["results"]]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="pycc-client")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--socket", default=None, help="path of the Unix socket")
+    parser.add_argument(
+        "--mode", default="syntax-only", choices=("syntax-only", "tokens")
+    )
+    args = parser.parse_args(argv)
+    status = 0
+    for result in compile(args.files, args.mode, args.socket):
+        for diagnostic in result.diagnostics:
+            print(diagnostic, file=sys.stderr)
+        sys.stdout.write(result.output)
+        if not result.ok:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,835 @@
+import dataclasses
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+from . import regalloc, strings
+from .ir import COMPARISONS, NONE, Function, Global, Module, Op, ValueType
+from .ssa import uses as use_lists
+from .x86 import (
+    ARGUMENT_REGISTERS,
+    CALLEE_SAVED,
+    FIRST_VIRTUAL,
+    NEGATED,
+    RAX,
+    RBP,
+    RCX,
+    RDX,
+    RIP,
+    RSP,
+    SWAPPED,
+    Imm,
+    Inst,
+    Label,
+    MBlock,
+    MFunction,
+    Mem,
+    Sym,
+    fits_imm32,
+)
+
+
+class CodegenError(Exception):
+    pass
+
+
+_CONDITIONS = {
+    Op.EQ: "e",
+    Op.NE: "ne",
+    Op.SLT: "l",
+    Op.SLE: "le",
+    Op.SGT: "g",
+    Op.SGE: "ge",
+    Op.ULT: "b",
+    Op.ULE: "be",
+    Op.UGT: "a",
+    Op.UGE: "ae",
+}
+_TWO_ADDRESS = {
+    Op.ADD: "add",
+    Op.SUB: "sub",
+    Op.MUL: "imul",
+    Op.AND: "and",
+    Op.OR: "or",
+    Op.XOR: "xor",
+}
+_SHIFTS = {Op.SHL: "shl", Op.SAR: "sar", Op.SHR: "shr"}
+# operations which can read their second operand from memory
+_MEMORY_OPERAND = frozenset(_TWO_ADDRESS) | COMPARISONS
+# values which are recomputed where they are used instead of kept in a register
+_REMATERIALIZED = frozenset({Op.CONST, Op.UNDEF, Op.ALLOCA, Op.GLOBAL})
+
+# where the blocks which never ran in the profile go
+COLD_SECTION = ".text.unlikely"
+
+ALLOCATORS = {"linear-scan": regalloc.allocate, "naive": regalloc.allocate_naive}
+
+
+def split_critical_edges(fn: Function) -> None:
+    """Turns branches with both targets the same into jumps and puts a new
+    block on every edge from a block with several successors to one with
+    several predecessors, so that copies for phis and the register
+    allocator have a place on every edge."""
+    op = fn.op
+    for block in fn.blocks:
+        i = fn.terminator(block.id)
+        if i is not None and op[i] == Op.BRANCH and fn.b[i] == fn.c[i]:
+            fn.remove_edge(block.id, fn.b[i])
+            op[i] = Op.JUMP
+            fn.a[i] = fn.b[i]
+    for block in list(fn.blocks):
+        if len(block.succs) < 2:
+            continue
+        for k, succ in enumerate(block.succs):
+            preds = fn.blocks[succ].preds
+            if len(preds) < 2:
+                continue
+            new = fn.new_block()
+            fn.retarget(block.id, succ, new)
+            block.succs[k] = new
+            preds[preds.index(block.id)] = new
+            fn.blocks[new].preds.append(block.id)
+            fn.blocks[new].succs.append(succ)
+            fn.blocks[new].insts.append(fn.create(new, Op.JUMP, a=succ))
+
+
+def _estimate_counts(blocks: Sequence[MBlock]) -> List[int]:
+    """Returns the profile counts of ``blocks``. Those which are unknown,
+    such as the blocks split off edges after the profile was read, are
+    estimated from their neighbours, or else taken to be as hot as the
+    hottest block."""
+    counts = [x.count for x in blocks]
+    changed = True
+    while changed:
+        changed = False
+        for k, block in enumerate(blocks):
+            if counts[k] >= 0:
+                continue
+            estimates = [
+                sum(counts[x] for x in neighbours)
+                for neighbours in (block.preds, block.succs)
+                if neighbours and all(counts[x] >= 0 for x in neighbours)
+            ]
+            if estimates:
+                counts[k] = min(estimates)
+                changed = True
+    hottest = max(counts)
+    return [hottest if x < 0 else x for x in counts]
+
+
+def place_blocks(mfn: MFunction) -> None:
+    """Orders the blocks of ``mfn`` by their profile counts. Each block is
+    followed by its hottest successor not placed yet, so that the hot paths
+    fall through, and when there is none by the hottest block left. If the
+    function ran, the blocks which never did are moved to the cold
+    section."""
+    blocks = mfn.blocks
+    if all(x.count < 0 for x in blocks):
+        return
+    counts = _estimate_counts(blocks)
+    placed = [False] * len(blocks)
+    order = []
+    current: Optional[int] = 0
+    while current is not None:
+        placed[current] = True
+        order.append(current)
+        candidates = [x for x in blocks[current].succs if not placed[x]]
+        if not candidates:
+            candidates = [k for k, x in enumerate(placed) if not x]
+        # ties keep the order of the source
+        current = max(candidates, key=lambda x: (counts[x], -x), default=None)
+    if counts[0] > 0:
+        hot = [k for k in order if counts[k]]
+        if len(hot) < len(order):
+            mfn.cold = len(hot)
+            order = hot + [k for k in order if not counts[k]]
+    remap = {old: new for new, old in enumerate(order)}
+    mfn.blocks = [blocks[k] for k in order]
+    for block in mfn.blocks:
+        block.succs = [remap[x] for x in block.succs]
+        block.preds = [remap[x] for x in block.preds]
+
+
+def _align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+@dataclasses.dataclass
+class Selector:
+    """Selects x86-64 instructions for a function in SSA form, over virtual
+    registers.
+
+    Selection is greedy tree matching: a value with one use in its own
+    block is folded into its user where an x86 operand can express it, so
+    additions and scaled indices become addressing modes, loads become
+    memory operands, and comparisons are fused with the branch using them.
+    Constants, stack addresses and symbols are rematerialized at each use.
+    Phis become copies at the end of the predecessors.
+    """
+
+    fn: Function
+    # the symbols defined in the module, which are reached without the GOT
+    defined: Set[str] = dataclasses.field(default_factory=set)
+    index: int = 0
+    mfn: MFunction = dataclasses.field(init=False)
+    frame_size: int = dataclasses.field(default=0, init=False)
+    _vregs: Dict[int, int] = dataclasses.field(default_factory=dict, init=False)
+    _next: int = dataclasses.field(default=FIRST_VIRTUAL, init=False)
+    _slots: Dict[int, int] = dataclasses.field(default_factory=dict, init=False)
+    _folded: Set[int] = dataclasses.field(default_factory=set, init=False)
+    _insts: List[Inst] = dataclasses.field(default_factory=list, init=False)
+
+    def select(self) -> MFunction:
+        fn = self.fn
+        split_critical_edges(fn)
+        self._uses = use_lists(fn)
+        self.mfn = MFunction(fn.name, static=fn.static)
+        entry = fn.blocks[0].count if fn.blocks else -1
+        self.mfn.blocks.append(MBlock(self.label(0), succs=[1], count=entry))
+        for block in fn.blocks:
+            self.mfn.blocks.append(
+                MBlock(
+                    self.label(block.id + 1),
+                    succs=[x + 1 for x in block.succs],
+                    preds=[x + 1 for x in block.preds],
+                    count=block.count,
+                )
+            )
+        self.mfn.blocks[1].preds.insert(0, 0)
+        offset = 0
+        for i in fn.instructions():
+            if fn.op[i] == Op.ALLOCA:
+                offset = _align(offset + fn.a[i], max(fn.b[i], 1))
+                self._slots[i] = -offset
+        self.frame_size = _align(offset, 8)
+        self._choose_folded()
+        self._insts = self.mfn.blocks[0].insts
+        self._parameters()
+        self.emit("jmp", 8, Label(self.label(1)))
+        for block in fn.blocks:
+            self._insts = self.mfn.blocks[block.id + 1].insts
+            self._block(block.id)
+        return self.mfn
+
+    def label(self, block: int) -> str:
+        return f".LBB{self.index}_{block}"
+
+    def emit(self, op: str, size: int, *args, **kwargs) -> Inst:
+        inst = Inst(op, size, list(args), **kwargs)
+        self._insts.append(inst)
+        return inst
+
+    def new_vreg(self) -> int:
+        self._next += 1
+        return self._next - 1
+
+    def vreg(self, value: int) -> int:
+        reg = self._vregs.get(value)
+        if reg is None:
+            reg = self._vregs[value] = self.new_vreg()
+        return reg
+
+    def size(self, value: int) -> int:
+        return ValueType(self.fn.type[value]).size
+
+    def _single_use(self, value: int, block: int) -> bool:
+        return len(self._uses[value]) == 1 and self.fn.block_of[value] == block
+
+    def _scale(self, value: int) -> int:
+        """Returns the factor of a multiplication by 1, 2, 4 or 8, or 0."""
+        fn = self.fn
+        o = fn.op[value]
+        if o not in (Op.MUL, Op.SHL) or fn.op[fn.b[value]] != Op.CONST:
+            return 0
+        k = fn.a[fn.b[value]]
+        if o == Op.SHL:
+            k = 1 << k if 0 <= k <= 3 else 0
+        return k if k in (1, 2, 4, 8) else 0
+
+    def _choose_folded(self) -> None:
+        fn = self.fn
+        op, a, b = fn.op, fn.a, fn.b
+        folded = self._folded
+        for block in fn.blocks:
+            insts = [i for i in block.insts if op[i] != Op.NOP]
+            for i in insts:
+                o = op[i]
+                if o == Op.LOAD or o == Op.STORE:
+                    address = a[i]
+                    if op[address] == Op.ADD and self._single_use(address, block.id):
+                        folded.add(address)
+                        for x in (b[address], a[address]):
+                            if self._scale(x) and self._single_use(x, block.id):
+                                folded.add(x)
+                                break
+                elif o == Op.BRANCH:
+                    cond = a[i]
+                    if op[cond] in COMPARISONS and self._single_use(cond, block.id):
+                        folded.add(cond)
+            # loads move to where their user is emitted, so no store or call
+            # may come in between
+            position = {i: k for k, i in enumerate(insts)}
+            effects = [k for k, i in enumerate(insts) if op[i] in (Op.STORE, Op.CALL)]
+            for k, i in enumerate(insts):
+                o = op[i]
+                if o not in _MEMORY_OPERAND:
+                    continue
+                if i in folded:
+                    if o not in COMPARISONS:
+                        continue
+                    # a fused comparison is emitted with the branch
+                    k = len(insts) - 1
+                load = b[i]
+                if (
+                    op[load] == Op.LOAD
+                    and self.size(load) >= 4
+                    and self._single_use(load, block.id)
+                    and not any(position[load] < e < k for e in effects)
+                ):
+                    folded.add(load)
+
+    # operands
+
+    def _compute_into(self, value: int) -> int:
+        reg = self.new_vreg()
+        self.compute(value, reg)
+        return reg
+
+    def reg(self, value: int) -> int:
+        """Returns a register holding ``value``."""
+        if self.fn.op[value] in _REMATERIALIZED or value in self._folded:
+            return self._compute_into(value)
+        return self.vreg(value)
+
+    def imm_or_reg(self, value: int):
+        fn = self.fn
+        o = fn.op[value]
+        if o == Op.CONST and fits_imm32(fn.a[value]):
+            return Imm(fn.a[value])
+        if o == Op.UNDEF:
+            return Imm(0)
+        return self.reg(value)
+
+    def operand(self, value: int):
+        """Returns an immediate, memory or register operand for ``value``."""
+        if value in self._folded and self.fn.op[value] == Op.LOAD:
+            return self.address(self.fn.a[value])
+        return self.imm_or_reg(value)
+
+    def _local(self, value: int) -> Optional[str]:
+        fn = self.fn
+        if fn.op[value] != Op.GLOBAL:
+            return None
+        name = fn.names[fn.a[value]]
+        return name if name in self.defined else None
+
+    def address(self, value: int) -> Mem:
+        """Returns a memory operand addressing ``value``."""
+        fn = self.fn
+        o = fn.op[value]
+        if o == Op.ALLOCA:
+            return Mem(RBP, disp=self._slots[value])
+        symbol = self._local(value)
+        if symbol is not None:
+            return Mem(RIP, symbol=symbol)
+        if value not in self._folded or o != Op.ADD:
+            return Mem(self.reg(value))
+        base = index = NONE
+        scale = 1
+        disp = 0
+        terms = [fn.a[value], fn.b[value]]
+        if fn.op[terms[0]] == Op.CONST:
+            terms.reverse()
+        if len(terms) == 2 and fn.op[terms[1]] == Op.CONST:
+            # symbol+disp or disp(%rbp) with no registers
+            k = fn.a[terms[1]]
+            symbol = self._local(terms[0])
+            if symbol is not None and fits_imm32(k):
+                return Mem(RIP, symbol=symbol, disp=k)
+        for x in terms:
+            o = fn.op[x]
+            if o == Op.CONST and fits_imm32(disp + fn.a[x]):
+                disp += fn.a[x]
+            elif x in self._folded:
+                index = self.reg(fn.a[x])
+                scale = self._scale(x)
+            elif o == Op.ALLOCA and base == NONE:
+                base = RBP
+                disp += self._slots[x]
+            elif base == NONE:
+                base = self.reg(x)
+            else:
+                index = self.reg(x)
+        return Mem(base, index, scale, disp)
+
+    # instructions
+
+    def _parameters(self) -> None:
+        fn = self.fn
+        for i in fn.instructions():
+            if fn.op[i] != Op.PARAM or not self._uses[i]:
+                continue
+            k = fn.a[i]
+            if k < len(ARGUMENT_REGISTERS):
+                self.emit("mov", 8, ARGUMENT_REGISTERS[k], self.vreg(i))
+            else:
+                # above the return address and the saved %rbp
+                source = Mem(RBP, disp=16 + 8 * (k - len(ARGUMENT_REGISTERS)))
+                self.emit("mov", 8, source, self.vreg(i))
+
+    def _block(self, block: int) -> None:
+        fn = self.fn
+        op = fn.op
+        preds = fn.blocks[block].preds
+        if len(preds) == 1 and op[fn.blocks[preds[0]].insts[-1]] == Op.BRANCH:
+            self._phi_copies(preds[0], block)
+        for i in fn.blocks[block].insts:
+            o = op[i]
+            if (
+                o in _REMATERIALIZED
+                or o in (Op.NOP, Op.PHI, Op.PARAM)
+                or i in self._folded
+            ):
+                continue
+            if o == Op.STORE:
+                self.emit(
+                    "mov",
+                    self.size(fn.b[i]),
+                    self.imm_or_reg(fn.b[i]),
+                    self.address(fn.a[i]),
+                )
+            elif o == Op.CALL:
+                self._call(i)
+            elif o == Op.JUMP:
+                self._phi_copies(block, fn.a[i])
+                self.emit("jmp", 8, Label(self.label(fn.a[i] + 1)))
+            elif o == Op.BRANCH:
+                self._branch(i)
+            elif o == Op.RET:
+                if fn.a[i] == NONE:
+                    self.emit("ret", 8)
+                else:
+                    value = fn.a[i]
+                    size = 8 if self.size(value) == 8 else 4
+                    self.emit("mov", size, self.imm_or_reg(value), RAX)
+                    self.emit("ret", 8, nargs=1)
+            elif self._uses[i]:
+                self.compute(i, self.vreg(i))
+
+    def _phi_copies(self, pred: int, block: int) -> None:
+        fn = self.fn
+        k = fn.blocks[block].preds.index(pred)
+        copies = [(fn.pool[fn.b[i] + k], i) for i in fn.phis(block)]
+        if not copies:
+            return
+        # a phi whose incoming value is another phi of the block must read
+        # it before it is overwritten
+        phis = {i for _, i in copies}
+        if any(value in phis for value, _ in copies):
+            temps = []
+            for value, i in copies:
+                temp = self.new_vreg()
+                self.emit("mov", 8, self.imm_or_reg(value), temp)
+                temps.append((temp, i))
+            for temp, i in temps:
+                self.emit("mov", 8, temp, self.vreg(i))
+            return
+        for value, i in copies:
+            self.emit("mov", 8, self.imm_or_reg(value), self.vreg(i))
+
+    def _compare(self, i: int) -> str:
+        """Emits the comparison ``i`` and returns the condition code which
+        holds if it is true."""
+        fn = self.fn
+        cond = _CONDITIONS[Op(fn.op[i])]
+        left, right = fn.a[i], fn.b[i]
+        size = self.size(left)
+        if fn.op[left] in (Op.CONST, Op.UNDEF) and fn.op[right] != Op.CONST:
+            left, right = right, left
+            cond = SWAPPED[cond]
+        self.emit("cmp", size, self.operand(right), self.reg(left))
+        return cond
+
+    def _branch(self, i: int) -> None:
+        fn = self.fn
+        cond = fn.a[i]
+        if cond in self._folded:
+            cc = self._compare(cond)
+        else:
+            reg = self.reg(cond)
+            self.emit("test", self.size(cond), reg, reg)
+            cc = "ne"
+        self.emit("j", 8, Label(self.label(fn.b[i] + 1)), cond=cc)
+        self.emit("jmp", 8, Label(self.label(fn.c[i] + 1)))
+
+    def _call(self, i: int) -> None:
+        fn = self.fn
+        callee, *args = fn.operands(i)
+        count = len(ARGUMENT_REGISTERS)
+        for k, arg in enumerate(args[count:]):
+            self.emit("mov", 8, self.imm_or_reg(arg), Mem(RSP, disp=8 * k))
+        self.mfn.outgoing_size = max(
+            self.mfn.outgoing_size, 8 * max(len(args) - count, 0)
+        )
+        for arg, reg in zip(args, ARGUMENT_REGISTERS):
+            size = 8 if self.size(arg) == 8 else 4
+            self.emit("mov", size, self.imm_or_reg(arg), reg)
+        if fn.op[callee] == Op.GLOBAL:
+            name = fn.names[fn.a[callee]]
+            target = Sym(name, plt=name not in self.defined)
+        else:
+            target = self.reg(callee)
+        # no vector registers carry arguments to variadic functions
+        self.emit("mov", 4, Imm(0), RAX)
+        self.emit("call", 8, target, nargs=min(len(args), count))
+        if fn.type[i] != ValueType.VOID and self._uses[i]:
+            self.emit("mov", 8, RAX, self.vreg(i))
+
+    def _extend(self, value: int, signed: bool) -> int:
+        """Returns a register holding ``value`` extended to 32 bits if it is
+        narrower."""
+        reg = self.reg(value)
+        size = self.size(value)
+        if size >= 4:
+            return reg
+        wide = self.new_vreg()
+        self.emit("movs" if signed else "movz", 4, reg, wide, src_size=size)
+        return wide
+
+    def compute(self, i: int, dst: int) -> None:
+        """Emits instruction ``i`` with its result in ``dst``."""
+        fn = self.fn
+        o = fn.op[i]
+        a, b = fn.a[i], fn.b[i]
+        t = ValueType(fn.type[i])
+        # 8 and 16-bit values live in 32-bit registers whose upper bits are
+        # ignored, since only their low bits are ever observed
+        size = 8 if t.size == 8 else 4
+        if o == Op.CONST:
+            self.emit("mov", size, Imm(a), dst)
+        elif o == Op.UNDEF:
+            self.emit("mov", 4, Imm(0), dst)
+        elif o == Op.ALLOCA:
+            self.emit("lea", 8, Mem(RBP, disp=self._slots[i]), dst)
+        elif o == Op.GLOBAL:
+            name = fn.names[a]
+            if name in self.defined:
+                self.emit("lea", 8, Mem(RIP, symbol=name), dst)
+            else:
+                self.emit("mov", 8, Mem(RIP, symbol=name, got=True), dst)
+        elif o == Op.LOAD:
+            if t.size < 4:
+                self.emit("movz", 4, self.address(a), dst, src_size=t.size)
+            else:
+                self.emit("mov", t.size, self.address(a), dst)
+        elif o == Op.ADD and i in self._folded:
+            self.emit("lea", 8, self.address(i), dst)
+        elif o in _TWO_ADDRESS:
+            source = self.operand(b)
+            if o == Op.MUL and isinstance(source, Imm):
+                self.emit("imul", size, source, self.reg(a), dst)
+                return
+            self.emit("mov", size, self.reg(a), dst)
+            self.emit(_TWO_ADDRESS[o], size, source, dst)
+        elif o in _SHIFTS:
+            signed = o != Op.SHR
+            left = self._extend(a, signed) if o != Op.SHL else self.reg(a)
+            if fn.op[b] == Op.CONST:
+                self.emit("mov", size, left, dst)
+                self.emit(_SHIFTS[o], size, Imm(fn.a[b] & (t.bits - 1)), dst)
+                return
+            self.emit("mov", 4, self.reg(b), RCX)
+            self.emit("mov", size, left, dst)
+            self.emit(_SHIFTS[o], size, RCX, dst)
+        elif o in (Op.SDIV, Op.UDIV, Op.SREM, Op.UREM):
+            signed = o in (Op.SDIV, Op.SREM)
+            left = self._extend(a, signed)
+            right = self._extend(b, signed)
+            self.emit("mov", size, left, RAX)
+            if signed:
+                self.emit("cqto", size)
+            else:
+                self.emit("mov", 4, Imm(0), RDX)
+            self.emit("idiv" if signed else "div", size, right)
+            result = RAX if o in (Op.SDIV, Op.UDIV) else RDX
+            self.emit("mov", size, result, dst)
+        elif o in COMPARISONS:
+            cc = self._compare(i)
+            self.emit("set", 1, dst, cond=cc)
+            self.emit("movz", 4, dst, dst, src_size=1)
+        elif o == Op.NEG or o == Op.NOT:
+            self.emit("mov", size, self.reg(a), dst)
+            self.emit("neg" if o == Op.NEG else "not", size, dst)
+        elif o == Op.SEXT or o == Op.ZEXT:
+            src_size = self.size(a)
+            reg = self.reg(a)
+            if src_size == 8:
+                self.emit("mov", 8, reg, dst)
+            else:
+                op = "movs" if o == Op.SEXT else "movz"
+                self.emit(op, size, reg, dst, src_size=src_size)
+        elif o == Op.TRUNC:
+            self.emit("mov", 4, self.reg(a), dst)
+        else:
+            raise CodegenError(f"cannot select {Op(o).name.lower()}")
+
+
+def _saved_registers(mfn: MFunction) -> List[int]:
+    saved = set()
+    for block in mfn.blocks:
+        for inst in block.insts:
+            defs, _ = inst.registers()
+            saved.update(r for r in defs if r in CALLEE_SAVED)
+    return sorted(saved)
+
+
+def finalize(mfn: MFunction) -> List[Union[str, Inst]]:
+    """Returns the code of an allocated function with its prologue and
+    epilogues, as instructions and the labels of the blocks. Copies between
+    the same register and jumps to the next block are dropped."""
+    saved = mfn.saved = _saved_registers(mfn)
+    homes = [Mem(RBP, disp=-(mfn.frame_size + 8 * (k + 1))) for k in range(len(saved))]
+    frame = _align(mfn.frame_size + 8 * len(saved) + mfn.outgoing_size, 16)
+    code: List[Union[str, Inst]] = [Inst("push", 8, [RBP]), Inst("mov", 8, [RSP, RBP])]
+    if frame:
+        code.append(Inst("sub", 8, [Imm(frame), RSP]))
+    code.extend(Inst("mov", 8, [r, home]) for r, home in zip(saved, homes))
+    for k, block in enumerate(mfn.blocks):
+        following = None
+        if k + 1 < len(mfn.blocks) and k + 1 != mfn.cold:
+            following = mfn.blocks[k + 1].label
+        code.append(block.label)
+        insts = block.insts
+        for n, inst in enumerate(insts):
+            op = inst.op
+            if op == "mov" and isinstance(inst.args[0], int) and (
+                inst.args[0] == inst.args[1]
+            ):
+                continue
+            if op == "jmp" and inst.args[0].name == following:
+                continue
+            if op == "j" and n + 2 == len(insts) and insts[n + 1].op == "jmp":
+                target = insts[n + 1].args[0].name
+                if inst.args[0].name == following and target != following:
+                    # fall through to the first target instead
+                    inst = Inst("j", 8, [Label(target)], cond=NEGATED[inst.cond])
+                    insts[n + 1] = Inst("jmp", 8, [Label(following)])
+            if op == "ret":
+                code.extend(Inst("mov", 8, [home, r]) for r, home in zip(saved, homes))
+                code.append(Inst("leave"))
+            code.append(inst)
+    return code
+
+
+def _split(mfn: MFunction) -> Tuple[list, list]:
+    """Returns the finalized code of ``mfn`` in the text section and in the
+    cold section."""
+    code = finalize(mfn)
+    if mfn.cold is None:
+        return code, []
+    k = code.index(mfn.blocks[mfn.cold].label)
+    return code[:k], code[k:]
+
+
+def _emit_function(mfn: MFunction, lines: List[str]) -> None:
+    hot, cold = _split(mfn)
+    lines.append("\t.text")
+    if not mfn.static:
+        lines.append(f"\t.globl {mfn.name}")
+    for name, code in ((mfn.name, hot), (f"{mfn.name}.cold", cold)):
+        if name != mfn.name:
+            if not code:
+                break
+            lines.append(f'\t.section {COLD_SECTION},"ax",@progbits')
+        lines.append(f"\t.type {name}, @function")
+        lines.append(f"{name}:")
+        for x in code:
+            lines.append(f"{x}:" if isinstance(x, str) else f"\t{x}")
+        lines.append(f"\t.size {name}, .-{name}")
+
+
+def _emit_global(
+    g: Global, lines: List[str], labels: Sequence[Tuple[int, str]] = ()
+) -> None:
+    section = _global_section(g)
+    if section in (".data", ".bss"):
+        lines.append(f"\t{section}")
+    else:
+        lines.append(f"\t.section {section}")
+    if not g.static:
+        lines.append(f"\t.globl {g.name}")
+    lines.append(f"\t.balign {g.align}")
+    lines.append(f"\t.type {g.name}, @object")
+    lines.append(f"\t.size {g.name}, {g.size}")
+    lines.append(f"{g.name}:")
+    data = g.data or b""
+    relocations = {offset: (symbol, addend) for offset, symbol, addend in g.relocations}
+    # the literals stored at the tail of this one
+    inner: Dict[int, List[str]] = {}
+    for at, name in labels:
+        inner.setdefault(at, []).append(name)
+    offset = 0
+    while offset < len(data):
+        for name in inner.get(offset, ()):
+            lines.append(f"{name}:")
+        if offset in relocations:
+            symbol, addend = relocations[offset]
+            target = f"{symbol}{addend:+d}" if addend else symbol
+            lines.append(f"\t.quad {target}")
+            offset += 8
+            continue
+        end = min(len(data), offset + 16)
+        end = min([end] + [x for x in (*relocations, *inner) if offset < x < end])
+        lines.append("\t.byte " + ",".join(str(x) for x in data[offset:end]))
+        offset = end
+    if g.size > offset:
+        lines.append(f"\t.zero {g.size - offset}")
+
+
+def select(module: Module) -> List[MFunction]:
+    """Selects instructions for every function of ``module``, leaving
+    virtual registers unallocated."""
+    defined = defined_symbols(module)
+    return [_select(fn, defined, k) for k, fn in enumerate(module.functions)]
+
+
+def defined_symbols(module: Module) -> Set[str]:
+    defined = {fn.name for fn in module.functions}
+    defined.update(g.name for g in module.globals)
+    return defined
+
+
+def _select(fn: Function, defined: Set[str], index: int) -> MFunction:
+    selector = Selector(fn, defined, index)
+    mfn = selector.select()
+    mfn.frame_size = selector.frame_size
+    return mfn
+
+
+def compile_function(
+    fn: Function, defined: Set[str], index: int, allocator: str = "linear-scan"
+) -> MFunction:
+    """Selects instructions for ``fn``, the function at ``index`` in its
+    module, and allocates their registers. The result depends on nothing
+    else, so functions can be compiled in any order or process."""
+    mfn = _select(fn, defined, index)
+    place_blocks(mfn)
+    ALLOCATORS[allocator](mfn, mfn.frame_size)
+    return mfn
+
+
+def function_assembly(mfn: MFunction) -> str:
+    lines: List[str] = []
+    _emit_function(mfn, lines)
+    return "\n".join(lines)
+
+
+def function_code(mfn: MFunction) -> Tuple[bytes, list, bytes, list]:
+    """Returns the encoded code of an allocated function and its
+    relocations, at offsets from the start of the function, then the same
+    for its code in the cold section. Relocations against the sections
+    themselves have addends from the start of the function's code there."""
+    from .assembler import Assembler
+
+    hot, cold = Assembler(), Assembler()
+    for assembler, code in zip((hot, cold), _split(mfn)):
+        assembler.assemble(code)
+    # the blocks of a function only jump to each other
+    hot.resolve({x: (COLD_SECTION, at) for x, at in cold.labels.items()})
+    cold.resolve({x: (".text", at) for x, at in hot.labels.items()})
+    return bytes(hot.code), hot.relocations, bytes(cold.code), cold.relocations
+
+
+def _global_section(g: Global) -> str:
+    if g.section is not None:
+        return g.section
+    if g.readonly:
+        return ".rodata"
+    return ".bss" if g.data is None else ".data"
+
+
+def _literal_layout(module: Module):
+    return strings.layout([(g.name, g.data) for g in module.globals if g.literal])
+
+
+def generate(module: Module, allocator: str = "linear-scan") -> str:
+    """Returns the assembly for ``module`` in AT&T syntax for the GNU
+    assembler. ``allocator`` is "linear-scan" or "naive", which keeps every
+    value on the stack. Critical edges of the functions are split in
+    place."""
+    defined = defined_symbols(module)
+    functions = (
+        function_assembly(compile_function(fn, defined, k, allocator))
+        for k, fn in enumerate(module.functions)
+    )
+    return assembly(module, functions)
+
+
+def assembly(module: Module, functions: Iterable[str]) -> str:
+    """Returns the assembly for ``module`` given that of its functions, in
+    order."""
+    lines: List[str] = list(functions)
+    # string literals ending other literals are stored inside them
+    shared, labels = _literal_layout(module)
+    for g in module.globals:
+        if g.name not in shared:
+            _emit_global(g, lines, labels.get(g.name, ()))
+    lines.append('\t.section .note.GNU-stack,"",@progbits')
+    return "\n".join(lines) + "\n"
+
+
+def generate_object(module: Module, allocator: str = "linear-scan") -> bytes:
+    """Returns a relocatable ELF object for ``module``, encoding the same
+    code as ``generate`` without going through an assembler."""
+    defined = defined_symbols(module)
+    functions = (
+        function_code(compile_function(fn, defined, k, allocator))
+        for k, fn in enumerate(module.functions)
+    )
+    return object_file(module, functions)
+
+
+def object_file(
+    module: Module, functions: Iterable[Tuple[bytes, list, bytes, list]]
+) -> bytes:
+    """Returns the ELF object for ``module`` given the code of its
+    functions, in order, as ``function_code`` returns it."""
+    # the encoder is only loaded by the compilations which need it
+    from .assembler import Relocation
+    from .elf import STT_FUNC, STT_OBJECT, ObjectFile
+
+    obj = ObjectFile()
+    obj.section(".text")
+    for fn, (code, relocations, cold, cold_relocations) in zip(
+        module.functions, functions
+    ):
+        parts = [(fn.name, ".text", code, relocations)]
+        if cold:
+            parts.append((f"{fn.name}.cold", COLD_SECTION, cold, cold_relocations))
+        starts = {x: len(obj.section(x).data) for _, x, _, _ in parts}
+        for name, section, data, relocs in parts:
+            target = obj.section(section)
+            start = starts[section]
+            target.data += data
+            target.relocations.extend(
+                Relocation(
+                    start + r.offset,
+                    r.symbol,
+                    r.type,
+                    r.addend + starts.get(r.symbol, 0),
+                )
+                for r in relocs
+            )
+            local = fn.static or section == COLD_SECTION
+            obj.define(name, section, start, len(data), STT_FUNC, local)
+    shared, labels = _literal_layout(module)
+    sizes = {g.name: g.size for g in module.globals}
+    for g in module.globals:
+        if g.name in shared:
+            continue
+        data = (g.data or b"").ljust(g.size, b"\0")
+        section = _global_section(g)
+        offset = obj.add_data(section, data, g.align, g.relocations)
+        obj.define(g.name, section, offset, g.size, STT_OBJECT, g.static)
+        for at, name in labels.get(g.name, ()):
+            obj.define(name, section, offset + at, sizes[name], STT_OBJECT, True)
+    obj.section(".note.GNU-stack")
+    return obj.write()
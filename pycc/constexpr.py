@@ -0,0 +1,281 @@
+import dataclasses
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Sequence, Tuple
+
+from . import ast
+from . import types
+from .error import Error, Warning, Reporter
+from .token import Token
+from .types import IntegerType
+
+if TYPE_CHECKING:
+    from .parser import TokenData
+
+
+class ConstantError(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class Constant:
+    type: IntegerType
+    value: int
+
+
+_COMPARISONS = {
+    Token.LESS_THAN: lambda a, b: a < b,
+    Token.GREATER_THAN: lambda a, b: a > b,
+    Token.LESS_THAN_EQUALS: lambda a, b: a <= b,
+    Token.GREATER_THAN_EQUALS: lambda a, b: a >= b,
+    Token.EQUALS_EQUALS: lambda a, b: a == b,
+    Token.EXCLAMATION_EQUALS: lambda a, b: a != b,
+}
+
+_ARITHMETIC = {
+    Token.PLUS: lambda a, b: a + b,
+    Token.MINUS: lambda a, b: a - b,
+    Token.STAR: lambda a, b: a * b,
+    Token.AMPERSAND: lambda a, b: a & b,
+    Token.PIPE: lambda a, b: a | b,
+    Token.CARET: lambda a, b: a ^ b,
+}
+
+_BINARY_OPERATORS = {
+    *_COMPARISONS,
+    *_ARITHMETIC,
+    Token.SLASH,
+    Token.PERCENT,
+    Token.LESS_THAN_LESS_THAN,
+    Token.GREATER_THAN_GREATER_THAN,
+}
+
+
+def character_constant_value(text: str) -> int:
+    """Returns the int value of a decoded character constant the way GCC
+    computes it for x86-64: a single char is a (signed) char, and the bytes of
+    a multi-character constant are packed big-endian into an int."""
+    data = text.encode("utf-8", "surrogatepass")
+    if all(ord(c) < 256 for c in text):
+        data = bytes(ord(c) for c in text)
+    if len(data) == 1:
+        return types.CHAR.wrap(data[0])
+    value = 0
+    for b in data:
+        value = (value << 8) | b
+    return types.INT.wrap(value)
+
+
+@dataclasses.dataclass
+class Evaluator:
+    """Evaluates integer constant expressions with the semantics of C.
+
+    Results are cached per node, and in ``evaluate_tokens`` per token
+    sequence, so evaluating the same expression again is a dict lookup. In
+    preprocessor mode every integer has the type ``intmax_t`` or
+    ``uintmax_t`` and identifiers left after macro expansion evaluate to 0.
+    """
+
+    reporter: Reporter
+    preprocessor: bool = False
+    # resolves identifiers such as enumeration constants to their value
+    resolve: Optional[Callable[[str], Optional[Constant]]] = None
+    cache: Dict[int, Tuple[ast.Expr, Constant]] = dataclasses.field(
+        default_factory=dict
+    )
+    token_cache: Dict[tuple, Constant] = dataclasses.field(default_factory=dict)
+    _unevaluated: int = dataclasses.field(default=0, init=False)
+    _quiet: int = dataclasses.field(default=0, init=False)
+
+    def evaluate(self, expr: ast.Expr) -> Constant:
+        cached = self.cache.get(id(expr))
+        if cached is not None:
+            return cached[1]
+        method = getattr(self, "_evaluate_" + type(expr).__name__, None)
+        if method is None:
+            self._error(expr, Error.NOT_CONSTANT_EXPRESSION)
+        result = method(expr)
+        if not self._unevaluated:
+            self.cache[id(expr)] = (expr, result)
+        return result
+
+    def try_evaluate(self, expr: ast.Expr) -> Optional[Constant]:
+        """Returns the value of ``expr``, or None without reporting anything if
+        it is not a constant expression, e.g. the length of a VLA."""
+        self._quiet += 1
+        try:
+            return self.evaluate(expr)
+        except ConstantError:
+            return None
+        finally:
+            self._quiet -= 1
+
+    def evaluate_tokens(self, tokens: Sequence["TokenData"]) -> Constant:
+        """Evaluates a macro-expanded ``#if`` expression."""
+        from .parser import ParseError, Parser, TokenStream
+
+        key = tuple((x.kind, x.text) for x in tokens)
+        result = self.token_cache.get(key)
+        if result is not None:
+            return result
+        parser = Parser(TokenStream.from_tokens(tokens), self.reporter)
+        try:
+            expr = parser.parse_conditional_expr()
+            parser._expect(Token.EOF)
+        except ParseError as e:
+            raise ConstantError(str(e))
+        result = self.evaluate(expr)
+        self.token_cache[key] = result
+        return result
+
+    def _error(self, expr: ast.Expr, error: Error, message: Optional[str] = None):
+        if message is None:
+            message = error.value
+        if not self._unevaluated and not self._quiet:
+            self.reporter.error(expr.start, error, message)
+        raise ConstantError(message)
+
+    def _check_overflow(self, expr: ast.Expr, t: IntegerType, value: int) -> int:
+        quiet = self._unevaluated or self._quiet
+        if t.signed and not t.min <= value <= t.max and not quiet:
+            self.reporter.warning(
+                expr.start,
+                Warning.INTEGER_OVERFLOW,
+                f"overflow in expression; result is {t.wrap(value)} with type '{t}'",
+            )
+        return t.wrap(value)
+
+    def _convert(self, t: IntegerType) -> IntegerType:
+        if self.preprocessor:
+            return types.INTMAX if t.signed else types.UINTMAX
+        return t
+
+    def _promote(self, t: IntegerType) -> IntegerType:
+        return self._convert(types.integer_promotion(t))
+
+    def _int(self, value: int) -> Constant:
+        return Constant(self._convert(types.INT), value)
+
+    def _evaluate_IntegerConstant(self, expr: ast.IntegerConstant) -> Constant:
+        decimal = not expr.text.startswith("0")
+        t = types.integer_constant_type(expr.value, expr.suffix, decimal)
+        if t is None:
+            self._error(expr, Error.INTEGER_CONSTANT_TOO_LARGE)
+        return Constant(self._convert(t), expr.value)
+
+    def _evaluate_CharacterConstant(self, expr: ast.CharacterConstant) -> Constant:
+        return self._int(character_constant_value(expr.value))
+
+    def _evaluate_RefDeclExpr(self, expr: ast.RefDeclExpr) -> Constant:
+        if self.resolve is not None:
+            result = self.resolve(expr.name)
+            if result is not None:
+                return Constant(self._convert(result.type), result.value)
+        if self.preprocessor:
+            return self._int(0)
+        self._error(expr, Error.NOT_CONSTANT_EXPRESSION)
+
+    def _evaluate_ParenExpr(self, expr: ast.ParenExpr) -> Constant:
+        return self.evaluate(expr.expr)
+
+    def _evaluate_UnaryExpr(self, expr: ast.UnaryExpr) -> Constant:
+        op = expr.op
+        if op not in (Token.PLUS, Token.MINUS, Token.TILDE, Token.EXCLAMATION):
+            self._error(expr, Error.NOT_CONSTANT_EXPRESSION)
+        operand = self.evaluate(expr.operand)
+        if op == Token.EXCLAMATION:
+            return self._int(int(operand.value == 0))
+        t = self._promote(operand.type)
+        value = t.wrap(operand.value)
+        if op == Token.MINUS:
+            return Constant(t, self._check_overflow(expr, t, -value))
+        elif op == Token.TILDE:
+            return Constant(t, t.wrap(~value))
+        return Constant(t, value)
+
+    def _evaluate_BinaryExpr(self, expr: ast.BinaryExpr) -> Constant:
+        op = expr.op
+        if op in (Token.AMPERSAND_AMPERSAND, Token.PIPE_PIPE):
+            left = self.evaluate(expr.left)
+            if (left.value != 0) == (op == Token.PIPE_PIPE):
+                self._skip(expr.right)
+                return self._int(int(op == Token.PIPE_PIPE))
+            return self._int(int(self.evaluate(expr.right).value != 0))
+
+        if op not in _BINARY_OPERATORS:
+            self._error(expr, Error.NOT_CONSTANT_EXPRESSION)
+        left = self.evaluate(expr.left)
+        right = self.evaluate(expr.right)
+
+        if op in (Token.LESS_THAN_LESS_THAN, Token.GREATER_THAN_GREATER_THAN):
+            t = self._promote(left.type)
+            value = t.wrap(left.value)
+            count = right.value
+            if not 0 <= count < t.bits:
+                if self._unevaluated:
+                    return Constant(t, 0)
+                if count < 0:
+                    message = "shift count is negative"
+                else:
+                    message = f"shift count >= width of type '{t}'"
+                self._error(expr, Error.NOT_CONSTANT_EXPRESSION, message)
+            if op == Token.GREATER_THAN_GREATER_THAN:
+                return Constant(t, value >> count)
+            return Constant(t, self._check_overflow(expr, t, value << count))
+
+        t = types.usual_arithmetic_conversion(left.type, right.type)
+        a = t.wrap(left.value)
+        b = t.wrap(right.value)
+        if op in _COMPARISONS:
+            return self._int(int(_COMPARISONS[op](a, b)))
+        if op in _ARITHMETIC:
+            return Constant(t, self._check_overflow(expr, t, _ARITHMETIC[op](a, b)))
+        if b == 0:
+            if self._unevaluated:
+                return Constant(t, 0)
+            self._error(expr, Error.DIVISION_BY_ZERO)
+        # C division truncates toward zero
+        q = abs(a) // abs(b)
+        if (a < 0) != (b < 0):
+            q = -q
+        if op == Token.SLASH:
+            return Constant(t, self._check_overflow(expr, t, q))
+        return Constant(t, a - q * b)
+
+    def _evaluate_SizeofExpr(self, expr: ast.SizeofExpr) -> Constant:
+        t = expr.type
+        if t is None or not t.is_complete or isinstance(t, types.FunctionType):
+            self._error(expr, Error.NOT_CONSTANT_EXPRESSION)
+        value = t.size if expr.op == Token.SIZEOF else t.align
+        return Constant(self._convert(types.UNSIGNED_LONG), value)
+
+    def _evaluate_CastExpr(self, expr: ast.CastExpr) -> Constant:
+        if not isinstance(expr.type, IntegerType):
+            self._error(expr, Error.NOT_CONSTANT_EXPRESSION)
+        operand = self.evaluate(expr.expr)
+        if expr.type == types.BOOL:
+            return Constant(types.BOOL, int(operand.value != 0))
+        t = self._convert(expr.type)
+        return Constant(t, expr.type.wrap(operand.value))
+
+    def _evaluate_ConditionalExpr(self, expr: ast.ConditionalExpr) -> Constant:
+        cond = self.evaluate(expr.cond)
+        if cond.value != 0:
+            chosen = self.evaluate(expr.then)
+            other = self._skip(expr.otherwise)
+        else:
+            other = self._skip(expr.then)
+            chosen = self.evaluate(expr.otherwise)
+        t = types.usual_arithmetic_conversion(chosen.type, other.type)
+        return Constant(t, t.wrap(chosen.value))
+
+    def _skip(self, expr: ast.Expr) -> Constant:
+        """Evaluates an operand which is not evaluated in C, only for its type:
+        errors such as division by zero are not reported."""
+        self._unevaluated += 1
+        try:
+            return self.evaluate(expr)
+        except ConstantError as e:
+            if self._unevaluated == 1 and not self._quiet:
+                self.reporter.error(expr.start, Error.NOT_CONSTANT_EXPRESSION, str(e))
+            raise
+        finally:
+            self._unevaluated -= 1
@@ -0,0 +1,350 @@
+"""The pycc command line driver.
+
+    pycc [-fsyntax-only | -E | -S | -c] [-O<level>] [-j <jobs>] [-o <output>]
+         [-ferror-limit=<n>] [-fprofile-generate | -fprofile-use]
+         [-fprofile-path <file>]
+         [--memory-report] [--memory-budget <phase>=<size>]... [--watch]
+         <file>...
+
+The driver is meant to be run many times on small files, so that start-up
+time matters more than throughput: every mode imports only the modules it
+needs. ``-E`` stops after the scanner, ``-fsyntax-only`` after the parser,
+and only ``-S`` and ``-c`` load the optimizer and the code generator.
+With ``-j`` the functions of each file are compiled in that many processes.
+``-fprofile-generate`` builds programs which count how often their blocks
+run and add the counts to a profile at exit, and ``-fprofile-use`` compiles
+again with the profile guiding the inliner and the block layout.
+``--memory-report`` runs the front end a phase at a time first and reports
+the memory of each phase, and ``--memory-budget`` stops a phase which
+allocates more than its budget.
+
+With ``--watch`` the driver keeps running after the first build, and
+compiles again the files which depend on a file that changed, reusing the
+tokens of every other file.
+"""
+import argparse
+import os
+import sys
+
+MODES = {
+    "-E": "preprocess",
+    "-fsyntax-only": "syntax-only",
+    "-S": "assembly",
+    "-c": "object",
+}
+SUFFIXES = {"assembly": ".s", "object": ".o"}
+HELP = {
+    "preprocess": "stop after the scanner and print the tokens",
+    "syntax-only": "check the syntax and stop after the parser",
+    "assembly": "compile to assembly",
+    "object": "compile to an object file",
+}
+
+
+def _scan(file, reporter):
+    from .scanner import Scanner
+    from .token import Token
+
+    scanner = Scanner(file, reporter)
+    while True:
+        tok = scanner.scan()
+        if tok not in (Token.SINGLE_LINE_COMMENT, Token.MULTI_LINE_COMMENT):
+            yield tok, scanner.start, scanner.end, scanner.text
+        if tok == Token.EOF:
+            break
+
+
+def preprocess(file, reporter, tokens=None) -> str:
+    """Returns the tokens of ``file``, or ``tokens`` already scanned from
+    it, on the lines they come from with comments removed, as translation
+    phases 1 to 3 leave them. There are no directives or macros to expand."""
+    from .token import Token
+
+    if tokens is None:
+        scanned = _scan(file, reporter)
+    else:
+        scanned = ((x.kind, x.start, x.end, x.text) for x in tokens)
+    parts = []
+    line = 1
+    end = 0
+    for kind, start, stop, text in scanned:
+        if kind == Token.EOF:
+            break
+        if start.line > line:
+            parts.append("\n" * (start.line - line))
+            line = start.line
+            if start.column:
+                parts.append(" " * start.column)
+        elif start.pos > end and parts:
+            parts.append(" ")
+        parts.append(text)
+        end = stop.pos
+        line = stop.line
+    if parts:
+        parts.append("\n")
+    return "".join(parts)
+
+
+def parse(file, reporter, tokens=None) -> list:
+    from .error import FatalError
+    from .parser import Parser, TokenStream
+    from .scanner import Scanner
+
+    if tokens is None:
+        stream = TokenStream(Scanner(file, reporter))
+    else:
+        stream = TokenStream.from_tokens(tokens)
+    parser = Parser(stream, reporter)
+    declarations = []
+    try:
+        declarations.extend(parser.iter_declarations())
+    except FatalError:
+        pass
+    return declarations
+
+
+def compile(
+    file,
+    reporter,
+    mode: str,
+    level: int,
+    tokens=None,
+    jobs: int = 1,
+    instrument=None,
+    profile=None,
+    declarations=None,
+):
+    """Compiles ``file`` in ``mode`` and returns the output, or None if there
+    is no output or an error stopped the compilation. ``tokens`` are the
+    tokens of ``file`` if it is already scanned, and the functions are
+    compiled in ``jobs`` processes. The code counts its blocks into the
+    profile at the path ``instrument``, or is optimized with the counts of
+    ``profile``. ``declarations`` are the declarations of ``file`` if it is
+    already parsed."""
+    if mode == "preprocess":
+        return preprocess(file, reporter, tokens)
+    if declarations is None:
+        declarations = parse(file, reporter, tokens)
+    if mode == "syntax-only" or reporter.errors:
+        return None
+    from .lower import lower
+
+    module = lower(declarations, reporter)
+    if reporter.errors:
+        return None
+    if instrument is not None:
+        from .pgo import instrument as add_counters
+
+        add_counters(module, file.filename, instrument)
+    elif profile is not None:
+        from .error import Warning
+        from .pgo import annotate
+
+        stale = set(annotate(module, profile, file.filename))
+        for decl in declarations:
+            if getattr(decl, "body", None) is not None and decl.name in stale:
+                reporter.warning(decl.start, Warning.PROFILE_MISMATCH)
+    if jobs > 1:
+        from .parallel import compile_module
+
+        return compile_module(module, level, jobs, obj=mode == "object")
+    from .opt import optimize
+
+    optimize(module, level=level)
+    if mode == "assembly":
+        from .codegen import generate
+
+        return generate(module)
+    from .codegen import generate_object
+
+    return generate_object(module)
+
+
+def _output(filename: str, mode: str) -> str:
+    return os.path.splitext(os.path.basename(filename))[0] + SUFFIXES[mode]
+
+
+def build(filename: str, args, cache=None) -> int:
+    """Compiles ``filename`` as ``args`` say and writes the output. Returns
+    1 on errors and 0 otherwise. With a ``FileCache`` the file is read and
+    scanned through it."""
+    from .error import FatalError, RecordingReporter
+    from .file import File
+
+    reporter = RecordingReporter(error_limit=args.error_limit)
+    tokens = None
+    declarations = None
+    scanned = []
+    profile = None
+    if args.profile_use:
+        from .pgo import read_profile
+
+        try:
+            profile = read_profile(args.profile_path)
+        except OSError as e:
+            print(f"pycc: error: {args.profile_path}: {e.strerror}", file=sys.stderr)
+            return 1
+    try:
+        if args.memory_report or args.memory_budget:
+            from .memory import account
+
+            try:
+                accounting = account(filename, reporter, dict(args.memory_budget))
+            except FatalError:
+                for diagnostic in reporter.diagnostics:
+                    print(diagnostic, file=sys.stderr)
+                return 1
+            if args.memory_report:
+                print(accounting.report.format(), file=sys.stderr)
+            file, tokens = accounting.file, accounting.tokens
+            declarations = accounting.declarations
+        elif cache is None:
+            file = File.open(filename)
+        else:
+            from .session import cached_tokens
+
+            entry = cache.get(filename)
+            file = entry.file
+            tokens, scanned = cached_tokens(entry)
+    except OSError as e:
+        print(f"pycc: error: {filename}: {e.strerror}", file=sys.stderr)
+        return 1
+    instrument = args.profile_path if args.profile_generate else None
+    try:
+        output = compile(
+            file,
+            reporter,
+            args.mode,
+            args.level,
+            tokens,
+            args.jobs,
+            instrument,
+            profile,
+            declarations,
+        )
+    except FatalError:
+        # the fatal error is the last of the diagnostics
+        output = None
+    # the diagnostics of scanning are kept with the cached tokens
+    diagnostics = scanned + reporter.diagnostics
+    for diagnostic in diagnostics:
+        print(diagnostic, file=sys.stderr)
+    if any(x.severity != "warning" for x in diagnostics):
+        return 1
+    if output is None:
+        return 0
+    if args.mode == "preprocess" and args.output is None:
+        sys.stdout.write(output)
+        return 0
+    path = args.output or _output(filename, args.mode)
+    with open(path, "wb" if isinstance(output, bytes) else "w") as fp:
+        fp.write(output)
+    return 0
+
+
+def _budget(text: str):
+    from .memory import parse_budget
+
+    return parse_budget(text)
+
+
+def watch(args) -> int:
+    from .cache import FileCache
+    from .watch import Watcher
+
+    cache = FileCache()
+    watcher = Watcher(args.files, lambda x: build(x, args, cache), cache)
+    rebuild = watcher.build_all()
+    total = len(args.files)
+
+    def report(rebuild):
+        changed = ", ".join(rebuild.changed)
+        print(
+            f"pycc: rebuilt {len(rebuild.units)} of {total} files "
+            f"in {rebuild.seconds * 1e3:.2f}ms ({changed} changed)",
+            file=sys.stderr,
+        )
+
+    print(
+        f"pycc: built {total} files in {rebuild.seconds * 1e3:.2f}ms", file=sys.stderr
+    )
+    try:
+        watcher.run(report, args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="pycc")
+    group = parser.add_mutually_exclusive_group(required=True)
+    for flag, mode in MODES.items():
+        group.add_argument(
+            flag, dest="mode", action="store_const", const=mode, help=HELP[mode]
+        )
+    parser.add_argument(
+        "-O", dest="level", type=int, nargs="?", const=1, default=0, choices=range(4)
+    )
+    parser.add_argument(
+        "-j", dest="jobs", type=int, default=1, help="processes compiling functions"
+    )
+    parser.add_argument(
+        "-ferror-limit",
+        dest="error_limit",
+        type=int,
+        default=20,
+        metavar="N",
+        help="stop after N errors, or never with 0 (default: 20)",
+    )
+    profiling = parser.add_mutually_exclusive_group()
+    profiling.add_argument(
+        "-fprofile-generate",
+        dest="profile_generate",
+        action="store_true",
+        help="count the runs of every block into the profile",
+    )
+    profiling.add_argument(
+        "-fprofile-use",
+        dest="profile_use",
+        action="store_true",
+        help="optimize with the counts of the profile",
+    )
+    parser.add_argument(
+        "-fprofile-path", dest="profile_path", default="pycc.profile"
+    )
+    parser.add_argument("-o", dest="output", default=None, help="the output file")
+    parser.add_argument(
+        "--memory-report",
+        action="store_true",
+        help="report the memory of every phase of the front end",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=_budget,
+        action="append",
+        default=[],
+        metavar="PHASE=SIZE",
+        help="stop when a phase of the front end allocates more than SIZE",
+    )
+    parser.add_argument(
+        "--watch", action="store_true", help="compile again when files change"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=0.25, help="seconds between polls"
+    )
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args(argv)
+    if args.output is not None and len(args.files) > 1 and args.mode != "syntax-only":
+        parser.error("cannot specify -o with several files")
+    if args.watch and (args.memory_report or args.memory_budget):
+        parser.error("cannot account memory with --watch")
+    if args.watch:
+        return watch(args)
+    status = 0
+    for filename in args.files:
+        status |= build(filename, args)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
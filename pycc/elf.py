@@ -0,0 +1,265 @@
+import dataclasses
+import struct
+from typing import Dict, List, Optional
+
+from .assembler import R_X86_64_64, Relocation
+
+# section types and flags
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_RELA = 4
+SHT_NOBITS = 8
+SHT_INIT_ARRAY = 14
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+SHF_INFO_LINK = 0x40
+
+# symbol bindings and types
+STB_LOCAL = 0
+STB_GLOBAL = 1
+STT_NOTYPE = 0
+STT_OBJECT = 1
+STT_FUNC = 2
+STT_SECTION = 3
+
+_ELF_HEADER = struct.Struct("<16sHHIQQQIHHHHHH")
+_SECTION_HEADER = struct.Struct("<IIQQQQIIQQ")
+_SYMBOL = struct.Struct("<IBBHQQ")
+_RELA = struct.Struct("<QQq")
+
+
+@dataclasses.dataclass
+class Section:
+    name: str
+    type: int = SHT_PROGBITS
+    flags: int = SHF_ALLOC
+    data: bytearray = dataclasses.field(default_factory=bytearray)
+    align: int = 1
+    # the size of a SHT_NOBITS section, which has no data
+    size: int = 0
+    relocations: List[Relocation] = dataclasses.field(default_factory=list)
+
+    def reserve(self, size: int, align: int) -> int:
+        """Aligns the end of the section and returns the offset of ``size``
+        more bytes there."""
+        self.align = max(self.align, align)
+        end = self.size if self.type == SHT_NOBITS else len(self.data)
+        offset = (end + align - 1) // align * align
+        if self.type == SHT_NOBITS:
+            self.size = offset + size
+        else:
+            self.data += bytes(offset + size - len(self.data))
+        return offset
+
+
+@dataclasses.dataclass
+class Symbol:
+    name: str
+    section: Optional[str] = None
+    value: int = 0
+    size: int = 0
+    type: int = STT_NOTYPE
+    binding: int = STB_GLOBAL
+
+
+class StringTable:
+    def __init__(self):
+        self.data = bytearray(b"\0")
+        self._offsets: Dict[str, int] = {"": 0}
+
+    def add(self, name: str) -> int:
+        offset = self._offsets.get(name)
+        if offset is None:
+            offset = self._offsets[name] = len(self.data)
+            self.data += name.encode() + b"\0"
+        return offset
+
+
+@dataclasses.dataclass
+class ObjectFile:
+    """A relocatable ELF64 object for x86-64.
+
+    Symbols are defined in sections by name, and a relocation against the
+    name of a section refers to its section symbol; any other symbol which a
+    relocation refers to becomes an undefined global. ``write`` lays out the
+    sections, the relocation sections, the symbol table and the string
+    tables in that order, followed by the section headers.
+    """
+
+    sections: Dict[str, Section] = dataclasses.field(default_factory=dict)
+    symbols: Dict[str, Symbol] = dataclasses.field(default_factory=dict)
+
+    def section(self, name: str) -> Section:
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = _standard_section(name)
+        return section
+
+    def define(
+        self,
+        name: str,
+        section: str,
+        value: int,
+        size: int,
+        type: int,
+        local: bool = False,
+    ) -> None:
+        binding = STB_LOCAL if local else STB_GLOBAL
+        self.symbols[name] = Symbol(name, section, value, size, type, binding)
+
+    def add_data(
+        self,
+        section: str,
+        data: bytes,
+        align: int,
+        relocations=(),
+    ) -> int:
+        """Appends ``data`` with its (offset, symbol, addend) pointers and
+        returns its offset in the section."""
+        target = self.section(section)
+        offset = target.reserve(len(data), align)
+        if target.type != SHT_NOBITS:
+            target.data[offset : offset + len(data)] = data
+        for at, symbol, addend in relocations:
+            target.relocations.append(
+                Relocation(offset + at, symbol, R_X86_64_64, addend)
+            )
+        return offset
+
+    def write(self) -> bytes:
+        sections = [x for x in self.sections.values()]
+        index = {x.name: k + 1 for k, x in enumerate(sections)}
+        strtab = StringTable()
+        shstrtab = StringTable()
+
+        # locals come first, as sh_info of the symbol table requires
+        symbols = [Symbol("", binding=STB_LOCAL)]
+        symbols.extend(
+            Symbol(x.name, x.name, type=STT_SECTION, binding=STB_LOCAL)
+            for x in sections
+        )
+        defined = list(self.symbols.values())
+        symbols.extend(x for x in defined if x.binding == STB_LOCAL)
+        first_global = len(symbols)
+        symbols.extend(x for x in defined if x.binding != STB_LOCAL)
+        # relocations name sections by their section symbol
+        referenced = {r.symbol for x in sections for r in x.relocations}
+        referenced -= set(self.symbols) | set(index)
+        symbols.extend(Symbol(x) for x in sorted(referenced))
+        symbol_index = {x.name: k for k, x in enumerate(symbols)}
+
+        symtab = bytearray()
+        for x in symbols:
+            name = 0 if x.type == STT_SECTION else strtab.add(x.name)
+            shndx = index[x.section] if x.section is not None else 0
+            info = x.binding << 4 | x.type
+            symtab += _SYMBOL.pack(name, info, 0, shndx, x.value, x.size)
+
+        # (name, type, flags, data, size, link, info, align, entsize)
+        headers = []
+        for x in sections:
+            size = x.size if x.type == SHT_NOBITS else len(x.data)
+            headers.append((x.name, x.type, x.flags, x.data, size, 0, 0, x.align, 0))
+        symtab_index = len(sections) + 1 + sum(1 for x in sections if x.relocations)
+        for x in sections:
+            if not x.relocations:
+                continue
+            rela = bytearray()
+            for r in x.relocations:
+                info = symbol_index[r.symbol] << 32 | r.type
+                rela += _RELA.pack(r.offset, info, r.addend)
+            headers.append(
+                (
+                    ".rela" + x.name,
+                    SHT_RELA,
+                    SHF_INFO_LINK,
+                    rela,
+                    len(rela),
+                    symtab_index,
+                    index[x.name],
+                    8,
+                    _RELA.size,
+                )
+            )
+        strtab_index = symtab_index + 1
+        headers.append(
+            (
+                ".symtab",
+                SHT_SYMTAB,
+                0,
+                symtab,
+                len(symtab),
+                strtab_index,
+                first_global,
+                8,
+                _SYMBOL.size,
+            )
+        )
+        headers.append(
+            (".strtab", SHT_STRTAB, 0, strtab.data, len(strtab.data), 0, 0, 1, 0)
+        )
+        for header in headers:
+            shstrtab.add(header[0])
+        shstrtab.add(".shstrtab")
+        headers.append(
+            (".shstrtab", SHT_STRTAB, 0, shstrtab.data, len(shstrtab.data), 0, 0, 1, 0)
+        )
+
+        out = bytearray(_ELF_HEADER.size)
+        table = bytearray(_SECTION_HEADER.size)
+        for name, kind, flags, data, size, link, info, align, entsize in headers:
+            offset = (len(out) + align - 1) // align * align
+            out += bytes(offset - len(out))
+            if kind != SHT_NOBITS:
+                out += data
+            table += _SECTION_HEADER.pack(
+                shstrtab.add(name),
+                kind,
+                flags,
+                0,
+                offset,
+                size,
+                link,
+                info,
+                align,
+                entsize,
+            )
+        out += bytes(-len(out) % 8)
+        header_offset = len(out)
+        out += table
+        ident = b"\x7fELF" + bytes([2, 1, 1, 0]) + bytes(8)
+        _ELF_HEADER.pack_into(
+            out,
+            0,
+            ident,
+            1,  # ET_REL
+            62,  # EM_X86_64
+            1,
+            0,
+            0,
+            header_offset,
+            0,
+            _ELF_HEADER.size,
+            0,
+            0,
+            _SECTION_HEADER.size,
+            len(headers) + 1,
+            len(headers),
+        )
+        return bytes(out)
+
+
+def _standard_section(name: str) -> Section:
+    if name == ".text" or name.startswith(".text."):
+        return Section(name, flags=SHF_ALLOC | SHF_EXECINSTR, align=16)
+    if name == ".data":
+        return Section(name, flags=SHF_ALLOC | SHF_WRITE)
+    if name == ".bss":
+        return Section(name, SHT_NOBITS, SHF_ALLOC | SHF_WRITE)
+    if name == ".init_array":
+        return Section(name, SHT_INIT_ARRAY, SHF_ALLOC | SHF_WRITE, align=8)
+    if name == ".note.GNU-stack":
+        return Section(name, flags=0)
+    return Section(name)
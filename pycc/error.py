@@ -1,11 +1,20 @@
 import dataclasses
 from enum import Enum
-from typing import List, Tuple, Optional
-import logging
+from typing import TYPE_CHECKING, List, Tuple, Optional
 
 from .file import Location
 
-logger = logging.getLogger("pycc." + __name__)
+if TYPE_CHECKING:
+    import logging
+
+
+def default_logger() -> "logging.Logger":
+    """Returns the logger of reporters not given one. ``logging`` is only
+    imported once something is logged, since it is slow to import and the
+    command line driver records diagnostics instead."""
+    import logging
+
+    return logging.getLogger("pycc." + __name__)
 
 
 class Error(Enum):
@@ -22,16 +31,63 @@ class Error(Enum):
 
     # parse error
     UNEXPECTED_TOKEN = "unexpected token"
+    UNEXPECTED_TYPE_NAME = "unexpected type name"
+    UNKNOWN_TYPE_NAME = "unknown type name"
+    INVALID_DECLARATION_SPECIFIER = "invalid combination of declaration specifiers"
+
+    # semantic error
+    NOT_CONSTANT_EXPRESSION = "expression is not an integer constant expression"
+    DIVISION_BY_ZERO = "division by zero"
+    INTEGER_CONSTANT_TOO_LARGE = (
+        "integer constant is too large to be represented in any integer type"
+    )
+    STATIC_ASSERT_FAILED = "static assertion failed"
+    UNDECLARED_IDENTIFIER = "use of undeclared identifier"
+    UNDECLARED_LABEL = "use of undeclared label"
+    NOT_ASSIGNABLE = "expression is not assignable"
+    INVALID_OPERANDS = "invalid operands"
+    INVALID_BIT_FIELD = "invalid bit-field"
+    MISPLACED_STATEMENT = "statement not allowed here"
+    UNSUPPORTED = "not supported"
+
+    # fatal error
+    TOO_MANY_ERRORS = "too many errors emitted, stopping now"
+    NESTING_TOO_DEEP = "nesting level exceeded maximum"
+    MEMORY_BUDGET_EXCEEDED = "memory budget exceeded"
 
 
 class Warning(Enum):
     UNKNOWN_ESCAPE_SEQUENCE = "unknown escape sequence"
+    INTEGER_OVERFLOW = "overflow in expression"
+    IMPLICIT_INT = "type specifier missing, defaults to 'int'"
+    EMPTY_DECLARATION = "declaration does not declare anything"
+    IMPLICIT_FUNCTION_DECLARATION = "implicit declaration of function"
+    PROFILE_MISMATCH = "profile does not match the function, ignoring it"
+
+
+class FatalError(Exception):
+    pass
 
 
 @dataclasses.dataclass
 class Reporter:
+    """Collects the diagnostics of one translation unit and logs them.
+
+    A reporter belongs to the scanner and parser it is given to, like the
+    rest of their state, so translation units can be compiled on separate
+    threads as long as each has its own reporter. Reporters not given a
+    logger share ``default_logger()``, and ``logging`` serializes the
+    records itself.
+    """
+
     errors: List[Tuple[Location, Error]] = dataclasses.field(default_factory=list)
     warnings: List[Tuple[Location, Warning]] = dataclasses.field(default_factory=list)
+    # stop with a FatalError once this many errors are reported, 20 as in
+    # clang, so that a broken file does not report a cascade; 0 means no limit
+    error_limit: int = 20
+    logger: Optional["logging.Logger"] = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
 
     def error(
         self, location: Location, error: Error, message: Optional[str] = None
@@ -39,7 +95,22 @@ class Reporter:
         self.errors.append((location, error))
         if message is None:
             message = error.value
-        logger.error(f"{location}: {message}")
+        self._emit("error", location, message)
+        if self.error_limit and len(self.errors) >= self.error_limit:
+            message = Error.TOO_MANY_ERRORS.value
+            self._emit("fatal error", location, message)
+            raise FatalError(message)
+
+    def fatal(
+        self, location: Location, error: Error, message: Optional[str] = None
+    ) -> None:
+        """Reports an error after which compilation cannot go on, and stops
+        it with a FatalError."""
+        self.errors.append((location, error))
+        if message is None:
+            message = error.value
+        self._emit("fatal error", location, message)
+        raise FatalError(message)
 
     def warning(
         self, location: Location, warning: Warning, message: Optional[str] = None
@@ -47,4 +118,52 @@ class Reporter:
         self.warnings.append((location, warning))
         if message is None:
             message = warning.value
-        logger.warning(f"{location}: {message}")
+        self._emit("warning", location, message)
+
+    def _emit(self, severity: str, location: Location, message: str) -> None:
+        logger = self.logger
+        if logger is None:
+            logger = self.logger = default_logger()
+        if severity == "warning":
+            logger.warning(f"{location}: {message}")
+        else:
+            logger.error(f"{location}: {message}")
+
+
+@dataclasses.dataclass(frozen=True)
+class Diagnostic:
+    severity: str
+    location: Location
+    message: str
+
+    def to_json(self) -> dict:
+        return {
+            "severity": self.severity,
+            "filename": self.location.filename,
+            "pos": self.location.pos,
+            "line": self.location.line,
+            "column": self.location.column,
+            "message": self.message,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Diagnostic":
+        location = Location(data["filename"], data["pos"], data["line"], data["column"])
+        return cls(data["severity"], location, data["message"])
+
+    def __str__(self) -> str:
+        location = self.location
+        return (
+            f"{location.filename}:{location.line}:{location.column}: "
+            f"{self.severity}: {self.message}"
+        )
+
+
+@dataclasses.dataclass
+class RecordingReporter(Reporter):
+    """A reporter which keeps the rendered messages instead of logging them."""
+
+    diagnostics: List[Diagnostic] = dataclasses.field(default_factory=list)
+
+    def _emit(self, severity: str, location: Location, message: str) -> None:
+        self.diagnostics.append(Diagnostic(severity, location, message))
@@ -1,16 +1,146 @@
+import array
+import bisect
+import contextvars
 import dataclasses
+import re
+from typing import Optional, Set, Tuple
+
+# C11 5.2.1.1: the trigraph sequences and the characters they stand for
+TRIGRAPHS = {
+    "=": "#",
+    "(": "[",
+    "/": "\\",
+    ")": "]",
+    "'": "^",
+    "<": "{",
+    "!": "|",
+    ">": "}",
+    "-": "~",
+}
+
+# a line splice, which may be spelled with the ??/ trigraph, or a trigraph
+_PHASE_1_2 = re.compile(r"(?:\\|\?\?/)(?:\r\n|\n|\r)|\?\?([=(/)'<!>-])")
+
+
+@dataclasses.dataclass
+class SourceMap:
+    """Maps positions in the text after translation phases 1 and 2 back to
+    positions in the original source.
+
+    There is one entry per splice or trigraph: ``positions`` holds, in
+    ascending order, the translated position right after each of them, and
+    ``removed`` and ``newlines`` how many characters and line breaks were
+    removed up to there. A lookup is a binary search over ``positions``.
+    """
+
+    positions: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q")
+    )
+    removed: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    newlines: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q")
+    )
+
+    def lookup(self, pos: int) -> Tuple[int, int]:
+        """Returns the original position of the translated position ``pos``
+        and the number of line breaks removed before it."""
+        i = bisect.bisect_right(self.positions, pos) - 1
+        if i < 0:
+            return pos, 0
+        return pos + self.removed[i], self.newlines[i]
+
+
+def translate(source: str) -> Tuple[str, Optional[SourceMap]]:
+    """Replaces trigraphs and deletes backslash-newline line splices.
+
+    Source without either is returned as it is, without a copy or a map.
+    Otherwise only the characters between the rewritten sequences are copied,
+    and the returned map relates the new text to ``source``.
+    """
+    # substring tests are much faster than the regular expression
+    if "??" not in source and "\\\n" not in source and "\\\r" not in source:
+        return source, None
+    match = _PHASE_1_2.search(source)
+    if match is None:
+        return source, None
+    parts = []
+    source_map = SourceMap()
+    last = 0
+    length = 0
+    removed = 0
+    newlines = 0
+    for m in _PHASE_1_2.finditer(source, match.start()):
+        start, end = m.span()
+        parts.append(source[last:start])
+        length += start - last
+        trigraph = m.group(1)
+        if trigraph is None:
+            removed += end - start
+            newlines += 1
+        else:
+            parts.append(TRIGRAPHS[trigraph])
+            length += 1
+            removed += end - start - 1
+        source_map.positions.append(length)
+        source_map.removed.append(removed)
+        source_map.newlines.append(newlines)
+        last = end
+    parts.append(source[last:])
+    return "".join(parts), source_map
+
+
+# the Recording of the current context, if any
+_recording: contextvars.ContextVar = contextvars.ContextVar("recording", default=None)
+
+
+@dataclasses.dataclass
+class Recording:
+    """Records the names of the files a compilation reads while it is
+    entered, which are the files its result depends on. Each thread and
+    task records into its own context."""
+
+    opened: Set[str] = dataclasses.field(default_factory=set)
+    _token: Optional[contextvars.Token] = dataclasses.field(default=None, repr=False)
+
+    def __enter__(self) -> "Recording":
+        self._token = _recording.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _recording.reset(self._token)
+
+
+def record_open(filename: str) -> None:
+    """Adds ``filename`` to the current recording. ``File.open`` calls it,
+    and so should caches which return a file without opening it again."""
+    recording = _recording.get()
+    if recording is not None:
+        recording.opened.add(filename)
 
 
 @dataclasses.dataclass
 class File:
     filename: str
     source: str
+    _translated: Optional[Tuple[str, Optional[SourceMap]]] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @classmethod
     def open(cls, filename: str) -> "File":
+        record_open(filename)
         with open(filename, newline="") as fp:
             return File(filename, fp.read())
 
+    def translate(self) -> Tuple[str, Optional[SourceMap]]:
+        """Returns the text after translation phases 1 and 2 and its source
+        map, or None as the map if the text is ``source`` itself."""
+        # threads scanning the same file may both translate it, but they
+        # store equal results, so a file can be shared without a lock
+        if self._translated is None:
+            self._translated = translate(self.source)
+        return self._translated
+
 
 @dataclasses.dataclass
 class Location:
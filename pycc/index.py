@@ -0,0 +1,412 @@
+"""A cross-translation-unit index of declarations and references.
+
+    python -m pycc.index <database> update [-j <jobs>] <file>...
+    python -m pycc.index <database> lookup <name>
+    python -m pycc.index <database> prefix <prefix>
+    python -m pycc.index <database> at <file>:<line>:<column>
+
+The index lives in a SQLite database, so that it outlasts the process and
+queries by name, name prefix or location are answered from a B-tree rather
+than by parsing anything again. Files are indexed again only when the
+SHA-256 of their contents changes. Files are stored and queried by their
+real path, so that every spelling of a file names the same one.
+"""
+import argparse
+import dataclasses
+import hashlib
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import ast
+from .error import FatalError, RecordingReporter
+from .file import File, Location
+from .parser import Parser, TokenStream
+from .scanner import Scanner
+from .token import Token
+from .visitor import Visitor
+
+# bumped whenever the schema or what is stored in it changes; an older
+# database is rebuilt
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    digest BLOB NOT NULL
+);
+CREATE TABLE symbols (
+    file INTEGER NOT NULL REFERENCES files (id),
+    name TEXT NOT NULL,
+    kind TEXT,
+    role TEXT NOT NULL,
+    start_pos INTEGER NOT NULL,
+    start_line INTEGER NOT NULL,
+    start_column INTEGER NOT NULL,
+    end_pos INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    end_column INTEGER NOT NULL
+);
+CREATE INDEX symbols_name ON symbols (name);
+CREATE INDEX symbols_location ON symbols (file, start_line);
+"""
+_SELECT = """
+SELECT filename, name, kind, role, start_pos, start_line, start_column,
+       end_pos, end_line, end_column
+FROM symbols JOIN files ON symbols.file = files.id
+"""
+
+
+class Kind(Enum):
+    FUNCTION = "function"
+    VARIABLE = "variable"
+    PARAMETER = "parameter"
+    TYPEDEF = "typedef"
+    FIELD = "field"
+    ENUMERATOR = "enumerator"
+    TAG = "tag"
+
+
+class Role(Enum):
+    DECLARATION = "declaration"
+    DEFINITION = "definition"
+    # references are recorded by name only, so they have no kind
+    REFERENCE = "reference"
+
+
+@dataclasses.dataclass
+class Symbol:
+    name: str
+    kind: Optional[Kind]
+    role: Role
+    start: Location
+    end: Location
+
+
+# (name, kind, role, start pos, line, column, end pos, line, column)
+Row = Tuple[str, Optional[str], str, int, int, int, int, int, int]
+
+
+class _Collector(Visitor):
+    """Collects the rows of every declaration and ``RefDeclExpr`` of a
+    tree. Declarations span the whole declaration, as the AST records no
+    separate location for the name."""
+
+    def __init__(self):
+        self.rows: List[Row] = []
+
+    def _add(self, node: ast.Node, name: str, kind: Optional[Kind], role: Role):
+        start, end = node.start, node.end
+        self.rows.append(
+            (
+                name,
+                kind.value if kind is not None else None,
+                role.value,
+                start.pos,
+                start.line,
+                start.column,
+                end.pos,
+                end.line,
+                end.column,
+            )
+        )
+
+    def visit_RefDeclExpr(self, node: ast.RefDeclExpr):
+        self._add(node, node.name, None, Role.REFERENCE)
+
+    def visit_FunctionDecl(self, node: ast.FunctionDecl):
+        role = Role.DECLARATION if node.body is None else Role.DEFINITION
+        self._add(node, node.name, Kind.FUNCTION, role)
+
+    def visit_VarDecl(self, node: ast.VarDecl):
+        role = Role.DEFINITION
+        if node.storage == Token.EXTERN and node.init is None:
+            role = Role.DECLARATION
+        self._add(node, node.name, Kind.VARIABLE, role)
+
+    def visit_ParamDecl(self, node: ast.ParamDecl):
+        if node.name is not None:
+            self._add(node, node.name, Kind.PARAMETER, Role.DEFINITION)
+
+    def visit_TypedefDecl(self, node: ast.TypedefDecl):
+        self._add(node, node.name, Kind.TYPEDEF, Role.DEFINITION)
+
+    def visit_FieldDecl(self, node: ast.FieldDecl):
+        if node.name is not None:
+            self._add(node, node.name, Kind.FIELD, Role.DEFINITION)
+
+    def visit_EnumConstantDecl(self, node: ast.EnumConstantDecl):
+        self._add(node, node.name, Kind.ENUMERATOR, Role.DEFINITION)
+
+    def visit_RecordDecl(self, node: ast.RecordDecl):
+        # enum tags are not kept by the parser, which gives enums type int
+        if node.type.tag is not None:
+            self._add(node, node.type.tag, Kind.TAG, Role.DEFINITION)
+
+
+def collect(file: File) -> List[Row]:
+    """Parses ``file`` and returns the rows of its symbols. Whatever parses
+    before a syntax error is indexed."""
+    reporter = RecordingReporter()
+    parser = Parser(TokenStream(Scanner(file, reporter)), reporter)
+    collector = _Collector()
+    try:
+        for decl in parser.iter_declarations():
+            collector.visit(decl)
+    except FatalError:
+        pass
+    return collector.rows
+
+
+def _digest(file: File) -> bytes:
+    return hashlib.sha256(file.source.encode("utf-8", "surrogatepass")).digest()
+
+
+def _extract(
+    job: Tuple[str, Optional[bytes]]
+) -> Tuple[str, Optional[bytes], Optional[List[Row]]]:
+    """Runs in a worker: returns the digest and rows of a file, no rows if
+    its digest is unchanged, or neither if it cannot be read."""
+    filename, digest = job
+    try:
+        file = File.open(filename)
+    except OSError:
+        return filename, None, None
+    new_digest = _digest(file)
+    if new_digest == digest:
+        return filename, digest, None
+    return filename, new_digest, collect(file)
+
+
+@dataclasses.dataclass
+class UpdateStats:
+    indexed: int = 0
+    unchanged: int = 0
+    # files which could not be read are dropped from the index
+    removed: int = 0
+    symbols: int = 0
+
+
+@dataclasses.dataclass
+class Index:
+    """A symbol index stored in the SQLite database at ``path``.
+
+    Files are parsed in ``jobs`` worker processes, and their rows written
+    from this process in transactions of ``batch_size`` files, since SQLite
+    allows one writer at a time. Queries return symbols ordered by file and
+    position, prefix queries by name first.
+    """
+
+    path: str
+    batch_size: int = 64
+    connection: sqlite3.Connection = dataclasses.field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS symbols")
+                self.connection.execute("DROP TABLE IF EXISTS files")
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "Index":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def update(self, filenames: Iterable[str], jobs: int = 1) -> UpdateStats:
+        """Indexes the files of ``filenames`` whose contents changed since
+        they were last indexed."""
+        digests = dict(self.connection.execute("SELECT filename, digest FROM files"))
+        filenames = dict.fromkeys(os.path.realpath(x) for x in filenames)
+        work = [(x, digests.get(x)) for x in filenames]
+        stats = UpdateStats()
+        if jobs > 1 and len(work) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                chunksize = max(1, len(work) // (jobs * 4))
+                self._write(pool.map(_extract, work, chunksize=chunksize), stats)
+        else:
+            self._write(map(_extract, work), stats)
+        return stats
+
+    def _write(self, results: Iterator, stats: UpdateStats) -> None:
+        batch = []
+        for result in results:
+            filename, digest, rows = result
+            if digest is not None and rows is None:
+                stats.unchanged += 1
+                continue
+            batch.append(result)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch, stats)
+                batch = []
+        if batch:
+            self._write_batch(batch, stats)
+
+    def _write_batch(self, batch: Sequence, stats: UpdateStats) -> None:
+        with self.connection as connection:
+            for filename, digest, rows in batch:
+                existed = self._delete(filename)
+                if digest is None:
+                    stats.removed += existed
+                    continue
+                file_id = connection.execute(
+                    "INSERT INTO files (filename, digest) VALUES (?, ?)",
+                    (filename, digest),
+                ).lastrowid
+                connection.executemany(
+                    "INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(file_id,) + x for x in rows],
+                )
+                stats.indexed += 1
+                stats.symbols += len(rows)
+
+    def _delete(self, filename: str) -> bool:
+        row = self.connection.execute(
+            "SELECT id FROM files WHERE filename = ?", (filename,)
+        ).fetchone()
+        if row is None:
+            return False
+        self.connection.execute("DELETE FROM symbols WHERE file = ?", row)
+        self.connection.execute("DELETE FROM files WHERE id = ?", row)
+        return True
+
+    def remove(self, filename: str) -> None:
+        with self.connection:
+            self._delete(os.path.realpath(filename))
+
+    @property
+    def filenames(self) -> List[str]:
+        return [x for (x,) in self.connection.execute("SELECT filename FROM files")]
+
+    def lookup(self, name: str, role: Optional[Role] = None) -> List[Symbol]:
+        """Returns the declarations and references of ``name``, or only those
+        with ``role``."""
+        if role is None:
+            return self._query("WHERE name = ? ORDER BY filename, start_pos", (name,))
+        return self._query(
+            "WHERE name = ? AND role = ? ORDER BY filename, start_pos",
+            (name, role.value),
+        )
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[Symbol]:
+        """Returns the first ``limit`` symbols whose name starts with
+        ``prefix``."""
+        # a range over the name index, which LIKE would not use as it is
+        # case-insensitive; ordering by name lets the index stop at the limit
+        end = _after_prefix(prefix)
+        if end is None:
+            query, parameters = "WHERE name >= ?", (prefix,)
+        else:
+            query, parameters = "WHERE name >= ? AND name < ?", (prefix, end)
+        query += " ORDER BY name, filename, start_pos"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return self._query(query, parameters)
+
+    def at(self, filename: str, line: int, column: int) -> List[Symbol]:
+        """Returns the symbols spanning ``line:column`` of ``filename``,
+        innermost first."""
+        symbols = self._query(
+            "WHERE filename = ? AND start_line <= ? AND end_line >= ?"
+            " AND (start_line, start_column) <= (?, ?)"
+            " AND (end_line, end_column) > (?, ?)"
+            " ORDER BY start_pos",
+            (os.path.realpath(filename), line, line, line, column, line, column),
+        )
+        symbols.sort(key=lambda x: x.end.pos - x.start.pos)
+        return symbols
+
+    def _query(self, query: str, parameters: tuple) -> List[Symbol]:
+        cursor = self.connection.execute(_SELECT + query, parameters)
+        return [
+            Symbol(
+                name,
+                Kind(kind) if kind is not None else None,
+                Role(role),
+                Location(filename, start_pos, start_line, start_column),
+                Location(filename, end_pos, end_line, end_column),
+            )
+            for (
+                filename,
+                name,
+                kind,
+                role,
+                start_pos,
+                start_line,
+                start_column,
+                end_pos,
+                end_line,
+                end_column,
+            ) in cursor
+        ]
+
+
+def _after_prefix(prefix: str) -> Optional[str]:
+    """Returns the least string after every string starting with ``prefix``,
+    or None if there is none, as when ``prefix`` is empty or only made of
+    U+10FFFF. SQLite compares text as UTF-8, that is by code point, and
+    surrogates cannot be encoded, so they are skipped."""
+    stripped = prefix.rstrip("\U0010ffff")
+    if not stripped:
+        return None
+    code = ord(stripped[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return stripped[:-1] + chr(code)
+
+
+def _format(symbol: Symbol) -> str:
+    start = symbol.start
+    kind = symbol.kind.value if symbol.kind is not None else "-"
+    return (
+        f"{start.filename}:{start.line}:{start.column}: "
+        f"{symbol.role.value} {kind} {symbol.name}"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="pycc.index")
+    parser.add_argument("database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update")
+    update.add_argument("-j", dest="jobs", type=int, default=1)
+    update.add_argument("files", nargs="+")
+    commands.add_parser("lookup").add_argument("name")
+    commands.add_parser("prefix").add_argument("prefix")
+    commands.add_parser("at").add_argument("location")
+    args = parser.parse_args(argv)
+
+    with Index(args.database) as index:
+        if args.command == "update":
+            stats = index.update(args.files, args.jobs)
+            print(
+                f"{stats.indexed} indexed, {stats.unchanged} unchanged, "
+                f"{stats.removed} removed, {stats.symbols} symbols"
+            )
+            return 0
+        if args.command == "lookup":
+            symbols = index.lookup(args.name)
+        elif args.command == "prefix":
+            symbols = index.prefix(args.prefix)
+        else:
+            filename, line, column = args.location.rsplit(":", 2)
+            symbols = index.at(filename, int(line), int(column))
+    for symbol in symbols:
+        print(_format(symbol))
+    return 0 if symbols else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+import dataclasses
+from typing import Dict, List, Optional, Set
+
+from .ir import NONE, Function, Module, Op, ValueType
+
+# instructions which cost nothing once inlined
+_FREE = frozenset({Op.NOP, Op.PARAM, Op.CONST, Op.UNDEF, Op.PHI, Op.GLOBAL})
+
+
+def callee(fn: Function, call: int) -> Optional[str]:
+    """Returns the name of the function a call calls directly, if any."""
+    target = fn.a[call]
+    if fn.op[target] == Op.GLOBAL:
+        return fn.names[fn.a[target]]
+    return None
+
+
+@dataclasses.dataclass
+class CallGraph:
+    """The direct calls between the functions defined in a module.
+
+    ``order`` lists the strongly connected components of the graph with
+    every callee before its callers, which is the order in which the
+    inliner visits functions, so that a callee has been optimized by the
+    time it is considered for inlining.
+    """
+
+    functions: Dict[str, Function]
+    calls: Dict[str, List[str]]
+    order: List[List[str]]
+    # the component index of every function
+    component: Dict[str, int]
+    # the functions whose address is used other than to call them
+    address_taken: Set[str]
+
+    @classmethod
+    def build(cls, module: Module) -> "CallGraph":
+        functions = {fn.name: fn for fn in module.functions}
+        calls: Dict[str, List[str]] = {}
+        address_taken = {name for g in module.globals for _, name, _ in g.relocations}
+        for fn in module.functions:
+            targets = calls[fn.name] = []
+            op = fn.op
+            for i in fn.instructions():
+                if op[i] == Op.CALL:
+                    name = callee(fn, i)
+                    if name in functions and name not in targets:
+                        targets.append(name)
+                    values = fn.operands(i)[1:]
+                else:
+                    values = fn.operands(i)
+                for x in values:
+                    if op[x] == Op.GLOBAL:
+                        address_taken.add(fn.names[fn.a[x]])
+        order = _components(list(functions), calls)
+        component = {name: k for k, scc in enumerate(order) for name in scc}
+        return cls(functions, calls, order, component, address_taken)
+
+    def recursive(self, caller: str, name: str) -> bool:
+        """Reports whether ``name`` can call back into ``caller``."""
+        return self.component[caller] == self.component[name]
+
+
+def _components(names: List[str], calls: Dict[str, List[str]]) -> List[List[str]]:
+    """Tarjan's algorithm with an explicit stack; components come out in
+    reverse topological order, callees first."""
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack: Set[str] = set()
+    order: List[List[str]] = []
+    for root in names:
+        if root in index:
+            continue
+        work = [(root, iter(calls[root]))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            name, succs = work[-1]
+            for succ in succs:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(calls[succ])))
+                    break
+                if succ in on_stack:
+                    low[name] = min(low[name], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[name])
+                if low[name] == index[name]:
+                    scc = []
+                    while True:
+                        x = stack.pop()
+                        on_stack.discard(x)
+                        scc.append(x)
+                        if x == name:
+                            break
+                    order.append(scc)
+    return order
+
+
+def size(fn: Function) -> int:
+    """Estimates the size of a function in instructions, not counting the
+    ones which become immediates or disappear."""
+    op = fn.op
+    return sum(1 for i in fn.instructions() if op[i] not in _FREE)
+
+
+@dataclasses.dataclass
+class CostModel:
+    """Decides whether inlining a call pays off.
+
+    The cost of a call is the size of the callee less what inlining saves:
+    the call sequence itself, the arguments which are constants and likely
+    to fold away, and the whole callee if it is static and this is its only
+    call. A call is inlined if its cost is at most the threshold, which is
+    raised for functions declared inline. The caller may grow to at most
+    ``max_size`` instructions.
+
+    With a profile, the threshold is raised for calls run at least
+    ``hot_fraction`` times as often as the hottest block of the module, and
+    calls which never ran are only inlined where that shrinks the code.
+    """
+
+    threshold: int = 45
+    inline_bonus: int = 30
+    call_cost: int = 5
+    constant_argument: int = 4
+    max_size: int = 4000
+    hot_bonus: int = 60
+    hot_fraction: float = 0.01
+
+    def cost(self, fn: Function, call: int, target: Function, last: bool) -> int:
+        count = fn.c[call]
+        start = fn.b[call]
+        constants = sum(
+            1 for x in fn.pool[start : start + count] if fn.op[x] == Op.CONST
+        )
+        cost = size(target) - self.call_cost - count
+        cost -= constants * self.constant_argument
+        # the callee goes away with its last call
+        if last:
+            cost -= size(target)
+        return cost
+
+    def threshold_for(self, target: Function, count: int = -1, hottest: int = 0) -> int:
+        """Returns the threshold for a call to ``target`` from a block run
+        ``count`` times, or -1 if unknown, in a module whose hottest block
+        ran ``hottest`` times."""
+        threshold = self.threshold
+        if target.inline:
+            threshold += self.inline_bonus
+        if count == 0:
+            return min(threshold, 0)
+        if count > 0 and count >= hottest * self.hot_fraction:
+            threshold += self.hot_bonus
+        return threshold
+
+
+@dataclasses.dataclass
+class Inliner:
+    """Inlines the direct calls of a function to functions already visited,
+    following a ``CostModel``. Only the calls present before inlining are
+    considered, so that the inlined bodies are not expanded again.
+    """
+
+    graph: CallGraph
+    model: CostModel = dataclasses.field(default_factory=CostModel)
+    inlined: int = 0
+    # how many calls to every function are left
+    _calls: Dict[str, int] = dataclasses.field(default_factory=dict)
+    # the count of the hottest block in the profile
+    _hottest: int = 0
+
+    def __post_init__(self):
+        for fn in self.graph.functions.values():
+            self._hottest = max([self._hottest] + [x.count for x in fn.blocks])
+            for i in fn.instructions():
+                if fn.op[i] == Op.CALL:
+                    name = callee(fn, i)
+                    self._calls[name] = self._calls.get(name, 0) + 1
+
+    def run(self, fn: Function) -> bool:
+        graph = self.graph
+        calls = [i for i in fn.instructions() if fn.op[i] == Op.CALL]
+        replaced: Dict[int, int] = {}
+        inlined = 0
+        growth = size(fn)
+        for call in calls:
+            name = callee(fn, call)
+            target = graph.functions.get(name)
+            if target is None or graph.recursive(fn.name, name):
+                continue
+            if not _inlinable(fn, call, target):
+                continue
+            last = (
+                self._calls[name] == 1
+                and target.static
+                and name not in graph.address_taken
+            )
+            cost = self.model.cost(fn, call, target, last)
+            count = fn.blocks[fn.block_of[call]].count
+            if cost > self.model.threshold_for(target, count, self._hottest):
+                continue
+            if growth + size(target) > self.model.max_size:
+                continue
+            growth += size(target)
+            value = inline_call(fn, call, target)
+            if value != NONE:
+                replaced[call] = value
+            self._calls[name] -= 1
+            # the copied body calls what the callee calls
+            for i in target.instructions():
+                if target.op[i] == Op.CALL:
+                    name = callee(target, i)
+                    self._calls[name] = self._calls.get(name, 0) + 1
+            inlined += 1
+        if replaced:
+            fn.substitute(replaced)
+        self.inlined += inlined
+        return inlined > 0
+
+
+def remove_unused(module: Module) -> List[str]:
+    """Removes the static functions which nothing refers to any more and
+    returns their names."""
+    referenced = {name for g in module.globals for _, name, _ in g.relocations}
+    for fn in module.functions:
+        for i in fn.instructions():
+            if fn.op[i] == Op.GLOBAL:
+                referenced.add(fn.names[fn.a[i]])
+    unused = [
+        fn.name for fn in module.functions if fn.static and fn.name not in referenced
+    ]
+    if unused:
+        module.functions = [x for x in module.functions if x.name not in unused]
+    return unused
+
+
+def _inlinable(fn: Function, call: int, target: Function) -> bool:
+    if fn.c[call] != len(target.params) or not target.blocks:
+        return False
+    if target.blocks[0].preds:
+        return False
+    # the call must not use the value of a void function
+    return ValueType(fn.type[call]) == ValueType.VOID or target.ret != ValueType.VOID
+
+
+def _scaled(count: int, calls: int, entries: int) -> int:
+    """Returns the share of the ``count`` of a callee's block due to a call
+    site run ``calls`` times, of the ``entries`` into the callee."""
+    if calls == 0:
+        return 0
+    if count < 0 or calls < 0 or entries <= 0:
+        return -1
+    return count * calls // entries
+
+
+def inline_call(fn: Function, call: int, target: Function) -> int:
+    """Replaces a call in ``fn`` with a copy of the body of ``target`` and
+    returns the value of the call, or NONE. The uses of the call are left
+    to the caller to replace.
+
+    The block of the call is split after it; the copied blocks are placed in
+    between, their returns jump to the second half, and a phi there merges
+    the returned values if there are several. The stack slots of the callee
+    go to the entry block of the caller.
+    """
+    block = fn.block_of[call]
+    insts = fn.blocks[block].insts
+    k = insts.index(call)
+    # the second half of the block
+    rest = fn.new_block()
+    after = fn.blocks[rest]
+    after.count = fn.blocks[block].count
+    after.insts = insts[k + 1 :]
+    for i in after.insts:
+        fn.block_of[i] = rest
+    after.succs = fn.blocks[block].succs
+    for succ in after.succs:
+        preds = fn.blocks[succ].preds
+        for n, pred in enumerate(preds):
+            if pred == block:
+                preds[n] = rest
+    fn.blocks[block].succs = []
+    fn.blocks[block].insts = insts[:k]
+
+    blocks = [fn.new_block() for _ in target.blocks]
+    start = fn.b[call]
+    args = fn.pool[start : start + fn.c[call]]
+    value: Dict[int, int] = {}
+    returns = []
+    top = fn.blocks[0]
+    # the instructions are created first and their operands set once every
+    # value has its copy, since phis refer to values defined later
+    copies = []
+    for source in target.blocks:
+        dst = blocks[source.id]
+        fn.blocks[dst].count = _scaled(
+            source.count, fn.blocks[block].count, target.blocks[0].count
+        )
+        for i in source.insts:
+            o = target.op[i]
+            if o == Op.NOP:
+                continue
+            if o == Op.PARAM:
+                value[i] = args[target.a[i]]
+                continue
+            t = ValueType(target.type[i])
+            a, b, c = target.a[i], target.b[i], target.c[i]
+            if o == Op.RET:
+                returns.append((dst, a))
+                fn.append(dst, Op.JUMP, a=rest)
+                continue
+            if o == Op.JUMP:
+                a = blocks[a]
+            elif o == Op.BRANCH:
+                b, c = blocks[b], blocks[c]
+            elif o == Op.GLOBAL:
+                a = fn.name_index(target.names[a])
+            elif o == Op.CALL or o == Op.PHI:
+                b = len(fn.pool)
+                fn.pool.extend(target.pool[target.b[i] : target.b[i] + c])
+            if o == Op.ALLOCA:
+                j = fn.create(0, Op.ALLOCA, t, a, b, c)
+                top.insts.insert(len(top.insts) - 1, j)
+            else:
+                j = fn.create(dst, Op(o), t, a, b, c)
+                fn.blocks[dst].insts.append(j)
+            value[i] = j
+            copies.append(j)
+        fn.blocks[dst].preds = [blocks[x] for x in source.preds]
+        if source.insts and target.op[source.insts[-1]] != Op.RET:
+            fn.blocks[dst].succs = [blocks[x] for x in source.succs]
+    for j in copies:
+        values = fn.operands(j)
+        if values:
+            fn.set_operands(j, [value.get(x, x) if x != NONE else x for x in values])
+
+    # the call becomes a jump into the copy of the entry block
+    fn.op[call] = Op.JUMP
+    fn.a[call] = blocks[0]
+    fn.b[call] = fn.c[call] = NONE
+    fn.type[call] = ValueType.VOID
+    fn.blocks[block].insts.append(call)
+    fn.blocks[block].succs = [blocks[0]]
+    fn.blocks[blocks[0]].preds = [block]
+
+    results = [(dst, value.get(x, x)) for dst, x in returns]
+    if target.ret == ValueType.VOID:
+        return NONE
+    if not results:
+        # the callee never returns
+        undef = fn.create(rest, Op.UNDEF, target.ret)
+        after.insts.insert(0, undef)
+        return undef
+    if len(results) == 1:
+        return results[0][1]
+    phi = fn.insert_phi(rest, target.ret)
+    start = fn.b[phi]
+    for n, pred in enumerate(after.preds):
+        fn.pool[start + n] = dict(results)[pred]
+    return phi
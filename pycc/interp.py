@@ -0,0 +1,1502 @@
+"""Runs parsed C code without generating machine code.
+
+Every function is compiled once into a tree of nested Python closures, each
+taking the frame of the running call and returning a value. Names are
+resolved while compiling: a local whose address is never taken lives in a
+slot of the frame list, and everything else, like arrays, structs, globals
+and string literals, in one flat ``bytearray`` addressed as on x86-64.
+Integer arithmetic wraps in two's complement as the generated code does,
+division truncates toward zero, and shift counts are masked like ``shl``.
+
+Floating point and struct values are not supported, as in the code
+generator. Unlike the code generator, which lowers to basic blocks, the
+interpreter has no ``goto``, and case labels must be statements of the
+switch body: closures can only be entered at their start, not jumped into.
+"""
+import dataclasses
+import operator
+import struct
+import sys
+from typing import Callable, Dict, Iterable, List, Optional, TextIO
+
+from . import ast
+from . import types
+from .constexpr import Constant, ConstantError, Evaluator
+from .error import Error, Reporter, Warning
+from .lower import encode_string
+from .symtab import Kind, SymbolTable
+from .token import Token
+from .types import ArrayType, FunctionType, IntegerType, PointerType, StructType
+
+
+class InterpreterError(Exception):
+    pass
+
+
+class Exit(Exception):
+    """Raised by ``exit`` to unwind the interpreted program."""
+
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+# the signals by which a statement leaves the statements around it
+BREAK = 1
+CONTINUE = 2
+RETURN = 3
+
+# frame slots: the return value, the frame pointer, then the locals
+_RESULT = 0
+_FP = 1
+_LOCALS = 2
+
+# nothing is stored below this address, so that null pointers fault
+_NULL_PAGE = 4096
+# function pointers are addresses above memory
+_FUNCTIONS = 1 << 48
+
+_MASK64 = (1 << 64) - 1
+_SIZE_T = types.UNSIGNED_LONG
+_PTRDIFF_T = types.LONG
+
+_CODECS = {
+    (1, True): struct.Struct("<b"),
+    (1, False): struct.Struct("<B"),
+    (2, True): struct.Struct("<h"),
+    (2, False): struct.Struct("<H"),
+    (4, True): struct.Struct("<i"),
+    (4, False): struct.Struct("<I"),
+    (8, True): struct.Struct("<q"),
+    (8, False): struct.Struct("<Q"),
+}
+
+_ARITHMETIC = {
+    Token.PLUS: operator.add,
+    Token.MINUS: operator.sub,
+    Token.STAR: operator.mul,
+    Token.AMPERSAND: operator.and_,
+    Token.PIPE: operator.or_,
+    Token.CARET: operator.xor,
+}
+
+_COMPARISONS = {
+    Token.LESS_THAN: operator.lt,
+    Token.GREATER_THAN: operator.gt,
+    Token.LESS_THAN_EQUALS: operator.le,
+    Token.GREATER_THAN_EQUALS: operator.ge,
+    Token.EQUALS_EQUALS: operator.eq,
+    Token.EXCLAMATION_EQUALS: operator.ne,
+}
+
+_COMPOUND_ASSIGNMENT = {
+    Token.PLUS_EQUALS: Token.PLUS,
+    Token.MINUS_EQUALS: Token.MINUS,
+    Token.STAR_EQUALS: Token.STAR,
+    Token.SLASH_EQUALS: Token.SLASH,
+    Token.PERCENT_EQUALS: Token.PERCENT,
+    Token.LESS_THAN_LESS_THAN_EQUALS: Token.LESS_THAN_LESS_THAN,
+    Token.GREATER_THAN_GREATER_THAN_EQUALS: Token.GREATER_THAN_GREATER_THAN,
+    Token.AMPERSAND_EQUALS: Token.AMPERSAND,
+    Token.PIPE_EQUALS: Token.PIPE,
+    Token.CARET_EQUALS: Token.CARET,
+}
+
+
+def _codec(t: types.Type) -> struct.Struct:
+    if isinstance(t, PointerType):
+        return _CODECS[8, False]
+    return _CODECS[t.size, t.signed and t != types.BOOL]
+
+
+def _decay(t: types.Type) -> types.Type:
+    if isinstance(t, ArrayType):
+        return PointerType(t.base)
+    if isinstance(t, FunctionType):
+        return PointerType(t)
+    return t
+
+
+def _strip(expr: ast.Expr) -> ast.Expr:
+    while isinstance(expr, ast.ParenExpr):
+        expr = expr.expr
+    return expr
+
+
+def _wrapper(t: types.Type) -> Callable[[int], int]:
+    """Returns the function reducing an integer into the range of ``t``."""
+    if t == types.BOOL:
+        return lambda v: 1 if v else 0
+    if isinstance(t, PointerType) or not t.signed:
+        mask = _MASK64 if isinstance(t, PointerType) else (1 << t.bits) - 1
+        return lambda v: v & mask
+    half = 1 << (t.bits - 1)
+    mask = (1 << t.bits) - 1
+    return lambda v: ((v + half) & mask) - half
+
+
+def _contains(outer: types.Type, inner: types.Type) -> bool:
+    """Whether every value of ``inner`` is a value of ``outer``."""
+    if isinstance(outer, PointerType):
+        outer = types.UNSIGNED_LONG
+    if isinstance(inner, PointerType):
+        inner = types.UNSIGNED_LONG
+    if outer == types.BOOL:
+        return inner == types.BOOL
+    return outer.min <= inner.min and inner.max <= outer.max
+
+
+def _divide(a: int, b: int) -> int:
+    if b == 0:
+        raise InterpreterError("division by zero")
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+def _remainder(a: int, b: int) -> int:
+    return a - b * _divide(a, b)
+
+
+@dataclasses.dataclass
+class Value:
+    """A compiled expression: ``run`` computes its value from a frame.
+    ``constant`` is the value if it is known while compiling."""
+
+    run: Callable[[list], int]
+    type: types.Type
+    constant: Optional[int] = None
+
+
+def _constant(t: types.Type, value: int) -> Value:
+    return Value(lambda f: value, t, value)
+
+
+@dataclasses.dataclass
+class Place:
+    """Where an object is: the frame slot ``slot``, or the address ``offset``
+    added to the frame pointer if ``frame``, or to ``base(f)`` if given."""
+
+    type: types.Type
+    slot: int = -1
+    offset: int = 0
+    frame: bool = False
+    base: Optional[Callable[[list], int]] = None
+
+
+@dataclasses.dataclass
+class Local:
+    type: types.Type
+    # the frame slot, or -1 if the object is in memory at ``offset`` from
+    # the frame pointer
+    slot: int = -1
+    offset: int = 0
+
+
+@dataclasses.dataclass
+class Static:
+    type: types.Type
+    address: int
+
+
+@dataclasses.dataclass
+class Function:
+    name: str
+    type: FunctionType
+    body: Optional[Callable[[list], Optional[int]]] = None
+    builtin: Optional[Callable] = None
+    template: List[int] = dataclasses.field(default_factory=list)
+    frame_size: int = 0
+    params: List[Place] = dataclasses.field(default_factory=list)
+    address: int = 0
+
+
+@dataclasses.dataclass
+class _FunctionScope:
+    slots: int = _LOCALS
+    frame_size: int = 0
+    # the names whose address is taken, which live in memory
+    addressed: frozenset = frozenset()
+    loops: int = 0
+    switches: int = 0
+    ret: types.Type = types.VOID
+
+
+def _addressed_names(body: ast.Stmt) -> frozenset:
+    from .visitor import Visitor
+
+    class Finder(Visitor):
+        def __init__(self):
+            self.names = set()
+
+        def visit_UnaryExpr(self, node):
+            if node.op == Token.AMPERSAND:
+                operand = _strip(node.operand)
+                if isinstance(operand, ast.RefDeclExpr):
+                    self.names.add(operand.name)
+
+    finder = Finder()
+    finder.visit(body)
+    return frozenset(finder.names)
+
+
+@dataclasses.dataclass
+class Interpreter:
+    """Compiles declarations into closures and runs them.
+
+    ``load`` compiles a stream of declarations, such as
+    ``Parser.iter_declarations()``; a function with an error is reported and
+    left undefined. ``call`` runs a function with integer or pointer
+    arguments, and the program's ``printf`` writes to ``stdout``.
+    """
+
+    reporter: Reporter
+    stack_size: int = 1 << 20
+    stdout: Optional[TextIO] = None
+    memory: bytearray = dataclasses.field(default_factory=lambda: bytearray(_NULL_PAGE))
+    functions: Dict[str, Function] = dataclasses.field(default_factory=dict)
+    symbols: SymbolTable = dataclasses.field(default_factory=SymbolTable)
+    evaluator: Evaluator = dataclasses.field(init=False)
+    sp: int = dataclasses.field(default=0, init=False)
+    stack_end: int = dataclasses.field(default=0, init=False)
+    _strings: Dict[str, int] = dataclasses.field(default_factory=dict, init=False)
+    _by_address: Dict[int, Function] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+    _scope: Optional[_FunctionScope] = dataclasses.field(default=None, init=False)
+
+    def __post_init__(self):
+        self.evaluator = Evaluator(self.reporter, resolve=self._resolve_constant)
+
+    def _resolve_constant(self, name: str) -> Optional[Constant]:
+        symbol = self.symbols.lookup(name)
+        if symbol is not None and symbol.kind == Kind.ENUMERATOR:
+            return symbol.decl
+        return None
+
+    def _error(self, node: ast.Node, error: Error, message: Optional[str] = None):
+        self.reporter.error(node.start, error, message)
+        raise InterpreterError(message or error.value)
+
+    def _unsupported(self, node: ast.Node, message: str):
+        self._error(node, Error.UNSUPPORTED, message)
+
+    # memory
+
+    def allocate(self, size: int, align: int = 8) -> int:
+        """Reserves ``size`` zeroed bytes at the end of memory."""
+        memory = self.memory
+        address = -len(memory) % align + len(memory)
+        memory.extend(bytes(address + size - len(memory)))
+        return address
+
+    def _stack(self) -> None:
+        if not self.stack_end:
+            self.sp = self.allocate(self.stack_size, 16)
+            self.stack_end = self.sp + self.stack_size
+
+    def read_string(self, address: int) -> bytes:
+        end = self.memory.index(0, address)
+        return bytes(self.memory[address:end])
+
+    def _string(self, value: str) -> int:
+        address = self._strings.get(value)
+        if address is None:
+            data = encode_string(value) + b"\0"
+            address = self._strings[value] = self.allocate(len(data), 1)
+            self.memory[address : address + len(data)] = data
+        return address
+
+    # declarations
+
+    def load(self, decls: Iterable[ast.Decl]) -> "Interpreter":
+        for decl in decls:
+            try:
+                self.load_decl(decl)
+            except InterpreterError:
+                pass
+        return self
+
+    def load_decl(self, decl: ast.Decl) -> None:
+        if isinstance(decl, ast.FunctionDecl):
+            self._function(decl.name, decl.type)
+            self.symbols.declare(decl.name, Kind.FUNCTION, decl.type)
+            if decl.body is not None:
+                self._compile_function(decl)
+        elif isinstance(decl, ast.VarDecl):
+            self._global(decl)
+        elif isinstance(decl, ast.EnumDecl):
+            self._declare_enumerators(decl)
+
+    def _function(self, name: str, t: FunctionType) -> Function:
+        fn = self.functions.get(name)
+        if fn is None:
+            fn = Function(name, t, builtin=BUILTINS.get(name))
+            fn.address = _FUNCTIONS + 16 * len(self.functions)
+            self.functions[name] = fn
+            self._by_address[fn.address] = fn
+        return fn
+
+    def _declare_enumerators(self, decl: ast.EnumDecl) -> None:
+        for constant in decl.constants:
+            self.symbols.declare(
+                constant.name, Kind.ENUMERATOR, Constant(types.INT, constant.value)
+            )
+
+    def _global(self, decl: ast.VarDecl) -> None:
+        t = decl.type
+        symbol = self.symbols.lookup(decl.name)
+        if (
+            symbol is not None
+            and symbol.kind == Kind.OBJECT
+            and isinstance(symbol.decl, Static)
+            and symbol.depth == self.symbols.depth
+        ):
+            static = symbol.decl
+        else:
+            if not t.is_complete:
+                if decl.init is None:
+                    self._unsupported(decl, f"variable has incomplete type '{t}'")
+            static = Static(t, self.allocate(max(t.size, 1), t.align))
+            self.symbols.declare(decl.name, Kind.OBJECT, static)
+        if decl.init is not None:
+            # initializers are constant, so they run once, now
+            place = Place(t, offset=static.address)
+            for store in self._initializers(place, decl.init):
+                store([0, 0])
+
+    # initializers
+
+    def _initializers(self, place: Place, init: ast.Expr) -> List[Callable]:
+        """Returns the closures storing ``init`` into the object at
+        ``place``. Nested aggregates must be braced, and members not given
+        are left as they are."""
+        t = place.type
+        init = _strip(init)
+        if isinstance(t, ArrayType) and isinstance(init, ast.StringConstant):
+            data = encode_string(init.value) + b"\0"
+            size = t.size if t.is_complete else len(data)
+            data = data[:size].ljust(size, b"\0")
+            address = self._address(place)
+            memory = self.memory
+
+            def store(f):
+                start = address(f)
+                memory[start : start + size] = data
+
+            return [store]
+        if not isinstance(init, ast.InitListExpr):
+            if isinstance(t, (ArrayType, StructType)):
+                self._unsupported(init, "initializer must be braced")
+            value = self.convert(self.rvalue(init), t, init)
+            storer = self._storer(place)
+            run = value.run
+            return [lambda f: storer(f, run(f))]
+        if not isinstance(t, (ArrayType, StructType)):
+            if not init.inits:
+                return []
+            return self._initializers(place, init.inits[0])
+        stores = []
+        position = 0
+        for item in init.inits:
+            if isinstance(item, ast.DesignatedInitExpr):
+                if len(item.designators) != 1:
+                    self._unsupported(item, "nested designators")
+                designator = item.designators[0]
+                if isinstance(t, ArrayType) and designator.index is not None:
+                    position = self._constant(designator.index).value
+                elif isinstance(t, StructType) and designator.field is not None:
+                    names = [name for name, _ in t.fields]
+                    if designator.field not in names:
+                        self._error(
+                            designator,
+                            Error.INVALID_OPERANDS,
+                            f"no member named '{designator.field}' in '{t}'",
+                        )
+                    position = names.index(designator.field)
+                else:
+                    self._error(designator, Error.INVALID_OPERANDS, "bad designator")
+                item = item.init
+            if isinstance(t, ArrayType):
+                if t.length is not None and position >= t.length:
+                    self._error(item, Error.INVALID_OPERANDS, "excess elements")
+                member, offset = t.base, position * t.base.size
+            else:
+                if position >= len(t.fields):
+                    self._error(item, Error.INVALID_OPERANDS, "excess elements")
+                if t.widths[position] is not None:
+                    self._unsupported(item, "bit-field members are not supported")
+                member, offset = t.fields[position][1], t.offsets[position]
+            stores += self._initializers(self._member(place, member, offset), item)
+            position += 1
+        return stores
+
+    def _constant(self, expr: ast.Expr) -> Constant:
+        try:
+            return self.evaluator.evaluate(expr)
+        except ConstantError as e:
+            raise InterpreterError(str(e))
+
+    # functions
+
+    def _compile_function(self, decl: ast.FunctionDecl) -> None:
+        fn = self._function(decl.name, decl.type)
+        scope = self._scope = _FunctionScope(
+            addressed=_addressed_names(decl.body), ret=decl.type.ret
+        )
+        self.symbols.push_scope()
+        try:
+            params = [self._local(p, p.type, p.name) for p in decl.params]
+            body = self.statement(decl.body)
+        finally:
+            self.symbols.pop_scope()
+            self._scope = None
+        ret = decl.type.ret
+        fn.template = [0 if ret != types.VOID else None] + [0] * (scope.slots - 1)
+        fn.frame_size = -scope.frame_size % 16 + scope.frame_size
+        fn.params = [self._storer(x) for x in params]
+        fn.body = body
+
+    def _local(self, node: ast.Node, t: types.Type, name: Optional[str]) -> Place:
+        """Declares a local of the function being compiled."""
+        scope = self._scope
+        if not t.is_complete:
+            self._unsupported(node, f"variable has incomplete type '{t}'")
+        if t.is_scalar and name not in scope.addressed:
+            local = Local(t, slot=scope.slots)
+            scope.slots += 1
+            place = Place(t, slot=local.slot)
+        else:
+            offset = -scope.frame_size % t.align + scope.frame_size
+            scope.frame_size = offset + t.size
+            local = Local(t, offset=offset)
+            place = Place(t, offset=offset, frame=True)
+        if name is not None:
+            self.symbols.declare(name, Kind.OBJECT, local)
+        return place
+
+    def invoke(self, fn: Function, args: List[int]) -> Optional[int]:
+        body = fn.body
+        if body is None:
+            if fn.builtin is not None:
+                return fn.builtin(self, *args)
+            raise InterpreterError(f"function '{fn.name}' is not defined")
+        f = fn.template.copy()
+        fp = self.sp
+        f[_FP] = fp
+        if fn.frame_size:
+            sp = fp + fn.frame_size
+            if sp > self.stack_end:
+                raise InterpreterError("stack overflow")
+            self.sp = sp
+        for store, value in zip(fn.params, args):
+            store(f, value)
+        try:
+            body(f)
+        finally:
+            self.sp = fp
+        return f[_RESULT]
+
+    def call(self, name: str, *args: int) -> Optional[int]:
+        """Calls the function ``name``, which is defined or a builtin."""
+        fn = self.functions.get(name)
+        if fn is None:
+            fn = self._function(name, FunctionType(types.INT, (), prototype=False))
+        self._stack()
+        try:
+            return self.invoke(fn, list(args))
+        except RecursionError:
+            raise InterpreterError("stack overflow")
+
+    def run(self) -> int:
+        """Runs ``main`` and returns its exit status."""
+        try:
+            return self.call("main") & 0xFF
+        except Exit as e:
+            return e.status & 0xFF
+
+    # statements
+
+    def statement(self, stmt: ast.Stmt) -> Callable[[list], Optional[int]]:
+        """Compiles ``stmt`` into a closure which returns None, or BREAK,
+        CONTINUE or RETURN to leave the statements around it."""
+        method = getattr(self, "_statement_" + type(stmt).__name__, None)
+        if method is None:
+            self._unsupported(stmt, f"{type(stmt).__name__} is not supported")
+        return method(stmt)
+
+    def _statements(self, stmts: List[ast.Stmt]) -> Callable[[list], Optional[int]]:
+        compiled = [self.statement(x) for x in stmts]
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def run(f):
+            for stmt in compiled:
+                signal = stmt(f)
+                if signal is not None:
+                    return signal
+            return None
+
+        return run
+
+    def _statement_CompoundStmt(self, stmt: ast.CompoundStmt):
+        self.symbols.push_scope()
+        try:
+            return self._statements(stmt.stmts)
+        finally:
+            self.symbols.pop_scope()
+
+    def _statement_NullStmt(self, stmt: ast.NullStmt):
+        return lambda f: None
+
+    def _statement_ExprStmt(self, stmt: ast.ExprStmt):
+        run = self.rvalue(stmt.expr, discard=True).run
+
+        def statement(f):
+            run(f)
+
+        return statement
+
+    def _statement_DeclStmt(self, stmt: ast.DeclStmt):
+        stores = []
+        for decl in stmt.decls:
+            if isinstance(decl, ast.VarDecl):
+                stores += self._declare_local(decl)
+            elif isinstance(decl, ast.FunctionDecl):
+                self._function(decl.name, decl.type)
+                self.symbols.declare(decl.name, Kind.FUNCTION, decl.type)
+            elif isinstance(decl, ast.EnumDecl):
+                self._declare_enumerators(decl)
+
+        def run(f):
+            for store in stores:
+                store(f)
+
+        return run
+
+    def _declare_local(self, decl: ast.VarDecl) -> List[Callable]:
+        t = decl.type
+        if decl.storage in (Token.EXTERN, Token.STATIC):
+            if decl.storage == Token.EXTERN:
+                symbol = self.symbols.lookup(decl.name)
+                if symbol is None or not isinstance(symbol.decl, Static):
+                    self._unsupported(decl, "extern variables must be defined first")
+                self.symbols.declare(decl.name, Kind.OBJECT, symbol.decl)
+                return []
+            self.symbols.push_scope()
+            try:
+                self._global(decl)
+                static = self.symbols.lookup(decl.name).decl
+            finally:
+                self.symbols.pop_scope()
+            self.symbols.declare(decl.name, Kind.OBJECT, static)
+            return []
+        if isinstance(t, ArrayType) and not t.is_complete and decl.init is None:
+            self._unsupported(decl, "variable length arrays are not supported")
+        place = self._local(decl, t, decl.name)
+        if decl.init is None:
+            return []
+        stores = []
+        if isinstance(t, (ArrayType, StructType)):
+            # zero the object, then store the members which are given
+            address = self._address(place)
+            memory = self.memory
+            zeros = bytes(t.size)
+            size = t.size
+
+            def clear(f):
+                start = address(f)
+                memory[start : start + size] = zeros
+
+            stores.append(clear)
+        return stores + self._initializers(place, decl.init)
+
+    def _condition(self, expr: ast.Expr) -> Callable[[list], object]:
+        """Compiles ``expr`` into a closure returning a truth value, which
+        needs no conversion to 0 or 1."""
+        expr = _strip(expr)
+        if isinstance(expr, ast.BinaryExpr) and expr.op in _COMPARISONS:
+            return self._compare(expr).run
+        if isinstance(expr, ast.UnaryExpr) and expr.op == Token.EXCLAMATION:
+            operand = self._condition(expr.operand)
+            return lambda f: not operand(f)
+        if isinstance(expr, ast.BinaryExpr) and expr.op == Token.AMPERSAND_AMPERSAND:
+            left = self._condition(expr.left)
+            right = self._condition(expr.right)
+            return lambda f: left(f) and right(f)
+        if isinstance(expr, ast.BinaryExpr) and expr.op == Token.PIPE_PIPE:
+            left = self._condition(expr.left)
+            right = self._condition(expr.right)
+            return lambda f: left(f) or right(f)
+        value = self.rvalue(expr)
+        if not value.type.is_scalar:
+            self._error(expr, Error.INVALID_OPERANDS, "condition is not a scalar")
+        return value.run
+
+    def _statement_IfStmt(self, stmt: ast.IfStmt):
+        cond = self._condition(stmt.cond)
+        then = self.statement(stmt.then)
+        if stmt.otherwise is None:
+
+            def run(f):
+                if cond(f):
+                    return then(f)
+                return None
+
+            return run
+        otherwise = self.statement(stmt.otherwise)
+
+        def run_else(f):
+            if cond(f):
+                return then(f)
+            return otherwise(f)
+
+        return run_else
+
+    def _loop_body(self, body: ast.Stmt):
+        self._scope.loops += 1
+        try:
+            return self.statement(body)
+        finally:
+            self._scope.loops -= 1
+
+    def _statement_WhileStmt(self, stmt: ast.WhileStmt):
+        cond = self._condition(stmt.cond)
+        body = self._loop_body(stmt.body)
+
+        def run(f):
+            while cond(f):
+                signal = body(f)
+                if signal is not None:
+                    if signal == BREAK:
+                        break
+                    if signal == RETURN:
+                        return signal
+            return None
+
+        return run
+
+    def _statement_DoStmt(self, stmt: ast.DoStmt):
+        body = self._loop_body(stmt.body)
+        cond = self._condition(stmt.cond)
+
+        def run(f):
+            while True:
+                signal = body(f)
+                if signal is not None:
+                    if signal == BREAK:
+                        break
+                    if signal == RETURN:
+                        return signal
+                if not cond(f):
+                    break
+            return None
+
+        return run
+
+    def _statement_ForStmt(self, stmt: ast.ForStmt):
+        self.symbols.push_scope()
+        try:
+            init = self.statement(stmt.init) if stmt.init is not None else None
+            cond = None
+            if stmt.cond is not None:
+                cond = self._condition(stmt.cond)
+            step = None
+            if stmt.step is not None:
+                step = self.rvalue(stmt.step, discard=True).run
+            body = self._loop_body(stmt.body)
+        finally:
+            self.symbols.pop_scope()
+
+        def run(f):
+            if init is not None:
+                init(f)
+            while cond is None or cond(f):
+                signal = body(f)
+                if signal is not None:
+                    if signal == BREAK:
+                        break
+                    if signal == RETURN:
+                        return signal
+                if step is not None:
+                    step(f)
+            return None
+
+        return run
+
+    def _statement_SwitchStmt(self, stmt: ast.SwitchStmt):
+        value = self.rvalue(stmt.cond)
+        t = value.type
+        if not isinstance(t, IntegerType):
+            self._error(stmt.cond, Error.INVALID_OPERANDS, "switch on a non-integer")
+        t = types.integer_promotion(t)
+        cond = self.convert(value, t, stmt.cond).run
+        body = stmt.body
+        items = body.stmts if isinstance(body, ast.CompoundStmt) else [body]
+        # the statements of the body, with the index each case starts at
+        stmts = []
+        targets: Dict[int, int] = {}
+        default = len(items)
+        self.symbols.push_scope()
+        self._scope.switches += 1
+        try:
+            for item in items:
+                while isinstance(item, (ast.CaseStmt, ast.DefaultStmt)):
+                    if isinstance(item, ast.CaseStmt):
+                        case = t.wrap(self._constant(item.expr).value)
+                        targets.setdefault(case, len(stmts))
+                    else:
+                        default = len(stmts)
+                    item = item.stmt
+                stmts.append(self.statement(item))
+        finally:
+            self._scope.switches -= 1
+            self.symbols.pop_scope()
+        if default == len(items):
+            default = len(stmts)
+
+        def run(f):
+            for k in range(targets.get(cond(f), default), len(stmts)):
+                signal = stmts[k](f)
+                if signal is not None:
+                    if signal == BREAK:
+                        break
+                    return signal
+            return None
+
+        return run
+
+    def _statement_CaseStmt(self, stmt: ast.CaseStmt):
+        if not self._scope.switches:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'case' statement not in switch statement",
+            )
+        self._unsupported(stmt, "case labels must be statements of the switch body")
+
+    _statement_DefaultStmt = _statement_CaseStmt
+
+    def _statement_BreakStmt(self, stmt: ast.BreakStmt):
+        if not self._scope.loops and not self._scope.switches:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'break' statement not in loop or switch statement",
+            )
+        return lambda f: BREAK
+
+    def _statement_ContinueStmt(self, stmt: ast.ContinueStmt):
+        if not self._scope.loops:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'continue' statement not in loop statement",
+            )
+        return lambda f: CONTINUE
+
+    def _statement_ReturnStmt(self, stmt: ast.ReturnStmt):
+        if stmt.expr is None:
+            return lambda f: RETURN
+        value = self.rvalue(stmt.expr)
+        ret = self._scope.ret
+        if ret != types.VOID:
+            value = self.convert(value, ret, stmt.expr)
+        run = value.run
+
+        def statement(f):
+            f[_RESULT] = run(f)
+            return RETURN
+
+        return statement
+
+    def _statement_LabelStmt(self, stmt: ast.LabelStmt):
+        self._unsupported(stmt, "labels are not supported")
+
+    def _statement_GotoStmt(self, stmt: ast.GotoStmt):
+        self._unsupported(stmt, "'goto' is not supported")
+
+    # places
+
+    def _member(self, place: Place, t: types.Type, offset: int) -> Place:
+        return dataclasses.replace(place, type=t, offset=place.offset + offset)
+
+    def _address(self, place: Place) -> Callable[[list], int]:
+        offset = place.offset
+        if place.base is not None:
+            base = place.base
+            if offset:
+                return lambda f: base(f) + offset
+            return base
+        if place.frame:
+            return lambda f: f[_FP] + offset
+        return lambda f: offset
+
+    def _loader(self, place: Place) -> Callable[[list], int]:
+        if place.slot >= 0:
+            return operator.itemgetter(place.slot)
+        unpack = _codec(place.type).unpack_from
+        memory = self.memory
+        offset = place.offset
+        if place.base is not None:
+            address = self._address(place)
+
+            def load(f):
+                a = address(f)
+                if a < _NULL_PAGE:
+                    raise InterpreterError(f"invalid memory access at {a:#x}")
+                return unpack(memory, a)[0]
+
+            return load
+        if place.frame:
+            return lambda f: unpack(memory, f[_FP] + offset)[0]
+        return lambda f: unpack(memory, offset)[0]
+
+    def _storer(self, place: Place) -> Callable[[list, int], None]:
+        if place.slot >= 0:
+            slot = place.slot
+
+            def store_slot(f, v):
+                f[slot] = v
+
+            return store_slot
+        pack = _codec(place.type).pack_into
+        memory = self.memory
+        offset = place.offset
+        if place.base is not None:
+            address = self._address(place)
+
+            def store(f, v):
+                a = address(f)
+                if a < _NULL_PAGE:
+                    raise InterpreterError(f"invalid memory access at {a:#x}")
+                pack(memory, a, v)
+
+            return store
+        if place.frame:
+            return lambda f, v: pack(memory, f[_FP] + offset, v)
+        return lambda f, v: pack(memory, offset, v)
+
+    def place(self, expr: ast.Expr) -> Place:
+        """Compiles the location of the lvalue ``expr``."""
+        expr = _strip(expr)
+        if isinstance(expr, ast.RefDeclExpr):
+            symbol = self._lookup(expr)
+            if symbol.kind == Kind.OBJECT:
+                obj = symbol.decl
+                if isinstance(obj, Static):
+                    return Place(obj.type, offset=obj.address)
+                if obj.slot >= 0:
+                    return Place(obj.type, slot=obj.slot)
+                return Place(obj.type, offset=obj.offset, frame=True)
+        elif isinstance(expr, ast.UnaryExpr) and expr.op == Token.STAR:
+            value = self.rvalue(expr.operand)
+            if not isinstance(value.type, PointerType):
+                message = "indirection requires pointer operand"
+                self._error(expr, Error.INVALID_OPERANDS, message)
+            return Place(value.type.base, base=value.run)
+        elif isinstance(expr, ast.SubscriptExpr):
+            base = self.rvalue(expr.base)
+            index = self.rvalue(expr.index)
+            value = self._arithmetic(Token.PLUS, base, index, expr)
+            if not isinstance(value.type, PointerType):
+                self._error(expr, Error.INVALID_OPERANDS, "subscript of non-pointer")
+            return Place(value.type.base, base=value.run)
+        elif isinstance(expr, ast.MemberExpr):
+            if expr.arrow:
+                value = self.rvalue(expr.base)
+                t = value.type.base if isinstance(value.type, PointerType) else None
+                place = Place(t, base=value.run)
+            else:
+                place = self.place(expr.base)
+                t = place.type
+            if not isinstance(t, StructType) or not t.is_complete:
+                self._error(expr, Error.INVALID_OPERANDS, "member of non-struct")
+            member = t.field(expr.name)
+            if member is None:
+                message = f"no member named '{expr.name}' in '{t}'"
+                self._error(expr, Error.INVALID_OPERANDS, message)
+            if t.bit_width(expr.name) is not None:
+                self._unsupported(expr, "bit-field members are not supported")
+            return self._member(place, member[0], member[1])
+        elif isinstance(expr, ast.StringConstant):
+            t = ArrayType(types.CHAR, len(encode_string(expr.value)) + 1)
+            return Place(t, offset=self._string(expr.value))
+        self._error(expr, Error.NOT_ASSIGNABLE)
+
+    def _lookup(self, expr: ast.RefDeclExpr):
+        symbol = self.symbols.lookup(expr.name)
+        if symbol is None or symbol.kind == Kind.TYPEDEF:
+            self._error(
+                expr,
+                Error.UNDECLARED_IDENTIFIER,
+                f"use of undeclared identifier '{expr.name}'",
+            )
+        return symbol
+
+    def _load(self, place: Place, node: ast.Node) -> Value:
+        t = place.type
+        if isinstance(t, (ArrayType, FunctionType)):
+            return Value(self._address(place), _decay(t))
+        if isinstance(t, StructType):
+            self._unsupported(node, "struct values are not supported")
+        if isinstance(t, types.FloatingType):
+            self._unsupported(node, "floating point is not supported")
+        return Value(self._loader(place), t)
+
+    # expressions
+
+    def rvalue(self, expr: ast.Expr, discard: bool = False) -> Value:
+        """Compiles ``expr``. Arrays and functions decay to pointers. With
+        ``discard`` the value may be left uncomputed."""
+        method = getattr(self, "_rvalue_" + type(expr).__name__, None)
+        if method is not None:
+            if discard and isinstance(expr, ast.PostfixExpr):
+                return self._increment(expr.operand, expr.op, prefix=True)
+            return method(expr)
+        return self._load(self.place(expr), expr)
+
+    def convert(self, value: Value, dst: types.Type, node: ast.Node) -> Value:
+        src = value.type
+        if dst == src:
+            return value
+        if isinstance(dst, types.VoidType):
+            run = value.run
+            return Value(run, dst)
+        if not dst.is_scalar or not src.is_scalar:
+            message = f"cannot convert '{src}' to '{dst}'"
+            self._error(node, Error.INVALID_OPERANDS, message)
+        if isinstance(src, types.FloatingType) or isinstance(dst, types.FloatingType):
+            self._unsupported(node, "floating point is not supported")
+        if _contains(dst, src):
+            return Value(value.run, dst, value.constant)
+        wrap = _wrapper(dst)
+        if value.constant is not None:
+            return _constant(dst, wrap(value.constant))
+        run = value.run
+        return Value(lambda f: wrap(run(f)), dst)
+
+    def _rvalue_ParenExpr(self, expr: ast.ParenExpr):
+        return self.rvalue(expr.expr)
+
+    def _rvalue_IntegerConstant(self, expr: ast.IntegerConstant):
+        constant = self._constant(expr)
+        return _constant(constant.type, constant.value)
+
+    def _rvalue_CharacterConstant(self, expr: ast.CharacterConstant):
+        return _constant(types.INT, self._constant(expr).value)
+
+    def _rvalue_FloatingConstant(self, expr: ast.FloatingConstant):
+        self._unsupported(expr, "floating point is not supported")
+
+    def _rvalue_RefDeclExpr(self, expr: ast.RefDeclExpr):
+        symbol = self._lookup(expr)
+        if symbol.kind == Kind.ENUMERATOR:
+            return _constant(types.INT, symbol.decl.value)
+        if symbol.kind == Kind.FUNCTION:
+            address = self._function(expr.name, symbol.decl).address
+            return _constant(PointerType(symbol.decl), address)
+        return self._load(self.place(expr), expr)
+
+    def _type_of(self, expr: ast.Expr) -> types.Type:
+        """Returns the type of ``expr`` before arrays and functions decay;
+        compiling it has no effect."""
+        expr = _strip(expr)
+        if isinstance(expr, ast.RefDeclExpr):
+            symbol = self._lookup(expr)
+            if symbol.kind == Kind.FUNCTION:
+                return symbol.decl
+            if symbol.kind == Kind.OBJECT:
+                return symbol.decl.type
+        elif isinstance(expr, (ast.StringConstant, ast.SubscriptExpr, ast.MemberExpr)):
+            return self.place(expr).type
+        elif isinstance(expr, ast.UnaryExpr) and expr.op == Token.STAR:
+            return self.place(expr).type
+        return self.rvalue(expr).type
+
+    def _rvalue_SizeofExpr(self, expr: ast.SizeofExpr):
+        t = expr.type
+        if t is None:
+            t = self._type_of(expr.operand)
+        if not t.is_complete or isinstance(t, FunctionType):
+            self._error(expr, Error.INVALID_OPERANDS, f"sizeof incomplete type '{t}'")
+        return _constant(_SIZE_T, t.size if expr.op == Token.SIZEOF else t.align)
+
+    def _rvalue_CastExpr(self, expr: ast.CastExpr):
+        return self.convert(self.rvalue(expr.expr), expr.type, expr)
+
+    def _rvalue_UnaryExpr(self, expr: ast.UnaryExpr):
+        op = expr.op
+        if op == Token.AMPERSAND:
+            operand = _strip(expr.operand)
+            if isinstance(operand, ast.RefDeclExpr):
+                symbol = self._lookup(operand)
+                if symbol.kind == Kind.FUNCTION:
+                    return self._rvalue_RefDeclExpr(operand)
+            place = self.place(expr.operand)
+            if place.slot >= 0:
+                self._error(expr, Error.NOT_ASSIGNABLE, "cannot take the address")
+            address = self._address(place)
+            if place.base is None and not place.frame:
+                return _constant(PointerType(place.type), place.offset)
+            return Value(address, PointerType(place.type))
+        if op == Token.STAR:
+            return self._load(self.place(expr), expr)
+        if op in (Token.PLUS_PLUS, Token.MINUS_MINUS):
+            return self._increment(expr.operand, op, prefix=True)
+        if op == Token.EXCLAMATION:
+            cond = self._condition(expr.operand)
+            return Value(lambda f: 0 if cond(f) else 1, types.INT)
+        value = self.rvalue(expr.operand)
+        if not isinstance(value.type, IntegerType):
+            message = f"invalid argument type '{value.type}'"
+            self._error(expr, Error.INVALID_OPERANDS, message)
+        t = types.integer_promotion(value.type)
+        value = self.convert(value, t, expr)
+        if op == Token.PLUS:
+            return value
+        wrap = _wrapper(t)
+        run = value.run
+        if op == Token.MINUS:
+            if value.constant is not None:
+                return _constant(t, wrap(-value.constant))
+            return Value(lambda f: wrap(-run(f)), t)
+        if op == Token.TILDE:
+            if value.constant is not None:
+                return _constant(t, wrap(~value.constant))
+            return Value(lambda f: wrap(~run(f)), t)
+        self._unsupported(expr, f"operator '{op.value}'")
+
+    def _rvalue_PostfixExpr(self, expr: ast.PostfixExpr):
+        return self._increment(expr.operand, expr.op, prefix=False)
+
+    def _increment(self, operand: ast.Expr, op: Token, prefix: bool) -> Value:
+        place = self.place(operand)
+        t = place.type
+        if isinstance(t, PointerType):
+            step = t.base.size if t.base.is_complete else 1
+        elif isinstance(t, IntegerType):
+            step = 1
+        else:
+            message = f"cannot increment value of type '{t}'"
+            self._error(operand, Error.INVALID_OPERANDS, message)
+        if op == Token.MINUS_MINUS:
+            step = -step
+        wrap = _wrapper(t)
+        if place.slot >= 0:
+            slot = place.slot
+            if prefix:
+
+                def pre(f):
+                    v = f[slot] = wrap(f[slot] + step)
+                    return v
+
+                return Value(pre, t)
+
+            def post(f):
+                v = f[slot]
+                f[slot] = wrap(v + step)
+                return v
+
+            return Value(post, t)
+        address = self._address(place)
+        unpack = _codec(t).unpack_from
+        pack = _codec(t).pack_into
+        memory = self.memory
+
+        def increment(f):
+            a = address(f)
+            if a < _NULL_PAGE:
+                raise InterpreterError(f"invalid memory access at {a:#x}")
+            old = unpack(memory, a)[0]
+            new = wrap(old + step)
+            pack(memory, a, new)
+            return new if prefix else old
+
+        return Value(increment, t)
+
+    def _rvalue_BinaryExpr(self, expr: ast.BinaryExpr):
+        op = expr.op
+        if op == Token.COMMA:
+            left = self.rvalue(expr.left, discard=True).run
+            right = self.rvalue(expr.right)
+            run = right.run
+
+            def comma(f):
+                left(f)
+                return run(f)
+
+            return Value(comma, right.type)
+        if op == Token.EQUALS:
+            place = self.place(expr.left)
+            self._check_scalar(place.type, expr)
+            value = self.convert(self.rvalue(expr.right), place.type, expr)
+            return self._assign(place, value.run)
+        if op in _COMPOUND_ASSIGNMENT:
+            place = self.place(expr.left)
+            self._check_scalar(place.type, expr)
+            if place.base is not None:
+                # the address is computed once
+                address = self._address(place)
+                slot = self._scope.slots
+                self._scope.slots += 1
+                base = operator.itemgetter(slot)
+
+                def compute(f):
+                    a = f[slot] = address(f)
+                    return a
+
+                place = Place(place.type, base=base)
+                current = self._load(place, expr)
+                right = self.rvalue(expr.right)
+                value = self._arithmetic(_COMPOUND_ASSIGNMENT[op], current, right, expr)
+                value = self.convert(value, place.type, expr).run
+                store = self._storer(place)
+
+                def compound(f):
+                    compute(f)
+                    v = value(f)
+                    store(f, v)
+                    return v
+
+                return Value(compound, place.type)
+            current = self._load(place, expr)
+            right = self.rvalue(expr.right)
+            value = self._arithmetic(_COMPOUND_ASSIGNMENT[op], current, right, expr)
+            return self._assign(place, self.convert(value, place.type, expr).run)
+        if op in (Token.AMPERSAND_AMPERSAND, Token.PIPE_PIPE):
+            cond = self._condition(expr)
+            return Value(lambda f: 1 if cond(f) else 0, types.INT)
+        if op in _COMPARISONS:
+            value = self._compare(expr)
+            run = value.run
+            return Value(lambda f: 1 if run(f) else 0, types.INT)
+        left = self.rvalue(expr.left)
+        right = self.rvalue(expr.right)
+        return self._arithmetic(op, left, right, expr)
+
+    def _check_scalar(self, t: types.Type, node: ast.Node) -> None:
+        if isinstance(t, StructType):
+            self._unsupported(node, "struct values are not supported")
+        if not t.is_scalar:
+            self._error(node, Error.NOT_ASSIGNABLE)
+
+    def _assign(self, place: Place, run: Callable[[list], int]) -> Value:
+        if place.slot >= 0:
+            slot = place.slot
+
+            def assign_slot(f):
+                v = f[slot] = run(f)
+                return v
+
+            return Value(assign_slot, place.type)
+        store = self._storer(place)
+
+        def assign(f):
+            v = run(f)
+            store(f, v)
+            return v
+
+        return Value(assign, place.type)
+
+    def _compare(self, expr: ast.BinaryExpr) -> Value:
+        """Compiles a comparison into a closure returning a bool."""
+        left = self.rvalue(expr.left)
+        right = self.rvalue(expr.right)
+        lt, rt = left.type, right.type
+        if isinstance(lt, PointerType) or isinstance(rt, PointerType):
+            left = self.convert(left, _SIZE_T, expr)
+            right = self.convert(right, _SIZE_T, expr)
+        elif isinstance(lt, IntegerType) and isinstance(rt, IntegerType):
+            t = types.usual_arithmetic_conversion(lt, rt)
+            left = self.convert(left, t, expr)
+            right = self.convert(right, t, expr)
+        else:
+            self._error(
+                expr,
+                Error.INVALID_OPERANDS,
+                f"invalid operands to binary expression ('{lt}' and '{rt}')",
+            )
+        compare = _COMPARISONS[expr.op]
+        a, b = left.run, right.run
+        if right.constant is not None:
+            c = right.constant
+            return Value(lambda f: compare(a(f), c), types.INT)
+        return Value(lambda f: compare(a(f), b(f)), types.INT)
+
+    def _arithmetic(
+        self, op: Token, left: Value, right: Value, node: ast.Node
+    ) -> Value:
+        """Compiles a binary operation with the usual conversions and pointer
+        arithmetic of C."""
+        lt, rt = left.type, right.type
+        lp = isinstance(lt, PointerType)
+        rp = isinstance(rt, PointerType)
+        if op == Token.PLUS and rp and not lp:
+            left, right, lt, rt, lp, rp = right, left, rt, lt, rp, lp
+        if op in (Token.PLUS, Token.MINUS) and lp and isinstance(rt, IntegerType):
+            index = self.convert(right, _PTRDIFF_T, node)
+            size = lt.base.size if lt.base.is_complete else 1
+            if op == Token.MINUS:
+                size = -size
+            a, b = left.run, index.run
+            if index.constant is not None:
+                step = index.constant * size
+                return Value(lambda f: (a(f) + step) & _MASK64, lt)
+            return Value(lambda f: (a(f) + b(f) * size) & _MASK64, lt)
+        if op == Token.MINUS and lp and rp:
+            size = lt.base.size if lt.base.is_complete else 1
+            wrap = _wrapper(_PTRDIFF_T)
+            a, b = left.run, right.run
+            return Value(lambda f: _divide(wrap(a(f) - b(f)), size), _PTRDIFF_T)
+        if not isinstance(lt, IntegerType) or not isinstance(rt, IntegerType):
+            self._error(
+                node,
+                Error.INVALID_OPERANDS,
+                f"invalid operands to binary expression ('{lt}' and '{rt}')",
+            )
+        if op in (Token.LESS_THAN_LESS_THAN, Token.GREATER_THAN_GREATER_THAN):
+            t = types.integer_promotion(lt)
+            left = self.convert(left, t, node)
+            right = self.convert(right, types.integer_promotion(rt), node)
+            # like x86, which masks the count of a shift
+            count = t.bits - 1
+            a, b = left.run, right.run
+            wrap = _wrapper(t)
+            if op == Token.GREATER_THAN_GREATER_THAN:
+                if right.constant is not None:
+                    c = right.constant & count
+                    return Value(lambda f: a(f) >> c, t)
+                return Value(lambda f: a(f) >> (b(f) & count), t)
+            if right.constant is not None:
+                c = right.constant & count
+                return Value(lambda f: wrap(a(f) << c), t)
+            return Value(lambda f: wrap(a(f) << (b(f) & count)), t)
+        t = types.usual_arithmetic_conversion(lt, rt)
+        left = self.convert(left, t, node)
+        right = self.convert(right, t, node)
+        if op in _ARITHMETIC:
+            apply = _ARITHMETIC[op]
+        elif op == Token.SLASH:
+            apply = _divide
+        elif op == Token.PERCENT:
+            apply = _remainder
+        else:
+            self._unsupported(node, f"operator '{op.value}'")
+        a, b = left.run, right.run
+        if op in (Token.AMPERSAND, Token.PIPE, Token.CARET) or (
+            op == Token.PERCENT and not t.signed
+        ):
+            # the result is in range already
+            if right.constant is not None:
+                c = right.constant
+                return Value(lambda f: apply(a(f), c), t)
+            return Value(lambda f: apply(a(f), b(f)), t)
+        if t.signed:
+            half = 1 << (t.bits - 1)
+            mask = (1 << t.bits) - 1
+            if right.constant is not None:
+                c = right.constant
+                return Value(lambda f: ((apply(a(f), c) + half) & mask) - half, t)
+            return Value(lambda f: ((apply(a(f), b(f)) + half) & mask) - half, t)
+        mask = (1 << t.bits) - 1
+        if right.constant is not None:
+            c = right.constant
+            return Value(lambda f: apply(a(f), c) & mask, t)
+        return Value(lambda f: apply(a(f), b(f)) & mask, t)
+
+    def _rvalue_ConditionalExpr(self, expr: ast.ConditionalExpr):
+        cond = self._condition(expr.cond)
+        then = self.rvalue(expr.then)
+        otherwise = self.rvalue(expr.otherwise)
+        at, bt = then.type, otherwise.type
+        if isinstance(at, IntegerType) and isinstance(bt, IntegerType):
+            t = types.usual_arithmetic_conversion(at, bt)
+        elif isinstance(at, types.VoidType) or isinstance(bt, types.VoidType):
+            t = types.VOID
+        else:
+            t = at if isinstance(at, PointerType) else bt
+        a = self.convert(then, t, expr).run
+        b = self.convert(otherwise, t, expr).run
+        return Value(lambda f: a(f) if cond(f) else b(f), t)
+
+    def _rvalue_StringConstant(self, expr: ast.StringConstant):
+        return self._load(self.place(expr), expr)
+
+    def _rvalue_CallExpr(self, expr: ast.CallExpr):
+        callee = _strip(expr.callee)
+        direct = None
+        if isinstance(callee, ast.RefDeclExpr):
+            symbol = self.symbols.lookup(callee.name)
+            if symbol is None:
+                self.reporter.warning(
+                    callee.start,
+                    Warning.IMPLICIT_FUNCTION_DECLARATION,
+                    f"implicit declaration of function '{callee.name}'",
+                )
+                ft = FunctionType(types.INT, (), prototype=False)
+                self.symbols.declare(callee.name, Kind.FUNCTION, ft)
+                symbol = self.symbols.lookup(callee.name)
+            if symbol.kind == Kind.FUNCTION:
+                direct = self._function(callee.name, symbol.decl)
+        target = self.rvalue(callee)
+        t = target.type
+        if not isinstance(t, PointerType) or not isinstance(t.base, FunctionType):
+            self._error(expr, Error.INVALID_OPERANDS, "called object is not a function")
+        ft = t.base
+        if ft.prototype and (
+            len(expr.args) < len(ft.params)
+            or len(expr.args) > len(ft.params)
+            and not ft.variadic
+        ):
+            self._error(expr, Error.INVALID_OPERANDS, "wrong number of arguments")
+        args = []
+        for k, arg in enumerate(expr.args):
+            value = self.rvalue(arg)
+            if k < len(ft.params):
+                pt = ft.params[k]
+            elif isinstance(value.type, IntegerType):
+                pt = types.integer_promotion(value.type)
+            else:
+                pt = value.type
+            args.append(self.convert(value, pt, arg).run)
+        invoke = self.invoke
+        if direct is not None:
+            fn = direct
+            if not args:
+                return Value(lambda f: invoke(fn, []), ft.ret)
+            if len(args) == 1:
+                (a,) = args
+                return Value(lambda f: invoke(fn, [a(f)]), ft.ret)
+            return Value(lambda f: invoke(fn, [x(f) for x in args]), ft.ret)
+        functions = self._by_address
+        address = target.run
+
+        def indirect(f):
+            fn = functions.get(address(f))
+            if fn is None:
+                raise InterpreterError("call through an invalid function pointer")
+            return invoke(fn, [x(f) for x in args])
+
+        return Value(indirect, ft.ret)
+
+
+# builtins: the few functions of the C library which snippets need
+
+
+def _printf(interp: Interpreter, format: int, *args: int) -> int:
+    text = interp.read_string(format).decode("latin-1")
+    out = []
+    args = list(args)
+    k = 0
+    while k < len(text):
+        c = text[k]
+        if c != "%":
+            out.append(c)
+            k += 1
+            continue
+        end = k + 1
+        while text[end] in "-+ #0123456789.":
+            end += 1
+        flags = text[k + 1 : end]
+        length = ""
+        while text[end] in "hlzjt":
+            length += text[end]
+            end += 1
+        conversion = text[end]
+        k = end + 1
+        if conversion == "%":
+            out.append("%")
+            continue
+        value = args.pop(0)
+        bits = 64 if length in ("l", "ll", "z", "j", "t") else 32
+        if conversion in "di":
+            value = types.LONG.wrap(value) if bits == 64 else types.INT.wrap(value)
+            out.append(("%" + flags + "d") % value)
+        elif conversion in "uxXo":
+            value &= (1 << bits) - 1
+            spec = "d" if conversion == "u" else conversion
+            out.append(("%" + flags + spec) % value)
+        elif conversion == "c":
+            out.append(("%" + flags + "c") % chr(value & 0xFF))
+        elif conversion == "s":
+            string = interp.read_string(value).decode("latin-1")
+            out.append(("%" + flags + "s") % string)
+        elif conversion == "p":
+            out.append(("%" + flags + "s") % hex(value))
+        else:
+            raise InterpreterError(f"unsupported printf conversion '%{conversion}'")
+    result = "".join(out)
+    (interp.stdout or sys.stdout).write(result)
+    return len(result)
+
+
+def _putchar(interp: Interpreter, c: int) -> int:
+    (interp.stdout or sys.stdout).write(chr(c & 0xFF))
+    return c & 0xFF
+
+
+def _puts(interp: Interpreter, s: int) -> int:
+    (interp.stdout or sys.stdout).write(interp.read_string(s).decode("latin-1") + "\n")
+    return 0
+
+
+def _malloc(interp: Interpreter, size: int) -> int:
+    # memory is never reused, which is fine for short runs
+    return interp.allocate(max(size, 1), 16)
+
+
+def _calloc(interp: Interpreter, count: int, size: int) -> int:
+    return _malloc(interp, count * size)
+
+
+def _free(interp: Interpreter, address: int) -> None:
+    return None
+
+
+def _memset(interp: Interpreter, address: int, c: int, size: int) -> int:
+    interp.memory[address : address + size] = bytes([c & 0xFF]) * size
+    return address
+
+
+def _memcpy(interp: Interpreter, dst: int, src: int, size: int) -> int:
+    interp.memory[dst : dst + size] = interp.memory[src : src + size]
+    return dst
+
+
+def _strlen(interp: Interpreter, s: int) -> int:
+    return interp.memory.index(0, s) - s
+
+
+def _abs(interp: Interpreter, value: int) -> int:
+    return types.INT.wrap(abs(value))
+
+
+def _exit(interp: Interpreter, status: int) -> None:
+    raise Exit(status)
+
+
+def _abort(interp: Interpreter) -> None:
+    raise InterpreterError("abort")
+
+
+BUILTINS: Dict[str, Callable] = {
+    "printf": _printf,
+    "putchar": _putchar,
+    "puts": _puts,
+    "malloc": _malloc,
+    "calloc": _calloc,
+    "free": _free,
+    "memset": _memset,
+    "memmove": _memcpy,
+    "memcpy": _memcpy,
+    "strlen": _strlen,
+    "abs": _abs,
+    "exit": _exit,
+    "abort": _abort,
+}
+
+
+def interpret(decls: Iterable[ast.Decl], reporter: Reporter) -> Interpreter:
+    """Compiles a stream of declarations, such as Parser.iter_declarations(),
+    for running."""
+    return Interpreter(reporter).load(decls)
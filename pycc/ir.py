@@ -0,0 +1,493 @@
+import array
+import dataclasses
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# an absent operand
+NONE = -1
+
+
+class ValueType(IntEnum):
+    VOID = 0
+    I8 = 1
+    I16 = 2
+    I32 = 3
+    I64 = 4
+
+    @property
+    def size(self) -> int:
+        return _SIZES[self]
+
+    @property
+    def bits(self) -> int:
+        return _SIZES[self] * 8
+
+    def wrap(self, value: int, signed: bool = True) -> int:
+        """Reduces ``value`` modulo 2**bits into the signed or unsigned range
+        of this type."""
+        bits = self.bits
+        value &= (1 << bits) - 1
+        if signed and value >> (bits - 1):
+            value -= 1 << bits
+        return value
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+
+_SIZES = {
+    ValueType.VOID: 0,
+    ValueType.I8: 1,
+    ValueType.I16: 2,
+    ValueType.I32: 4,
+    ValueType.I64: 8,
+}
+
+VALUE_TYPES = {1: ValueType.I8, 2: ValueType.I16, 4: ValueType.I32, 8: ValueType.I64}
+
+
+class Op(IntEnum):
+    # a deleted instruction, removed from its block by Function.compact
+    NOP = 0
+    # a: the value, as a signed 64-bit integer
+    CONST = 1
+    # a: the index of the parameter
+    PARAM = 2
+    UNDEF = 3
+    # a, b
+    ADD = 4
+    SUB = 5
+    MUL = 6
+    SDIV = 7
+    UDIV = 8
+    SREM = 9
+    UREM = 10
+    AND = 11
+    OR = 12
+    XOR = 13
+    SHL = 14
+    SAR = 15
+    SHR = 16
+    # a, b; the result is an i32 0 or 1
+    EQ = 17
+    NE = 18
+    SLT = 19
+    SLE = 20
+    SGT = 21
+    SGE = 22
+    ULT = 23
+    ULE = 24
+    UGT = 25
+    UGE = 26
+    # a
+    NEG = 27
+    NOT = 28
+    SEXT = 29
+    ZEXT = 30
+    TRUNC = 31
+    # a: size, b: alignment; the address of a stack slot
+    ALLOCA = 32
+    # a: the index of the name in Function.names; the address of a symbol
+    GLOBAL = 33
+    # a: address
+    LOAD = 34
+    # a: address, b: value
+    STORE = 35
+    # a: callee address, b: start of the arguments in the pool, c: count
+    CALL = 36
+    # b: start of the incoming values in the pool, c: count; one value per
+    # predecessor, in the order of Block.preds
+    PHI = 37
+    # a: target block
+    JUMP = 38
+    # a: condition, b: block if nonzero, c: block if zero
+    BRANCH = 39
+    # a: value, or NONE
+    RET = 40
+
+
+BINARY = frozenset(range(Op.ADD, Op.UGE + 1))
+COMPARISONS = frozenset(range(Op.EQ, Op.UGE + 1))
+UNARY = frozenset({Op.NEG, Op.NOT, Op.SEXT, Op.ZEXT, Op.TRUNC, Op.LOAD})
+TERMINATORS = frozenset({Op.JUMP, Op.BRANCH, Op.RET})
+# instructions which are kept even if their value is unused
+SIDE_EFFECTS = frozenset({Op.STORE, Op.CALL, Op.JUMP, Op.BRANCH, Op.RET})
+
+
+@dataclasses.dataclass(eq=False)
+class Block:
+    id: int
+    # instruction ids in order; phis come first and the terminator last
+    insts: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    preds: List[int] = dataclasses.field(default_factory=list)
+    succs: List[int] = dataclasses.field(default_factory=list)
+    # how many times the block ran in the profile, or -1 if unknown
+    count: int = -1
+
+
+@dataclasses.dataclass(eq=False)
+class Function:
+    """A function in SSA form.
+
+    Every instruction is an index into parallel typed arrays holding its
+    opcode, result type and up to three operands, and an instruction's index
+    is also the name of the value it defines. Operands are value indices,
+    block indices or immediates depending on the opcode; the variable length
+    operands of calls and phis live in ``pool``. A function with 100k
+    instructions takes a few megabytes and no per-instruction objects.
+    """
+
+    name: str
+    params: List[ValueType] = dataclasses.field(default_factory=list)
+    ret: ValueType = ValueType.VOID
+    static: bool = False
+    # declared inline, which makes the inliner more willing
+    inline: bool = False
+    blocks: List[Block] = dataclasses.field(default_factory=list)
+    op: array.array = dataclasses.field(default_factory=lambda: array.array("B"))
+    type: array.array = dataclasses.field(default_factory=lambda: array.array("B"))
+    a: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    b: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    c: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    block_of: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q")
+    )
+    pool: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    # the symbols referred to by GLOBAL instructions
+    names: List[str] = dataclasses.field(default_factory=list)
+    _name_index: Dict[str, int] = dataclasses.field(
+        default_factory=dict, repr=False
+    )
+
+    def __len__(self) -> int:
+        return len(self.op)
+
+    def new_block(self) -> int:
+        block = Block(len(self.blocks))
+        self.blocks.append(block)
+        return block.id
+
+    def name_index(self, name: str) -> int:
+        index = self._name_index.get(name)
+        if index is None:
+            index = self._name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def create(
+        self,
+        block: int,
+        op: Op,
+        t: ValueType = ValueType.VOID,
+        a: int = NONE,
+        b: int = NONE,
+        c: int = NONE,
+    ) -> int:
+        """Creates an instruction belonging to ``block`` without placing it in
+        the block's instruction list."""
+        i = len(self.op)
+        self.op.append(op)
+        self.type.append(t)
+        self.a.append(a)
+        self.b.append(b)
+        self.c.append(c)
+        self.block_of.append(block)
+        return i
+
+    def append(
+        self,
+        block: int,
+        op: Op,
+        t: ValueType = ValueType.VOID,
+        a: int = NONE,
+        b: int = NONE,
+        c: int = NONE,
+    ) -> int:
+        """Appends an instruction to ``block`` and returns its value."""
+        i = self.create(block, op, t, a, b, c)
+        self.blocks[block].insts.append(i)
+        if op == Op.JUMP:
+            self._link(block, a)
+        elif op == Op.BRANCH:
+            self._link(block, b)
+            self._link(block, c)
+        return i
+
+    def append_call(
+        self, block: int, t: ValueType, callee: int, args: Sequence[int]
+    ) -> int:
+        start = len(self.pool)
+        self.pool.extend(args)
+        return self.append(block, Op.CALL, t, callee, start, len(args))
+
+    def insert_phi(self, block: int, t: ValueType) -> int:
+        """Inserts a phi with an undefined incoming value for each predecessor
+        at the start of ``block``."""
+        count = len(self.blocks[block].preds)
+        start = len(self.pool)
+        self.pool.extend([NONE] * count)
+        i = self.create(block, Op.PHI, t, NONE, start, count)
+        self.blocks[block].insts.insert(0, i)
+        return i
+
+    def _link(self, src: int, dst: int) -> None:
+        self.blocks[src].succs.append(dst)
+        self.blocks[dst].preds.append(src)
+
+    def const(self, block: int, t: ValueType, value: int) -> int:
+        # constants are kept sign-extended from their own width so that
+        # equal constants have equal operands
+        return self.append(block, Op.CONST, t, t.wrap(value))
+
+    def remove_edge(self, src: int, dst: int) -> None:
+        """Removes an edge from the successors of ``src``, the predecessors of
+        ``dst`` and the incoming values of the phis in ``dst``. The
+        terminator of ``src`` is left to the caller."""
+        self.blocks[src].succs.remove(dst)
+        preds = self.blocks[dst].preds
+        k = preds.index(src)
+        del preds[k]
+        pool = self.pool
+        for i in self.phis(dst):
+            start = self.b[i]
+            end = start + self.c[i]
+            pool[start + k : end - 1] = pool[start + k + 1 : end]
+            self.c[i] -= 1
+
+    def add_edge(self, src: int, dst: int, like: int) -> None:
+        """Adds an edge from ``src`` to ``dst`` along which the phis in
+        ``dst`` receive the same values as from the predecessor ``like``."""
+        self.blocks[src].succs.append(dst)
+        preds = self.blocks[dst].preds
+        k = preds.index(like)
+        preds.append(src)
+        pool = self.pool
+        for i in self.phis(dst):
+            # the incoming values are moved to the end of the pool
+            start = self.b[i]
+            values = pool[start : start + self.c[i]]
+            values.append(values[k])
+            self.b[i] = len(pool)
+            self.c[i] = len(values)
+            pool.extend(values)
+
+    def retarget(self, block: int, old: int, new: int) -> None:
+        """Makes the terminator of ``block`` jump to ``new`` instead of
+        ``old``. The edges are left to the caller."""
+        i = self.blocks[block].insts[-1]
+        if self.op[i] == Op.JUMP:
+            self.a[i] = new
+        else:
+            if self.b[i] == old:
+                self.b[i] = new
+            if self.c[i] == old:
+                self.c[i] = new
+
+    def phis(self, block: int) -> Iterator[int]:
+        op = self.op
+        for i in self.blocks[block].insts:
+            o = op[i]
+            if o == Op.PHI:
+                yield i
+            elif o != Op.NOP:
+                return
+
+    def instruction_count(self) -> int:
+        return sum(len(block.insts) for block in self.blocks)
+
+    def terminator(self, block: int) -> Optional[int]:
+        insts = self.blocks[block].insts
+        if insts and self.op[insts[-1]] in TERMINATORS:
+            return insts[-1]
+        return None
+
+    def operands(self, i: int) -> List[int]:
+        """Returns the values used by instruction ``i``."""
+        op = self.op[i]
+        if op in BINARY or op == Op.STORE:
+            return [self.a[i], self.b[i]]
+        elif op in UNARY or op == Op.BRANCH:
+            return [self.a[i]]
+        elif op == Op.RET:
+            return [] if self.a[i] == NONE else [self.a[i]]
+        elif op == Op.CALL:
+            start = self.b[i]
+            return [self.a[i], *self.pool[start : start + self.c[i]]]
+        elif op == Op.PHI:
+            start = self.b[i]
+            return list(self.pool[start : start + self.c[i]])
+        return []
+
+    def set_operands(self, i: int, values: Sequence[int]) -> None:
+        """Replaces the values used by instruction ``i``, given in the order
+        returned by ``operands``."""
+        op = self.op[i]
+        if op in BINARY or op == Op.STORE:
+            self.a[i], self.b[i] = values
+        elif op in UNARY or op == Op.BRANCH or op == Op.RET:
+            if values:
+                self.a[i] = values[0]
+        elif op == Op.CALL:
+            self.a[i] = values[0]
+            start = self.b[i]
+            self.pool[start : start + self.c[i]] = array.array("q", values[1:])
+        elif op == Op.PHI:
+            start = self.b[i]
+            self.pool[start : start + self.c[i]] = array.array("q", values)
+
+    def substitute(self, replaced: Dict[int, int]) -> None:
+        """Makes every instruction use the values ``replaced`` maps the
+        values it uses to, following chains of replacements."""
+
+        def resolve(x: int) -> int:
+            while x in replaced:
+                x = replaced[x]
+            return x
+
+        for i in self.instructions():
+            values = self.operands(i)
+            if any(x in replaced for x in values):
+                self.set_operands(i, [resolve(x) for x in values])
+
+    def delete(self, i: int) -> None:
+        """Turns instruction ``i`` into a NOP; ``compact`` removes it."""
+        self.op[i] = Op.NOP
+
+    def compact(self) -> None:
+        op = self.op
+        for block in self.blocks:
+            insts = block.insts
+            if any(op[i] == Op.NOP for i in insts):
+                block.insts = array.array("q", [i for i in insts if op[i] != Op.NOP])
+
+    def instructions(self) -> Iterator[int]:
+        """Yields the live instructions in block order."""
+        op = self.op
+        for block in self.blocks:
+            for i in block.insts:
+                if op[i] != Op.NOP:
+                    yield i
+
+    def remove_blocks(self, keep: Sequence[bool]) -> None:
+        """Removes the blocks whose ``keep`` entry is false and renumbers the
+        rest. Removed blocks must not be jumped to from kept ones; their
+        incoming values are dropped from the phis of the blocks they jumped
+        to."""
+        remap = array.array("q", [NONE] * len(self.blocks))
+        kept = []
+        op = self.op
+        for block in self.blocks:
+            if keep[block.id]:
+                remap[block.id] = len(kept)
+                kept.append(block)
+            else:
+                for i in block.insts:
+                    op[i] = Op.NOP
+        for block in kept:
+            live = [k for k, pred in enumerate(block.preds) if keep[pred]]
+            if len(live) != len(block.preds):
+                for i in block.insts:
+                    if op[i] == Op.PHI:
+                        values = self.operands(i)
+                        start = len(self.pool)
+                        self.pool.extend([values[k] for k in live])
+                        self.b[i] = start
+                        self.c[i] = len(live)
+            block.preds = [remap[block.preds[k]] for k in live]
+            block.succs = [remap[x] for x in block.succs]
+            block.id = remap[block.id]
+            for i in block.insts:
+                self.block_of[i] = block.id
+            if block.insts:
+                last = block.insts[-1]
+                if op[last] == Op.JUMP:
+                    self.a[last] = remap[self.a[last]]
+                elif op[last] == Op.BRANCH:
+                    self.b[last] = remap[self.b[last]]
+                    self.c[last] = remap[self.c[last]]
+        self.blocks = kept
+
+    def remove_unreachable_blocks(self) -> bool:
+        """Removes the blocks which cannot be reached from the entry block and
+        returns whether there were any."""
+        reachable = [False] * len(self.blocks)
+        reachable[0] = True
+        stack = [0]
+        while stack:
+            for succ in self.blocks[stack.pop()].succs:
+                if not reachable[succ]:
+                    reachable[succ] = True
+                    stack.append(succ)
+        if all(reachable):
+            return False
+        self.remove_blocks(reachable)
+        return True
+
+
+@dataclasses.dataclass
+class Global:
+    name: str
+    size: int
+    align: int
+    # None for an object initialized with zeros
+    data: Optional[bytes] = None
+    # (offset, symbol, addend) for every pointer stored in data
+    relocations: List[Tuple[int, str, int]] = dataclasses.field(default_factory=list)
+    readonly: bool = False
+    static: bool = False
+    # a string literal, whose storage may overlap with other literals
+    literal: bool = False
+    # the section, if not the one its contents imply
+    section: Optional[str] = None
+
+
+@dataclasses.dataclass
+class Module:
+    functions: List[Function] = dataclasses.field(default_factory=list)
+    globals: List[Global] = dataclasses.field(default_factory=list)
+
+
+def format_value(fn: Function, value: int) -> str:
+    return "undef" if value == NONE else f"%{value}"
+
+
+def format_instruction(fn: Function, i: int) -> str:
+    op = Op(fn.op[i])
+    t = ValueType(fn.type[i])
+    a = fn.a[i]
+    if op == Op.CONST:
+        args = str(a)
+    elif op == Op.PARAM:
+        args = str(a)
+    elif op == Op.ALLOCA:
+        args = f"{a}, {fn.b[i]}"
+    elif op == Op.GLOBAL:
+        args = "@" + fn.names[a]
+    elif op == Op.JUMP:
+        args = f"b{a}"
+    elif op == Op.BRANCH:
+        args = f"%{a}, b{fn.b[i]}, b{fn.c[i]}"
+    elif op == Op.PHI:
+        preds = fn.blocks[fn.block_of[i]].preds
+        args = ", ".join(
+            f"[b{pred}: {format_value(fn, x)}]"
+            for pred, x in zip(preds, fn.operands(i))
+        )
+    else:
+        args = ", ".join(format_value(fn, x) for x in fn.operands(i))
+    text = f"{op.name.lower()} {args}".rstrip()
+    if t == ValueType.VOID:
+        return text
+    return f"%{i} = {t} {text}"
+
+
+def format_function(fn: Function) -> str:
+    params = ", ".join(str(x) for x in fn.params)
+    lines = [f"function {fn.name}({params}) -> {fn.ret}"]
+    for block in fn.blocks:
+        preds = ", ".join(f"b{x}" for x in block.preds)
+        lines.append(f"b{block.id}:" + (f"  ; preds {preds}" if preds else ""))
+        for i in block.insts:
+            if fn.op[i] != Op.NOP:
+                lines.append("  " + format_instruction(fn, i))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,1062 @@
+import dataclasses
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import ast
+from . import types
+from .constexpr import Constant, ConstantError, Evaluator
+from .error import Error, Reporter, Warning
+from .ir import NONE, VALUE_TYPES, Function, Global, Module, Op, ValueType
+from .ssa import construct_ssa
+from .symtab import Kind, SymbolTable
+from .token import Token
+from .types import ArrayType, FunctionType, IntegerType, PointerType, StructType
+
+
+class LoweringError(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True)
+class Object:
+    type: types.Type
+    # the stack slot of a local variable, or NONE
+    slot: int = NONE
+    # the symbol of a variable with static storage duration
+    name: Optional[str] = None
+
+
+_ARITHMETIC = {
+    Token.PLUS: Op.ADD,
+    Token.MINUS: Op.SUB,
+    Token.STAR: Op.MUL,
+    Token.AMPERSAND: Op.AND,
+    Token.PIPE: Op.OR,
+    Token.CARET: Op.XOR,
+    Token.LESS_THAN_LESS_THAN: Op.SHL,
+}
+
+# (signed, unsigned)
+_SIGNED_ARITHMETIC = {
+    Token.SLASH: (Op.SDIV, Op.UDIV),
+    Token.PERCENT: (Op.SREM, Op.UREM),
+    Token.GREATER_THAN_GREATER_THAN: (Op.SAR, Op.SHR),
+}
+
+_COMPARISONS = {
+    Token.EQUALS_EQUALS: (Op.EQ, Op.EQ),
+    Token.EXCLAMATION_EQUALS: (Op.NE, Op.NE),
+    Token.LESS_THAN: (Op.SLT, Op.ULT),
+    Token.LESS_THAN_EQUALS: (Op.SLE, Op.ULE),
+    Token.GREATER_THAN: (Op.SGT, Op.UGT),
+    Token.GREATER_THAN_EQUALS: (Op.SGE, Op.UGE),
+}
+
+_COMPOUND_ASSIGNMENT = {
+    Token.PLUS_EQUALS: Token.PLUS,
+    Token.MINUS_EQUALS: Token.MINUS,
+    Token.STAR_EQUALS: Token.STAR,
+    Token.SLASH_EQUALS: Token.SLASH,
+    Token.PERCENT_EQUALS: Token.PERCENT,
+    Token.LESS_THAN_LESS_THAN_EQUALS: Token.LESS_THAN_LESS_THAN,
+    Token.GREATER_THAN_GREATER_THAN_EQUALS: Token.GREATER_THAN_GREATER_THAN,
+    Token.AMPERSAND_EQUALS: Token.AMPERSAND,
+    Token.PIPE_EQUALS: Token.PIPE,
+    Token.CARET_EQUALS: Token.CARET,
+}
+
+_SIZE_T = types.UNSIGNED_LONG
+_PTRDIFF_T = types.LONG
+
+
+def encode_string(text: str) -> bytes:
+    """Returns the bytes of a decoded string literal: code points below 256
+    are bytes, as written with octal and hexadecimal escapes, and anything
+    else is UTF-8."""
+    if all(ord(c) < 256 for c in text):
+        return text.encode("latin-1")
+    return text.encode("utf-8", "surrogatepass")
+
+
+def _decay(t: types.Type) -> types.Type:
+    if isinstance(t, ArrayType):
+        return PointerType(t.base)
+    if isinstance(t, FunctionType):
+        return PointerType(t)
+    return t
+
+
+def _strip(expr: ast.Expr) -> ast.Expr:
+    while isinstance(expr, ast.ParenExpr):
+        expr = expr.expr
+    return expr
+
+
+@dataclasses.dataclass
+class Scope:
+    """The targets of the statements which jump within a function."""
+
+    break_block: int = NONE
+    continue_block: int = NONE
+    # (value, block) of each case label and the default label's block
+    cases: Optional[List[Tuple[int, int]]] = None
+    default_block: int = NONE
+    switch_type: Optional[IntegerType] = None
+
+
+@dataclasses.dataclass
+class Lowering:
+    """Lowers declarations to a Module of functions in SSA form.
+
+    Every local variable lives in a stack slot while a function is lowered,
+    so that lvalues are simply addresses, and ``construct_ssa`` then promotes
+    the slots whose address is not taken. An error abandons the function
+    being lowered, which is left out of the module.
+    """
+
+    reporter: Reporter
+    module: Module = dataclasses.field(default_factory=Module)
+    symbols: SymbolTable = dataclasses.field(default_factory=SymbolTable)
+    evaluator: Evaluator = dataclasses.field(init=False)
+    fn: Optional[Function] = dataclasses.field(default=None, init=False)
+    block: int = dataclasses.field(default=NONE, init=False)
+    _globals: Dict[str, Global] = dataclasses.field(default_factory=dict, init=False)
+    # the symbol of every distinct string literal
+    _strings: Dict[str, str] = dataclasses.field(default_factory=dict, init=False)
+    # the literals already in the module, numbered before the new ones
+    _string_base: int = dataclasses.field(default=0, init=False)
+    _statics: int = dataclasses.field(default=0, init=False)
+    _scope: Scope = dataclasses.field(default_factory=Scope, init=False)
+    _labels: Dict[str, Tuple[int, Optional[ast.Node]]] = dataclasses.field(
+        default_factory=dict, init=False
+    )
+    _return_type: types.Type = dataclasses.field(default=types.VOID, init=False)
+
+    def __post_init__(self):
+        self.evaluator = Evaluator(self.reporter, resolve=self._resolve_constant)
+        self._string_base = sum(1 for g in self.module.globals if g.literal)
+
+    def _resolve_constant(self, name: str) -> Optional[Constant]:
+        symbol = self.symbols.lookup(name)
+        if symbol is not None and symbol.kind == Kind.ENUMERATOR:
+            return symbol.decl
+        return None
+
+    def _error(
+        self, node: ast.Node, error: Error, message: Optional[str] = None
+    ) -> None:
+        self.reporter.error(node.start, error, message)
+        raise LoweringError(message or error.value)
+
+    def _constant(self, expr: ast.Expr) -> Constant:
+        try:
+            return self.evaluator.evaluate(expr)
+        except ConstantError as e:
+            raise LoweringError(str(e))
+
+    def value_type(self, t: types.Type, node: ast.Node) -> ValueType:
+        if isinstance(t, types.VoidType):
+            return ValueType.VOID
+        if isinstance(t, (IntegerType, PointerType)):
+            return VALUE_TYPES[t.size]
+        if isinstance(t, (ArrayType, FunctionType)):
+            return ValueType.I64
+        self._error(node, Error.UNSUPPORTED, f"values of type '{t}' are not supported")
+
+    # declarations
+
+    def lower(self, decls: Iterable[ast.Decl]) -> Module:
+        for decl in decls:
+            self.lower_decl(decl)
+        return self.module
+
+    def lower_decl(self, decl: ast.Decl) -> None:
+        try:
+            if isinstance(decl, ast.FunctionDecl):
+                self.symbols.declare(decl.name, Kind.FUNCTION, decl.type)
+                if decl.body is not None:
+                    self.lower_function(decl)
+            elif isinstance(decl, ast.VarDecl):
+                static = decl.storage == Token.STATIC
+                self.symbols.declare(
+                    decl.name, Kind.OBJECT, Object(decl.type, name=decl.name)
+                )
+                if decl.storage != Token.EXTERN or decl.init is not None:
+                    self._define_global(decl, decl.name, static)
+            elif isinstance(decl, ast.EnumDecl):
+                self._declare_enumerators(decl)
+        except LoweringError:
+            pass
+
+    def _declare_enumerators(self, decl: ast.EnumDecl) -> None:
+        for constant in decl.constants:
+            self.symbols.declare(
+                constant.name, Kind.ENUMERATOR, Constant(types.INT, constant.value)
+            )
+
+    def _define_global(self, decl: ast.VarDecl, name: str, static: bool) -> None:
+        t = decl.type
+        if isinstance(t, FunctionType) or not (t.is_complete or decl.init is None):
+            self._error(decl, Error.UNSUPPORTED, f"variable has incomplete type '{t}'")
+        g = self._globals.get(name)
+        if g is None:
+            size = t.size if t.is_complete else 0
+            g = Global(name, size, t.align, static=static)
+            self._globals[name] = g
+            self.module.globals.append(g)
+        if decl.init is not None:
+            data = bytearray(t.size)
+            g.relocations = []
+            for offset, member, init in self._initializers(t, decl.init, 0):
+                self._constant_initializer(g, data, offset, member, init)
+            g.data = bytes(data)
+
+    def _string(self, value: str) -> str:
+        name = self._strings.get(value)
+        if name is None:
+            number = self._string_base + len(self._strings)
+            name = self._strings[value] = f".L.str.{number}"
+            data = encode_string(value) + b"\0"
+            g = Global(name, len(data), 1, data, readonly=True, static=True)
+            g.literal = True
+            self.module.globals.append(g)
+        return name
+
+    def _initializers(
+        self, t: types.Type, init: ast.Expr, offset: int
+    ) -> Iterator[Tuple[int, types.Type, ast.Expr]]:
+        """Yields the offset, type and expression of every scalar initialized
+        by ``init``, and of character arrays initialized by a string. Nested
+        aggregates must be braced."""
+        init = _strip(init)
+        if isinstance(t, ArrayType) and isinstance(init, ast.StringConstant):
+            yield offset, t, init
+            return
+        if not isinstance(init, ast.InitListExpr):
+            if isinstance(t, (ArrayType, StructType)):
+                self._error(init, Error.UNSUPPORTED, "initializer must be braced")
+            yield offset, t, init
+            return
+        if not isinstance(t, (ArrayType, StructType)):
+            if init.inits:
+                yield from self._initializers(t, init.inits[0], offset)
+            return
+        position = 0
+        for item in init.inits:
+            if isinstance(item, ast.DesignatedInitExpr):
+                if len(item.designators) != 1:
+                    self._error(item, Error.UNSUPPORTED, "nested designators")
+                designator = item.designators[0]
+                if isinstance(t, ArrayType) and designator.index is not None:
+                    position = self._constant(designator.index).value
+                elif isinstance(t, StructType) and designator.field is not None:
+                    names = [name for name, _ in t.fields]
+                    if designator.field not in names:
+                        self._error(
+                            designator,
+                            Error.INVALID_OPERANDS,
+                            f"no member named '{designator.field}' in '{t}'",
+                        )
+                    position = names.index(designator.field)
+                else:
+                    self._error(designator, Error.INVALID_OPERANDS, "bad designator")
+                item = item.init
+            if isinstance(t, ArrayType):
+                if t.length is not None and position >= t.length:
+                    self._error(item, Error.INVALID_OPERANDS, "excess elements")
+                member, member_offset = t.base, position * t.base.size
+            else:
+                if position >= len(t.fields):
+                    self._error(item, Error.INVALID_OPERANDS, "excess elements")
+                if t.widths[position] is not None:
+                    message = "bit-field members are not supported"
+                    self._error(item, Error.UNSUPPORTED, message)
+                member, member_offset = t.fields[position][1], t.offsets[position]
+            yield from self._initializers(member, item, offset + member_offset)
+            position += 1
+
+    def _constant_initializer(
+        self,
+        g: Global,
+        data: bytearray,
+        offset: int,
+        t: types.Type,
+        init: ast.Expr,
+    ) -> None:
+        if isinstance(t, ArrayType):
+            value = encode_string(init.value) + b"\0"
+            size = t.size if t.is_complete else len(value)
+            data[offset : offset + size] = value[:size].ljust(size, b"\0")
+            return
+        if isinstance(t, PointerType):
+            address = self._address_constant(init)
+            if address is not None:
+                g.relocations.append((offset, *address))
+                return
+        if not isinstance(t, (IntegerType, PointerType)):
+            self._error(init, Error.UNSUPPORTED, f"initializer of type '{t}'")
+        value = self._constant(init).value
+        if t == types.BOOL:
+            value = int(value != 0)
+        data[offset : offset + t.size] = (value % (1 << (t.size * 8))).to_bytes(
+            t.size, "little"
+        )
+
+    def _address_constant(self, expr: ast.Expr) -> Optional[Tuple[str, int]]:
+        """Returns the symbol and addend of an address constant."""
+        expr = _strip(expr)
+        while isinstance(expr, ast.CastExpr):
+            expr = _strip(expr.expr)
+        if isinstance(expr, ast.StringConstant):
+            return self._string(expr.value), 0
+        if isinstance(expr, ast.UnaryExpr) and expr.op == Token.AMPERSAND:
+            operand = _strip(expr.operand)
+            if isinstance(operand, ast.RefDeclExpr):
+                return self._static_symbol(operand, decays=False)
+        if isinstance(expr, ast.RefDeclExpr):
+            return self._static_symbol(expr, decays=True)
+        if isinstance(expr, ast.BinaryExpr) and expr.op in (Token.PLUS, Token.MINUS):
+            base = self._address_constant(expr.left)
+            if base is not None:
+                t = self._static_type(expr.left)
+                scale = t.base.size if isinstance(t, PointerType) else 1
+                addend = self._constant(expr.right).value * scale
+                if expr.op == Token.MINUS:
+                    addend = -addend
+                return base[0], base[1] + addend
+        return None
+
+    def _static_symbol(self, expr: ast.RefDeclExpr, decays: bool):
+        symbol = self.symbols.lookup(expr.name)
+        if symbol is None:
+            return None
+        if symbol.kind == Kind.FUNCTION:
+            return expr.name, 0
+        if symbol.kind == Kind.OBJECT and symbol.decl.name is not None:
+            if not decays or isinstance(symbol.decl.type, ArrayType):
+                return symbol.decl.name, 0
+        return None
+
+    def _static_type(self, expr: ast.Expr) -> types.Type:
+        expr = _strip(expr)
+        if isinstance(expr, ast.StringConstant):
+            return PointerType(types.CHAR)
+        if isinstance(expr, ast.CastExpr):
+            return expr.type
+        if isinstance(expr, ast.RefDeclExpr):
+            return _decay(self.symbols.lookup(expr.name).decl.type)
+        if isinstance(expr, ast.UnaryExpr):
+            operand = _strip(expr.operand)
+            symbol = self.symbols.lookup(operand.name)
+            return PointerType(symbol.decl.type)
+        return types.INT
+
+    # functions
+
+    def lower_function(self, decl: ast.FunctionDecl) -> None:
+        t = decl.type
+        params = [self.value_type(p.type, p) for p in decl.params]
+        fn = Function(
+            decl.name,
+            params,
+            self.value_type(t.ret, decl),
+            static=decl.storage == Token.STATIC,
+            inline=decl.inline,
+        )
+        self.fn = fn
+        entry = fn.new_block()
+        body = fn.new_block()
+        self.block = body
+        self._scope = Scope()
+        self._labels = {}
+        self._return_type = t.ret
+        self.symbols.push_scope()
+        try:
+            for index, (param, vt) in enumerate(zip(decl.params, params)):
+                slot = self._alloca(param.type)
+                value = fn.append(entry, Op.PARAM, vt, index)
+                fn.append(entry, Op.STORE, a=slot, b=value)
+                if param.name is not None:
+                    obj = Object(param.type, slot)
+                    self.symbols.declare(param.name, Kind.OBJECT, obj)
+            self.lower_stmt(decl.body)
+            for name, (_, node) in self._labels.items():
+                if node is not None:
+                    message = f"use of undeclared label '{name}'"
+                    self._error(node, Error.UNDECLARED_LABEL, message)
+            # falling off the end returns 0, which main must do
+            if fn.ret == ValueType.VOID:
+                self._emit(Op.RET)
+            else:
+                self._emit(Op.RET, a=fn.const(self.block, fn.ret, 0))
+            fn.append(entry, Op.JUMP, a=body)
+        finally:
+            self.symbols.pop_scope()
+            self.fn = None
+        construct_ssa(fn)
+        self.module.functions.append(fn)
+
+    def _alloca(self, t: types.Type) -> int:
+        return self.fn.append(0, Op.ALLOCA, ValueType.I64, t.size, t.align)
+
+    def _emit(
+        self,
+        op: Op,
+        t: ValueType = ValueType.VOID,
+        a: int = NONE,
+        b: int = NONE,
+        c: int = NONE,
+    ) -> int:
+        i = self.fn.append(self.block, op, t, a, b, c)
+        if op == Op.JUMP or op == Op.BRANCH or op == Op.RET:
+            # code after a jump is unreachable until the next label
+            self.block = self.fn.new_block()
+        return i
+
+    def _start(self, block: int) -> None:
+        """Falls through from the current block into ``block``."""
+        self._emit(Op.JUMP, a=block)
+        self.block = block
+
+    def _const(self, t: types.Type, value: int) -> int:
+        return self.fn.const(self.block, VALUE_TYPES[t.size], value)
+
+    # statements
+
+    def lower_stmt(self, stmt: ast.Stmt) -> None:
+        method = getattr(self, "_lower_" + type(stmt).__name__, None)
+        if method is None:
+            self._error(stmt, Error.UNSUPPORTED)
+        method(stmt)
+
+    def _lower_CompoundStmt(self, stmt: ast.CompoundStmt) -> None:
+        self.symbols.push_scope()
+        try:
+            for x in stmt.stmts:
+                self.lower_stmt(x)
+        finally:
+            self.symbols.pop_scope()
+
+    def _lower_NullStmt(self, stmt: ast.NullStmt) -> None:
+        pass
+
+    def _lower_ExprStmt(self, stmt: ast.ExprStmt) -> None:
+        self.rvalue(stmt.expr)
+
+    def _lower_DeclStmt(self, stmt: ast.DeclStmt) -> None:
+        for decl in stmt.decls:
+            if isinstance(decl, ast.VarDecl):
+                self._lower_local(decl)
+            elif isinstance(decl, ast.FunctionDecl):
+                self.symbols.declare(decl.name, Kind.FUNCTION, decl.type)
+            elif isinstance(decl, ast.EnumDecl):
+                self._declare_enumerators(decl)
+
+    def _lower_local(self, decl: ast.VarDecl) -> None:
+        t = decl.type
+        if decl.storage == Token.EXTERN:
+            self.symbols.declare(decl.name, Kind.OBJECT, Object(t, name=decl.name))
+            return
+        if decl.storage == Token.STATIC:
+            name = f"{self.fn.name}.{decl.name}.{self._statics}"
+            self._statics += 1
+            self.symbols.declare(decl.name, Kind.OBJECT, Object(t, name=name))
+            self._define_global(decl, name, True)
+            return
+        if not t.is_complete:
+            self._error(decl, Error.UNSUPPORTED, f"variable has incomplete type '{t}'")
+        slot = self._alloca(t)
+        self.symbols.declare(decl.name, Kind.OBJECT, Object(t, slot))
+        if decl.init is None:
+            return
+        if isinstance(t, (ArrayType, StructType)):
+            # zero the object, then store the elements which are given
+            memset = self._emit(
+                Op.GLOBAL, ValueType.I64, self.fn.name_index("memset")
+            )
+            args = [slot, self._const(types.INT, 0), self._const(_SIZE_T, t.size)]
+            self.fn.append_call(self.block, ValueType.I64, memset, args)
+        for offset, member, init in self._initializers(t, decl.init, 0):
+            address = self._offset(slot, offset)
+            if isinstance(member, ArrayType):
+                data = encode_string(init.value) + b"\0"
+                for k, byte in enumerate(data[: member.size or len(data)]):
+                    if byte:
+                        self._store(self._offset(address, k), types.CHAR, byte, False)
+                continue
+            value, vt = self.rvalue(init)
+            self._store(address, member, self.convert(value, vt, member, init))
+
+    def _offset(self, address: int, offset: int) -> int:
+        if offset == 0:
+            return address
+        return self._emit(Op.ADD, ValueType.I64, address, self._const(_SIZE_T, offset))
+
+    def _store(
+        self, address: int, t: types.Type, value: int, is_value: bool = True
+    ) -> None:
+        if not is_value:
+            value = self._const(t, value)
+        self._emit(Op.STORE, a=address, b=value)
+
+    def _lower_IfStmt(self, stmt: ast.IfStmt) -> None:
+        then = self.fn.new_block()
+        end = self.fn.new_block()
+        otherwise = self.fn.new_block() if stmt.otherwise is not None else end
+        self.branch(stmt.cond, then, otherwise)
+        self.block = then
+        self.lower_stmt(stmt.then)
+        self._emit(Op.JUMP, a=end)
+        if stmt.otherwise is not None:
+            self.block = otherwise
+            self.lower_stmt(stmt.otherwise)
+            self._emit(Op.JUMP, a=end)
+        self.block = end
+
+    def _loop(self, body: ast.Stmt, break_block: int, continue_block: int) -> None:
+        outer = self._scope
+        self._scope = dataclasses.replace(
+            outer, break_block=break_block, continue_block=continue_block
+        )
+        try:
+            self.lower_stmt(body)
+        finally:
+            self._scope = outer
+
+    def _lower_WhileStmt(self, stmt: ast.WhileStmt) -> None:
+        cond = self.fn.new_block()
+        body = self.fn.new_block()
+        end = self.fn.new_block()
+        self._start(cond)
+        self.branch(stmt.cond, body, end)
+        self.block = body
+        self._loop(stmt.body, end, cond)
+        self._emit(Op.JUMP, a=cond)
+        self.block = end
+
+    def _lower_DoStmt(self, stmt: ast.DoStmt) -> None:
+        body = self.fn.new_block()
+        cond = self.fn.new_block()
+        end = self.fn.new_block()
+        self._start(body)
+        self._loop(stmt.body, end, cond)
+        self._start(cond)
+        self.branch(stmt.cond, body, end)
+        self.block = end
+
+    def _lower_ForStmt(self, stmt: ast.ForStmt) -> None:
+        self.symbols.push_scope()
+        try:
+            if stmt.init is not None:
+                self.lower_stmt(stmt.init)
+            cond = self.fn.new_block()
+            body = self.fn.new_block()
+            step = self.fn.new_block()
+            end = self.fn.new_block()
+            self._start(cond)
+            if stmt.cond is not None:
+                self.branch(stmt.cond, body, end)
+            else:
+                self._emit(Op.JUMP, a=body)
+            self.block = body
+            self._loop(stmt.body, end, step)
+            self._start(step)
+            if stmt.step is not None:
+                self.rvalue(stmt.step)
+            self._emit(Op.JUMP, a=cond)
+            self.block = end
+        finally:
+            self.symbols.pop_scope()
+
+    def _lower_SwitchStmt(self, stmt: ast.SwitchStmt) -> None:
+        value, t = self.rvalue(stmt.cond)
+        if not isinstance(t, IntegerType):
+            self._error(stmt.cond, Error.INVALID_OPERANDS, "switch on a non-integer")
+        promoted = types.integer_promotion(t)
+        value = self.convert(value, t, promoted, stmt.cond)
+        t = promoted
+        dispatch = self.fn.new_block()
+        end = self.fn.new_block()
+        self._emit(Op.JUMP, a=dispatch)
+        outer = self._scope
+        self._scope = dataclasses.replace(
+            outer, break_block=end, cases=[], default_block=NONE, switch_type=t
+        )
+        try:
+            self.lower_stmt(stmt.body)
+            scope = self._scope
+        finally:
+            self._scope = outer
+        self._emit(Op.JUMP, a=end)
+        # compare against each case in turn
+        self.block = dispatch
+        vt = VALUE_TYPES[t.size]
+        for case, target in scope.cases:
+            constant = self.fn.const(dispatch, vt, case)
+            cond = self._emit(Op.EQ, ValueType.I32, value, constant)
+            next_block = self.fn.new_block()
+            self._emit(Op.BRANCH, a=cond, b=target, c=next_block)
+            self.block = dispatch = next_block
+        default = scope.default_block if scope.default_block != NONE else end
+        self._emit(Op.JUMP, a=default)
+        self.block = end
+
+    def _lower_CaseStmt(self, stmt: ast.CaseStmt) -> None:
+        if self._scope.cases is None:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'case' statement not in switch statement",
+            )
+        value = self._scope.switch_type.wrap(self._constant(stmt.expr).value)
+        block = self.fn.new_block()
+        self._scope.cases.append((value, block))
+        self._start(block)
+        self.lower_stmt(stmt.stmt)
+
+    def _lower_DefaultStmt(self, stmt: ast.DefaultStmt) -> None:
+        if self._scope.cases is None:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'default' statement not in switch statement",
+            )
+        block = self.fn.new_block()
+        self._scope.default_block = block
+        self._start(block)
+        self.lower_stmt(stmt.stmt)
+
+    def _lower_BreakStmt(self, stmt: ast.BreakStmt) -> None:
+        if self._scope.break_block == NONE:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'break' statement not in loop or switch statement",
+            )
+        self._emit(Op.JUMP, a=self._scope.break_block)
+
+    def _lower_ContinueStmt(self, stmt: ast.ContinueStmt) -> None:
+        if self._scope.continue_block == NONE:
+            self._error(
+                stmt,
+                Error.MISPLACED_STATEMENT,
+                "'continue' statement not in loop statement",
+            )
+        self._emit(Op.JUMP, a=self._scope.continue_block)
+
+    def _lower_ReturnStmt(self, stmt: ast.ReturnStmt) -> None:
+        if stmt.expr is None:
+            if self.fn.ret != ValueType.VOID:
+                self._emit(Op.RET, a=self.fn.const(self.block, self.fn.ret, 0))
+            else:
+                self._emit(Op.RET)
+            return
+        value, t = self.rvalue(stmt.expr)
+        value = self.convert(value, t, self._return_type, stmt.expr)
+        self._emit(Op.RET, a=value)
+
+    def _label(self, name: str, node: Optional[ast.Node]) -> int:
+        """Returns the block of a label; ``node`` is the first goto to a
+        label which is not defined yet."""
+        entry = self._labels.get(name)
+        if entry is None:
+            entry = self._labels[name] = (self.fn.new_block(), node)
+        return entry[0]
+
+    def _lower_GotoStmt(self, stmt: ast.GotoStmt) -> None:
+        self._emit(Op.JUMP, a=self._label(stmt.label, stmt))
+
+    def _lower_LabelStmt(self, stmt: ast.LabelStmt) -> None:
+        block = self._label(stmt.name, None)
+        self._labels[stmt.name] = (block, None)
+        self._start(block)
+        self.lower_stmt(stmt.stmt)
+
+    # expressions
+
+    def branch(self, expr: ast.Expr, then: int, otherwise: int) -> None:
+        """Jumps to ``then`` if ``expr`` is nonzero and to ``otherwise`` if
+        not, short-circuiting ``&&``, ``||`` and ``!``."""
+        expr = _strip(expr)
+        if isinstance(expr, ast.BinaryExpr) and expr.op in (
+            Token.AMPERSAND_AMPERSAND,
+            Token.PIPE_PIPE,
+        ):
+            right = self.fn.new_block()
+            if expr.op == Token.AMPERSAND_AMPERSAND:
+                self.branch(expr.left, right, otherwise)
+            else:
+                self.branch(expr.left, then, right)
+            self.block = right
+            self.branch(expr.right, then, otherwise)
+            return
+        if isinstance(expr, ast.UnaryExpr) and expr.op == Token.EXCLAMATION:
+            self.branch(expr.operand, otherwise, then)
+            return
+        value, t = self.rvalue(expr)
+        if not t.is_scalar:
+            self._error(expr, Error.INVALID_OPERANDS, "condition is not a scalar")
+        self._emit(Op.BRANCH, a=value, b=then, c=otherwise)
+
+    def rvalue(self, expr: ast.Expr) -> Tuple[int, types.Type]:
+        """Emits the code computing ``expr`` and returns its value and type.
+        Arrays and functions decay to pointers."""
+        method = getattr(self, "_rvalue_" + type(expr).__name__, None)
+        if method is not None:
+            return method(expr)
+        address, t = self.lvalue(expr)
+        return self._load(address, t, expr)
+
+    def _load(self, address: int, t: types.Type, node: ast.Node):
+        if isinstance(t, (ArrayType, FunctionType)):
+            return address, _decay(t)
+        if isinstance(t, StructType):
+            self._error(node, Error.UNSUPPORTED, "struct values are not supported")
+        return self._emit(Op.LOAD, self.value_type(t, node), address), t
+
+    def lvalue(self, expr: ast.Expr) -> Tuple[int, types.Type]:
+        """Emits the code computing the address of ``expr`` and returns it with
+        the type of the object."""
+        expr = _strip(expr)
+        if isinstance(expr, ast.RefDeclExpr):
+            symbol = self._lookup(expr)
+            if symbol.kind == Kind.FUNCTION:
+                index = self.fn.name_index(expr.name)
+                return self._emit(Op.GLOBAL, ValueType.I64, index), symbol.decl
+            if symbol.kind == Kind.OBJECT:
+                obj = symbol.decl
+                if obj.slot != NONE:
+                    return obj.slot, obj.type
+                index = self.fn.name_index(obj.name)
+                return self._emit(Op.GLOBAL, ValueType.I64, index), obj.type
+        elif isinstance(expr, ast.UnaryExpr) and expr.op == Token.STAR:
+            value, t = self.rvalue(expr.operand)
+            if not isinstance(t, PointerType):
+                message = "indirection requires pointer operand"
+                self._error(expr, Error.INVALID_OPERANDS, message)
+            return value, t.base
+        elif isinstance(expr, ast.SubscriptExpr):
+            base, bt = self.rvalue(expr.base)
+            index, it = self.rvalue(expr.index)
+            value, t = self._arithmetic(Token.PLUS, base, bt, index, it, expr)
+            if not isinstance(t, PointerType):
+                self._error(expr, Error.INVALID_OPERANDS, "subscript of non-pointer")
+            return value, t.base
+        elif isinstance(expr, ast.MemberExpr):
+            if expr.arrow:
+                base, t = self.rvalue(expr.base)
+                t = t.base if isinstance(t, PointerType) else None
+            else:
+                base, t = self.lvalue(expr.base)
+            if not isinstance(t, StructType) or not t.is_complete:
+                self._error(expr, Error.INVALID_OPERANDS, "member of non-struct")
+            member = t.field(expr.name)
+            if member is None:
+                message = f"no member named '{expr.name}' in '{t}'"
+                self._error(expr, Error.INVALID_OPERANDS, message)
+            if t.bit_width(expr.name) is not None:
+                message = "bit-field members are not supported"
+                self._error(expr, Error.UNSUPPORTED, message)
+            return self._offset(base, member[1]), member[0]
+        elif isinstance(expr, ast.StringConstant):
+            index = self.fn.name_index(self._string(expr.value))
+            t = ArrayType(types.CHAR, len(encode_string(expr.value)) + 1)
+            return self._emit(Op.GLOBAL, ValueType.I64, index), t
+        self._error(expr, Error.NOT_ASSIGNABLE)
+
+    def _lookup(self, expr: ast.RefDeclExpr):
+        symbol = self.symbols.lookup(expr.name)
+        if symbol is None or symbol.kind == Kind.TYPEDEF:
+            self._error(
+                expr,
+                Error.UNDECLARED_IDENTIFIER,
+                f"use of undeclared identifier '{expr.name}'",
+            )
+        return symbol
+
+    def convert(
+        self, value: int, src: types.Type, dst: types.Type, node: ast.Node
+    ) -> int:
+        if isinstance(dst, types.VoidType):
+            return NONE
+        if dst == types.BOOL and src != types.BOOL:
+            vt = self.value_type(src, node)
+            zero = self.fn.const(self.block, vt, 0)
+            cond = self._emit(Op.NE, ValueType.I32, value, zero)
+            return self._emit(Op.TRUNC, ValueType.I8, cond)
+        if not dst.is_scalar or not src.is_scalar:
+            message = f"cannot convert '{src}' to '{dst}'"
+            self._error(node, Error.INVALID_OPERANDS, message)
+        s = self.value_type(src, node)
+        d = self.value_type(dst, node)
+        if s == d:
+            return value
+        if d.size < s.size:
+            return self._emit(Op.TRUNC, d, value)
+        if isinstance(src, IntegerType) and src.signed:
+            return self._emit(Op.SEXT, d, value)
+        return self._emit(Op.ZEXT, d, value)
+
+    def _rvalue_ParenExpr(self, expr: ast.ParenExpr):
+        return self.rvalue(expr.expr)
+
+    def _rvalue_IntegerConstant(self, expr: ast.IntegerConstant):
+        constant = self._constant(expr)
+        return self._const(constant.type, constant.value), constant.type
+
+    def _rvalue_CharacterConstant(self, expr: ast.CharacterConstant):
+        constant = self._constant(expr)
+        return self._const(types.INT, constant.value), types.INT
+
+    def _rvalue_FloatingConstant(self, expr: ast.FloatingConstant):
+        self._error(expr, Error.UNSUPPORTED, "floating point is not supported")
+
+    def _rvalue_RefDeclExpr(self, expr: ast.RefDeclExpr):
+        symbol = self._lookup(expr)
+        if symbol.kind == Kind.ENUMERATOR:
+            return self._const(types.INT, symbol.decl.value), types.INT
+        address, t = self.lvalue(expr)
+        return self._load(address, t, expr)
+
+    def _rvalue_SizeofExpr(self, expr: ast.SizeofExpr):
+        t = expr.type
+        if t is None:
+            # the operand is not evaluated: lower it into a block of its own,
+            # which is unreachable, only to find its type
+            block = self.block
+            self.block = self.fn.new_block()
+            try:
+                t = self._type_of(expr.operand)
+            finally:
+                self.block = block
+        if not t.is_complete or isinstance(t, FunctionType):
+            self._error(expr, Error.INVALID_OPERANDS, f"sizeof incomplete type '{t}'")
+        value = t.size if expr.op == Token.SIZEOF else t.align
+        return self._const(_SIZE_T, value), _SIZE_T
+
+    def _type_of(self, expr: ast.Expr) -> types.Type:
+        """Returns the type of ``expr`` before arrays and functions decay."""
+        expr = _strip(expr)
+        if isinstance(expr, ast.RefDeclExpr):
+            symbol = self._lookup(expr)
+            if symbol.kind == Kind.FUNCTION:
+                return symbol.decl
+            if symbol.kind == Kind.OBJECT:
+                return symbol.decl.type
+        elif isinstance(expr, (ast.StringConstant, ast.SubscriptExpr, ast.MemberExpr)):
+            return self.lvalue(expr)[1]
+        elif isinstance(expr, ast.UnaryExpr) and expr.op == Token.STAR:
+            return self.lvalue(expr)[1]
+        return self.rvalue(expr)[1]
+
+    def _rvalue_CastExpr(self, expr: ast.CastExpr):
+        value, t = self.rvalue(expr.expr)
+        return self.convert(value, t, expr.type, expr), expr.type
+
+    def _rvalue_UnaryExpr(self, expr: ast.UnaryExpr):
+        op = expr.op
+        if op == Token.AMPERSAND:
+            address, t = self.lvalue(expr.operand)
+            return address, PointerType(t)
+        if op == Token.STAR:
+            address, t = self.lvalue(expr)
+            return self._load(address, t, expr)
+        if op in (Token.PLUS_PLUS, Token.MINUS_MINUS):
+            return self._increment(expr.operand, op, prefix=True)
+        value, t = self.rvalue(expr.operand)
+        if op == Token.EXCLAMATION:
+            zero = self.fn.const(self.block, self.value_type(t, expr), 0)
+            return self._emit(Op.EQ, ValueType.I32, value, zero), types.INT
+        if not isinstance(t, IntegerType):
+            self._error(expr, Error.INVALID_OPERANDS, f"invalid argument type '{t}'")
+        promoted = types.integer_promotion(t)
+        value = self.convert(value, t, promoted, expr)
+        vt = VALUE_TYPES[promoted.size]
+        if op == Token.MINUS:
+            return self._emit(Op.NEG, vt, value), promoted
+        if op == Token.TILDE:
+            return self._emit(Op.NOT, vt, value), promoted
+        return value, promoted
+
+    def _rvalue_PostfixExpr(self, expr: ast.PostfixExpr):
+        return self._increment(expr.operand, expr.op, prefix=False)
+
+    def _increment(self, operand: ast.Expr, op: Token, prefix: bool):
+        address, t = self.lvalue(operand)
+        old, t = self._load(address, t, operand)
+        one = self._const(types.INT, 1)
+        arithmetic = Token.PLUS if op == Token.PLUS_PLUS else Token.MINUS
+        new, nt = self._arithmetic(arithmetic, old, t, one, types.INT, operand)
+        new = self.convert(new, nt, t, operand)
+        self._store(address, t, new)
+        return (new if prefix else old), t
+
+    def _rvalue_BinaryExpr(self, expr: ast.BinaryExpr):
+        op = expr.op
+        if op == Token.COMMA:
+            self.rvalue(expr.left)
+            return self.rvalue(expr.right)
+        if op == Token.EQUALS:
+            address, t = self.lvalue(expr.left)
+            value, vt = self.rvalue(expr.right)
+            value = self.convert(value, vt, t, expr)
+            self._store(address, t, value)
+            return value, t
+        if op in _COMPOUND_ASSIGNMENT:
+            address, t = self.lvalue(expr.left)
+            old, ot = self._load(address, t, expr.left)
+            right, rt = self.rvalue(expr.right)
+            arithmetic = _COMPOUND_ASSIGNMENT[op]
+            new, nt = self._arithmetic(arithmetic, old, ot, right, rt, expr)
+            new = self.convert(new, nt, t, expr)
+            self._store(address, t, new)
+            return new, t
+        if op in (Token.AMPERSAND_AMPERSAND, Token.PIPE_PIPE):
+            return self._logical(expr)
+        left, lt = self.rvalue(expr.left)
+        right, rt = self.rvalue(expr.right)
+        return self._arithmetic(op, left, lt, right, rt, expr)
+
+    def _logical(self, expr: ast.Expr):
+        # the result goes through a stack slot, which becomes a phi
+        slot = self._alloca(types.INT)
+        then = self.fn.new_block()
+        otherwise = self.fn.new_block()
+        end = self.fn.new_block()
+        self.branch(expr, then, otherwise)
+        for block, value in ((then, 1), (otherwise, 0)):
+            self.block = block
+            self._store(slot, types.INT, value, False)
+            self._emit(Op.JUMP, a=end)
+        self.block = end
+        return self._emit(Op.LOAD, ValueType.I32, slot), types.INT
+
+    def _rvalue_ConditionalExpr(self, expr: ast.ConditionalExpr):
+        then = self.fn.new_block()
+        otherwise = self.fn.new_block()
+        end = self.fn.new_block()
+        self.branch(expr.cond, then, otherwise)
+        results = []
+        for block, operand in ((then, expr.then), (otherwise, expr.otherwise)):
+            self.block = block
+            value, t = self.rvalue(operand)
+            results.append((value, t, self.block))
+        (a, at, a_end), (b, bt, b_end) = results
+        if isinstance(at, IntegerType) and isinstance(bt, IntegerType):
+            t = types.usual_arithmetic_conversion(at, bt)
+        elif isinstance(at, types.VoidType) or isinstance(bt, types.VoidType):
+            t = types.VOID
+        else:
+            t = at if isinstance(at, PointerType) else bt
+        slot = self._alloca(t) if t != types.VOID else NONE
+        for value, vt, block in ((a, at, a_end), (b, bt, b_end)):
+            self.block = block
+            if slot != NONE:
+                self._store(slot, t, self.convert(value, vt, t, expr))
+            self._emit(Op.JUMP, a=end)
+        self.block = end
+        if slot == NONE:
+            return NONE, t
+        return self._emit(Op.LOAD, self.value_type(t, expr), slot), t
+
+    def _arithmetic(
+        self,
+        op: Token,
+        left: int,
+        lt: types.Type,
+        right: int,
+        rt: types.Type,
+        node: ast.Node,
+    ) -> Tuple[int, types.Type]:
+        """Emits a binary operation with the usual conversions and pointer
+        arithmetic of C."""
+        lp = isinstance(lt, PointerType)
+        rp = isinstance(rt, PointerType)
+        if op == Token.PLUS and rp and not lp:
+            left, lt, right, rt = right, rt, left, lt
+            lp, rp = rp, lp
+        if op in (Token.PLUS, Token.MINUS) and lp and isinstance(rt, IntegerType):
+            index = self.convert(right, rt, _PTRDIFF_T, node)
+            size = lt.base.size if lt.base.is_complete else 1
+            if size != 1:
+                index = self._emit(
+                    Op.MUL, ValueType.I64, index, self._const(_PTRDIFF_T, size)
+                )
+            code = Op.ADD if op == Token.PLUS else Op.SUB
+            return self._emit(code, ValueType.I64, left, index), lt
+        if op == Token.MINUS and lp and rp:
+            diff = self._emit(Op.SUB, ValueType.I64, left, right)
+            size = lt.base.size if lt.base.is_complete else 1
+            if size != 1:
+                diff = self._emit(
+                    Op.SDIV, ValueType.I64, diff, self._const(_PTRDIFF_T, size)
+                )
+            return diff, _PTRDIFF_T
+        if op in _COMPARISONS and (lp or rp):
+            left = self.convert(left, lt, _SIZE_T, node)
+            right = self.convert(right, rt, _SIZE_T, node)
+            code = _COMPARISONS[op][1]
+            return self._emit(code, ValueType.I32, left, right), types.INT
+        if not isinstance(lt, IntegerType) or not isinstance(rt, IntegerType):
+            self._error(
+                node,
+                Error.INVALID_OPERANDS,
+                f"invalid operands to binary expression ('{lt}' and '{rt}')",
+            )
+        if op in (Token.LESS_THAN_LESS_THAN, Token.GREATER_THAN_GREATER_THAN):
+            t = types.integer_promotion(lt)
+            left = self.convert(left, lt, t, node)
+            right = self.convert(right, rt, t, node)
+        else:
+            t = types.usual_arithmetic_conversion(lt, rt)
+            left = self.convert(left, lt, t, node)
+            right = self.convert(right, rt, t, node)
+        vt = VALUE_TYPES[t.size]
+        if op in _COMPARISONS:
+            code = _COMPARISONS[op][0 if t.signed else 1]
+            return self._emit(code, ValueType.I32, left, right), types.INT
+        if op in _ARITHMETIC:
+            return self._emit(_ARITHMETIC[op], vt, left, right), t
+        if op in _SIGNED_ARITHMETIC:
+            code = _SIGNED_ARITHMETIC[op][0 if t.signed else 1]
+            return self._emit(code, vt, left, right), t
+        self._error(node, Error.UNSUPPORTED, f"operator '{op.value}'")
+
+    def _rvalue_CallExpr(self, expr: ast.CallExpr):
+        callee = _strip(expr.callee)
+        implicit = isinstance(callee, ast.RefDeclExpr)
+        if implicit and self.symbols.lookup(callee.name) is None:
+            self.reporter.warning(
+                callee.start,
+                Warning.IMPLICIT_FUNCTION_DECLARATION,
+                f"implicit declaration of function '{callee.name}'",
+            )
+            ft = FunctionType(types.INT, (), prototype=False)
+            self.symbols.declare(callee.name, Kind.FUNCTION, ft)
+        address, t = self.rvalue(callee)
+        if not isinstance(t, PointerType) or not isinstance(t.base, FunctionType):
+            self._error(expr, Error.INVALID_OPERANDS, "called object is not a function")
+        ft = t.base
+        if ft.prototype and (
+            len(expr.args) < len(ft.params)
+            or len(expr.args) > len(ft.params)
+            and not ft.variadic
+        ):
+            self._error(expr, Error.INVALID_OPERANDS, "wrong number of arguments")
+        args = []
+        for k, arg in enumerate(expr.args):
+            value, at = self.rvalue(arg)
+            if k < len(ft.params):
+                pt = ft.params[k]
+            elif isinstance(at, IntegerType):
+                pt = types.integer_promotion(at)
+            else:
+                pt = at
+            args.append(self.convert(value, at, pt, arg))
+        ret = self.value_type(ft.ret, expr)
+        return self.fn.append_call(self.block, ret, address, args), ft.ret
+
+
+def lower(decls: Iterable[ast.Decl], reporter: Reporter) -> Module:
+    """Lowers a stream of declarations, such as Parser.iter_declarations(),
+    to a module."""
+    return Lowering(reporter).lower(decls)
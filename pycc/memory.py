@@ -0,0 +1,331 @@
+"""Memory accounting of the front end.
+
+``account`` reads a file, scans it, buffers its tokens and parses them one
+phase after another while ``tracemalloc`` traces allocations, and reports
+the peak and retained bytes of every phase, the bytes per token and per
+node class, and the lines which allocated the most. The driver interleaves
+the phases instead, holding a few tokens at a time, so the figures bound
+what it needs from above.
+
+Budgets limit the peak of a phase, or with ``total`` of all of them, and
+are checked every few hundred tokens and after every declaration. A phase
+over its budget stops with a fatal error at the token it had got to,
+rather than running until the system kills the process.
+"""
+import collections
+import dataclasses
+import os
+import re
+import sys
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from .ast import Node
+from .error import Error, FatalError, Reporter
+from .file import File, Location
+from .parser import Parser, TokenData, TokenStream, tokenize
+from .scanner import Scanner
+from .visitor import child_fields, iter_child_nodes
+
+PHASES = ("open", "scan", "buffer", "ast")
+# tokens scanned or buffered between two budget checks
+CHECK_INTERVAL = 256
+
+_SIZE = re.compile(r"(\d+)\s*([kmg]?)(?:i?b)?", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+
+def parse_size(text: str) -> int:
+    """Returns the bytes of a size such as ``512``, ``64K``, ``16MB`` or
+    ``1GiB``, where the units are powers of 1024."""
+    match = _SIZE.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(f"invalid size {text!r}")
+    return int(match.group(1)) * _UNITS[match.group(2).lower()]
+
+
+def parse_budget(text: str) -> Tuple[str, int]:
+    """Returns the phase and bytes of a budget written ``<phase>=<size>``,
+    where the phase may also be ``total``."""
+    phase, sep, size = text.partition("=")
+    if not sep or phase not in PHASES + ("total",):
+        choices = ", ".join(PHASES + ("total",))
+        raise ValueError(
+            f"invalid budget {text!r}: expected <phase>=<size>, "
+            f"where the phase is one of {choices}"
+        )
+    return phase, parse_size(size)
+
+
+def format_size(n: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GiB"
+
+
+@dataclasses.dataclass
+class Phase:
+    name: str
+    # the most bytes allocated at once during the phase, over what was
+    # allocated when it started
+    peak: int
+    # the bytes the phase allocated and had not freed when it ended
+    retained: int
+
+
+@dataclasses.dataclass
+class NodeClass:
+    count: int
+    # the bytes of every node, with the lists of children it holds
+    bytes: int
+
+    @property
+    def average(self) -> float:
+        return self.bytes / self.count
+
+
+@dataclasses.dataclass
+class Site:
+    # ``<file>:<line>``
+    location: str
+    bytes: int
+    blocks: int
+
+
+@dataclasses.dataclass
+class MemoryReport:
+    filename: str
+    phases: List[Phase] = dataclasses.field(default_factory=list)
+    # the most bytes allocated at once over all the phases
+    peak: int = 0
+    tokens: int = 0
+    nodes: Dict[str, NodeClass] = dataclasses.field(default_factory=dict)
+    # the lines which allocated the most of the retained bytes
+    sites: List[Site] = dataclasses.field(default_factory=list)
+
+    def phase(self, name: str) -> Phase:
+        return next(x for x in self.phases if x.name == name)
+
+    @property
+    def bytes_per_token(self) -> float:
+        return self.phase("scan").retained / self.tokens if self.tokens else 0.0
+
+    def format(self) -> str:
+        lines = [f"memory of {self.filename}:"]
+        lines.append(f"  {'phase':<12}{'peak':>12}{'retained':>12}")
+        for phase in self.phases:
+            lines.append(
+                f"  {phase.name:<12}{format_size(phase.peak):>12}"
+                f"{format_size(phase.retained):>12}"
+            )
+        lines.append(f"  {'total':<12}{format_size(self.peak):>12}")
+        lines.append(
+            f"  {self.tokens} tokens, {self.bytes_per_token:.1f} bytes per TokenData"
+        )
+        if self.nodes:
+            lines.append(f"  {'node class':<24}{'count':>8}{'bytes/node':>12}")
+            nodes = sorted(self.nodes.items(), key=lambda x: -x[1].bytes)
+            for name, stats in nodes:
+                lines.append(f"  {name:<24}{stats.count:>8}{stats.average:>12.1f}")
+        if self.sites:
+            lines.append("  top allocation sites:")
+            for site in self.sites:
+                lines.append(
+                    f"  {format_size(site.bytes):>12} in {site.blocks:>7} blocks"
+                    f"  {site.location}"
+                )
+        return "\n".join(lines)
+
+
+@dataclasses.dataclass
+class Accounting:
+    """What ``account`` built, which is kept alive to the end so that the
+    retained bytes are still allocated, and the report on it."""
+
+    report: MemoryReport
+    file: Optional[File] = None
+    tokens: List[TokenData] = dataclasses.field(default_factory=list)
+    declarations: list = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class _Accountant:
+    reporter: Reporter
+    budgets: Dict[str, int]
+    report: MemoryReport
+    phase: str = ""
+    # the traced bytes when accounting and the current phase started
+    start: int = 0
+    base: int = 0
+    # the peak tracemalloc had reached when the phase started, and the most
+    # bytes traced at once in the phase as far as it is known
+    _before: int = 0
+    _peak: int = 0
+
+    def begin(self, phase: str) -> None:
+        # tracemalloc.reset_peak is new in Python 3.9: the phase peak is the
+        # traced peak once that rises above the peak before the phase, and
+        # the most bytes seen at the checks until then
+        self.phase = phase
+        self.base, self._before = tracemalloc.get_traced_memory()
+        self._peak = self.base
+
+    def _sample(self) -> Tuple[int, int]:
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak = max(self._peak, current, peak if peak > self._before else 0)
+        return current, self._peak
+
+    def check(self, location: Location) -> None:
+        peak = self._sample()[1]
+        self.report.peak = max(self.report.peak, peak - self.start)
+        usage = {self.phase: peak - self.base, "total": peak - self.start}
+        for name, used in usage.items():
+            limit = self.budgets.get(name)
+            if limit is not None and used > limit:
+                self.fail(location, name, used, limit)
+
+    def fail(self, location: Location, name: str, used: int, limit: int) -> None:
+        what = "the front end" if name == "total" else f"the {name} phase"
+        self.reporter.fatal(
+            location,
+            Error.MEMORY_BUDGET_EXCEEDED,
+            f"{what} allocated {format_size(used)} ({used} bytes), over its "
+            f"budget of {format_size(limit)}",
+        )
+
+    def end(self, location: Location) -> None:
+        self.check(location)
+        current, peak = self._sample()
+        self.report.phases.append(
+            Phase(self.phase, peak - self.base, current - self.base)
+        )
+
+
+def _node_sizes(declarations: List[Node]) -> Dict[str, NodeClass]:
+    """Counts the nodes of every class in ``declarations`` and measures them.
+
+    A node is measured by allocating copies of one node of its class, since
+    tracemalloc cannot find the blocks of an object with its attributes
+    stored inline, and the bytes of its lists of children are added.
+    """
+    counts: Dict[type, int] = collections.Counter()
+    lists: Dict[type, int] = collections.Counter()
+    samples: Dict[type, Node] = {}
+    stack = list(declarations)
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        cls = type(node)
+        counts[cls] += 1
+        samples.setdefault(cls, node)
+        for name, is_list in child_fields(cls):
+            if is_list:
+                lists[cls] += sys.getsizeof(getattr(node, name))
+        stack.extend(iter_child_nodes(node))
+    nodes = {}
+    for cls, count in counts.items():
+        size = _instance_size(samples[cls])
+        nodes[cls.__name__] = NodeClass(count, size * count + lists[cls])
+    return nodes
+
+
+def _instance_size(node: Node, probes: int = 64) -> int:
+    """Returns the bytes of a copy of ``node``, averaged over ``probes``
+    copies. The first round warms up whatever Python caches on the first
+    calls of the constructor, and only the second one is kept."""
+    args = tuple(getattr(node, x.name) for x in dataclasses.fields(node))
+    cls = type(node)
+    for _ in range(2):
+        copies = [None] * probes
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(probes):
+            copies[i] = cls(*args)
+        size = (tracemalloc.get_traced_memory()[0] - before) // probes
+        del copies
+    return size
+
+
+def account(
+    filename: str,
+    reporter: Reporter,
+    budgets: Optional[Dict[str, int]] = None,
+    top: int = 10,
+) -> Accounting:
+    """Runs the front end on ``filename`` a phase at a time and measures the
+    memory of each with ``tracemalloc``, which is started if it is not
+    tracing yet. A phase over its entry in ``budgets`` stops it with a
+    FatalError, reported to ``reporter``. The report lists the ``top``
+    allocation sites of the retained bytes."""
+    budgets = budgets or {}
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        result = Accounting(MemoryReport(filename))
+        accountant = _Accountant(reporter, budgets, result.report)
+        before = tracemalloc.take_snapshot()
+        accountant.start = tracemalloc.get_traced_memory()[0]
+        _run(accountant, result)
+        after = tracemalloc.take_snapshot()
+        result.report.nodes = _node_sizes(result.declarations)
+        result.report.tokens = len(result.tokens)
+        for stat in after.compare_to(before, "lineno")[:top]:
+            if stat.size_diff <= 0:
+                break
+            frame = stat.traceback[0]
+            location = f"{frame.filename}:{frame.lineno}"
+            result.report.sites.append(Site(location, stat.size_diff, stat.count_diff))
+        return result
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+
+def _run(accountant: _Accountant, result: Accounting) -> None:
+    filename = result.report.filename
+    location = Location(filename, 0, 1, 0)
+    accountant.begin("open")
+    # the text takes at least a byte per byte of the file, so a file over
+    # the budget is not read at all
+    limit = accountant.budgets.get("open")
+    size = os.stat(filename).st_size
+    if limit is not None and size > limit:
+        accountant.fail(location, "open", size, limit)
+    file = result.file = File.open(filename)
+    accountant.end(location)
+
+    accountant.begin("scan")
+    tokens = result.tokens
+    for tok in tokenize(Scanner(file, accountant.reporter)):
+        tokens.append(tok)
+        if len(tokens) % CHECK_INTERVAL == 0:
+            accountant.check(tok.start)
+    location = tokens[-1].end
+    accountant.end(location)
+
+    # the whole unit is buffered before the parse, which is as much as the
+    # stream holds when the parser speculates to the end of the file
+    accountant.begin("buffer")
+    stream = TokenStream.from_tokens(tokens)
+    for i in range(0, len(tokens), CHECK_INTERVAL):
+        stream.fill(min(CHECK_INTERVAL, len(tokens) - i))
+        accountant.check(stream.buf[-1].start)
+    accountant.end(location)
+
+    accountant.begin("ast")
+    declarations = iter(Parser(stream, accountant.reporter).iter_declarations())
+    while True:
+        try:
+            decl = next(declarations, None)
+        except FatalError:
+            break
+        if decl is None:
+            break
+        result.declarations.append(decl)
+        accountant.check(decl.end)
+    accountant.end(location)
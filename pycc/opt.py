@@ -0,0 +1,845 @@
+import dataclasses
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from . import ssa
+from .inline import CallGraph, CostModel, Inliner, remove_unused
+from .ir import BINARY, NONE, SIDE_EFFECTS, Function, Module, Op, ValueType
+
+_COMMUTATIVE = frozenset({Op.ADD, Op.MUL, Op.AND, Op.OR, Op.XOR, Op.EQ, Op.NE})
+# instructions whose value depends only on their operands
+_PURE = BINARY | {Op.CONST, Op.GLOBAL, Op.NEG, Op.NOT, Op.SEXT, Op.ZEXT, Op.TRUNC}
+
+_SIGNED_COMPARISONS = {
+    Op.EQ: lambda a, b: a == b,
+    Op.NE: lambda a, b: a != b,
+    Op.SLT: lambda a, b: a < b,
+    Op.SLE: lambda a, b: a <= b,
+    Op.SGT: lambda a, b: a > b,
+    Op.SGE: lambda a, b: a >= b,
+}
+_UNSIGNED_COMPARISONS = {
+    Op.ULT: lambda a, b: a < b,
+    Op.ULE: lambda a, b: a <= b,
+    Op.UGT: lambda a, b: a > b,
+    Op.UGE: lambda a, b: a >= b,
+}
+_ARITHMETIC = {
+    Op.ADD: lambda a, b: a + b,
+    Op.SUB: lambda a, b: a - b,
+    Op.MUL: lambda a, b: a * b,
+    Op.AND: lambda a, b: a & b,
+    Op.OR: lambda a, b: a | b,
+    Op.XOR: lambda a, b: a ^ b,
+}
+
+
+def fold(
+    op: Op, t: ValueType, operand: ValueType, a: int, b: int = 0
+) -> Optional[int]:
+    """Evaluates an instruction of type ``t`` whose operands of type
+    ``operand`` are the constants ``a`` and ``b``. Returns None for division
+    by zero, overflowing division and out of range shifts, which are left to
+    run and trap or misbehave as the target does."""
+    if op in _ARITHMETIC:
+        return t.wrap(_ARITHMETIC[op](a, b))
+    if op in _SIGNED_COMPARISONS:
+        return int(_SIGNED_COMPARISONS[op](operand.wrap(a), operand.wrap(b)))
+    if op in _UNSIGNED_COMPARISONS:
+        x = operand.wrap(a, False)
+        y = operand.wrap(b, False)
+        return int(_UNSIGNED_COMPARISONS[op](x, y))
+    if op in (Op.SDIV, Op.SREM, Op.UDIV, Op.UREM):
+        signed = op in (Op.SDIV, Op.SREM)
+        x = t.wrap(a, signed)
+        y = t.wrap(b, signed)
+        if y == 0 or signed and y == -1 and x == -(1 << (t.bits - 1)):
+            return None
+        # C division truncates toward zero
+        q = abs(x) // abs(y)
+        if (x < 0) != (y < 0):
+            q = -q
+        return t.wrap(q if op in (Op.SDIV, Op.UDIV) else x - q * y)
+    if op in (Op.SHL, Op.SAR, Op.SHR):
+        count = operand.wrap(b, False)
+        if count >= t.bits:
+            return None
+        if op == Op.SHL:
+            return t.wrap(a << count)
+        if op == Op.SAR:
+            return t.wrap(t.wrap(a) >> count)
+        return t.wrap(t.wrap(a, False) >> count)
+    if op == Op.NEG:
+        return t.wrap(-a)
+    if op == Op.NOT:
+        return t.wrap(~a)
+    if op == Op.SEXT or op == Op.TRUNC:
+        return t.wrap(operand.wrap(a))
+    if op == Op.ZEXT:
+        return t.wrap(operand.wrap(a, False))
+    return None
+
+
+# x op 0 == x
+_RIGHT_ZERO_IDENTITY = frozenset(
+    {Op.ADD, Op.SUB, Op.OR, Op.XOR, Op.SHL, Op.SAR, Op.SHR}
+)
+# x op x == 0
+_SELF_ZERO = frozenset({Op.SUB, Op.XOR})
+
+
+def simplify(fn: Function, i: int) -> Optional[int]:
+    """Applies algebraic identities to a binary instruction. Returns the
+    value it is equal to, or None; an instruction equal to 0 is turned into
+    a CONST in place."""
+    o = fn.op[i]
+    x, y = fn.a[i], fn.b[i]
+    if o in _COMMUTATIVE and fn.op[x] == Op.CONST:
+        x, y = y, x
+    if o in _SELF_ZERO and x == y:
+        fn.op[i] = Op.CONST
+        fn.a[i] = 0
+        fn.b[i] = NONE
+        return None
+    if fn.op[y] != Op.CONST:
+        return None
+    k = fn.a[y]
+    if k == 0 and o in _RIGHT_ZERO_IDENTITY or k == 1 and o == Op.MUL:
+        return x
+    if k == 0 and (o == Op.MUL or o == Op.AND):
+        return y
+    return None
+
+
+def replace_uses(fn: Function, uses: List[List[int]], old: int, new: int) -> None:
+    """Makes every user of ``old`` use ``new`` instead, keeping ``uses``
+    up to date."""
+    for user in uses[old]:
+        values = fn.operands(user)
+        fn.set_operands(user, [new if x == old else x for x in values])
+    uses[new].extend(uses[old])
+    uses[old] = []
+
+
+def _sort_phis(fn: Function, block: int) -> None:
+    # keeps phis at the start of a block after some became other instructions
+    insts = fn.blocks[block].insts
+    op = fn.op
+    phis = [i for i in insts if op[i] == Op.PHI]
+    insts[:] = type(insts)("q", phis + [i for i in insts if op[i] != Op.PHI])
+
+
+@dataclasses.dataclass
+class Analyses:
+    """Analyses of one function, computed on first use and cached until a
+    pass which does not preserve them changes the function."""
+
+    fn: Function
+    cache: Dict[str, object] = dataclasses.field(default_factory=dict)
+    computed: int = 0
+
+    def get(self, name: str):
+        result = self.cache.get(name)
+        if result is None:
+            result = self.cache[name] = ANALYSES[name](self.fn)
+            self.computed += 1
+        return result
+
+    def invalidate(self, preserved: FrozenSet[str] = frozenset()) -> None:
+        for name in list(self.cache):
+            if name not in preserved:
+                del self.cache[name]
+
+
+ANALYSES: Dict[str, Callable[[Function], object]] = {
+    "dominators": ssa.immediate_dominators,
+    "uses": ssa.uses,
+    "loops": lambda fn: ssa.natural_loops(fn, ssa.immediate_dominators(fn)),
+}
+
+
+class Pass:
+    name = ""
+    # the analyses which are still valid after the pass changed a function
+    preserves: FrozenSet[str] = frozenset()
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        """Transforms ``fn`` and returns whether anything changed."""
+        raise NotImplementedError
+
+
+# lattice values of SCCP besides constants
+_UNKNOWN = object()
+_VARYING = object()
+
+
+class SCCP(Pass):
+    """Sparse conditional constant propagation (Wegman and Zadeck).
+
+    Values start unknown and only move down the lattice to a constant and
+    then to varying, as the blocks reachable through executable edges are
+    visited; SSA edges and CFG edges are both worklists. Constant values
+    become CONST instructions, branches on constants become jumps and the
+    blocks never reached are removed.
+    """
+
+    name = "sccp"
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        uses = analyses.get("uses")
+        op, t, a, b, c = fn.op, fn.type, fn.a, fn.b, fn.c
+        blocks = fn.blocks
+        block_of = fn.block_of
+        value: List[object] = [_UNKNOWN] * len(fn)
+        visited = bytearray(len(blocks))
+        executable = set()
+        flow = [(NONE, 0)]
+        work: List[int] = []
+
+        def lower(i: int, new: object) -> None:
+            old = value[i]
+            if old is new or old == new and old is not _VARYING:
+                return
+            value[i] = new
+            work.extend(uses[i])
+
+        def lattice(x: int) -> object:
+            if op[x] == Op.CONST:
+                return a[x]
+            return value[x]
+
+        def visit(i: int) -> None:
+            o = op[i]
+            if o == Op.PHI:
+                block = blocks[block_of[i]]
+                result = _UNKNOWN
+                for pred, x in zip(block.preds, fn.operands(i)):
+                    if (pred, block.id) not in executable or x == NONE:
+                        continue
+                    v = lattice(x)
+                    if v is _UNKNOWN:
+                        continue
+                    if v is _VARYING or result is not _UNKNOWN and result != v:
+                        result = _VARYING
+                        break
+                    result = v
+                lower(i, result)
+            elif o == Op.JUMP:
+                flow.append((block_of[i], a[i]))
+            elif o == Op.BRANCH:
+                cond = lattice(a[i])
+                if cond is _VARYING:
+                    flow.append((block_of[i], b[i]))
+                    flow.append((block_of[i], c[i]))
+                elif cond is not _UNKNOWN:
+                    flow.append((block_of[i], b[i] if cond else c[i]))
+            elif o == Op.CONST:
+                lower(i, a[i])
+            elif o in _PURE and o != Op.GLOBAL:
+                x = lattice(a[i])
+                y = lattice(b[i]) if o in BINARY else 0
+                if x is _VARYING or y is _VARYING:
+                    lower(i, _VARYING)
+                elif x is not _UNKNOWN and y is not _UNKNOWN:
+                    operand = ValueType(t[a[i]])
+                    result = fold(Op(o), ValueType(t[i]), operand, x, y)
+                    lower(i, _VARYING if result is None else result)
+            elif o != Op.NOP:
+                # undefined values are varying too, so that every value in
+                # a reached block ends up known
+                lower(i, _VARYING)
+
+        while flow or work:
+            while flow:
+                edge = flow.pop()
+                if edge in executable:
+                    continue
+                executable.add(edge)
+                target = edge[1]
+                if visited[target]:
+                    for i in fn.phis(target):
+                        visit(i)
+                    continue
+                visited[target] = 1
+                for i in blocks[target].insts:
+                    visit(i)
+            while work:
+                i = work.pop()
+                if visited[block_of[i]] and op[i] != Op.NOP:
+                    visit(i)
+
+        changed = False
+        for block in blocks:
+            if not visited[block.id]:
+                continue
+            phis = False
+            for i in block.insts:
+                v = value[i]
+                o = op[i]
+                if v is _UNKNOWN or v is _VARYING or o == Op.CONST:
+                    continue
+                if o in SIDE_EFFECTS:
+                    continue
+                phis |= o == Op.PHI
+                op[i] = Op.CONST
+                a[i] = v
+                b[i] = c[i] = NONE
+                changed = True
+            if phis:
+                _sort_phis(fn, block.id)
+            i = block.insts[-1]
+            if op[i] == Op.BRANCH:
+                cond = lattice(a[i])
+                if cond is _UNKNOWN or cond is _VARYING:
+                    continue
+                taken, dropped = (b[i], c[i]) if cond else (c[i], b[i])
+                op[i] = Op.JUMP
+                a[i] = taken
+                b[i] = c[i] = NONE
+                fn.remove_edge(block.id, dropped)
+                changed = True
+        changed |= fn.remove_unreachable_blocks()
+        return changed
+
+
+class DCE(Pass):
+    """Removes the instructions whose values are never used by anything
+    with a side effect. Liveness is propagated from the side effects along
+    operands with a worklist, so dead cycles of phis go too."""
+
+    name = "dce"
+    preserves = frozenset({"dominators"})
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        op = fn.op
+        live = bytearray(len(fn))
+        work = [i for i in fn.instructions() if op[i] in SIDE_EFFECTS]
+        for i in work:
+            live[i] = 1
+        while work:
+            for x in fn.operands(work.pop()):
+                if x != NONE and not live[x]:
+                    live[x] = 1
+                    work.append(x)
+        changed = False
+        for i in fn.instructions():
+            if not live[i]:
+                fn.delete(i)
+                changed = True
+        if changed:
+            fn.compact()
+        return changed
+
+
+class GVN(Pass):
+    """Global value numbering over the dominator tree.
+
+    Pure instructions are numbered by their opcode, type and operands, with
+    commutative operands in order; an instruction equal to one in a
+    dominating block is replaced by it. Phis whose incoming values are all
+    the same value are replaced by that value.
+    """
+
+    name = "gvn"
+    preserves = frozenset({"dominators"})
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        idom = analyses.get("dominators")
+        uses = analyses.get("uses")
+        children = ssa.dominator_tree(idom)
+        op, t, a, b = fn.op, fn.type, fn.a, fn.b
+        table: Dict[Tuple, int] = {}
+        changed = False
+        work: List[Tuple[int, Optional[List[Tuple]]]] = [(0, None)]
+        while work:
+            block, added = work.pop()
+            if added is not None:
+                for key in added:
+                    del table[key]
+                continue
+            added = []
+            work.append((block, added))
+            for i in fn.blocks[block].insts:
+                o = op[i]
+                if o == Op.PHI:
+                    values = set(fn.operands(i))
+                    values.discard(i)
+                    if len(values) == 1 and NONE not in values:
+                        replace_uses(fn, uses, i, values.pop())
+                        fn.delete(i)
+                        changed = True
+                        continue
+                    key = (o, block, tuple(fn.operands(i)))
+                elif o in _PURE:
+                    if o in BINARY:
+                        same = simplify(fn, i)
+                        if same is not None:
+                            replace_uses(fn, uses, i, same)
+                            fn.delete(i)
+                            changed = True
+                            continue
+                        if op[i] != o:
+                            o = op[i]
+                            changed = True
+                    x, y = a[i], b[i]
+                    if o in _COMMUTATIVE and x > y:
+                        x, y = y, x
+                    key = (o, t[i], x, y)
+                else:
+                    continue
+                existing = table.get(key)
+                if existing is not None:
+                    replace_uses(fn, uses, i, existing)
+                    fn.delete(i)
+                    changed = True
+                else:
+                    table[key] = i
+                    added.append(key)
+            for child in children[block]:
+                work.append((child, None))
+        if changed:
+            fn.compact()
+        return changed
+
+
+class SimplifyCFG(Pass):
+    """Simplifies the control flow graph with a worklist of blocks.
+
+    A branch on a constant or with both targets the same becomes a jump, a
+    block is merged into its only predecessor when it is that block's only
+    successor, and an empty block which only jumps on is bypassed. Blocks
+    left unreachable are removed.
+    """
+
+    name = "simplifycfg"
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        uses = analyses.get("uses")
+        op, a, b, c = fn.op, fn.a, fn.b, fn.c
+        blocks = fn.blocks
+        changed = False
+        work = list(range(len(blocks) - 1, -1, -1))
+        queued = bytearray([1] * len(blocks))
+
+        def push(block: int) -> None:
+            if not queued[block]:
+                queued[block] = 1
+                work.append(block)
+
+        while work:
+            block = blocks[work.pop()]
+            queued[block.id] = 0
+            if not block.insts or block.id != 0 and not block.preds:
+                continue
+            last = block.insts[-1]
+            if op[last] == Op.BRANCH:
+                cond = a[last]
+                if b[last] == c[last] or op[cond] == Op.CONST:
+                    taken = b[last] if b[last] == c[last] or a[cond] else c[last]
+                    dropped = c[last] if taken == b[last] else b[last]
+                    fn.remove_edge(block.id, dropped)
+                    op[last] = Op.JUMP
+                    a[last] = taken
+                    b[last] = c[last] = NONE
+                    changed = True
+                    push(block.id)
+                    push(dropped)
+                    continue
+            if op[last] != Op.JUMP:
+                continue
+            target = blocks[a[last]]
+            if target.id != block.id and target.id != 0 and len(target.preds) == 1:
+                self._merge(fn, uses, block, target)
+                changed = True
+                push(block.id)
+                for succ in block.succs:
+                    push(succ)
+                continue
+            if block.id != 0 and len(block.insts) == 1 and target.id != block.id:
+                if self._bypass(fn, block, target):
+                    changed = True
+                    push(target.id)
+                    for pred in target.preds:
+                        push(pred)
+        changed |= fn.remove_unreachable_blocks()
+        return changed
+
+    def _merge(self, fn: Function, uses, block, target) -> None:
+        """Appends ``target`` to ``block``, its only predecessor."""
+        op = fn.op
+        for i in list(fn.phis(target.id)):
+            replace_uses(fn, uses, i, fn.operands(i)[0])
+            fn.delete(i)
+        fn.delete(block.insts[-1])
+        insts = [i for i in target.insts if op[i] != Op.NOP]
+        for i in insts:
+            fn.block_of[i] = block.id
+        block.insts = type(block.insts)(
+            "q", [i for i in block.insts if op[i] != Op.NOP] + insts
+        )
+        block.succs = target.succs
+        for succ in target.succs:
+            preds = fn.blocks[succ].preds
+            preds[preds.index(target.id)] = block.id
+        target.insts = type(target.insts)("q")
+        target.preds = []
+        target.succs = []
+
+    def _bypass(self, fn: Function, block, target) -> bool:
+        """Makes the predecessors of an empty ``block`` jump straight to
+        ``target``, unless a phi in ``target`` would need two values along
+        one edge. Returns whether any predecessor was moved."""
+        has_phis = next(fn.phis(target.id), None) is not None
+        moved = False
+        for pred in list(block.preds):
+            if pred == block.id or has_phis and pred in target.preds:
+                continue
+            if fn.blocks[pred].succs.count(block.id) > 1:
+                continue
+            fn.retarget(pred, block.id, target.id)
+            fn.remove_edge(pred, block.id)
+            fn.add_edge(pred, target.id, block.id)
+            moved = True
+        if moved and not block.preds:
+            fn.remove_edge(block.id, target.id)
+        return moved
+
+
+def _create_preheader(fn: Function, loop: ssa.Loop) -> None:
+    """Adds a block through which every edge from outside the loop reaches
+    its header; phis there merge the values coming in along those edges."""
+    blocks = fn.blocks
+    header = blocks[loop.header]
+    outside = [k for k, x in enumerate(header.preds) if x not in loop.blocks]
+    if not outside or len(outside) == len(header.preds):
+        return
+    pre = fn.new_block()
+    phis = list(fn.phis(header.id))
+    incoming = [[fn.operands(phi)[k] for k in outside] for phi in phis]
+    sources = [header.preds[k] for k in outside]
+    for x in sources:
+        fn.remove_edge(x, header.id)
+        blocks[x].succs.append(pre)
+        blocks[pre].preds.append(x)
+    for x in set(sources):
+        fn.retarget(x, header.id, pre)
+    merged = []
+    for phi, values in zip(phis, incoming):
+        if len(values) == 1:
+            merged.append(values[0])
+            continue
+        new = fn.insert_phi(pre, ValueType(fn.type[phi]))
+        fn.pool[fn.b[new] : fn.b[new] + len(values)] = type(fn.pool)("q", values)
+        merged.append(new)
+    blocks[pre].insts.append(fn.create(pre, Op.JUMP, a=header.id))
+    fn.add_edge(pre, header.id, header.preds[0])
+    for phi, value in zip(phis, merged):
+        fn.pool[fn.b[phi] + fn.c[phi] - 1] = value
+
+
+def _loops(fn: Function, analyses: Analyses) -> Tuple[List[ssa.Loop], bool]:
+    """Returns the natural loops of ``fn``, innermost first, after giving
+    every loop a preheader, and whether any preheader had to be added."""
+    loops = analyses.get("loops")
+    if all(x.preheader != NONE for x in loops):
+        return loops, False
+    for loop in loops:
+        if loop.preheader == NONE:
+            _create_preheader(fn, loop)
+    analyses.invalidate()
+    return analyses.get("loops"), True
+
+
+def _insert(fn: Function, block: int, op: Op, t: ValueType, a: int, b=NONE) -> int:
+    """Creates an instruction at the end of ``block``, before its
+    terminator."""
+    i = fn.create(block, op, t, a, b)
+    insts = fn.blocks[block].insts
+    insts.insert(len(insts) - 1, i)
+    return i
+
+
+def _move(fn: Function, i: int, block: int) -> None:
+    fn.blocks[fn.block_of[i]].insts.remove(i)
+    insts = fn.blocks[block].insts
+    insts.insert(len(insts) - 1, i)
+    fn.block_of[i] = block
+
+
+# instructions moved along with an invariant instruction which uses them
+_MOVABLE = frozenset({Op.CONST, Op.GLOBAL, Op.UNDEF})
+_DIVISIONS = frozenset({Op.SDIV, Op.UDIV, Op.SREM, Op.UREM})
+
+
+class LICM(Pass):
+    """Loop-invariant code motion.
+
+    Pure instructions whose operands are all defined outside a loop are
+    moved to its preheader, innermost loops first, so that an instruction
+    invariant in several nested loops ends up in front of the outermost.
+    Division is only moved by constants which cannot trap, since the loop
+    might not have executed it.
+    """
+
+    name = "licm"
+    preserves = frozenset({"dominators", "uses", "loops"})
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        loops, changed = _loops(fn, analyses)
+        op, b = fn.op, fn.b
+        block_of = fn.block_of
+        rpo = ssa.reverse_postorder(fn)
+        for loop in loops:
+            inside = loop.blocks
+            for block in [x for x in rpo if x in inside]:
+                for i in list(fn.blocks[block].insts):
+                    o = op[i]
+                    if o not in _PURE or o in _MOVABLE:
+                        continue
+                    if o in _DIVISIONS:
+                        divisor = b[i]
+                        if op[divisor] != Op.CONST or fn.a[divisor] in (0, -1):
+                            continue
+                    values = fn.operands(i)
+                    if any(
+                        block_of[x] in inside and op[x] not in _MOVABLE
+                        for x in values
+                    ):
+                        continue
+                    for x in values:
+                        if block_of[x] in inside:
+                            _move(fn, x, loop.preheader)
+                    _move(fn, i, loop.preheader)
+                    changed = True
+        return changed
+
+
+class StrengthReduction(Pass):
+    """Induction variable strength reduction.
+
+    A basic induction variable is a phi in a loop header which the single
+    latch increments by a constant. A product of one, or of its sign
+    extension, with a loop-invariant factor becomes a phi of its own, which
+    starts at the product of the initial value in the preheader and grows
+    by the step times the factor in the latch, replacing a multiplication
+    per iteration by an addition. Factors which are powers of two are left
+    alone, since shifts and scaled addressing already make those cheap.
+    """
+
+    name = "ivsr"
+
+    def run(self, fn: Function, analyses: Analyses) -> bool:
+        loops, changed = _loops(fn, analyses)
+        op, a, b = fn.op, fn.a, fn.b
+        block_of = fn.block_of
+        replaced: Dict[int, int] = {}
+        for loop in loops:
+            header = fn.blocks[loop.header]
+            if len(loop.latches) != 1 or len(header.preds) != 2:
+                continue
+            latch = loop.latches[0]
+            k_latch = header.preds.index(latch)
+            k_pre = 1 - k_latch
+            ivs = {}
+            for phi in fn.phis(header.id):
+                values = fn.operands(phi)
+                step = _step(fn, phi, values[k_latch])
+                if step is not None:
+                    ivs[phi] = (values[k_pre], step)
+            if not ivs:
+                continue
+            for block in sorted(loop.blocks):
+                for i in list(fn.blocks[block].insts):
+                    if op[i] != Op.MUL:
+                        continue
+                    for e, factor in ((a[i], b[i]), (b[i], a[i])):
+                        iv = a[e] if op[e] == Op.SEXT else e
+                        if iv not in ivs:
+                            continue
+                        if op[factor] == Op.CONST:
+                            k = a[factor]
+                            if k > 0 and k & (k - 1) == 0:
+                                break
+                        elif block_of[factor] in loop.blocks:
+                            continue
+                        replaced[i] = self._reduce(fn, loop, i, e, factor, ivs[iv])
+                        fn.delete(i)
+                        break
+        if replaced:
+            fn.compact()
+            fn.substitute(replaced)
+        return changed or bool(replaced)
+
+    def _reduce(
+        self, fn: Function, loop: ssa.Loop, i: int, e: int, factor: int, iv
+    ) -> int:
+        """Creates the phi replacing the product ``i`` of ``e``, the
+        induction variable or its extension, and ``factor``."""
+        op = fn.op
+        t = ValueType(fn.type[i])
+        pre = loop.preheader
+        header = fn.blocks[loop.header]
+        latch = loop.latches[0]
+        init, step = iv
+        if op[e] == Op.SEXT:
+            init = _insert(fn, pre, Op.SEXT, t, init)
+        if op[factor] == Op.CONST:
+            k = fn.a[factor]
+            factor = _insert(fn, pre, Op.CONST, t, k)
+            increment = _insert(fn, pre, Op.CONST, t, t.wrap(step * k))
+        else:
+            count = _insert(fn, pre, Op.CONST, t, t.wrap(step))
+            increment = _insert(fn, pre, Op.MUL, t, factor, count)
+        start = _insert(fn, pre, Op.MUL, t, init, factor)
+        phi = fn.insert_phi(header.id, t)
+        following = _insert(fn, latch, Op.ADD, t, phi, increment)
+        k_latch = header.preds.index(latch)
+        fn.pool[fn.b[phi] + k_latch] = following
+        fn.pool[fn.b[phi] + 1 - k_latch] = start
+        return phi
+
+
+def _step(fn: Function, phi: int, following: int) -> Optional[int]:
+    """Returns the constant by which ``following`` increments ``phi``."""
+    op, a, b = fn.op, fn.a, fn.b
+    o = op[following]
+    if fn.type[following] != fn.type[phi]:
+        return None
+    if o == Op.ADD:
+        x, y = a[following], b[following]
+        if x != phi:
+            x, y = y, x
+        if x == phi and op[y] == Op.CONST:
+            return a[y]
+    elif o == Op.SUB and a[following] == phi and op[b[following]] == Op.CONST:
+        return -a[b[following]]
+    return None
+
+
+@dataclasses.dataclass
+class PassStatistics:
+    name: str
+    runs: int = 0
+    changed: int = 0
+    time: float = 0.0
+    # live instructions before and after, summed over runs
+    before: int = 0
+    after: int = 0
+
+    @property
+    def delta(self) -> int:
+        return self.after - self.before
+
+
+def default_passes() -> List[Pass]:
+    return [SimplifyCFG(), SCCP(), GVN(), DCE(), SimplifyCFG()]
+
+
+def pipeline(level: int) -> List[Pass]:
+    """Returns the passes run at ``-O<level>``: none at 0, the scalar
+    cleanups at 1 and the loop optimizations after them from 2 on."""
+    if level <= 0:
+        return []
+    passes = default_passes()
+    if level >= 2:
+        passes += [LICM(), StrengthReduction(), SCCP(), GVN(), DCE(), SimplifyCFG()]
+    return passes
+
+
+def inlining(level: int) -> Optional[CostModel]:
+    """Returns the cost model of the inliner at ``-O<level>``; functions are
+    inlined from 2 on, and more eagerly from 3."""
+    if level <= 1:
+        return None
+    if level == 2:
+        return CostModel()
+    return CostModel(threshold=120, max_size=8000)
+
+
+@dataclasses.dataclass
+class PassManager:
+    """Runs a pipeline of passes over every function of a module.
+
+    Each function has its own ``Analyses``; after a pass changes the
+    function, the analyses it does not preserve are dropped and recomputed
+    only when a later pass asks for them. Time and instruction counts are
+    recorded per pass.
+    """
+
+    passes: Sequence[Pass] = dataclasses.field(default_factory=default_passes)
+    # inlines calls before the passes run if set
+    inlining: Optional[CostModel] = None
+    statistics: Dict[str, PassStatistics] = dataclasses.field(default_factory=dict)
+    analyses_computed: int = 0
+    inlined: int = 0
+    # the static functions left unused by inlining and removed
+    removed: List[str] = dataclasses.field(default_factory=list)
+
+    def run(self, module: Module) -> None:
+        if self.inlining is None:
+            for fn in module.functions:
+                self.run_function(fn)
+            return
+        # callees are optimized before their callers consider inlining them
+        graph = CallGraph.build(module)
+        inliner = Inliner(graph, self.inlining)
+        stats = self._statistics("inline")
+        for component in graph.order:
+            for name in component:
+                fn = graph.functions[name]
+                stats.before += fn.instruction_count()
+                start = time.perf_counter()
+                changed = inliner.run(fn)
+                stats.time += time.perf_counter() - start
+                stats.after += fn.instruction_count()
+                stats.runs += 1
+                stats.changed += changed
+                self.run_function(fn)
+        self.inlined += inliner.inlined
+        self.removed.extend(remove_unused(module))
+
+    def _statistics(self, name: str) -> PassStatistics:
+        stats = self.statistics.get(name)
+        if stats is None:
+            stats = self.statistics[name] = PassStatistics(name)
+        return stats
+
+    def run_function(self, fn: Function) -> None:
+        analyses = Analyses(fn)
+        for p in self.passes:
+            stats = self._statistics(p.name)
+            stats.before += fn.instruction_count()
+            start = time.perf_counter()
+            changed = p.run(fn, analyses)
+            stats.time += time.perf_counter() - start
+            stats.after += fn.instruction_count()
+            stats.runs += 1
+            if changed:
+                stats.changed += 1
+                analyses.invalidate(p.preserves)
+        self.analyses_computed += analyses.computed
+
+    def report(self) -> str:
+        lines = [f"{'pass':<12} {'runs':>6} {'changed':>8} {'time':>10} {'delta':>8}"]
+        for s in self.statistics.values():
+            lines.append(
+                f"{s.name:<12} {s.runs:>6} {s.changed:>8} "
+                f"{s.time * 1000:>8.2f}ms {s.delta:>+8}"
+            )
+        lines.append(f"analyses computed: {self.analyses_computed}")
+        if self.inlining is not None:
+            lines.append(f"calls inlined: {self.inlined}")
+        return "\n".join(lines) + "\n"
+
+
+def optimize(
+    module: Module, passes: Optional[Sequence[Pass]] = None, level: int = 1
+) -> PassManager:
+    """Optimizes ``module`` with ``passes``, or else with the pipeline and
+    inlining of ``-O<level>``."""
+    if passes is None:
+        manager = PassManager(pipeline(level), inlining(level))
+    else:
+        manager = PassManager(passes)
+    manager.run(module)
+    return manager
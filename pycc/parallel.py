@@ -0,0 +1,162 @@
+"""Compiles the functions of a module in worker processes.
+
+After lowering, every function is optimized and compiled on its own: the
+passes, instruction selection, register allocation and encoding read
+nothing but the function, its index in the module and the set of symbols
+the module defines. The functions are shipped to a process pool as
+``encode`` packs them, a few flat byte strings per function, and their code
+comes back in module order and is stitched as ``codegen`` stitches it, so
+the output is byte for byte that of a serial build.
+
+Inlining reads the callees of a function, so from ``-O2`` on the module is
+optimized in this process first and only the code generator runs in the
+workers.
+"""
+import array
+import functools
+import marshal
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple, Union
+
+from .codegen import (
+    assembly,
+    compile_function,
+    defined_symbols,
+    function_assembly,
+    function_code,
+    object_file,
+)
+from .ir import Block, Function, Module, ValueType
+from .opt import PassManager, inlining, optimize, pipeline
+
+# bumped when the encoding changes
+_VERSION = 2
+
+
+def _pack(lists: Sequence[Sequence[int]]) -> Tuple[bytes, bytes]:
+    lengths = array.array("q", [len(x) for x in lists])
+    flat = array.array("q")
+    for x in lists:
+        flat.extend(x)
+    return lengths.tobytes(), flat.tobytes()
+
+
+def _unpack(lengths: bytes, flat: bytes) -> List[array.array]:
+    counts = array.array("q")
+    counts.frombytes(lengths)
+    values = array.array("q")
+    values.frombytes(flat)
+    result = []
+    start = 0
+    for n in counts:
+        result.append(values[start : start + n])
+        start += n
+    return result
+
+
+def encode(fn: Function) -> bytes:
+    """Packs ``fn`` into bytes: its typed arrays as they are in memory, and
+    the blocks as flat arrays of instructions, predecessors, successors and
+    profile counts."""
+    return marshal.dumps(
+        (
+            _VERSION,
+            fn.name,
+            bytes(fn.params),
+            int(fn.ret),
+            fn.static,
+            fn.inline,
+            tuple(fn.names),
+            fn.op.tobytes(),
+            fn.type.tobytes(),
+            fn.a.tobytes(),
+            fn.b.tobytes(),
+            fn.c.tobytes(),
+            fn.block_of.tobytes(),
+            fn.pool.tobytes(),
+            _pack([x.insts for x in fn.blocks]),
+            _pack([x.preds for x in fn.blocks]),
+            _pack([x.succs for x in fn.blocks]),
+            array.array("q", [x.count for x in fn.blocks]).tobytes(),
+        )
+    )
+
+
+def decode(data: bytes) -> Function:
+    (version, name, params, ret, static, inline, names, *arrays) = marshal.loads(
+        data
+    )
+    if version != _VERSION:
+        raise ValueError(f"cannot decode a function of version {version}")
+    *columns, insts, preds, succs, raw_counts = arrays
+    fn = Function(name, [ValueType(x) for x in params], ValueType(ret), static, inline)
+    for column, raw in zip(
+        (fn.op, fn.type, fn.a, fn.b, fn.c, fn.block_of, fn.pool), columns
+    ):
+        column.frombytes(raw)
+    for x in names:
+        fn.name_index(x)
+    counts = array.array("q")
+    counts.frombytes(raw_counts)
+    for k, (block, into, out, count) in enumerate(
+        zip(_unpack(*insts), _unpack(*preds), _unpack(*succs), counts)
+    ):
+        fn.blocks.append(Block(k, block, list(into), list(out), count))
+    return fn
+
+
+# the symbols the module defines, the level, the register allocator and
+# whether to return machine code rather than assembly
+_Settings = Tuple[Set[str], int, str, bool]
+
+# the settings of a pool worker, set once by the pool's initializer; a
+# serial build passes its own, so builds on separate threads do not share
+_worker: Optional[_Settings] = None
+
+
+def _initialize(defined: Set[str], level: int, allocator: str, obj: bool) -> None:
+    global _worker
+    _worker = (defined, level, allocator, obj)
+
+
+def _compile_in_worker(item: Tuple[int, bytes]):
+    return _compile(_worker, item)
+
+
+def _compile(settings: _Settings, item: Tuple[int, bytes]):
+    defined, level, allocator, obj = settings
+    index, data = item
+    fn = decode(data)
+    if level:
+        PassManager(pipeline(level)).run_function(fn)
+    mfn = compile_function(fn, defined, index, allocator)
+    return function_code(mfn) if obj else function_assembly(mfn)
+
+
+def compile_module(
+    module: Module,
+    level: int = 0,
+    jobs: int = 2,
+    obj: bool = False,
+    allocator: str = "linear-scan",
+) -> Union[str, bytes]:
+    """Optimizes ``module`` at ``-O<level>`` and returns its assembly, or
+    its ELF object if ``obj`` is set, compiling the functions in ``jobs``
+    processes."""
+    if inlining(level) is not None:
+        optimize(module, level=level)
+        level = 0
+    defined = defined_symbols(module)
+    work = [(k, encode(fn)) for k, fn in enumerate(module.functions)]
+    settings = (defined, level, allocator, obj)
+    jobs = min(jobs, len(work))
+    if jobs > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_initialize, initargs=settings
+        ) as pool:
+            chunksize = max(1, len(work) // (jobs * 4))
+            # map keeps the order of the module whichever worker finishes first
+            functions = list(pool.map(_compile_in_worker, work, chunksize=chunksize))
+    else:
+        functions = list(map(functools.partial(_compile, settings), work))
+    return object_file(module, functions) if obj else assembly(module, functions)
@@ -1,32 +1,201 @@
 import dataclasses
-from typing import List, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from . import ast
+from . import types
+from .constexpr import Constant, ConstantError, Evaluator
 from .file import Location
-from .token import Token
-from .scanner import Scanner
+from .token import Suffix, Token
+from .scanner import Literal, Scanner
 from .error import Error, Warning, Reporter
+from .symtab import Kind, SymbolTable, tag_name
+from .strings import StringPool
 
 
 class ParseError(Exception):
     pass
 
 
+BINARY_PRECEDENCE = {
+    Token.PIPE_PIPE: 1,
+    Token.AMPERSAND_AMPERSAND: 2,
+    Token.PIPE: 3,
+    Token.CARET: 4,
+    Token.AMPERSAND: 5,
+    Token.EQUALS_EQUALS: 6,
+    Token.EXCLAMATION_EQUALS: 6,
+    Token.LESS_THAN: 7,
+    Token.GREATER_THAN: 7,
+    Token.LESS_THAN_EQUALS: 7,
+    Token.GREATER_THAN_EQUALS: 7,
+    Token.LESS_THAN_LESS_THAN: 8,
+    Token.GREATER_THAN_GREATER_THAN: 8,
+    Token.PLUS: 9,
+    Token.MINUS: 9,
+    Token.STAR: 10,
+    Token.SLASH: 10,
+    Token.PERCENT: 10,
+}
+
+UNARY_OPERATORS = {
+    Token.PLUS,
+    Token.MINUS,
+    Token.TILDE,
+    Token.EXCLAMATION,
+    Token.AMPERSAND,
+    Token.STAR,
+    Token.PLUS_PLUS,
+    Token.MINUS_MINUS,
+}
+
+ASSIGNMENT_OPERATORS = {
+    Token.EQUALS,
+    Token.PLUS_EQUALS,
+    Token.MINUS_EQUALS,
+    Token.STAR_EQUALS,
+    Token.SLASH_EQUALS,
+    Token.PERCENT_EQUALS,
+    Token.LESS_THAN_LESS_THAN_EQUALS,
+    Token.GREATER_THAN_GREATER_THAN_EQUALS,
+    Token.AMPERSAND_EQUALS,
+    Token.PIPE_EQUALS,
+    Token.CARET_EQUALS,
+}
+
+STORAGE_CLASSES = {
+    Token.TYPEDEF,
+    Token.EXTERN,
+    Token.STATIC,
+    Token.THREAD_LOCAL,
+    Token.AUTO,
+    Token.REGISTER,
+}
+
+TYPE_QUALIFIERS = {Token.CONST, Token.RESTRICT, Token.VOLATILE, Token.ATOMIC}
+
+BASIC_TYPE_SPECIFIERS = {
+    Token.VOID,
+    Token.CHAR,
+    Token.SHORT,
+    Token.INT,
+    Token.LONG,
+    Token.FLOAT,
+    Token.DOUBLE,
+    Token.SIGNED,
+    Token.UNSIGNED,
+    Token.BOOL,
+    Token.COMPLEX,
+}
+
+TYPE_SPECIFIERS = BASIC_TYPE_SPECIFIERS | {Token.STRUCT, Token.UNION, Token.ENUM}
+
+DECLARATION_SPECIFIERS = (
+    STORAGE_CLASSES
+    | TYPE_SPECIFIERS
+    | TYPE_QUALIFIERS
+    | {Token.INLINE, Token.NORETURN, Token.ALIGNAS}
+)
+
+# (base specifier, number of longs, unsigned, signed) -> type
+_BASIC_TYPES = {
+    (Token.VOID, 0, False, False): types.VOID,
+    (Token.BOOL, 0, False, False): types.BOOL,
+    (Token.CHAR, 0, False, False): types.CHAR,
+    (Token.CHAR, 0, False, True): types.SIGNED_CHAR,
+    (Token.CHAR, 0, True, False): types.UNSIGNED_CHAR,
+    (Token.FLOAT, 0, False, False): types.FLOAT,
+    (Token.DOUBLE, 0, False, False): types.DOUBLE,
+    (Token.DOUBLE, 1, False, False): types.LONG_DOUBLE,
+}
+for _base, _longs, _signed, _unsigned in [
+    (Token.SHORT, 0, types.SHORT, types.UNSIGNED_SHORT),
+    (Token.INT, 0, types.INT, types.UNSIGNED_INT),
+    (Token.INT, 1, types.LONG, types.UNSIGNED_LONG),
+    (Token.INT, 2, types.LONG_LONG, types.UNSIGNED_LONG_LONG),
+]:
+    _BASIC_TYPES[_base, _longs, False, False] = _signed
+    _BASIC_TYPES[_base, _longs, False, True] = _signed
+    _BASIC_TYPES[_base, _longs, True, False] = _unsigned
+
+# type derivations of a declarator
+_POINTER = ("pointer",)
+_ARRAY = "array"
+_FUNCTION = "function"
+
+
+def _adjust_parameter_type(t: types.Type) -> types.Type:
+    # C11 6.7.6.3p7-8: array and function parameters are pointers
+    if isinstance(t, types.ArrayType):
+        return types.PointerType(t.base)
+    if isinstance(t, types.FunctionType):
+        return types.PointerType(t)
+    return t
+
+
+def _complete_array_type(t: types.Type, init: ast.Expr) -> types.Type:
+    """Takes the length of an array of unknown size from its initializer.
+    Designated indices are not taken into account."""
+    if not isinstance(t, types.ArrayType) or t.length is not None:
+        return t
+    if isinstance(init, ast.InitListExpr):
+        return types.ArrayType(t.base, len(init.inits))
+    if isinstance(init, ast.StringConstant):
+        return types.ArrayType(t.base, len(init.value) + 1)
+    return t
+
+
 @dataclasses.dataclass(frozen=True)
 class TokenData:
     kind: Token
     start: Location
     end: Location
     text: str
-    value: Union[int, float, str, None]
+    literal: Optional[Literal] = None
+    suffix: Suffix = Suffix.NONE
+
+    @property
+    def value(self) -> Union[int, float, str, None]:
+        if self.literal is None:
+            return None
+        return self.literal.value
+
+
+def tokenize(scanner: Scanner) -> Iterator[TokenData]:
+    while True:
+        tok = scanner.scan()
+        if tok in (Token.SINGLE_LINE_COMMENT, Token.MULTI_LINE_COMMENT):
+            continue
+        yield TokenData(
+            tok,
+            scanner.start,
+            scanner.end,
+            scanner.text,
+            scanner.literal,
+            scanner.suffix,
+        )
+        if tok == Token.EOF:
+            return
 
 
 @dataclasses.dataclass
 class TokenStream:
-    scanner: Scanner
+    scanner: Optional[Scanner]
+    # tokens to read instead of scanning, e.g. the result of a macro expansion
+    source: Optional[Iterator[TokenData]] = None
     pos: int = dataclasses.field(default=0, init=False)
     buf: List[TokenData] = dataclasses.field(default_factory=list, init=False)
     markers: List[int] = dataclasses.field(default_factory=list, init=False)
+    _last: Optional[TokenData] = dataclasses.field(default=None, init=False)
+    # the most recently consumed token
+    last: Optional[TokenData] = dataclasses.field(default=None, init=False)
+
+    def __post_init__(self):
+        if self.source is None:
+            self.source = tokenize(self.scanner)
+
+    @classmethod
+    def from_tokens(cls, tokens: Iterable[TokenData]) -> "TokenStream":
+        return cls(None, iter(tokens))
 
     def LT(self, i: int) -> TokenData:
         self.sync(i)
@@ -44,22 +213,23 @@ class TokenStream:
         for i in range(n):
             self.buf.append(self._scan())
 
-    def _scan(self) -> Token:
-        while True:
-            tok = self.scanner.scan()
-            if tok in (Token.SINGLE_LINE_COMMENT, Token.MULTI_LINE_COMMENT):
-                continue
-            return TokenData(
-                tok,
-                self.scanner.start,
-                self.scanner.end,
-                self.scanner.text,
-                self.scanner.value,
-            )
+    def _scan(self) -> TokenData:
+        tok = next(self.source, None)
+        if tok is None:
+            # keep returning the end of file once the source is exhausted
+            last = self._last
+            if last is None or last.kind != Token.EOF:
+                end = last.end if last is not None else Location("", 0, 1, 0)
+                last = TokenData(Token.EOF, end, end, "", None)
+                self._last = last
+            return last
+        self._last = tok
+        return tok
 
     def consume(self) -> None:
+        self.last = self.buf[self.pos]
         self.pos += 1
-        if self.pos == len(self.buf) and self.is_speculating():
+        if self.pos == len(self.buf) and not self.is_speculating():
             self.pos = 0
             self.buf.clear()
         self.sync(1)
@@ -79,44 +249,1063 @@ class TokenStream:
         return len(self.markers) > 0
 
 
+@dataclasses.dataclass
+class DeclSpec:
+    type: types.Type
+    storage: Optional[Token] = None
+    inline: bool = False
+    noreturn: bool = False
+    # struct, union and enum definitions made by the specifiers
+    decls: List[ast.Decl] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class Declarator:
+    # None for an abstract declarator
+    name: Optional[TokenData]
+    type: types.Type
+    # the parameters when the declarator declares a function
+    params: Optional[List[ast.ParamDecl]] = None
+
+
 @dataclasses.dataclass
 class Parser:
+    """Parses a translation unit from a ``TokenStream``.
+
+    Everything a parser changes while parsing, the token stream, symbol
+    table, string pool and reporter included, belongs to it; the module
+    level tables are only read. Any number of parsers can therefore run on
+    separate threads, while one parser must not be used by two at once.
+    """
+
     tokens: TokenStream
     reporter: Reporter
+    symbols: SymbolTable = dataclasses.field(default_factory=SymbolTable)
+    strings: StringPool = dataclasses.field(default_factory=StringPool)
+    # how deeply expressions, statements, declarators, struct definitions
+    # and initializers may nest; each level takes up to about ten Python
+    # frames, which fits Python's default recursion limit of 1000
+    max_nesting: int = 100
+    _nesting: int = dataclasses.field(default=0, init=False)
+    _last_error: int = dataclasses.field(default=-1, init=False)
+    evaluator: Evaluator = dataclasses.field(init=False)
 
-    def _expect(self, *tokens: List[Token]):
-        if self.tokens.LA(1) in tokens:
-            return
+    def __post_init__(self):
+        self.evaluator = Evaluator(self.reporter, resolve=self._resolve_constant)
+
+    def _speculate(self, parse: Callable[[], object]) -> bool:
+        """Reports whether ``parse`` succeeds from the current token, then
+        rewinds both the token stream and the symbol table, undoing whatever
+        it declared. Diagnostics are not reported while speculating, so a
+        parse which succeeds is repeated to report them."""
+        self.tokens.mark()
+        marker = self.symbols.mark()
+        depth = self._nesting
+        try:
+            parse()
+            return True
+        except ParseError:
+            self._nesting = depth
+            return False
+        finally:
+            self.symbols.release(marker)
+            self.tokens.release()
+
+    def _unknown_type_name(self, tok: TokenData, parse: Callable[[], object]) -> bool:
+        """Reports whether ``tok`` is an undeclared identifier used as the type
+        of the declaration ``parse`` parses, as ``size_t`` in ``size_t n;``
+        without its header. If the declaration parses with the name declared a
+        typedef of int, the name is reported and stays declared as one, so the
+        declaration can be parsed again and later uses of the name parse too.
+        """
+        if (
+            tok.kind != Token.IDENTIFIER
+            or self.tokens.LA(2) != Token.IDENTIFIER
+            or self.symbols.lookup(tok.text) is not None
+        ):
+            return False
+
+        def declaration():
+            self.symbols.declare(tok.text, Kind.TYPEDEF, types.INT)
+            parse()
+
+        if not self._speculate(declaration):
+            return False
+        message = f"unknown type name '{tok.text}'"
+        self._report(tok.start, Error.UNKNOWN_TYPE_NAME, message)
+        self.symbols.declare(tok.text, Kind.TYPEDEF, types.INT)
+        return True
+
+    def is_typedef_name(self, tok: TokenData) -> bool:
+        return tok.kind == Token.IDENTIFIER and self.symbols.is_typedef_name(tok.text)
+
+    def _error(self, tok: TokenData, error: Error, message: str) -> None:
+        # a second error at the same token is a cascade of the first one, and
+        # an invalid token has been reported by the scanner
+        if (
+            not self.tokens.is_speculating()
+            and tok.start.pos != self._last_error
+            and tok.kind != Token.INVALID
+        ):
+            self._last_error = tok.start.pos
+            self.reporter.error(tok.start, error, message)
+        raise ParseError(message)
+
+    def _expect(self, *tokens: List[Token]) -> TokenData:
+        tok = self.tokens.LT(1)
+        if tok.kind in tokens:
+            return tok
         if len(tokens) == 1:
             message = f"expected {tokens[0].value}"
         else:
             message = (
                 "expected "
                 + ", ".join([x.value for x in tokens[:-1]])
-                + f"or {tokens[-1].value}"
+                + f" or {tokens[-1].value}"
             )
-        self.reporter.error(self.tokens.LT(1).start, Error.UNEXPECTED_TOKEN, message)
-        # self.tokens.consume()
-        raise ParseError(message)
+        self._error(tok, Error.UNEXPECTED_TOKEN, message)
+
+    def _synchronize(self) -> Location:
+        """Skips the rest of a broken statement: past the next ``;`` or
+        balanced ``{...}`` block, or up to an unmatched ``}`` or the end of
+        file. Returns the end of the last skipped token."""
+        end = self.tokens.LT(1).start
+        depth = 0
+        while True:
+            tok = self.tokens.LT(1)
+            if tok.kind == Token.EOF:
+                return end
+            elif tok.kind == Token.LEFT_BRACE:
+                depth += 1
+            elif tok.kind == Token.RIGHT_BRACE:
+                if depth == 0:
+                    return end
+                depth -= 1
+            self.tokens.consume()
+            end = tok.end
+            if depth == 0 and tok.kind in (Token.SEMICOLON, Token.RIGHT_BRACE):
+                return end
+
+    def _nest(self) -> None:
+        """Enters a nested construct. The parser recurses on nested
+        constructs, so their depth is limited to keep clear of the Python
+        stack limit, and exceeding it is fatal. The caller leaves the
+        construct by decrementing ``_nesting``; where a ParseError is caught,
+        the depth is restored."""
+        self._nesting += 1
+        if self._nesting > self.max_nesting:
+            self.reporter.fatal(
+                self.tokens.LT(1).start,
+                Error.NESTING_TOO_DEEP,
+                f"nesting level exceeded maximum of {self.max_nesting}",
+            )
+
+    def _accept(self, kind: Token) -> Optional[TokenData]:
+        tok = self.tokens.LT(1)
+        if tok.kind != kind:
+            return None
+        self.tokens.consume()
+        return tok
+
+    def _match(self, *tokens: Token) -> TokenData:
+        tok = self._expect(*tokens)
+        self.tokens.consume()
+        return tok
+
+    def _end(self) -> Location:
+        """Returns the end of the last consumed token."""
+        return self.tokens.last.end
+
+    def _report(self, location: Location, error: Error, message: str) -> None:
+        """Reports a semantic error, which does not stop the parse."""
+        if not self.tokens.is_speculating():
+            self.reporter.error(location, error, message)
+
+    def _warn(self, location: Location, warning: Warning) -> None:
+        if not self.tokens.is_speculating():
+            self.reporter.warning(location, warning)
+
+    def _resolve_constant(self, name: str) -> Optional[Constant]:
+        symbol = self.symbols.lookup(name)
+        if symbol is not None and symbol.kind == Kind.ENUMERATOR:
+            return symbol.decl
+        return None
+
+    def _constant(self, expr: ast.Expr) -> Optional[int]:
+        """Evaluates an integer constant expression; errors are reported by the
+        evaluator and give None."""
+        try:
+            return self.evaluator.evaluate(expr).value
+        except ConstantError:
+            return None
+
+    def starts_declaration(self, tok: TokenData) -> bool:
+        return (
+            tok.kind in DECLARATION_SPECIFIERS
+            or tok.kind == Token.STATIC_ASSERT
+            or self.is_typedef_name(tok)
+        )
 
-    def parse() -> ast.TranslationUnit:
-        pass
+    def starts_type_name(self, tok: TokenData) -> bool:
+        return (
+            tok.kind in TYPE_SPECIFIERS
+            or tok.kind in TYPE_QUALIFIERS
+            or self.is_typedef_name(tok)
+        )
+
+    def parse(self) -> ast.TranslationUnit:
+        start = self.tokens.LT(1).start
+        decls = list(self.iter_declarations())
+        return ast.TranslationUnit(start, self.tokens.LT(1).end, decls)
+
+    def iter_declarations(self) -> Iterator[ast.Decl]:
+        """Yields the external declarations of the translation unit one at a
+        time, each as soon as it has been parsed.
+
+        A declaration with several declarators yields one node per declarator,
+        preceded by the struct, union and enum definitions in its specifiers.
+        Nothing refers back to a yielded node, so a consumer that drops it
+        keeps memory bounded by the largest single declaration.
+        """
+        while self.tokens.LA(1) != Token.EOF:
+            decls = self.parse_external_declaration()
+            # the evaluator caches results by node, keeping the nodes alive
+            self.evaluator.cache.clear()
+            yield from decls
+
+    def parse_external_declaration(self) -> List[ast.Decl]:
+        tok = self.tokens.LT(1)
+        depth = self._nesting
+        try:
+            if tok.kind == Token.SEMICOLON:
+                self.tokens.consume()
+                return []
+            self._unknown_type_name(tok, lambda: self.parse_declaration(external=True))
+            return self.parse_declaration(external=True)
+        except ParseError:
+            if self.tokens.is_speculating():
+                raise
+            self._nesting = depth
+            end = self._synchronize_declaration()
+            return [ast.ErrorDecl(tok.start, end)]
+
+    def _synchronize_declaration(self) -> Location:
+        """Skips the rest of a broken external declaration: past the next ``;``
+        or balanced ``{...}`` block at file scope, or up to a token that starts
+        a declaration in the first column. An unmatched ``}`` is skipped."""
+        end = self.tokens.LT(1).start
+        depth = 0
+        first = True
+        while True:
+            tok = self.tokens.LT(1)
+            if tok.kind == Token.EOF:
+                return end
+            if (
+                depth == 0
+                and not first
+                and tok.start.column == 0
+                and self.starts_declaration(tok)
+            ):
+                return end
+            if tok.kind == Token.LEFT_BRACE:
+                depth += 1
+            elif tok.kind == Token.RIGHT_BRACE and depth > 0:
+                depth -= 1
+            self.tokens.consume()
+            end = tok.end
+            first = False
+            if depth == 0 and tok.kind in (Token.SEMICOLON, Token.RIGHT_BRACE):
+                return end
+
+    def parse_declaration(self, external: bool = False) -> List[ast.Decl]:
+        start = self.tokens.LT(1)
+        if start.kind == Token.STATIC_ASSERT:
+            return [self.parse_static_assert()]
+        spec = self.parse_declaration_specifiers()
+        if self.tokens.LT(1) is start and start.kind not in (
+            Token.IDENTIFIER,
+            Token.STAR,
+            Token.LEFT_PAREN,
+        ):
+            self._error(start, Error.UNEXPECTED_TOKEN, "expected declaration")
+        decls = spec.decls
+        if self._accept(Token.SEMICOLON) is not None:
+            if not decls and not isinstance(spec.type, types.StructType):
+                self._warn(start.start, Warning.EMPTY_DECLARATION)
+            return decls
+        first = True
+        while True:
+            declarator = self.parse_declarator(spec.type)
+            decl = self._declare(start.start, spec, declarator)
+            if (
+                external
+                and isinstance(decl, ast.FunctionDecl)
+                and self.tokens.LA(1) == Token.LEFT_BRACE
+                and first
+            ):
+                decl.body = self.parse_function_body(decl)
+                decl.end = decl.body.end
+                decls.append(decl)
+                return decls
+            if self._accept(Token.EQUALS) is not None:
+                init = self.parse_initializer()
+                if isinstance(decl, ast.VarDecl):
+                    decl.init = init
+                    decl.type = _complete_array_type(decl.type, init)
+                    decl.end = init.end
+                else:
+                    self._report(
+                        init.start,
+                        Error.UNEXPECTED_TOKEN,
+                        f"illegal initializer for '{decl.name}'",
+                    )
+            decls.append(decl)
+            first = False
+            if self._accept(Token.COMMA) is None:
+                break
+        self._match(Token.SEMICOLON)
+        return decls
+
+    def _declare(
+        self, start: Location, spec: "DeclSpec", declarator: "Declarator"
+    ) -> ast.Decl:
+        name = declarator.name.text
+        t = declarator.type
+        end = self._end()
+        if spec.storage == Token.TYPEDEF:
+            self.symbols.declare(name, Kind.TYPEDEF, t)
+            return ast.TypedefDecl(start, end, name, t)
+        if isinstance(t, types.FunctionType):
+            self.symbols.declare(name, Kind.FUNCTION, t)
+            params = declarator.params or []
+            return ast.FunctionDecl(
+                start, end, name, t, spec.storage, params, None, spec.inline
+            )
+        self.symbols.declare(name, Kind.OBJECT, t)
+        return ast.VarDecl(start, end, name, t, spec.storage, None)
+
+    def parse_function_body(self, decl: ast.FunctionDecl) -> ast.CompoundStmt:
+        self.symbols.push_scope()
+        try:
+            for param in decl.params:
+                if param.name is not None:
+                    self.symbols.declare(param.name, Kind.OBJECT, param.type)
+            return self.parse_compound_stmt()
+        finally:
+            self.symbols.pop_scope()
+
+    def parse_declaration_specifiers(self, storage: bool = True) -> "DeclSpec":
+        """Parses declaration specifiers, or with ``storage`` false the
+        specifier-qualifier list of a type name or struct member."""
+        start = self.tokens.LT(1)
+        spec = DeclSpec(types.INT)
+        counts: Dict[Token, int] = {}
+        t: Optional[types.Type] = None
+        while True:
+            tok = self.tokens.LT(1)
+            kind = tok.kind
+            if kind in STORAGE_CLASSES and storage:
+                if spec.storage is not None:
+                    self._report(
+                        tok.start,
+                        Error.INVALID_DECLARATION_SPECIFIER,
+                        f"cannot combine '{kind.value}' with previous "
+                        f"'{spec.storage.value}' declaration specifier",
+                    )
+                spec.storage = kind
+            elif kind in TYPE_QUALIFIERS:
+                pass
+            elif kind == Token.INLINE and storage:
+                spec.inline = True
+            elif kind == Token.NORETURN and storage:
+                spec.noreturn = True
+            elif kind == Token.ALIGNAS:
+                self.tokens.consume()
+                self._match(Token.LEFT_PAREN)
+                if self.starts_type_name(self.tokens.LT(1)):
+                    self.parse_type_name()
+                else:
+                    self.parse_conditional_expr()
+                self._expect(Token.RIGHT_PAREN)
+            elif kind in (Token.STRUCT, Token.UNION, Token.ENUM) and t is None:
+                if kind == Token.ENUM:
+                    t = self.parse_enum_specifier(spec.decls)
+                else:
+                    t = self.parse_struct_specifier(spec.decls)
+                continue
+            elif kind in BASIC_TYPE_SPECIFIERS:
+                counts[kind] = counts.get(kind, 0) + 1
+            elif t is None and not counts and self.is_typedef_name(tok):
+                t = self.symbols.lookup(tok.text).decl
+            else:
+                break
+            self.tokens.consume()
+        if t is not None and counts:
+            self._report(
+                start.start,
+                Error.INVALID_DECLARATION_SPECIFIER,
+                "cannot combine with previous type specifier",
+            )
+        elif t is None:
+            t = self._basic_type(start, counts)
+        spec.type = t
+        return spec
+
+    def _basic_type(self, start: TokenData, counts: Dict[Token, int]) -> types.Type:
+        if not counts:
+            if self.tokens.LT(1) is not start or start.kind == Token.IDENTIFIER:
+                self._warn(start.start, Warning.IMPLICIT_INT)
+            return types.INT
+        signed = counts.pop(Token.SIGNED, 0)
+        unsigned = counts.pop(Token.UNSIGNED, 0)
+        longs = counts.pop(Token.LONG, 0)
+        counts.pop(Token.COMPLEX, None)
+        if counts.get(Token.INT) == 1 and (longs or Token.SHORT in counts):
+            del counts[Token.INT]
+        base = next(iter(counts), Token.INT)
+        t = _BASIC_TYPES.get((base, longs, bool(unsigned), bool(signed)))
+        if (
+            t is None
+            or len(counts) > 1
+            or any(n > 1 for n in counts.values())
+            or signed > 1
+            or unsigned > 1
+        ):
+            self._report(
+                start.start,
+                Error.INVALID_DECLARATION_SPECIFIER,
+                "cannot combine with previous type specifier",
+            )
+            return types.INT
+        return t
+
+    def _tag(self, kind: str) -> Tuple[TokenData, Optional[str]]:
+        keyword = self.tokens.LT(1)
+        self.tokens.consume()
+        tag = self._accept(Token.IDENTIFIER)
+        if tag is None and self.tokens.LA(1) != Token.LEFT_BRACE:
+            self._expect(Token.IDENTIFIER, Token.LEFT_BRACE)
+        return keyword, tag.text if tag is not None else None
+
+    def parse_struct_specifier(self, decls: List[ast.Decl]) -> types.Type:
+        kind = self.tokens.LA(1).value
+        keyword, tag = self._tag(kind)
+        symbol = self.symbols.lookup(tag_name(tag)) if tag is not None else None
+        if self.tokens.LA(1) != Token.LEFT_BRACE:
+            if symbol is not None and self.tokens.LA(1) != Token.SEMICOLON:
+                return symbol.decl
+            # a forward declaration, or the first use of the tag
+            if symbol is None or symbol.depth != self.symbols.depth:
+                symbol = self.symbols.declare(
+                    tag_name(tag), Kind.TAG, types.StructType(kind, tag)
+                )
+            return symbol.decl
+        t = None
+        if symbol is not None and symbol.depth == self.symbols.depth:
+            t = symbol.decl
+            if not isinstance(t, types.StructType) or t.is_complete:
+                self._report(
+                    keyword.start,
+                    Error.INVALID_DECLARATION_SPECIFIER,
+                    f"redefinition of '{kind} {tag}'",
+                )
+                t = None
+        if t is None:
+            t = types.StructType(kind, tag)
+            if tag is not None:
+                self.symbols.declare(tag_name(tag), Kind.TAG, t)
+        self.tokens.consume()
+        self._nest()
+        fields = []
+        widths = []
+        field_decls = []
+        while self.tokens.LA(1) not in (Token.RIGHT_BRACE, Token.EOF):
+            if self.tokens.LA(1) == Token.STATIC_ASSERT:
+                self.parse_static_assert()
+                continue
+            start = self.tokens.LT(1)
+            spec = self.parse_declaration_specifiers(storage=False)
+            if self._accept(Token.SEMICOLON) is not None:
+                # an anonymous struct or union member
+                fields.append((None, spec.type))
+                widths.append(None)
+                field_decls.append(
+                    ast.FieldDecl(start.start, self._end(), None, spec.type, None)
+                )
+                continue
+            while True:
+                name = None
+                field_type = spec.type
+                if self.tokens.LA(1) != Token.COLON:
+                    declarator = self.parse_declarator(spec.type)
+                    name = declarator.name.text
+                    field_type = declarator.type
+                width = None
+                if self._accept(Token.COLON) is not None:
+                    width = self.parse_conditional_expr()
+                    widths.append(self._bit_width(name, field_type, width))
+                else:
+                    widths.append(None)
+                fields.append((name, field_type))
+                field_decls.append(
+                    ast.FieldDecl(start.start, self._end(), name, field_type, width)
+                )
+                if self._accept(Token.COMMA) is None:
+                    break
+            self._match(Token.SEMICOLON)
+        rbrace = self._match(Token.RIGHT_BRACE)
+        self._nesting -= 1
+        t.complete(fields, widths)
+        decls.append(ast.RecordDecl(keyword.start, rbrace.end, t, field_decls))
+        return t
+
+    def _bit_width(
+        self, name: Optional[str], t: types.Type, expr: ast.Expr
+    ) -> Optional[int]:
+        """Returns the width of a bit-field, or None after reporting why it is
+        invalid, in which case the field is laid out as a whole member."""
+        width = self._constant(expr)
+        if width is None:
+            return None
+        field = "unnamed bit-field" if name is None else f"bit-field '{name}'"
+        if not isinstance(t, types.IntegerType):
+            message = f"{field} has non-integral type '{t}'"
+        elif width < 0:
+            message = f"{field} has negative width ({width})"
+        elif width > t.size * 8:
+            message = (
+                f"width of {field} ({width} bits) exceeds the width of its type "
+                f"({t.size * 8} bits)"
+            )
+        elif width == 0 and name is not None:
+            message = f"named {field} has zero width"
+        else:
+            return width
+        self._report(expr.start, Error.INVALID_BIT_FIELD, message)
+        return None
+
+    def parse_enum_specifier(self, decls: List[ast.Decl]) -> types.Type:
+        # enumerated types are compatible with int, which represents them
+        keyword, tag = self._tag("enum")
+        if self.tokens.LA(1) != Token.LEFT_BRACE:
+            return types.INT
+        self.tokens.consume()
+        if tag is not None:
+            self.symbols.declare(tag_name(tag), Kind.TAG, types.INT)
+        constants = []
+        value = 0
+        while self.tokens.LA(1) != Token.RIGHT_BRACE:
+            name = self._match(Token.IDENTIFIER)
+            init = None
+            if self._accept(Token.EQUALS) is not None:
+                init = self.parse_conditional_expr()
+                result = self._constant(init)
+                if result is not None:
+                    value = result
+            constant = Constant(types.INT, types.INT.wrap(value))
+            self.symbols.declare(name.text, Kind.ENUMERATOR, constant)
+            constants.append(
+                ast.EnumConstantDecl(
+                    name.start, self._end(), name.text, constant.value, init
+                )
+            )
+            value += 1
+            if self._accept(Token.COMMA) is None:
+                break
+        rbrace = self._match(Token.RIGHT_BRACE)
+        decls.append(ast.EnumDecl(keyword.start, rbrace.end, types.INT, constants))
+        return types.INT
+
+    def parse_static_assert(self) -> ast.StaticAssertDecl:
+        keyword = self.tokens.LT(1)
+        self.tokens.consume()
+        self._match(Token.LEFT_PAREN)
+        cond = self.parse_conditional_expr()
+        message = None
+        if self._accept(Token.COMMA) is not None:
+            self._expect(Token.STRING_CONSTANT)
+            message = self.parse_string_constant()
+        self._match(Token.RIGHT_PAREN)
+        semi = self._match(Token.SEMICOLON)
+        if self._constant(cond) == 0:
+            text = Error.STATIC_ASSERT_FAILED.value
+            if message is not None:
+                text += f": {message.value}"
+            self._report(keyword.start, Error.STATIC_ASSERT_FAILED, text)
+        return ast.StaticAssertDecl(keyword.start, semi.end, cond, message)
+
+    def parse_type_name(self) -> types.Type:
+        spec = self.parse_declaration_specifiers(storage=False)
+        declarator = self.parse_declarator(spec.type, abstract=True)
+        if declarator.name is not None:
+            self._error(
+                declarator.name, Error.UNEXPECTED_TOKEN, "expected abstract declarator"
+            )
+        return declarator.type
+
+    def parse_declarator(
+        self, base: types.Type, abstract: bool = False
+    ) -> "Declarator":
+        name, ops = self._parse_declarator_ops(abstract)
+        t = base
+        params = None
+        for op in ops:
+            params = None
+            if op is _POINTER:
+                t = types.PointerType(t)
+            elif op[0] == _ARRAY:
+                t = types.ArrayType(t, op[1])
+            else:
+                _, params, variadic, prototype = op
+                param_types = tuple(x.type for x in params)
+                t = types.FunctionType(t, param_types, variadic, prototype)
+        return Declarator(name, t, params)
+
+    def _parse_declarator_ops(self, abstract: bool) -> Tuple[Optional[TokenData], list]:
+        """Returns the name of a declarator and its type derivations in the
+        order they apply to the specified type: pointers bind looser than the
+        array and function suffixes, which bind looser than a parenthesized
+        inner declarator."""
+        pointers = 0
+        while self._accept(Token.STAR) is not None:
+            pointers += 1
+            while self.tokens.LA(1) in TYPE_QUALIFIERS:
+                self.tokens.consume()
+        name = None
+        inner: list = []
+        tok = self.tokens.LT(1)
+        if tok.kind == Token.IDENTIFIER:
+            name = tok
+            self.tokens.consume()
+        elif tok.kind == Token.LEFT_PAREN and self._is_nested_declarator():
+            self.tokens.consume()
+            self._nest()
+            name, inner = self._parse_declarator_ops(abstract)
+            self._match(Token.RIGHT_PAREN)
+            self._nesting -= 1
+        elif not abstract:
+            self._error(tok, Error.UNEXPECTED_TOKEN, "expected identifier or (")
+        suffixes = []
+        while True:
+            kind = self.tokens.LA(1)
+            if kind == Token.LEFT_BRACKET:
+                self.tokens.consume()
+                suffixes.append((_ARRAY, self._parse_array_length()))
+                self._match(Token.RIGHT_BRACKET)
+            elif kind == Token.LEFT_PAREN:
+                self.tokens.consume()
+                self._nest()
+                suffixes.append((_FUNCTION, *self.parse_parameter_list()))
+                self._match(Token.RIGHT_PAREN)
+                self._nesting -= 1
+            else:
+                break
+        suffixes.reverse()
+        return name, [_POINTER] * pointers + suffixes + inner
+
+    def _is_nested_declarator(self) -> bool:
+        tok = self.tokens.LT(2)
+        if tok.kind in (Token.STAR, Token.LEFT_PAREN):
+            return True
+        return tok.kind == Token.IDENTIFIER and not self.is_typedef_name(tok)
+
+    def _parse_array_length(self) -> Optional[int]:
+        while self.tokens.LA(1) in TYPE_QUALIFIERS or self.tokens.LA(1) == Token.STATIC:
+            self.tokens.consume()
+        if self.tokens.LA(1) == Token.RIGHT_BRACKET:
+            return None
+        if self.tokens.LA(1) == Token.STAR and self.tokens.LA(2) == Token.RIGHT_BRACKET:
+            self.tokens.consume()
+            return None
+        expr = self.parse_assignment_expr()
+        # a length which is not constant makes a variable length array
+        result = self.evaluator.try_evaluate(expr)
+        return None if result is None else result.value
+
+    def parse_parameter_list(self) -> Tuple[List[ast.ParamDecl], bool, bool]:
+        """Returns the parameters, whether the function is variadic and whether
+        the declarator is a prototype."""
+        if self.tokens.LA(1) == Token.RIGHT_PAREN:
+            return [], False, False
+        if self.tokens.LA(1) == Token.VOID and self.tokens.LA(2) == Token.RIGHT_PAREN:
+            self.tokens.consume()
+            return [], False, True
+        params = []
+        variadic = False
+        self.symbols.push_scope()
+        try:
+            while True:
+                if params and self._accept(Token.ELLIPSIS) is not None:
+                    variadic = True
+                    break
+                start = self.tokens.LT(1)
+                if not self.starts_declaration(start):
+                    self._error(
+                        start, Error.UNEXPECTED_TOKEN, "expected parameter declarator"
+                    )
+                spec = self.parse_declaration_specifiers()
+                declarator = self.parse_declarator(spec.type, abstract=True)
+                t = _adjust_parameter_type(declarator.type)
+                name = None
+                if declarator.name is not None:
+                    name = declarator.name.text
+                    self.symbols.declare(name, Kind.OBJECT, t)
+                params.append(ast.ParamDecl(start.start, self._end(), name, t))
+                if self._accept(Token.COMMA) is None:
+                    break
+        finally:
+            self.symbols.pop_scope()
+        return params, variadic, True
+
+    def parse_initializer(self) -> ast.Expr:
+        lbrace = self._accept(Token.LEFT_BRACE)
+        if lbrace is None:
+            return self.parse_assignment_expr()
+        self._nest()
+        inits: List[ast.Expr] = []
+        while self.tokens.LA(1) != Token.RIGHT_BRACE:
+            start = self.tokens.LT(1)
+            designators = []
+            while self.tokens.LA(1) in (Token.PERIOD, Token.LEFT_BRACKET):
+                tok = self.tokens.LT(1)
+                self.tokens.consume()
+                if tok.kind == Token.PERIOD:
+                    name = self._match(Token.IDENTIFIER)
+                    designators.append(
+                        ast.Designator(tok.start, name.end, name.text, None)
+                    )
+                else:
+                    index = self.parse_conditional_expr()
+                    rbracket = self._match(Token.RIGHT_BRACKET)
+                    designators.append(
+                        ast.Designator(tok.start, rbracket.end, None, index)
+                    )
+            if designators:
+                self._match(Token.EQUALS)
+                init = self.parse_initializer()
+                init = ast.DesignatedInitExpr(start.start, init.end, designators, init)
+            else:
+                init = self.parse_initializer()
+            inits.append(init)
+            if self._accept(Token.COMMA) is None:
+                break
+        rbrace = self._match(Token.RIGHT_BRACE)
+        self._nesting -= 1
+        return ast.InitListExpr(lbrace.start, rbrace.end, inits)
 
     def parse_stmt(self) -> ast.Stmt:
+        tok = self.tokens.LT(1)
+        self._nest()
+        depth = self._nesting
+        try:
+            kind = tok.kind
+            if kind == Token.LEFT_BRACE:
+                return self.parse_compound_stmt()
+            elif kind == Token.SEMICOLON:
+                self.tokens.consume()
+                return ast.NullStmt(tok.start, tok.end)
+            elif kind == Token.IF:
+                return self.parse_if_stmt()
+            elif kind == Token.SWITCH:
+                return self.parse_switch_stmt()
+            elif kind == Token.WHILE:
+                return self.parse_while_stmt()
+            elif kind == Token.DO:
+                return self.parse_do_stmt()
+            elif kind == Token.FOR:
+                return self.parse_for_stmt()
+            elif kind in (Token.GOTO, Token.CONTINUE, Token.BREAK, Token.RETURN):
+                return self.parse_jump_stmt()
+            elif kind in (Token.CASE, Token.DEFAULT):
+                return self.parse_case_stmt()
+            elif kind == Token.IDENTIFIER and self.tokens.LA(2) == Token.COLON:
+                return self.parse_label_stmt()
+            return self.parse_expr_stmt()
+        except ParseError:
+            if self.tokens.is_speculating():
+                raise
+            self._nesting = depth
+            end = self._synchronize()
+            return ast.ErrorStmt(tok.start, end)
+        finally:
+            self._nesting -= 1
+
+    def parse_block_item(self) -> ast.Stmt:
+        tok = self.tokens.LT(1)
+        if not self._unknown_type_name(tok, self.parse_decl_stmt) and (
+            not self.starts_declaration(tok) or self.tokens.LA(2) == Token.COLON
+        ):
+            return self.parse_stmt()
+        depth = self._nesting
+        try:
+            return self.parse_decl_stmt()
+        except ParseError:
+            if self.tokens.is_speculating():
+                raise
+            self._nesting = depth
+            end = self._synchronize()
+            return ast.ErrorStmt(tok.start, end)
+
+    def parse_decl_stmt(self) -> ast.DeclStmt:
+        start = self.tokens.LT(1)
+        decls = self.parse_declaration()
+        return ast.DeclStmt(start.start, self._end(), decls)
+
+    def parse_compound_stmt(self) -> ast.CompoundStmt:
+        lbrace = self._expect(Token.LEFT_BRACE)
+        self.tokens.consume()
+        stmts = []
+        self.symbols.push_scope()
+        try:
+            while self.tokens.LA(1) not in (Token.RIGHT_BRACE, Token.EOF):
+                stmts.append(self.parse_block_item())
+        finally:
+            self.symbols.pop_scope()
+        rbrace = self._expect(Token.RIGHT_BRACE)
+        self.tokens.consume()
+        return ast.CompoundStmt(lbrace.start, rbrace.end, stmts)
+
+    def _parse_paren_expr(self) -> ast.Expr:
+        self._match(Token.LEFT_PAREN)
+        expr = self.parse_expr()
+        self._match(Token.RIGHT_PAREN)
+        return expr
+
+    def parse_if_stmt(self) -> ast.IfStmt:
+        keyword = self._match(Token.IF)
+        cond = self._parse_paren_expr()
+        then = self.parse_stmt()
+        otherwise = None
+        if self._accept(Token.ELSE) is not None:
+            otherwise = self.parse_stmt()
+        end = (otherwise or then).end
+        return ast.IfStmt(keyword.start, end, cond, then, otherwise)
+
+    def parse_switch_stmt(self) -> ast.SwitchStmt:
+        keyword = self._match(Token.SWITCH)
+        cond = self._parse_paren_expr()
+        body = self.parse_stmt()
+        return ast.SwitchStmt(keyword.start, body.end, cond, body)
+
+    def parse_while_stmt(self) -> ast.WhileStmt:
+        keyword = self._match(Token.WHILE)
+        cond = self._parse_paren_expr()
+        body = self.parse_stmt()
+        return ast.WhileStmt(keyword.start, body.end, cond, body)
+
+    def parse_do_stmt(self) -> ast.DoStmt:
+        keyword = self._match(Token.DO)
+        body = self.parse_stmt()
+        self._match(Token.WHILE)
+        cond = self._parse_paren_expr()
+        semi = self._match(Token.SEMICOLON)
+        return ast.DoStmt(keyword.start, semi.end, body, cond)
+
+    def parse_for_stmt(self) -> ast.ForStmt:
+        keyword = self._match(Token.FOR)
+        self._match(Token.LEFT_PAREN)
+        # a declaration in the first clause is scoped to the loop
+        self.symbols.push_scope()
+        try:
+            init: Optional[ast.Stmt] = None
+            if self.starts_declaration(self.tokens.LT(1)):
+                init = self.parse_decl_stmt()
+            elif self._accept(Token.SEMICOLON) is None:
+                init = self.parse_expr_stmt()
+            cond = None
+            if self.tokens.LA(1) != Token.SEMICOLON:
+                cond = self.parse_expr()
+            self._match(Token.SEMICOLON)
+            step = None
+            if self.tokens.LA(1) != Token.RIGHT_PAREN:
+                step = self.parse_expr()
+            self._match(Token.RIGHT_PAREN)
+            body = self.parse_stmt()
+        finally:
+            self.symbols.pop_scope()
+        return ast.ForStmt(keyword.start, body.end, init, cond, step, body)
+
+    def parse_jump_stmt(self) -> ast.Stmt:
+        keyword = self.tokens.LT(1)
+        self.tokens.consume()
+        if keyword.kind == Token.GOTO:
+            label = self._match(Token.IDENTIFIER)
+            semi = self._match(Token.SEMICOLON)
+            return ast.GotoStmt(keyword.start, semi.end, label.text)
+        elif keyword.kind == Token.RETURN:
+            expr = None
+            if self.tokens.LA(1) != Token.SEMICOLON:
+                expr = self.parse_expr()
+            semi = self._match(Token.SEMICOLON)
+            return ast.ReturnStmt(keyword.start, semi.end, expr)
+        semi = self._match(Token.SEMICOLON)
+        if keyword.kind == Token.BREAK:
+            return ast.BreakStmt(keyword.start, semi.end)
+        return ast.ContinueStmt(keyword.start, semi.end)
+
+    def parse_case_stmt(self) -> ast.Stmt:
+        keyword = self.tokens.LT(1)
+        self.tokens.consume()
+        if keyword.kind == Token.DEFAULT:
+            self._match(Token.COLON)
+            stmt = self.parse_stmt()
+            return ast.DefaultStmt(keyword.start, stmt.end, stmt)
+        expr = self.parse_conditional_expr()
+        self._match(Token.COLON)
+        stmt = self.parse_stmt()
+        return ast.CaseStmt(keyword.start, stmt.end, expr, stmt)
+
+    def parse_label_stmt(self) -> ast.LabelStmt:
+        name = self._match(Token.IDENTIFIER)
+        self._match(Token.COLON)
+        stmt = self.parse_stmt()
+        return ast.LabelStmt(name.start, stmt.end, name.text, stmt)
+
+    def parse_expr_stmt(self) -> ast.ExprStmt:
         expr = self.parse_expr()
-        self._expect(Token.SEMICOLON)
-        semi = self.tokens.LT(1)
+        semi = self._expect(Token.SEMICOLON)
         self.tokens.consume()
         return ast.ExprStmt(expr.start, semi.end, expr)
 
     def parse_expr(self) -> ast.Expr:
-        return self.parse_primary_expr()
+        expr = self.parse_assignment_expr()
+        while self.tokens.LA(1) == Token.COMMA:
+            self.tokens.consume()
+            right = self.parse_assignment_expr()
+            expr = ast.BinaryExpr(expr.start, right.end, Token.COMMA, expr, right)
+        return expr
+
+    def parse_assignment_expr(self) -> ast.Expr:
+        expr = self.parse_conditional_expr()
+        op = self.tokens.LA(1)
+        if op in ASSIGNMENT_OPERATORS:
+            self.tokens.consume()
+            self._nest()
+            right = self.parse_assignment_expr()
+            self._nesting -= 1
+            return ast.BinaryExpr(expr.start, right.end, op, expr, right)
+        return expr
+
+    def parse_conditional_expr(self) -> ast.Expr:
+        cond = self.parse_binary_expr(1)
+        if self.tokens.LA(1) != Token.QUESTION:
+            return cond
+        self.tokens.consume()
+        self._nest()
+        then = self.parse_expr()
+        self._expect(Token.COLON)
+        self.tokens.consume()
+        otherwise = self.parse_conditional_expr()
+        self._nesting -= 1
+        return ast.ConditionalExpr(cond.start, otherwise.end, cond, then, otherwise)
+
+    def parse_binary_expr(self, precedence: int) -> ast.Expr:
+        expr = self.parse_cast_expr()
+        while True:
+            op = self.tokens.LA(1)
+            p = BINARY_PRECEDENCE.get(op, 0)
+            if p < precedence:
+                return expr
+            self.tokens.consume()
+            right = self.parse_binary_expr(p + 1)
+            expr = ast.BinaryExpr(expr.start, right.end, op, expr, right)
+
+    def parse_cast_expr(self) -> ast.Expr:
+        tok = self.tokens.LT(1)
+        if tok.kind == Token.LEFT_PAREN and self.starts_type_name(self.tokens.LT(2)):
+            self.tokens.consume()
+            t = self.parse_type_name()
+            self._match(Token.RIGHT_PAREN)
+            self._nest()
+            expr = self.parse_cast_expr()
+            self._nesting -= 1
+            return ast.CastExpr(tok.start, expr.end, t, expr)
+        return self.parse_unary_expr()
+
+    def parse_unary_expr(self) -> ast.Expr:
+        tok = self.tokens.LT(1)
+        if tok.kind in UNARY_OPERATORS:
+            self.tokens.consume()
+            self._nest()
+            if tok.kind in (Token.PLUS_PLUS, Token.MINUS_MINUS):
+                operand = self.parse_unary_expr()
+            else:
+                operand = self.parse_cast_expr()
+            self._nesting -= 1
+            return ast.UnaryExpr(tok.start, operand.end, tok.kind, operand)
+        if tok.kind in (Token.SIZEOF, Token.ALIGNOF):
+            self.tokens.consume()
+            if self.tokens.LA(1) == Token.LEFT_PAREN and self.starts_type_name(
+                self.tokens.LT(2)
+            ):
+                self.tokens.consume()
+                t = self.parse_type_name()
+                rparen = self._match(Token.RIGHT_PAREN)
+                return ast.SizeofExpr(tok.start, rparen.end, tok.kind, t, None)
+            self._nest()
+            operand = self.parse_unary_expr()
+            self._nesting -= 1
+            return ast.SizeofExpr(tok.start, operand.end, tok.kind, None, operand)
+        return self.parse_postfix_expr()
+
+    def parse_postfix_expr(self) -> ast.Expr:
+        expr = self.parse_primary_expr()
+        while True:
+            tok = self.tokens.LT(1)
+            kind = tok.kind
+            if kind == Token.LEFT_BRACKET:
+                self.tokens.consume()
+                self._nest()
+                index = self.parse_expr()
+                self._nesting -= 1
+                rbracket = self._match(Token.RIGHT_BRACKET)
+                expr = ast.SubscriptExpr(expr.start, rbracket.end, expr, index)
+            elif kind == Token.LEFT_PAREN:
+                self.tokens.consume()
+                args = []
+                self._nest()
+                if self.tokens.LA(1) != Token.RIGHT_PAREN:
+                    args.append(self.parse_assignment_expr())
+                    while self._accept(Token.COMMA) is not None:
+                        args.append(self.parse_assignment_expr())
+                self._nesting -= 1
+                rparen = self._match(Token.RIGHT_PAREN)
+                expr = ast.CallExpr(expr.start, rparen.end, expr, args)
+            elif kind in (Token.PERIOD, Token.ARROW):
+                self.tokens.consume()
+                name = self._match(Token.IDENTIFIER)
+                expr = ast.MemberExpr(
+                    expr.start, name.end, expr, name.text, kind == Token.ARROW
+                )
+            elif kind in (Token.PLUS_PLUS, Token.MINUS_MINUS):
+                self.tokens.consume()
+                expr = ast.PostfixExpr(expr.start, tok.end, kind, expr)
+            else:
+                return expr
 
     def parse_ref_decl_expr(self) -> ast.RefDeclExpr:
         self._expect(Token.IDENTIFIER)
         tok = self.tokens.LT(1)
         self.tokens.consume()
-        return ast.RefDeclExpr(tok.start, tok.end, tok.value)
+        return ast.RefDeclExpr(tok.start, tok.end, tok.text)
+
+    def parse_string_constant(self) -> ast.StringConstant:
+        """Parses a sequence of adjacent string literals as one, which
+        translation phase 6 concatenates."""
+        first = self.tokens.LT(1)
+        self.tokens.consume()
+        tok = self.tokens.LT(1)
+        if tok.kind != Token.STRING_CONSTANT:
+            value = self.strings.intern(first.value)
+            return ast.StringConstant(first.start, first.end, first.text, value)
+        parts = [first]
+        while tok.kind == Token.STRING_CONSTANT:
+            parts.append(tok)
+            self.tokens.consume()
+            tok = self.tokens.LT(1)
+        text = " ".join(x.text for x in parts)
+        value = self.strings.concatenate([x.value for x in parts])
+        return ast.StringConstant(first.start, parts[-1].end, text, value)
 
     def parse_primary_expr(self) -> ast.Expr:
         constants = {
@@ -128,14 +1317,29 @@ class Parser:
 
         self._expect(Token.IDENTIFIER, Token.LEFT_PAREN, *constants.keys())
         tok = self.tokens.LT(1)
+        if self.is_typedef_name(tok):
+            self._error(
+                tok,
+                Error.UNEXPECTED_TYPE_NAME,
+                f"unexpected type name '{tok.text}': expected expression",
+            )
         if tok.kind == Token.IDENTIFIER:
             return self.parse_ref_decl_expr()
+        elif tok.kind in (Token.INTEGER_CONSTANT, Token.FLOATING_CONSTANT):
+            self.tokens.consume()
+            return constants[tok.kind](
+                tok.start, tok.end, tok.text, tok.value, tok.suffix
+            )
+        elif tok.kind == Token.STRING_CONSTANT:
+            return self.parse_string_constant()
         elif tok.kind in constants:
             self.tokens.consume()
             return constants[tok.kind](tok.start, tok.end, tok.text, tok.value)
         elif tok.kind == Token.LEFT_PAREN:
             self.tokens.consume()
+            self._nest()
             e = self.parse_expr()
-            rparen = self._expect(Token.RPAREN)
+            self._nesting -= 1
+            rparen = self._expect(Token.RIGHT_PAREN)
             self.tokens.consume()
             return ast.ParenExpr(tok.start, rparen.end, e)
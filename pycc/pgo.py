@@ -0,0 +1,193 @@
+"""Profile-guided optimization.
+
+``instrument`` adds a counter to every block of the functions of a module
+as it is lowered, and a constructor registering a function which appends
+the counters to the profile file when the program exits. ``read_profile``
+sums the records of every run, and ``annotate`` sets the counts of the
+blocks of the same module lowered again. The blocks keep their counts
+through the optimizer, where they bias the inliner, to the code generator,
+which lays out the hot blocks on the fall-through path and moves the ones
+which never ran to a separate section.
+
+A profile is a text file of records, appended by every run:
+
+    unit <file>
+    function <name> <checksum> <count>...
+
+The checksum covers the shape of the lowered function, so that the record
+of an older version of the source is not applied to the wrong blocks.
+"""
+import array
+import dataclasses
+import os
+import zlib
+from typing import Dict, List, Tuple
+
+from .ir import Function, Global, Module, Op, ValueType
+
+# where the profile goes unless another file is given
+DEFAULT_PATH = "pycc.profile"
+COUNTERS = "__pycc_profile_counts"
+
+# the runtime of an instrumented unit, compiled with it
+_RUNTIME = r"""
+typedef struct _IO_FILE FILE;
+FILE *fopen(const char *, const char *);
+int fprintf(FILE *, const char *, ...);
+int fclose(FILE *);
+int atexit(void (*)(void));
+static long __pycc_profile_counts[{counters}];
+static const char *const __pycc_profile_names[] = {{{names}}};
+static const int __pycc_profile_sizes[] = {{{sizes}}};
+static void __pycc_profile_dump(void) {{
+    FILE *fp = fopen({path}, "a");
+    int k = 0;
+    if (!fp)
+        return;
+    fprintf(fp, "unit %s\n", {unit});
+    for (int i = 0; i < {functions}; i++) {{
+        fprintf(fp, "function %s", __pycc_profile_names[i]);
+        for (int j = 0; j < __pycc_profile_sizes[i]; j++)
+            fprintf(fp, " %ld", __pycc_profile_counts[k++]);
+        fprintf(fp, "\n");
+    }}
+    fclose(fp);
+}}
+static void __pycc_profile_init(void) {{ atexit(__pycc_profile_dump); }}
+"""
+
+
+def checksum(fn: Function) -> int:
+    """Returns a CRC of the blocks of ``fn``, their edges and the opcodes of
+    their instructions."""
+    shape = array.array("q", [len(fn.blocks)])
+    ops = bytearray()
+    for block in fn.blocks:
+        shape.append(len(block.insts))
+        shape.append(len(block.succs))
+        shape.extend(block.succs)
+        ops.extend(fn.op[i] for i in block.insts)
+    return zlib.crc32(ops, zlib.crc32(shape.tobytes()))
+
+
+def _c_string(text: str) -> str:
+    escaped = "".join(
+        chr(x) if 32 <= x < 127 and x not in b'"\\' else f"\\{x:03o}"
+        for x in text.encode()
+    )
+    return f'"{escaped}"'
+
+
+def _count(fn: Function, block: int, index: int) -> None:
+    """Increments counter ``index`` at the start of ``block``, after its
+    phis."""
+    i64 = ValueType.I64
+    counters = fn.create(block, Op.GLOBAL, i64, fn.name_index(COUNTERS))
+    offset = fn.create(block, Op.CONST, i64, 8 * index)
+    address = fn.create(block, Op.ADD, i64, counters, offset)
+    old = fn.create(block, Op.LOAD, i64, address)
+    one = fn.create(block, Op.CONST, i64, 1)
+    new = fn.create(block, Op.ADD, i64, old, one)
+    store = fn.create(block, Op.STORE, a=address, b=new)
+    insts = fn.blocks[block].insts
+    at = 0
+    while at < len(insts) and fn.op[insts[at]] in (Op.PHI, Op.NOP):
+        at += 1
+    insts[at:at] = array.array("q", [counters, offset, address, old, one, new, store])
+
+
+def instrument(module: Module, unit: str, path: str = DEFAULT_PATH) -> None:
+    """Counts the runs of every block of the functions of ``module``, which
+    is lowered from ``unit``, and makes the program append the counts to the
+    profile at ``path`` when it exits."""
+    from .error import Reporter
+    from .file import File
+    from .lower import Lowering
+    from .parser import Parser, TokenStream
+    from .scanner import Scanner
+
+    functions = [fn for fn in module.functions if fn.blocks]
+    if not functions:
+        return
+    names = []
+    sizes = []
+    counters = 0
+    for fn in functions:
+        names.append(_c_string(f"{fn.name} {checksum(fn)}"))
+        sizes.append(str(len(fn.blocks)))
+        for block in fn.blocks:
+            _count(fn, block.id, counters)
+            counters += 1
+    source = _RUNTIME.format(
+        counters=counters,
+        names=", ".join(names),
+        sizes=", ".join(sizes),
+        functions=len(functions),
+        path=_c_string(os.path.abspath(path)),
+        unit=_c_string(unit),
+    )
+    reporter = Reporter()
+    tokens = TokenStream(Scanner(File("<profile>", source), reporter))
+    Lowering(reporter, module).lower(Parser(tokens, reporter).iter_declarations())
+    # registers the dump at start-up
+    module.globals.append(
+        Global(
+            "__pycc_profile_constructor",
+            8,
+            8,
+            bytes(8),
+            [(0, "__pycc_profile_init", 0)],
+            static=True,
+            section=".init_array",
+        )
+    )
+
+
+@dataclasses.dataclass
+class Profile:
+    # the checksum and counts of every function by unit and name, summed
+    # over the runs
+    functions: Dict[Tuple[str, str], Tuple[int, List[int]]] = dataclasses.field(
+        default_factory=dict
+    )
+
+    def add(self, unit: str, name: str, checksum: int, counts: List[int]) -> None:
+        record = self.functions.get((unit, name))
+        if record is not None and record[0] == checksum:
+            counts = [x + y for x, y in zip(record[1], counts)]
+        self.functions[unit, name] = (checksum, counts)
+
+
+def read_profile(path: str) -> Profile:
+    """Reads the profile at ``path``; a function recorded again with another
+    checksum replaces the older records."""
+    profile = Profile()
+    unit = None
+    with open(path, encoding="utf-8", errors="surrogateescape") as fp:
+        for line in fp:
+            if line.startswith("unit "):
+                unit = line[len("unit ") :].rstrip("\n")
+                continue
+            fields = line.split()
+            if unit is None or len(fields) < 3 or fields[0] != "function":
+                continue
+            counts = [int(x) for x in fields[3:]]
+            profile.add(unit, fields[1], int(fields[2]), counts)
+    return profile
+
+
+def annotate(module: Module, profile: Profile, unit: str) -> List[str]:
+    """Sets the counts of the blocks of the functions of ``module``, lowered
+    from ``unit``, from ``profile``. Returns the names of the functions whose
+    record does not match their code, which are left without counts."""
+    stale = []
+    for fn in module.functions:
+        record = profile.functions.get((unit, fn.name))
+        if record is None:
+            continue
+        if record[0] != checksum(fn) or len(record[1]) != len(fn.blocks):
+            stale.append(fn.name)
+            continue
+        for block, count in zip(fn.blocks, record[1]):
+            block.count = count
+    return stale
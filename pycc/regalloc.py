@@ -0,0 +1,426 @@
+import bisect
+import dataclasses
+import heapq
+from typing import Dict, List, Set, Tuple, Union
+
+from .ir import NONE
+from .x86 import (
+    ALLOCATABLE,
+    FIRST_VIRTUAL,
+    R10,
+    RBP,
+    RBX,
+    SCRATCH,
+    Inst,
+    MFunction,
+    Mem,
+)
+
+INF = 1 << 62
+
+# where a value lives: a physical register or a stack slot
+Location = Union[int, Mem]
+
+
+class AllocationError(Exception):
+    pass
+
+
+@dataclasses.dataclass(eq=False)
+class Interval:
+    """A piece of the live range of a virtual register.
+
+    Instruction ``k`` reads its operands at position ``2k`` and writes its
+    results at ``2k + 1``. A live range starts as one interval from its
+    first definition or live-in block to its last use or live-out block,
+    and is split at even positions, between instructions, when it cannot
+    stay in one register; the pieces without uses live in the stack slot of
+    the register.
+    """
+
+    vreg: int
+    start: int
+    end: int
+    # positions at which the value must be in a register
+    uses: List[int] = dataclasses.field(default_factory=list)
+    reg: int = NONE
+
+    def next_use(self, position: int) -> int:
+        k = bisect.bisect_left(self.uses, position)
+        return self.uses[k] if k < len(self.uses) else INF
+
+
+def liveness(fn: MFunction, registers) -> Tuple[List[Set[int]], List[Set[int]]]:
+    """Returns the virtual registers live into and out of every block, from
+    the registers written and read by every instruction."""
+    gen: List[Set[int]] = []
+    kill: List[Set[int]] = []
+    k = 0
+    for block in fn.blocks:
+        g: Set[int] = set()
+        d: Set[int] = set()
+        for _ in block.insts:
+            defs, uses = registers[k]
+            k += 1
+            for r in uses:
+                if r >= FIRST_VIRTUAL and r not in d:
+                    g.add(r)
+            for r in defs:
+                if r >= FIRST_VIRTUAL:
+                    d.add(r)
+        gen.append(g)
+        kill.append(d)
+    live_in: List[Set[int]] = [set(g) for g in gen]
+    live_out: List[Set[int]] = [set() for _ in fn.blocks]
+    work = list(range(len(fn.blocks)))
+    queued = [True] * len(fn.blocks)
+    while work:
+        b = work.pop()
+        queued[b] = False
+        out = live_out[b]
+        for succ in fn.blocks[b].succs:
+            out |= live_in[succ]
+        new = gen[b] | (out - kill[b])
+        if new != live_in[b]:
+            live_in[b] = new
+            for pred in fn.blocks[b].preds:
+                if not queued[pred]:
+                    queued[pred] = True
+                    work.append(pred)
+    return live_in, live_out
+
+
+def _sequence(moves: List[Tuple[Location, Location]]) -> List[Inst]:
+    """Orders a parallel copy, breaking cycles through the scratch
+    register."""
+    moves = [(s, d) for s, d in moves if s != d]
+    out: List[Inst] = []
+    while moves:
+        for k, (s, d) in enumerate(moves):
+            if all(d != s2 for j, (s2, _) in enumerate(moves) if j != k):
+                if isinstance(s, Mem) and isinstance(d, Mem):
+                    out.append(Inst("mov", 8, [s, SCRATCH]))
+                    s = SCRATCH
+                out.append(Inst("mov", 8, [s, d]))
+                del moves[k]
+                break
+        else:
+            d = moves[0][1]
+            out.append(Inst("mov", 8, [d, SCRATCH]))
+            moves = [(SCRATCH if s == d else s, d2) for s, d2 in moves]
+    return out
+
+
+@dataclasses.dataclass
+class LinearScan:
+    """Linear scan register allocation with live range splitting (after
+    Wimmer and Franz).
+
+    Intervals are allocated in order of their start. One which can have a
+    register only for a while is split where the register is needed again,
+    and when none is free the interval whose next use is furthest away is
+    split and its middle part spilled, so values stay in registers around
+    their uses. Registers used by fixed instructions such as calls and
+    divisions block their allocatable register for the positions where
+    they are live. Moves between the pieces are inserted afterwards, as
+    parallel copies between instructions and on control flow edges.
+    """
+
+    fn: MFunction
+    # the bytes of the frame already used by stack allocations
+    frame_offset: int = 0
+    registers: List[Tuple[List[int], List[int]]] = dataclasses.field(
+        default_factory=list
+    )
+    pieces: Dict[int, List[Interval]] = dataclasses.field(default_factory=dict)
+    fixed: Dict[int, List[Tuple[int, int]]] = dataclasses.field(default_factory=dict)
+    hints: Dict[int, int] = dataclasses.field(default_factory=dict)
+    slots: Dict[int, Mem] = dataclasses.field(default_factory=dict)
+    _unhandled: list = dataclasses.field(default_factory=list)
+    _count: int = 0
+
+    def run(self) -> None:
+        fn = self.fn
+        insts = [x for block in fn.blocks for x in block.insts]
+        self.registers = [x.registers() for x in insts]
+        live_in, live_out = liveness(fn, self.registers)
+        self._build(live_in, live_out, insts)
+        self._allocate()
+        self._rewrite(live_in)
+        fn.frame_size = self.frame_offset + 8 * len(self.slots)
+
+    def _build(self, live_in, live_out, insts: List[Inst]) -> None:
+        ranges: Dict[int, List[int]] = {}
+        uses: Dict[int, List[int]] = {}
+
+        def extend(v: int, start: int, end: int) -> None:
+            r = ranges.get(v)
+            if r is None:
+                ranges[v] = [start, end]
+            else:
+                r[0] = min(r[0], start)
+                r[1] = max(r[1], end)
+
+        fixed: Dict[int, List[Tuple[int, int]]] = {r: [] for r in ALLOCATABLE}
+        k = 0
+        for b, block in enumerate(self.fn.blocks):
+            first = 2 * k
+            for v in live_in[b]:
+                extend(v, first, first)
+            opened: Dict[int, List[int]] = {}
+            for inst in block.insts:
+                defs, used = self.registers[k]
+                for r in used:
+                    if r >= FIRST_VIRTUAL:
+                        extend(r, 2 * k, 2 * k)
+                        uses.setdefault(r, []).append(2 * k)
+                    elif r in fixed:
+                        opened.setdefault(r, [first, 2 * k])[1] = 2 * k
+                for r in defs:
+                    if r >= FIRST_VIRTUAL:
+                        extend(r, 2 * k + 1, 2 * k + 1)
+                        uses.setdefault(r, []).append(2 * k + 1)
+                    elif r in fixed:
+                        if r in opened:
+                            fixed[r].append(tuple(opened[r]))
+                        opened[r] = [2 * k + 1, 2 * k + 1]
+                if inst.op == "mov" and isinstance(inst.args[0], int):
+                    src, dst = inst.args
+                    if isinstance(dst, int):
+                        if dst >= FIRST_VIRTUAL:
+                            self.hints.setdefault(dst, src)
+                        elif src >= FIRST_VIRTUAL:
+                            self.hints.setdefault(src, dst)
+                k += 1
+            for r, span in opened.items():
+                fixed[r].append(tuple(span))
+            last = 2 * k - 1
+            for v in live_out[b]:
+                extend(v, last, last)
+        for r in fixed:
+            fixed[r].sort()
+        self.fixed = fixed
+        for v, (start, end) in ranges.items():
+            interval = Interval(v, start, end, sorted(set(uses.get(v, ()))))
+            self.pieces[v] = [interval]
+            self._push(interval)
+
+    def _push(self, interval: Interval) -> None:
+        heapq.heappush(self._unhandled, (interval.start, self._count, interval))
+        self._count += 1
+
+    def _next_fixed(self, reg: int, position: int) -> int:
+        """Returns the first position from ``position`` on at which ``reg``
+        is used by a fixed instruction."""
+        spans = self.fixed[reg]
+        k = bisect.bisect_left(spans, (position + 1,)) - 1
+        if k >= 0 and spans[k][1] >= position:
+            return position
+        k += 1
+        return spans[k][0] if k < len(spans) else INF
+
+    def _split(self, interval: Interval, position: int) -> Interval:
+        """Splits ``interval`` before the even ``position`` and returns the
+        second part."""
+        k = bisect.bisect_left(interval.uses, position)
+        child = Interval(interval.vreg, position, interval.end, interval.uses[k:])
+        interval.uses = interval.uses[:k]
+        interval.end = position - 1
+        pieces = self.pieces[interval.vreg]
+        pieces.insert(pieces.index(interval) + 1, child)
+        return child
+
+    def _spill(self, interval: Interval, position: int) -> None:
+        """Moves ``interval`` to the stack from the even ``position``, up to
+        its next use."""
+        if position > interval.start:
+            interval = self._split(interval, position)
+        interval.reg = NONE
+        if interval.uses:
+            use = interval.uses[0] & ~1
+            if use <= interval.start:
+                raise AllocationError(f"v{interval.vreg} is needed at {use}")
+            self._push(self._split(interval, use))
+
+    def _hint(self, interval: Interval) -> int:
+        hint = self.hints.get(interval.vreg, NONE)
+        if hint >= FIRST_VIRTUAL:
+            pieces = self.pieces.get(hint, ())
+            for piece in pieces:
+                if piece.start <= interval.start <= piece.end + 1:
+                    return piece.reg
+            return NONE
+        return hint
+
+    def _allocate(self) -> None:
+        active: List[Interval] = []
+        while self._unhandled:
+            _, _, cur = heapq.heappop(self._unhandled)
+            position = cur.start
+            active = [x for x in active if x.end >= position]
+            if not cur.uses:
+                continue
+            free = {r: self._next_fixed(r, position) for r in ALLOCATABLE}
+            for x in active:
+                free[x.reg] = 0
+            reg = self._hint(cur)
+            if free.get(reg, 0) <= cur.end:
+                reg = max(ALLOCATABLE, key=lambda r: free[r])
+            until = free[reg]
+            if until > cur.end:
+                cur.reg = reg
+                active.append(cur)
+                continue
+            split = until & ~1
+            if split > position and cur.uses[0] < split:
+                cur.reg = reg
+                active.append(cur)
+                self._push(self._split(cur, split))
+                continue
+            self._allocate_blocked(cur, active)
+
+    def _allocate_blocked(self, cur: Interval, active: List[Interval]) -> None:
+        position = cur.start
+        # an interval read by the current instruction cannot give way
+        here = position & ~1
+        first = cur.uses[0]
+        use_at = {r: self._next_fixed(r, position) for r in ALLOCATABLE}
+        blocked = dict(use_at)
+        for x in active:
+            use_at[x.reg] = min(use_at[x.reg], x.next_use(here))
+        for r in ALLOCATABLE:
+            # a register taken by a fixed instruction right after this one
+            # leaves no room to move the value out of it
+            if blocked[r] <= cur.end and blocked[r] & ~1 <= position:
+                use_at[r] = -1
+        reg = max(ALLOCATABLE, key=lambda r: use_at[r])
+        if use_at[reg] <= first and first & ~1 > position:
+            # everything else is needed sooner: spill until the first use
+            cur.reg = NONE
+            self._push(self._split(cur, first & ~1))
+            return
+        if use_at[reg] <= here or blocked[reg] <= first:
+            raise AllocationError(f"no register for v{cur.vreg} at {position}")
+        for x in [x for x in active if x.reg == reg]:
+            active.remove(x)
+            self._spill(x, here if here > x.start else x.start)
+        cur.reg = reg
+        active.append(cur)
+        if blocked[reg] <= cur.end:
+            self._push(self._split(cur, blocked[reg] & ~1))
+
+    def _location(self, vreg: int, position: int) -> Location:
+        pieces = self.pieces[vreg]
+        k = bisect.bisect_right([x.start for x in pieces], position) - 1
+        piece = pieces[max(k, 0)]
+        if piece.reg != NONE:
+            return piece.reg
+        slot = self.slots.get(vreg)
+        if slot is None:
+            disp = -(self.frame_offset + 8 * (len(self.slots) + 1))
+            slot = self.slots[vreg] = Mem(RBP, disp=disp)
+        return slot
+
+    def _register(self, vreg: int, position: int) -> int:
+        if vreg < FIRST_VIRTUAL:
+            return vreg
+        location = self._location(vreg, position)
+        if isinstance(location, Mem):
+            raise AllocationError(f"v{vreg} is not in a register at {position}")
+        return location
+
+    def _rewrite(self, live_in: List[Set[int]]) -> None:
+        fn = self.fn
+        starts: List[int] = []
+        k = 0
+        for block in fn.blocks:
+            starts.append(k)
+            k += len(block.insts)
+        block_start = set(starts)
+        # parallel copies before instruction k: on entry to its block from a
+        # predecessor, between the pieces of a split interval, and on exit
+        # to a successor, in that order
+        entry: Dict[int, List[Tuple[Location, Location]]] = {}
+        moves: Dict[int, List[Tuple[Location, Location]]] = {}
+        exit: Dict[int, List[Tuple[Location, Location]]] = {}
+        for vreg, pieces in self.pieces.items():
+            for before, after in zip(pieces, pieces[1:]):
+                k = after.start // 2
+                if k in block_start:
+                    continue
+                src = self._location(vreg, before.end)
+                dst = self._location(vreg, after.start)
+                moves.setdefault(k, []).append((src, dst))
+        for b, block in enumerate(fn.blocks):
+            last = starts[b] + len(block.insts) - 1
+            for succ in block.succs:
+                first = starts[succ]
+                # critical edges are split, so one side has a single edge
+                if len(block.succs) == 1:
+                    group = exit.setdefault(last, [])
+                else:
+                    group = entry.setdefault(first, [])
+                for vreg in live_in[succ]:
+                    src = self._location(vreg, 2 * last + 1)
+                    dst = self._location(vreg, 2 * first)
+                    if src != dst:
+                        group.append((src, dst))
+        k = 0
+        for block in fn.blocks:
+            insts = []
+            for inst in block.insts:
+                position = 2 * k
+                for group in (entry, moves, exit):
+                    if k in group:
+                        insts.extend(_sequence(group[k]))
+                inst.map_registers(
+                    lambda r: self._register(r, position),
+                    lambda r: self._register(r, position + 1),
+                )
+                insts.append(inst)
+                k += 1
+            block.insts = insts
+
+
+def allocate(fn: MFunction, frame_offset: int) -> None:
+    """Assigns registers to the virtual registers of ``fn`` in place."""
+    LinearScan(fn, frame_offset).run()
+
+
+# the registers a naive allocator loads operands into
+_NAIVE_REGISTERS = (R10, SCRATCH, RBX)
+
+
+def allocate_naive(fn: MFunction, frame_offset: int) -> None:
+    """Keeps every virtual register in a stack slot, loading operands into
+    fixed registers before each instruction and storing results after it,
+    as a stack machine would. Used as a baseline."""
+    slots: Dict[int, Mem] = {}
+
+    def slot(vreg: int) -> Mem:
+        mem = slots.get(vreg)
+        if mem is None:
+            disp = -(frame_offset + 8 * (len(slots) + 1))
+            mem = slots[vreg] = Mem(RBP, disp=disp)
+        return mem
+
+    for block in fn.blocks:
+        insts = []
+        for inst in block.insts:
+            defs, uses = inst.registers()
+            assigned: Dict[int, int] = {}
+            for r in uses + defs:
+                if r >= FIRST_VIRTUAL and r not in assigned:
+                    assigned[r] = _NAIVE_REGISTERS[len(assigned)]
+            for r in dict.fromkeys(uses):
+                if r >= FIRST_VIRTUAL:
+                    insts.append(Inst("mov", 8, [slot(r), assigned[r]]))
+            inst.map_registers(
+                lambda r: assigned.get(r, r), lambda r: assigned.get(r, r)
+            )
+            insts.append(inst)
+            for r in dict.fromkeys(defs):
+                if r >= FIRST_VIRTUAL:
+                    insts.append(Inst("mov", 8, [assigned[r], slot(r)]))
+        block.insts = insts
+    fn.frame_size = frame_offset + 8 * len(slots)
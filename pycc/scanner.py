@@ -1,9 +1,9 @@
 import dataclasses
-from typing import Union
-from io import StringIO
+import re
+from typing import Optional, Tuple, Union
 
-from .token import Token, KEYWORDS
-from .file import File, Location
+from .token import Token, Suffix, KEYWORDS
+from .file import File, Location, SourceMap
 from .error import Error, Warning, Reporter
 
 
@@ -26,6 +26,97 @@ ESCAPES = {
 
 _KEYWORDS = {x.value: x for x in KEYWORDS}
 
+# runs of characters which need no attention inside a character sequence
+_PLAIN_CHARACTERS = {
+    "'": re.compile(r"[^'\\\r\n]+"),
+    '"': re.compile(r'[^"\\\r\n]+'),
+}
+
+_IDENTIFIER_CHARACTERS = re.compile(r"\w*")
+_WHITESPACE = re.compile(r"\s+")
+_LINE = re.compile(r"[^\r\n]*")
+_HEXADECIMAL_DIGITS = re.compile(r"[0-9a-fA-F]*")
+_DECIMAL_DIGITS = re.compile(r"[0-9]*")
+_EXPONENT = re.compile(r"[eE]")
+_INVALID_DIGIT = {8: re.compile(r"[^0-7]"), 10: re.compile(r"[^0-9]")}
+
+_FLOATING_SUFFIXES = {
+    "": Suffix.NONE,
+    "f": Suffix.FLOAT,
+    "F": Suffix.FLOAT,
+    "l": Suffix.LONG,
+    "L": Suffix.LONG,
+}
+
+
+def decode_character_sequence(text: str) -> str:
+    """Decodes the escape sequences of a character sequence which has already
+    been validated by the scanner."""
+    if "\\" not in text:
+        return text
+    out = []
+    i = 0
+    n = len(text)
+    while i < n:
+        j = text.find("\\", i)
+        if j < 0:
+            out.append(text[i:])
+            break
+        out.append(text[i:j])
+        c = text[j + 1]
+        i = j + 2
+        if c in OCTAL_DIGIT:
+            while i < n and i < j + 4 and text[i] in OCTAL_DIGIT:
+                i += 1
+            out.append(chr(int(text[j + 1 : i], 8)))
+        elif c == "x" or c == "X":
+            while i < n and text[i] in HEXADECIMAL_DIGIT:
+                i += 1
+            out.append(chr(int(text[j + 2 : i], 16)))
+        elif c == "\r":
+            if i < n and text[i] == "\n":
+                i += 1
+        elif c != "\n":
+            out.append(ESCAPES.get(c, c))
+    return "".join(out)
+
+
+_UNDECODED = object()
+
+
+@dataclasses.dataclass(eq=False)
+class Literal:
+    """The undecoded value of a literal token.
+
+    Only the span of the value in the source and its base are recorded while
+    scanning; ``value`` is decoded the first time it is accessed. Decoding
+    is idempotent, so tokens can be read from several threads.
+    """
+
+    kind: Token
+    source: str = dataclasses.field(repr=False)
+    start: int
+    end: int
+    base: int = 10
+    _value: object = dataclasses.field(default=_UNDECODED, init=False, repr=False)
+
+    @property
+    def value(self) -> Union[int, float, str]:
+        value = self._value
+        if value is _UNDECODED:
+            value = self._value = self.decode()
+        return value
+
+    def decode(self) -> Union[int, float, str]:
+        text = self.source[self.start : self.end]
+        if self.kind == Token.INTEGER_CONSTANT:
+            return int(text, self.base)
+        elif self.kind == Token.FLOATING_CONSTANT:
+            if self.base == 16:
+                return float.fromhex(text)
+            return float(text)
+        return decode_character_sequence(text)
+
 
 @dataclasses.dataclass
 class Scanner:
@@ -36,23 +127,49 @@ class Scanner:
     endpos: int = dataclasses.field(default=0, init=False)
     line: int = dataclasses.field(default=1, init=False)
     column: int = dataclasses.field(default=0, init=False)
-    value: Union[int, float, str, None] = dataclasses.field(init=False)
+    literal: Optional[Literal] = dataclasses.field(default=None, init=False)
+    suffix: Suffix = dataclasses.field(default=Suffix.NONE, init=False)
     start: Location = dataclasses.field(init=False)
     end: Location = dataclasses.field(init=False)
+    # the text after translation phases 1 and 2, and its map to the file
+    source: str = dataclasses.field(init=False, repr=False)
+    source_map: Optional[SourceMap] = dataclasses.field(init=False, repr=False)
+    _line_start: Tuple[int, int] = dataclasses.field(default=(0, 0), init=False)
+
+    def __post_init__(self):
+        self.source, self.source_map = self.file.translate()
 
     @property
     def text(self) -> str:
-        return self.file.source[self.startpos : self.endpos]
+        return self.source[self.startpos : self.endpos]
+
+    @property
+    def value(self) -> Union[int, float, str, None]:
+        if self.literal is None:
+            return None
+        return self.literal.value
 
     def _peek(self, off=0) -> str:
         pos = self.pos + off
-        if pos < len(self.file.source):
-            c = self.file.source[pos]
+        if pos < len(self.source):
+            c = self.source[pos]
             return c
         return ""
 
     def _location(self):
-        return Location(self.file.filename, self.pos, self.line, self.column)
+        if self.source_map is None:
+            return Location(self.file.filename, self.pos, self.line, self.column)
+        pos, newlines = self.source_map.lookup(self.pos)
+        # search for the start of the line only since the previous location
+        mark, line_start = self._line_start
+        if pos < mark:
+            mark = line_start = 0
+        source = self.file.source
+        found = max(source.rfind("\n", mark, pos), source.rfind("\r", mark, pos))
+        if found >= 0:
+            line_start = found + 1
+        self._line_start = (pos, line_start)
+        return Location(self.file.filename, pos, self.line + newlines, pos - line_start)
 
     def _consume(self, off=1) -> None:
         self.pos += off
@@ -68,7 +185,8 @@ class Scanner:
         return tok
 
     def _scan(self) -> Token:
-        self.value = None
+        self.literal = None
+        self.suffix = Suffix.NONE
 
         c = self._peek()
         if c == "":
@@ -255,13 +373,10 @@ class Scanner:
             return Token.INVALID
 
     def _scan_identifier(self) -> Token:
-        while True:
-            c = self._peek()
-            if c == "_" or c.isalnum():
-                self._consume()
-            else:
-                break
-        text = self.file.source[self.startpos : self.pos]
+        # \w matches the underscore and the characters str.isalnum accepts
+        end = _IDENTIFIER_CHARACTERS.match(self.source, self.pos).end()
+        self._consume(end - self.pos)
+        text = self.source[self.startpos : self.pos]
         return _KEYWORDS.get(text, Token.IDENTIFIER)
 
     def _scan_number(self) -> Token:
@@ -280,29 +395,27 @@ class Scanner:
                     self._consume()
                     base = 16
                     startpos = self.pos
-        invalid_digit = False
-        while True:
-            c = self._peek()
-            if c not in HEXADECIMAL_DIGIT:
-                break
-            if base != 16 and (c == "e" or c == "E"):
+        digits = _HEXADECIMAL_DIGITS.match(self.source, self.pos).group()
+        if base != 16:
+            m = _EXPONENT.search(digits)
+            if m is not None:
+                self._consume(m.start())
                 return self._scan_decimal_fractional_part()
-            if not invalid_digit:
-                if base == 8 and c not in "01234567":
-                    invalid_digit = True
-                    self.reporter.error(
-                        self._location(),
-                        Error.INVALID_DIGIT,
-                        f"invalid digit '{c}' in octal constant",
-                    )
-                elif base == 10 and not c.isdigit():
-                    invalid_digit = True
-                    self.reporter.error(
-                        self._location(),
-                        Error.INVALID_DIGIT,
-                        f"invalid digit '{c}' in decimal constant",
-                    )
-            self._consume()
+        invalid_digit = False
+        if base != 16:
+            m = _INVALID_DIGIT[base].search(digits)
+            if m is not None:
+                invalid_digit = True
+                self._consume(m.start())
+                name = "octal" if base == 8 else "decimal"
+                self.reporter.error(
+                    self._location(),
+                    Error.INVALID_DIGIT,
+                    f"invalid digit '{m.group()}' in {name} constant",
+                )
+                digits = digits[m.start() :]
+        self._consume(len(digits))
+        c = self._peek()
         if c == ".":
             self._consume()
             if base == 8 or base == 10:
@@ -315,14 +428,18 @@ class Scanner:
         suffix = self._scan_number_suffix()
         if invalid_digit:
             return Token.INVALID
-        if not self._validate_integer_constant_suffix(suffix):
+        flags = self._parse_integer_constant_suffix(suffix)
+        if flags is None:
             self.reporter.error(
                 self._location(),
                 Error.INVALID_INTEGER_CONSTANT_SUFFIX,
                 f"invalid suffix '{suffix}' on integer constant",
             )
             return Token.INVALID
-        self.value = int(self.file.source[startpos:endpos], base)
+        self.literal = Literal(
+            Token.INTEGER_CONSTANT, self.source, startpos, endpos, base
+        )
+        self.suffix = flags
         return Token.INTEGER_CONSTANT
 
     def _scan_number_suffix(self) -> str:
@@ -331,14 +448,12 @@ class Scanner:
         while c.isalnum() or c == ".":
             self._consume()
             c = self._peek()
-        return self.file.source[startpos : self.pos]
+        return self.source[startpos : self.pos]
 
     def _scan_decimal_fractional_part(self) -> Token:
-        while True:
-            c = self._peek()
-            if not c.isdigit():
-                break
-            self._consume()
+        digits = _DECIMAL_DIGITS.match(self.source, self.pos)
+        self._consume(digits.end() - self.pos)
+        c = self._peek()
         invalid_exponent = False
         if c == "e" or c == "E":
             self._consume()
@@ -360,22 +475,23 @@ class Scanner:
         suffix = self._scan_number_suffix()
         if invalid_exponent:
             return Token.INVALID
-        elif suffix not in ("", "f", "l", "F", "L"):
+        elif suffix not in _FLOATING_SUFFIXES:
             self.reporter.error(
                 self._location(),
                 Error.INVALID_FLOATING_CONSTANT_SUFFIX,
                 f"invalid suffix '{suffix}' on floating constant",
             )
             return Token.INVALID
-        self.value = float(self.file.source[self.startpos : endpos])
+        self.suffix = _FLOATING_SUFFIXES[suffix]
+        self.literal = Literal(
+            Token.FLOATING_CONSTANT, self.source, self.startpos, endpos
+        )
         return Token.FLOATING_CONSTANT
 
     def _scan_hexadecimal_fractional_part(self) -> Token:
-        while True:
-            c = self._peek()
-            if c not in HEXADECIMAL_DIGIT:
-                break
-            self._consume()
+        digits = _HEXADECIMAL_DIGITS.match(self.source, self.pos)
+        self._consume(digits.end() - self.pos)
+        c = self._peek()
         invalid_exponent = False
         if c == "p" or c == "P":
             self._consume()
@@ -404,53 +520,64 @@ class Scanner:
         suffix = self._scan_number_suffix()
         if invalid_exponent:
             return Token.INVALID
-        elif suffix not in ("", "f", "l", "F", "L"):
+        elif suffix not in _FLOATING_SUFFIXES:
             self.reporter.error(
                 self._location(),
                 Error.INVALID_FLOATING_CONSTANT_SUFFIX,
                 f"invalid suffix '{suffix}' on floating constant",
             )
             return Token.INVALID
-        self.value = float.fromhex(self.file.source[self.startpos : endpos])
+        self.suffix = _FLOATING_SUFFIXES[suffix]
+        self.literal = Literal(
+            Token.FLOATING_CONSTANT, self.source, self.startpos, endpos, 16
+        )
         return Token.FLOATING_CONSTANT
 
-    def _validate_integer_constant_suffix(self, suffix) -> bool:
+    def _parse_integer_constant_suffix(self, suffix) -> Optional[Suffix]:
         i = 0
-        unsigned = False
-        long = False
+        flags = Suffix.NONE
         while i < len(suffix):
             c = suffix[i]
             i += 1
-            if c in "uU" and not unsigned:
-                unsigned = True
-            elif c in "lL" and not long:
-                if i < len(suffix):
-                    c2 = suffix[i]
-                    if c2 == c:
-                        i += 1
-                long = True
+            if c in "uU" and not flags & Suffix.UNSIGNED:
+                flags |= Suffix.UNSIGNED
+            elif c in "lL" and not flags & (Suffix.LONG | Suffix.LONG_LONG):
+                if i < len(suffix) and suffix[i] == c:
+                    i += 1
+                    flags |= Suffix.LONG_LONG
+                else:
+                    flags |= Suffix.LONG
             else:
-                return False
-        return True
+                return None
+        return flags
 
     def _scan_character_constant(self) -> Token:
         try:
-            self.value = self._scan_character_sequence("'")
+            self._scan_character_sequence("'")
         except ValueError:
             return Token.INVALID
+        self.literal = Literal(
+            Token.CHARACTER_CONSTANT, self.source, self.startpos + 1, self.pos - 1
+        )
         return Token.CHARACTER_CONSTANT
 
     def _scan_string_constant(self) -> Token:
         try:
-            self.value = self._scan_character_sequence('"')
+            self._scan_character_sequence('"')
         except ValueError:
             return Token.INVALID
+        self.literal = Literal(
+            Token.STRING_CONSTANT, self.source, self.startpos + 1, self.pos - 1
+        )
         return Token.STRING_CONSTANT
 
-    def _scan_character_sequence(self, quote) -> str:
-        out = StringIO()
+    def _scan_character_sequence(self, quote) -> None:
+        plain = _PLAIN_CHARACTERS[quote]
         error = None
         while True:
+            m = plain.match(self.source, self.pos)
+            if m is not None:
+                self._consume(m.end() - self.pos)
             c = self._peek()
             if c != "":
                 self._consume()
@@ -458,23 +585,21 @@ class Scanner:
                 break
             elif c == "\\":
                 try:
-                    out.write(self._scan_escape_sequence())
+                    self._scan_escape_sequence()
                 except ValueError as e:
                     error = e
-            elif c == "\r" or c == "\n" or c == "":
-                message = "missing terminating ' character"
-                self.reporter.error(
-                    self._location(), Error.UNTERMINATED_CHARACTER, message
-                )
-                raise ValueError(message)
             else:
-                out.write(c)
+                message = f"missing terminating {quote} character"
+                if quote == '"':
+                    kind = Error.UNTERMINATED_STRING
+                else:
+                    kind = Error.UNTERMINATED_CHARACTER
+                self.reporter.error(self._location(), kind, message)
+                raise ValueError(message)
         if error:
             raise error
-        return out.getvalue()
 
-    def _scan_escape_sequence(self, csize=1) -> str:
-        pos = self.pos
+    def _scan_escape_sequence(self, csize=1) -> None:
         c = self._peek()
         self._consume()
         if c in OCTAL_DIGIT:
@@ -482,16 +607,14 @@ class Scanner:
                 self._consume()
                 if self._peek() in OCTAL_DIGIT:
                     self._consume()
-            return chr(int(self.file.source[pos : self.pos], 8))
         elif c == "x" or c == "X":
-            self._consume()
             pos = self.pos
             while True:
                 c = self._peek()
                 if c not in HEXADECIMAL_DIGIT:
                     break
                 self._consume()
-            text = self.file.source[pos : self.pos]
+            text = self.source[pos : self.pos]
             if len(text) == 0:
                 message = r"\x used with no following hex digits"
                 self.reporter.error(
@@ -502,58 +625,58 @@ class Scanner:
                 message = "hex escape sequence out of range"
                 self.reporter.error(self._location(), Error.INVALID_ESCAPE_SEQUENCE)
                 raise ValueError(message)
-            return chr(int(text, 16))
         elif c == "\r" or c == "\n":
+            # _consume() above has moved past the newline already
+            self.pos -= 1
+            self.column -= 1
             self._scan_newline()
-            return ""
-        elif c in ESCAPES:
-            return ESCAPES[c]
-        self.reporter.warning(
-            self._location(),
-            Warning.UNKNOWN_ESCAPE_SEQUENCE,
-            f"unknown escape sequence '\\{c}'",
-        )
-        return c
+        elif c not in ESCAPES:
+            self.reporter.warning(
+                self._location(),
+                Warning.UNKNOWN_ESCAPE_SEQUENCE,
+                f"unknown escape sequence '\\{c}'",
+            )
 
     def _scan_single_line_comment(self) -> Token:
-        while True:
-            c = self._peek()
-            if c == "":
-                break
-            elif c == "\r" or c == "\n":
-                self._scan_newline()
-                break
-            self._consume()
+        end = _LINE.match(self.source, self.pos).end()
+        self._consume(end - self.pos)
+        self._scan_newline()
         return Token.SINGLE_LINE_COMMENT
 
     def _scan_multi_line_comment(self) -> Token:
-        while True:
-            c = self._peek()
-            if c == "":
-                self.reporter.error(
-                    self._location(), Error.UNTERMINATED_MULTI_LINE_COMMENT
-                )
-                return Token.INVALID
-            elif c == "*":
-                self._consume()
-                c2 = self._peek()
-                if c2 == "/":
-                    self._consume()
-                    return Token.MULTI_LINE_COMMENT
-            elif c == "\r" or c == "\n":
-                self._scan_newline()
-            else:
-                self._consume()
+        end = self.source.find("*/", self.pos)
+        if end < 0:
+            self._skip_lines(len(self.source))
+            self.reporter.error(self._location(), Error.UNTERMINATED_MULTI_LINE_COMMENT)
+            return Token.INVALID
+        self._skip_lines(end)
+        self._consume(2)
+        return Token.MULTI_LINE_COMMENT
+
+    def _skip_lines(self, end: int) -> None:
+        """Moves to ``end``, counting the line breaks on the way; a comment
+        or run of whitespace is skipped in a few passes over the text instead
+        of a step per character."""
+        source = self.source
+        pos = self.pos
+        newlines = (
+            source.count("\n", pos, end)
+            + source.count("\r", pos, end)
+            - source.count("\r\n", pos, end)
+        )
+        if newlines:
+            self.line += newlines
+            last = max(source.rfind("\n", pos, end), source.rfind("\r", pos, end))
+            self.column = end - last - 1
+        else:
+            self.column += end - pos
+        self.pos = end
 
     def _skip_whitespaces(self) -> None:
-        while True:
-            c = self._peek()
-            if not c.isspace():
-                break
-            if c == "\r" or c == "\n":
-                self._scan_newline()
-            else:
-                self._consume()
+        # \s matches the characters str.isspace accepts
+        m = _WHITESPACE.match(self.source, self.pos)
+        if m is not None:
+            self._skip_lines(m.end())
 
     def _scan_newline(self) -> None:
         c = self._peek()
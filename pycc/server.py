@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import concurrent.futures
+import dataclasses
+import errno
+import json
+import os
+import socket
+import stat
+from typing import Optional
+
+from .client import default_socket_path
+from .session import Session
+
+# the longest request line, over the 64 KiB asyncio reads by default
+REQUEST_LIMIT = 16 << 20
+
+
+@dataclasses.dataclass
+class Server:
+    """A compile server answering JSON requests over a Unix domain socket.
+
+    Each request and response is a single line of JSON. The server keeps one
+    ``Session`` for its whole lifetime so that file contents and token tables
+    stay warm between requests. Requests are handled one at a time on a
+    worker thread, so that the event loop keeps accepting connections while
+    a file is compiled.
+    """
+
+    path: str = dataclasses.field(default_factory=default_socket_path)
+    session: Session = dataclasses.field(default_factory=Session)
+    _server: Optional[asyncio.AbstractServer] = dataclasses.field(
+        default=None, init=False
+    )
+    _stopped: Optional[asyncio.Event] = dataclasses.field(default=None, init=False)
+    # the session is not thread-safe, so it is only used from one thread
+    _executor: Optional[concurrent.futures.ThreadPoolExecutor] = dataclasses.field(
+        default=None, init=False
+    )
+
+    async def start(self) -> None:
+        if _is_stale(self.path):
+            os.unlink(self.path)
+        elif os.path.lexists(self.path):
+            raise OSError(errno.EADDRINUSE, "a server is already listening", self.path)
+        self._stopped = asyncio.Event()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._server = await asyncio.start_unix_server(
+            self._handle, path=self.path, limit=REQUEST_LIMIT
+        )
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def stop(self) -> None:
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # the rest of the line would be read as another request
+                    response = {"status": "error", "message": "request too long"}
+                    writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if not isinstance(request, dict):
+                    request = None
+                    response = {"status": "error", "message": "malformed request"}
+                elif request.get("command") == "shutdown":
+                    response = {"status": "ok"}
+                else:
+                    loop = asyncio.get_event_loop()
+                    response = await loop.run_in_executor(
+                        self._executor, self.session.handle, request
+                    )
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+                if request is not None and request.get("command") == "shutdown":
+                    self.stop()
+                    break
+        finally:
+            writer.close()
+
+
+def _is_stale(path: str) -> bool:
+    """Returns whether ``path`` is a socket that no server listens on, as
+    left behind by a server which did not exit cleanly."""
+    try:
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            return False
+    except OSError:
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+    return False
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="pycc-server")
+    parser.add_argument("--socket", default=None, help="path of the Unix socket")
+    args = parser.parse_args(argv)
+    server = Server(args.socket or default_socket_path())
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        parser.exit(1, f"pycc-server: {e}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import dataclasses
+from typing import List, Tuple
+
+from .cache import CacheEntry, FileCache
+from .error import Diagnostic, FatalError, RecordingReporter
+from .file import Location
+from .scanner import Scanner
+from .parser import Parser, TokenData, TokenStream, tokenize
+
+MODES = ("syntax-only", "tokens")
+
+
+def cached_tokens(entry: CacheEntry) -> Tuple[List[TokenData], List[Diagnostic]]:
+    """Returns the tokens of the file of ``entry`` and the diagnostics of
+    scanning it, scanning it only the first time."""
+    derived = entry.derived.get("tokens")
+    if derived is None:
+        reporter = RecordingReporter()
+        tokens = []
+        try:
+            tokens.extend(tokenize(Scanner(entry.file, reporter)))
+        except FatalError:
+            # the tokens end where the error limit stopped the scanner
+            pass
+        derived = (tokens, reporter.diagnostics)
+        entry.derived["tokens"] = derived
+    return derived
+
+
+@dataclasses.dataclass
+class Result:
+    filename: str
+    diagnostics: List[Diagnostic]
+    output: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return all(x.severity == "warning" for x in self.diagnostics)
+
+    def to_json(self) -> dict:
+        return {
+            "filename": self.filename,
+            "diagnostics": [x.to_json() for x in self.diagnostics],
+            "output": self.output,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Result":
+        diagnostics = [Diagnostic.from_json(x) for x in data["diagnostics"]]
+        return cls(data["filename"], diagnostics, data["output"])
+
+
+@dataclasses.dataclass
+class Session:
+    """Compiles files while keeping per-file results in a ``FileCache``.
+
+    A session is used both in-process and by the compile server, where it
+    lives across requests so that unchanged files are never scanned twice.
+    """
+
+    cache: FileCache = dataclasses.field(default_factory=FileCache)
+
+    def compile(self, filename: str, mode: str = "syntax-only") -> Result:
+        if mode not in MODES:
+            raise ValueError(f"unknown mode '{mode}'")
+        try:
+            entry = self.cache.get(filename)
+        except OSError as e:
+            location = Location(filename, 0, 0, 0)
+            return Result(filename, [Diagnostic("error", location, e.strerror)])
+        tokens, diagnostics = cached_tokens(entry)
+        output = ""
+        if mode == "syntax-only":
+            diagnostics = diagnostics + self._parse(entry, tokens)
+        elif mode == "tokens":
+            output = "".join(
+                f"{x.start.line}:{x.start.column}: {x.kind.name} {x.text}\n"
+                for x in tokens
+            )
+        return Result(filename, list(diagnostics), output)
+
+    def _parse(self, entry: CacheEntry, tokens: List[TokenData]) -> List[Diagnostic]:
+        diagnostics = entry.derived.get("syntax")
+        if diagnostics is None:
+            reporter = RecordingReporter()
+            parser = Parser(TokenStream.from_tokens(tokens), reporter)
+            # declarations are dropped as they are parsed
+            try:
+                for _ in parser.iter_declarations():
+                    pass
+            except FatalError:
+                # the fatal error is the last of the diagnostics
+                pass
+            diagnostics = reporter.diagnostics
+            entry.derived["syntax"] = diagnostics
+        return diagnostics
+
+    def handle(self, request: dict) -> dict:
+        command = request.get("command", "compile")
+        if command == "compile":
+            mode = request.get("mode", "syntax-only")
+            files = request.get("files")
+            valid = isinstance(files, list) and all(isinstance(x, str) for x in files)
+            if not valid:
+                message = "'files' must be a list of strings"
+                return {"status": "error", "message": message}
+            try:
+                results = [self.compile(x, mode) for x in files]
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
+            return {"status": "ok", "results": [x.to_json() for x in results]}
+        elif command == "stats":
+            return {
+                "status": "ok",
+                "files": len(self.cache.entries),
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+            }
+        elif command == "invalidate":
+            filename = request.get("filename")
+            if filename is not None and not isinstance(filename, str):
+                return {"status": "error", "message": "'filename' must be a string"}
+            self.cache.invalidate(filename)
+            return {"status": "ok"}
+        return {"status": "error", "message": f"unknown command '{command}'"}
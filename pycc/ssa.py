@@ -0,0 +1,337 @@
+import array
+import dataclasses
+from typing import Dict, List, Optional, Set, Tuple
+
+from .ir import NONE, VALUE_TYPES, Function, Op, ValueType
+
+
+def reverse_postorder(fn: Function) -> List[int]:
+    """Returns the blocks reachable from the entry block in reverse
+    postorder of a depth-first search."""
+    blocks = fn.blocks
+    visited = bytearray(len(blocks))
+    visited[0] = 1
+    order = []
+    stack = [(0, iter(blocks[0].succs))]
+    while stack:
+        block, succs = stack[-1]
+        for succ in succs:
+            if not visited[succ]:
+                visited[succ] = 1
+                stack.append((succ, iter(blocks[succ].succs)))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
+
+def immediate_dominators(
+    fn: Function, rpo: Optional[List[int]] = None
+) -> List[int]:
+    """Returns the immediate dominator of every block, using the iterative
+    algorithm of Cooper, Harvey and Kennedy. The entry block is its own
+    immediate dominator and unreachable blocks have NONE."""
+    if rpo is None:
+        rpo = reverse_postorder(fn)
+    blocks = fn.blocks
+    index = array.array("q", [NONE] * len(blocks))
+    for k, block in enumerate(rpo):
+        index[block] = k
+    idom = array.array("q", [NONE] * len(blocks))
+    idom[0] = 0
+    changed = True
+    while changed:
+        changed = False
+        for block in rpo[1:]:
+            new = NONE
+            for x in blocks[block].preds:
+                if idom[x] == NONE:
+                    continue
+                if new == NONE:
+                    new = x
+                    continue
+                # walk both fingers up to their common dominator
+                y = new
+                while x != y:
+                    while index[x] > index[y]:
+                        x = idom[x]
+                    while index[y] > index[x]:
+                        y = idom[y]
+                new = x
+            if idom[block] != new:
+                idom[block] = new
+                changed = True
+    return list(idom)
+
+
+def dominator_tree(idom: List[int]) -> List[List[int]]:
+    """Returns the children of every block in the dominator tree."""
+    children: List[List[int]] = [[] for _ in idom]
+    for block, parent in enumerate(idom):
+        if parent != NONE and parent != block:
+            children[parent].append(block)
+    return children
+
+
+def dominance_frontiers(fn: Function, idom: List[int]) -> List[List[int]]:
+    frontiers: List[List[int]] = [[] for _ in fn.blocks]
+    for block in fn.blocks:
+        if len(block.preds) < 2 or idom[block.id] == NONE:
+            continue
+        for runner in block.preds:
+            if idom[runner] == NONE:
+                continue
+            while runner != idom[block.id]:
+                frontier = frontiers[runner]
+                # the entries for one block are added consecutively
+                if not frontier or frontier[-1] != block.id:
+                    frontier.append(block.id)
+                runner = idom[runner]
+    return frontiers
+
+
+def dominates(idom: List[int], a: int, b: int) -> bool:
+    """Reports whether block ``a`` dominates block ``b``."""
+    while b != a:
+        parent = idom[b]
+        if parent == b or parent == NONE:
+            return False
+        b = parent
+    return True
+
+
+@dataclasses.dataclass
+class Loop:
+    header: int
+    # the blocks of the loop, the header included
+    blocks: Set[int] = dataclasses.field(default_factory=set)
+    # the blocks with a back edge to the header
+    latches: List[int] = dataclasses.field(default_factory=list)
+    # the only predecessor from outside the loop, if it has no other
+    # successor, or NONE
+    preheader: int = NONE
+
+
+def natural_loops(fn: Function, idom: List[int]) -> List[Loop]:
+    """Returns the natural loops, innermost first. A back edge is an edge to
+    a block which dominates its source; the loops of the back edges to one
+    header are merged."""
+    blocks = fn.blocks
+    loops: Dict[int, Loop] = {}
+    for block in blocks:
+        if idom[block.id] == NONE:
+            continue
+        for header in block.succs:
+            if not dominates(idom, header, block.id):
+                continue
+            loop = loops.get(header)
+            if loop is None:
+                loop = loops[header] = Loop(header, {header})
+            loop.latches.append(block.id)
+            # the blocks reaching the latch without going through the header
+            stack = [block.id]
+            while stack:
+                x = stack.pop()
+                if x not in loop.blocks:
+                    loop.blocks.add(x)
+                    stack.extend(blocks[x].preds)
+    for loop in loops.values():
+        outside = [x for x in blocks[loop.header].preds if x not in loop.blocks]
+        if len(outside) == 1 and len(blocks[outside[0]].succs) == 1:
+            loop.preheader = outside[0]
+    # an inner loop has fewer blocks than the loops around it
+    return sorted(loops.values(), key=lambda x: len(x.blocks))
+
+
+def uses(fn: Function) -> List[List[int]]:
+    """Returns the instructions using each value, once per use."""
+    result: List[List[int]] = [[] for _ in range(len(fn))]
+    for i in fn.instructions():
+        for value in fn.operands(i):
+            if value != NONE:
+                result[value].append(i)
+    return result
+
+
+def _promotable_slots(fn: Function) -> Dict[int, int]:
+    """Returns the stack slots whose address is only loaded from and stored
+    to, with the type of the accesses or VOID if there are none."""
+    op, a, b = fn.op, fn.a, fn.b
+    slots: Dict[int, int] = {}
+    for i in fn.instructions():
+        if op[i] == Op.ALLOCA and a[i] in VALUE_TYPES:
+            slots[i] = ValueType.VOID
+    if not slots:
+        return slots
+    for i in fn.instructions():
+        o = op[i]
+        if o == Op.LOAD or o == Op.STORE:
+            slot = a[i]
+            if slot in slots:
+                t = fn.type[i] if o == Op.LOAD else fn.type[b[i]]
+                if VALUE_TYPES[fn.a[slot]] != t or slots[slot] not in (0, t):
+                    slots[slot] = NONE
+                else:
+                    slots[slot] = t
+            if o == Op.STORE and b[i] in slots:
+                slots[b[i]] = NONE
+        elif o != Op.ALLOCA:
+            for x in fn.operands(i):
+                if x in slots:
+                    slots[x] = NONE
+    return {slot: t for slot, t in slots.items() if t != NONE}
+
+
+def construct_ssa(fn: Function) -> None:
+    """Promotes the stack slots whose address does not escape to SSA values.
+
+    Phis are placed on the iterated dominance frontiers of the blocks which
+    store to a slot, then loads are replaced by the reaching value in a walk
+    of the dominator tree (Cytron et al.). Unreachable blocks are removed
+    first. Every step is an explicit worklist, so the cost grows linearly
+    with the size of the function and nothing recurses.
+    """
+    fn.remove_unreachable_blocks()
+    slots = _promotable_slots(fn)
+    if not slots:
+        return
+    op, a, b = fn.op, fn.a, fn.b
+    blocks = fn.blocks
+    idom = immediate_dominators(fn)
+
+    defs: Dict[int, List[int]] = {slot: [] for slot in slots}
+    for block in blocks:
+        for i in block.insts:
+            if op[i] == Op.STORE and a[i] in slots:
+                defs[a[i]].append(block.id)
+
+    frontiers = dominance_frontiers(fn, idom)
+    phi_slot: Dict[int, int] = {}
+    for slot, def_blocks in defs.items():
+        has_phi = set()
+        work = list(set(def_blocks))
+        queued = set(work)
+        while work:
+            for y in frontiers[work.pop()]:
+                if y in has_phi:
+                    continue
+                has_phi.add(y)
+                phi_slot[fn.insert_phi(y, ValueType(slots[slot]))] = slot
+                if y not in queued:
+                    queued.add(y)
+                    work.append(y)
+
+    # the position of each edge among the predecessors of its target
+    edges: List[List[Tuple[int, int]]] = [[] for _ in blocks]
+    for block in blocks:
+        for k, pred in enumerate(block.preds):
+            edges[pred].append((block.id, k))
+
+    current: Dict[int, List[int]] = {slot: [] for slot in slots}
+    replace: Dict[int, int] = {}
+    undefs: Dict[int, int] = {}
+
+    def reaching(slot: int) -> int:
+        stack = current[slot]
+        if stack:
+            return stack[-1]
+        t = slots[slot]
+        undef = undefs.get(t)
+        if undef is None:
+            undef = undefs[t] = fn.create(0, Op.UNDEF, ValueType(t))
+        return undef
+
+    children = dominator_tree(idom)
+    work: List[Tuple[int, Optional[List[int]]]] = [(0, None)]
+    while work:
+        block, pushed = work.pop()
+        if pushed is not None:
+            for slot in pushed:
+                current[slot].pop()
+            continue
+        pushed = []
+        work.append((block, pushed))
+        for i in blocks[block].insts:
+            o = op[i]
+            if o == Op.PHI:
+                slot = phi_slot.get(i)
+                if slot is not None:
+                    current[slot].append(i)
+                    pushed.append(slot)
+                continue
+            if o == Op.LOAD and a[i] in slots:
+                replace[i] = reaching(a[i])
+                fn.delete(i)
+                continue
+            if o == Op.STORE and a[i] in slots:
+                value = b[i]
+                current[a[i]].append(replace.get(value, value))
+                pushed.append(a[i])
+                fn.delete(i)
+                continue
+            if o == Op.ALLOCA and i in slots:
+                fn.delete(i)
+                continue
+            if replace:
+                values = fn.operands(i)
+                if any(x in replace for x in values):
+                    fn.set_operands(i, [replace.get(x, x) for x in values])
+        for succ, k in edges[block]:
+            for i in blocks[succ].insts:
+                if op[i] != Op.PHI:
+                    break
+                slot = phi_slot.get(i)
+                if slot is not None:
+                    value = reaching(slot)
+                else:
+                    value = fn.pool[b[i] + k]
+                    value = replace.get(value, value)
+                fn.pool[b[i] + k] = value
+        for child in reversed(children[block]):
+            work.append((child, None))
+
+    if undefs:
+        blocks[0].insts[0:0] = array.array("q", undefs.values())
+    fn.compact()
+
+
+def verify(fn: Function) -> None:
+    """Checks that every block ends in its only terminator, that phis have
+    one value per predecessor and that every definition dominates its uses.
+    Raises ValueError otherwise."""
+    idom = immediate_dominators(fn)
+    position: Dict[int, int] = {}
+    for block in fn.blocks:
+        for k, i in enumerate(block.insts):
+            position[i] = k
+    for block in fn.blocks:
+        insts = block.insts
+        if fn.terminator(block.id) is None:
+            raise ValueError(f"b{block.id} does not end in a terminator")
+        for k, i in enumerate(insts):
+            o = fn.op[i]
+            if fn.block_of[i] != block.id:
+                raise ValueError(f"%{i} is not in b{fn.block_of[i]}")
+            if o in (Op.JUMP, Op.BRANCH, Op.RET) and k != len(insts) - 1:
+                raise ValueError(f"terminator %{i} in the middle of b{block.id}")
+            values = fn.operands(i)
+            if o == Op.PHI:
+                if len(values) != len(block.preds):
+                    raise ValueError(f"phi %{i} does not match the predecessors")
+                uses = zip(values, block.preds)
+            else:
+                uses = ((x, block.id) for x in values)
+            for value, at in uses:
+                if value == NONE and o == Op.PHI:
+                    continue
+                if value not in position or fn.op[value] == Op.NOP:
+                    raise ValueError(f"%{i} uses %{value}, which is not defined")
+                home = fn.block_of[value]
+                if o == Op.PHI or home != at:
+                    ok = dominates(idom, home, at)
+                else:
+                    ok = position[value] < k
+                if not ok:
+                    raise ValueError(f"%{value} does not dominate its use in %{i}")
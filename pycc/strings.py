@@ -0,0 +1,62 @@
+import dataclasses
+from typing import Dict, List, Sequence, Tuple
+
+
+@dataclasses.dataclass
+class StringPool:
+    """Interns the values of string literals.
+
+    Equal literals share one ``str``, so that a format string repeated
+    thousands of times in a translation unit is kept once however many
+    tokens and AST nodes refer to it.
+    """
+
+    strings: Dict[str, str] = dataclasses.field(default_factory=dict)
+    hits: int = 0
+
+    def intern(self, value: str) -> str:
+        existing = self.strings.setdefault(value, value)
+        if existing is not value:
+            self.hits += 1
+        return existing
+
+    def concatenate(self, values: Sequence[str]) -> str:
+        """Returns the interned concatenation of adjacent literals, copying
+        their characters once however many there are."""
+        if len(values) == 1:
+            return self.intern(values[0])
+        return self.intern("".join(values))
+
+
+def share_suffixes(literals: Sequence[Tuple[str, bytes]]) -> Dict[str, Tuple[str, int]]:
+    """Finds the literals whose bytes, terminating null included, end
+    another literal, so that they can be stored inside it. Returns the name
+    of the literal holding each of them and its offset there.
+
+    Sorting the reversed bytes puts every literal right before the ones it
+    is a suffix of, so one pass from the end keeps the longest literal of
+    each chain and places the others at its tail.
+    """
+    ordered = sorted(literals, key=lambda x: x[1][::-1])
+    shared: Dict[str, Tuple[str, int]] = {}
+    host = None
+    for name, data in reversed(ordered):
+        if host is not None and host[1].endswith(data):
+            shared[name] = (host[0], len(host[1]) - len(data))
+        else:
+            host = (name, data)
+    return shared
+
+
+def layout(
+    literals: Sequence[Tuple[str, bytes]]
+) -> Tuple[Dict[str, Tuple[str, int]], Dict[str, List[Tuple[int, str]]]]:
+    """Returns ``share_suffixes`` of ``literals`` together with the labels
+    to place inside each literal which holds others, by offset."""
+    shared = share_suffixes(literals)
+    labels: Dict[str, List[Tuple[int, str]]] = {}
+    for name, (host, offset) in shared.items():
+        labels.setdefault(host, []).append((offset, name))
+    for entries in labels.values():
+        entries.sort()
+    return shared, labels
@@ -0,0 +1,125 @@
+import dataclasses
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+
+class Kind(Enum):
+    TYPEDEF = "typedef"
+    OBJECT = "object"
+    FUNCTION = "function"
+    ENUMERATOR = "enumerator"
+    TAG = "tag"
+
+
+def tag_name(tag: str) -> str:
+    """Returns the key of a struct, union or enum tag. Tags have a name space
+    of their own, and no identifier starts with a space."""
+    return " " + tag
+
+
+@dataclasses.dataclass
+class Symbol:
+    name: str
+    kind: Kind
+    depth: int
+    decl: object = None
+
+
+# undo log operations
+_DECLARE = 0
+_REPLACE = 1
+_PUSH_SCOPE = 2
+_POP_SCOPE = 3
+
+
+@dataclasses.dataclass
+class SymbolTable:
+    """Nested scopes of ordinary identifiers.
+
+    Every name maps to a stack of its visible bindings, innermost last, so
+    lookups are a single dict access regardless of how many scopes are open.
+    While a marker is outstanding every change is recorded in an undo log, and
+    ``release`` rolls the table back to the marker in time proportional to the
+    number of changes made since, never to the size of the table.
+    """
+
+    bindings: Dict[str, List[Symbol]] = dataclasses.field(default_factory=dict)
+    scopes: List[List[str]] = dataclasses.field(default_factory=lambda: [[]])
+    log: List[Tuple[int, object]] = dataclasses.field(default_factory=list)
+    markers: int = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self.scopes) - 1
+
+    def push_scope(self) -> None:
+        self.scopes.append([])
+        if self.markers:
+            self.log.append((_PUSH_SCOPE, None))
+
+    def pop_scope(self) -> None:
+        if self.depth == 0:
+            raise ValueError("cannot pop the file scope")
+        names = self.scopes.pop()
+        removed = []
+        for name in names:
+            stack = self.bindings[name]
+            removed.append(stack.pop())
+            if not stack:
+                del self.bindings[name]
+        if self.markers:
+            self.log.append((_POP_SCOPE, (names, removed)))
+
+    def declare(self, name: str, kind: Kind, decl: object = None) -> Symbol:
+        symbol = Symbol(name, kind, self.depth, decl)
+        stack = self.bindings.setdefault(name, [])
+        if stack and stack[-1].depth == symbol.depth:
+            if self.markers:
+                self.log.append((_REPLACE, stack[-1]))
+            stack[-1] = symbol
+        else:
+            stack.append(symbol)
+            self.scopes[-1].append(name)
+            if self.markers:
+                self.log.append((_DECLARE, name))
+        return symbol
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        stack = self.bindings.get(name)
+        if stack:
+            return stack[-1]
+        return None
+
+    def is_typedef_name(self, name: str) -> bool:
+        stack = self.bindings.get(name)
+        return bool(stack) and stack[-1].kind == Kind.TYPEDEF
+
+    def mark(self) -> int:
+        self.markers += 1
+        return len(self.log)
+
+    def release(self, marker: int) -> None:
+        self.rollback(marker)
+        self.markers -= 1
+        if self.markers == 0:
+            self.log.clear()
+
+    def rollback(self, marker: int) -> None:
+        log = self.log
+        while len(log) > marker:
+            op, arg = log.pop()
+            if op == _DECLARE:
+                stack = self.bindings[arg]
+                stack.pop()
+                if not stack:
+                    del self.bindings[arg]
+                self.scopes[-1].pop()
+            elif op == _REPLACE:
+                self.bindings[arg.name][-1] = arg
+            elif op == _PUSH_SCOPE:
+                self.scopes.pop()
+            elif op == _POP_SCOPE:
+                names, removed = arg
+                for name, symbol in zip(names, removed):
+                    self.bindings.setdefault(name, []).append(symbol)
+                self.scopes.append(names)
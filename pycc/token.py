@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, IntFlag
 
 
 class Token(Enum):
@@ -110,11 +110,19 @@ class Token(Enum):
     COMPLEX = "_Complex"
     GENERIC = "_Generic"
     IMAGINARY = "_Imaginary"
-    NORETURN = "_No_return"
+    NORETURN = "_Noreturn"
     STATIC_ASSERT = "_Static_assert"
     THREAD_LOCAL = "_Thread_local"
 
 
+class Suffix(IntFlag):
+    NONE = 0
+    UNSIGNED = 1
+    LONG = 2
+    LONG_LONG = 4
+    FLOAT = 8
+
+
 KEYWORDS = {
     Token.AUTO,
     Token.BREAK,
@@ -141,6 +149,7 @@ KEYWORDS = {
     Token.SHORT,
     Token.SIGNED,
     Token.SIZEOF,
+    Token.STATIC,
     Token.STRUCT,
     Token.SWITCH,
     Token.TYPEDEF,
@@ -0,0 +1,299 @@
+import dataclasses
+from typing import List, Optional, Tuple
+
+from .token import Suffix
+
+
+class Type:
+    @property
+    def is_scalar(self) -> bool:
+        return isinstance(self, (IntegerType, FloatingType, PointerType))
+
+    @property
+    def is_complete(self) -> bool:
+        return True
+
+
+@dataclasses.dataclass(frozen=True)
+class VoidType(Type):
+    # GNU C gives void a size of 1 for pointer arithmetic
+    size = 1
+    align = 1
+
+    @property
+    def is_complete(self) -> bool:
+        return False
+
+    def __str__(self) -> str:
+        return "void"
+
+
+@dataclasses.dataclass(frozen=True)
+class IntegerType(Type):
+    name: str
+    size: int
+    signed: bool
+    rank: int
+
+    @property
+    def align(self) -> int:
+        return self.size
+
+    @property
+    def bits(self) -> int:
+        return self.size * 8
+
+    @property
+    def min(self) -> int:
+        return -(1 << (self.bits - 1)) if self.signed else 0
+
+    @property
+    def max(self) -> int:
+        return (1 << (self.bits - self.signed)) - 1
+
+    def wrap(self, value: int) -> int:
+        """Reduces ``value`` modulo 2**bits into the range of this type."""
+        value &= (1 << self.bits) - 1
+        if self.signed and value >> (self.bits - 1):
+            value -= 1 << self.bits
+        return value
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclasses.dataclass(frozen=True)
+class FloatingType(Type):
+    name: str
+    size: int
+    align: int
+    rank: int
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@dataclasses.dataclass(frozen=True)
+class PointerType(Type):
+    base: Type
+    size = 8
+    align = 8
+
+    def __str__(self) -> str:
+        return f"{self.base} *"
+
+
+@dataclasses.dataclass(frozen=True)
+class ArrayType(Type):
+    base: Type
+    # None for an array of unknown size or a variable length array
+    length: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        return self.base.size * (self.length or 0)
+
+    @property
+    def align(self) -> int:
+        return self.base.align
+
+    @property
+    def is_complete(self) -> bool:
+        return self.length is not None
+
+    def __str__(self) -> str:
+        length = "" if self.length is None else self.length
+        return f"{self.base} [{length}]"
+
+
+@dataclasses.dataclass(frozen=True)
+class FunctionType(Type):
+    ret: Type
+    params: Tuple[Type, ...] = ()
+    variadic: bool = False
+    # False for a declaration without a prototype, e.g. ``int f();``
+    prototype: bool = True
+    size = 1
+    align = 1
+
+    def __str__(self) -> str:
+        params = [str(x) for x in self.params]
+        if self.variadic:
+            params.append("...")
+        elif self.prototype and not params:
+            params.append("void")
+        return f"{self.ret} ({', '.join(params)})"
+
+
+@dataclasses.dataclass(eq=False)
+class StructType(Type):
+    """A struct or union type. Identity is the type: two declarations of the
+    same tag in the same scope share one instance, which is completed when
+    the definition is seen."""
+
+    kind: str
+    tag: Optional[str]
+    # None while the type is incomplete
+    fields: Optional[List[Tuple[Optional[str], Type]]] = None
+    # the byte offset of every field, which for a bit-field is the offset of
+    # the storage unit of its type holding it
+    offsets: List[int] = dataclasses.field(default_factory=list)
+    # the width of every bit-field, and None for the other fields
+    widths: List[Optional[int]] = dataclasses.field(default_factory=list)
+    size: int = 0
+    align: int = 1
+
+    @property
+    def is_complete(self) -> bool:
+        return self.fields is not None
+
+    def complete(
+        self,
+        fields: List[Tuple[Optional[str], Type]],
+        widths: Optional[List[Optional[int]]] = None,
+    ) -> None:
+        """Lays out ``fields`` as x86-64 System V does. A bit-field goes into
+        the current storage unit of its type if it fits there whole, and
+        starts the next one otherwise; a zero width closes the unit. Unnamed
+        bit-fields do not align the struct."""
+        self.fields = fields
+        self.widths = list(widths) if widths is not None else [None] * len(fields)
+        self.offsets = []
+        bits = 0
+        align = 1
+        union = self.kind == "union"
+        for (name, t), width in zip(fields, self.widths):
+            if width is None or name is not None:
+                align = max(align, t.align)
+            if width is None:
+                offset = 0
+                if not union:
+                    size = -(-bits // 8)
+                    offset = (size + t.align - 1) // t.align * t.align
+                self.offsets.append(offset)
+                bits = max(bits, (offset + t.size) * 8)
+                continue
+            unit = t.size * 8
+            if union:
+                self.offsets.append(0)
+                bits = max(bits, width)
+                continue
+            if width == 0 or bits // unit != (bits + width - 1) // unit:
+                bits = -(-bits // unit) * unit
+            self.offsets.append(bits // unit * t.size)
+            bits += width
+        self.align = align
+        size = -(-bits // 8)
+        self.size = (size + align - 1) // align * align
+
+    def field(self, name: str) -> Optional[Tuple[Type, int]]:
+        for (field_name, t), offset in zip(self.fields or (), self.offsets):
+            if field_name == name:
+                return t, offset
+        return None
+
+    def bit_width(self, name: str) -> Optional[int]:
+        """Returns the width of the field ``name`` if it is a bit-field."""
+        for (field_name, _), width in zip(self.fields or (), self.widths):
+            if field_name == name:
+                return width
+        return None
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.tag or '(anonymous)'}"
+
+
+# the LP64 data model of x86-64 System V
+VOID = VoidType()
+BOOL = IntegerType("_Bool", 1, False, 1)
+CHAR = IntegerType("char", 1, True, 2)
+SIGNED_CHAR = IntegerType("signed char", 1, True, 2)
+UNSIGNED_CHAR = IntegerType("unsigned char", 1, False, 2)
+SHORT = IntegerType("short", 2, True, 3)
+UNSIGNED_SHORT = IntegerType("unsigned short", 2, False, 3)
+INT = IntegerType("int", 4, True, 4)
+UNSIGNED_INT = IntegerType("unsigned int", 4, False, 4)
+LONG = IntegerType("long", 8, True, 5)
+UNSIGNED_LONG = IntegerType("unsigned long", 8, False, 5)
+LONG_LONG = IntegerType("long long", 8, True, 6)
+UNSIGNED_LONG_LONG = IntegerType("unsigned long long", 8, False, 6)
+
+FLOAT = FloatingType("float", 4, 4, 1)
+DOUBLE = FloatingType("double", 8, 8, 2)
+LONG_DOUBLE = FloatingType("long double", 16, 16, 3)
+
+INTMAX = LONG_LONG
+UINTMAX = UNSIGNED_LONG_LONG
+
+_UNSIGNED = {
+    CHAR: UNSIGNED_CHAR,
+    SIGNED_CHAR: UNSIGNED_CHAR,
+    SHORT: UNSIGNED_SHORT,
+    INT: UNSIGNED_INT,
+    LONG: UNSIGNED_LONG,
+    LONG_LONG: UNSIGNED_LONG_LONG,
+}
+
+
+def to_unsigned(t: IntegerType) -> IntegerType:
+    return _UNSIGNED.get(t, t)
+
+
+def integer_promotion(t: IntegerType) -> IntegerType:
+    if t.rank < INT.rank:
+        return INT
+    return t
+
+
+def usual_arithmetic_conversion(a: IntegerType, b: IntegerType) -> IntegerType:
+    a = integer_promotion(a)
+    b = integer_promotion(b)
+    if a == b:
+        return a
+    if a.signed == b.signed:
+        return a if a.rank > b.rank else b
+    signed, unsigned = (a, b) if a.signed else (b, a)
+    if unsigned.rank >= signed.rank:
+        return unsigned
+    if signed.size > unsigned.size:
+        return signed
+    return to_unsigned(signed)
+
+
+# C11 6.4.4.1p5: candidate types of an integer constant by suffix
+_DECIMAL_CANDIDATES = {
+    Suffix.NONE: (INT, LONG, LONG_LONG),
+    Suffix.LONG: (LONG, LONG_LONG),
+    Suffix.LONG_LONG: (LONG_LONG,),
+}
+_CANDIDATES = {
+    Suffix.NONE: (
+        INT,
+        UNSIGNED_INT,
+        LONG,
+        UNSIGNED_LONG,
+        LONG_LONG,
+        UNSIGNED_LONG_LONG,
+    ),
+    Suffix.UNSIGNED: (UNSIGNED_INT, UNSIGNED_LONG, UNSIGNED_LONG_LONG),
+    Suffix.LONG: (LONG, UNSIGNED_LONG, LONG_LONG, UNSIGNED_LONG_LONG),
+    Suffix.UNSIGNED | Suffix.LONG: (UNSIGNED_LONG, UNSIGNED_LONG_LONG),
+    Suffix.LONG_LONG: (LONG_LONG, UNSIGNED_LONG_LONG),
+    Suffix.UNSIGNED | Suffix.LONG_LONG: (UNSIGNED_LONG_LONG,),
+}
+
+
+def integer_constant_type(
+    value: int, suffix: Suffix, decimal: bool
+) -> Optional[IntegerType]:
+    """Returns the type of an integer constant, or None if it is too large to
+    be represented in any integer type."""
+    candidates = None
+    if decimal:
+        candidates = _DECIMAL_CANDIDATES.get(suffix)
+    if candidates is None:
+        candidates = _CANDIDATES[suffix]
+    for t in candidates:
+        if value <= t.max:
+            return t
+    return None
@@ -0,0 +1,253 @@
+import dataclasses
+import typing
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .ast import Node
+
+# returned by a visit method to skip the children of the node
+SKIP = object()
+
+# filled in on demand; threads racing on a class store the same tuple
+_child_fields: Dict[type, Tuple[Tuple[str, bool], ...]] = {}
+
+
+def _is_node_type(tp) -> bool:
+    return isinstance(tp, type) and issubclass(tp, Node)
+
+
+def child_fields(cls: type) -> Tuple[Tuple[str, bool], ...]:
+    """Returns ``(name, is_list)`` for every field of ``cls`` holding child
+    nodes. The result is computed from the field annotations once per class."""
+    try:
+        return _child_fields[cls]
+    except KeyError:
+        pass
+    fields = []
+    for field in dataclasses.fields(cls):
+        tp = field.type
+        if _is_node_type(tp):
+            fields.append((field.name, False))
+        elif getattr(tp, "__origin__", None) in (list, List):
+            if _is_node_type(tp.__args__[0]):
+                fields.append((field.name, True))
+        elif getattr(tp, "__origin__", None) is typing.Union:
+            if any(_is_node_type(x) for x in tp.__args__):
+                fields.append((field.name, False))
+    result = tuple(fields)
+    _child_fields[cls] = result
+    return result
+
+
+def iter_child_nodes(node: Node) -> Iterator[Node]:
+    for name, is_list in child_fields(type(node)):
+        value = getattr(node, name)
+        if is_list:
+            yield from value
+        elif value is not None:
+            yield value
+
+
+def _lookup(visitor_cls: type, prefix: str, node_cls: type) -> Optional[Callable]:
+    for cls in node_cls.__mro__:
+        method = getattr(visitor_cls, prefix + cls.__name__, None)
+        if method is not None:
+            return method
+    return None
+
+
+class Visitor:
+    """Walks a tree in depth-first order without recursion.
+
+    For each node the first ``visit_<Class>`` method found along the node's
+    MRO is called before its children, and ``leave_<Class>`` after them.
+    Returning ``SKIP`` from a visit method skips the node's children. Method
+    lookups are cached per visitor class and node class.
+    """
+
+    _dispatch: Dict[type, tuple] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+
+    @classmethod
+    def _handlers(cls, node_cls: type):
+        try:
+            return cls._dispatch[node_cls]
+        except KeyError:
+            pass
+        # children are stored reversed, ready to be pushed onto the stack
+        handlers = (
+            _lookup(cls, "visit_", node_cls),
+            _lookup(cls, "leave_", node_cls),
+            tuple(reversed(child_fields(node_cls))),
+        )
+        cls._dispatch[node_cls] = handlers
+        return handlers
+
+    def visit(self, node: Node) -> None:
+        dispatch = self._dispatch
+        stack = [node]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            if type(node) is tuple:
+                leave, node = node
+                leave(self, node)
+                continue
+            cls = type(node)
+            try:
+                visit, leave, children = dispatch[cls]
+            except KeyError:
+                visit, leave, children = self._handlers(cls)
+            if visit is not None and visit(self, node) is SKIP:
+                continue
+            if leave is not None:
+                push((leave, node))
+            for name, is_list in children:
+                value = getattr(node, name)
+                if is_list:
+                    stack.extend(reversed(value))
+                elif value is not None:
+                    push(value)
+
+
+class Transformer:
+    """Rebuilds a tree bottom-up without recursion.
+
+    Children are transformed first and stored back into their parent, then
+    the first ``transform_<Class>`` method found along the node's MRO is
+    called and its return value replaces the node. Returning ``None`` removes
+    a node from a list field. Nodes without a method are kept as they are.
+    """
+
+    _dispatch: Dict[type, Optional[Callable]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+
+    def transform(self, node: Node) -> Optional[Node]:
+        dispatch = self._dispatch
+        results: List[Optional[Node]] = []
+        stack = [(node, False)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node, leaving = pop()
+            cls = type(node)
+            try:
+                children = _child_fields[cls]
+            except KeyError:
+                children = child_fields(cls)
+            if not leaving:
+                push((node, True))
+                for name, is_list in reversed(children):
+                    value = getattr(node, name)
+                    if is_list:
+                        for child in reversed(value):
+                            push((child, False))
+                    elif value is not None:
+                        push((value, False))
+                continue
+            # the results of the children are on top of the result stack, in order
+            counts = []
+            for name, is_list in children:
+                value = getattr(node, name)
+                if is_list:
+                    counts.append(len(value))
+                else:
+                    counts.append(0 if value is None else 1)
+            base = len(results) - sum(counts)
+            i = base
+            for (name, is_list), count in zip(children, counts):
+                if is_list:
+                    value = [x for x in results[i : i + count] if x is not None]
+                    setattr(node, name, value)
+                elif count:
+                    setattr(node, name, results[i])
+                i += count
+            del results[base:]
+            try:
+                transform = dispatch[cls]
+            except KeyError:
+                transform = _lookup(type(self), "transform_", cls)
+                dispatch[cls] = transform
+            results.append(node if transform is None else transform(self, node))
+        return results[0]
+
+
+def fuse(*visitors: Visitor) -> "_Fused":
+    """Returns a visitor which runs several visitors in a single traversal.
+
+    Each node is visited by the passes in the given order. A pass which
+    returns ``SKIP`` does not see the node's children, while the others do.
+    """
+    return _Fused(visitors)
+
+
+class _Fused:
+    def __init__(self, visitors):
+        self.visitors = tuple(visitors)
+        self.dispatch: Dict[type, tuple] = {}
+
+    def _handlers(self, node_cls: type):
+        visits = []
+        leaves = []
+        for i, visitor in enumerate(self.visitors):
+            visit, leave, children = type(visitor)._handlers(node_cls)
+            if visit is not None:
+                visits.append((1 << i, visit.__get__(visitor)))
+            if leave is not None:
+                leaves.append((1 << i, leave.__get__(visitor)))
+        handlers = (tuple(visits), tuple(leaves), children)
+        self.dispatch[node_cls] = handlers
+        return handlers
+
+    def visit(self, node: Node) -> None:
+        # The passes still interested in a node are tracked as a bit mask. The
+        # stack holds bare nodes while every pass is active, ``(node, mask)``
+        # below a node that some pass skipped, and ``(leaves, node, mask)``
+        # for pending leave calls.
+        dispatch = self.dispatch
+        everyone = (1 << len(self.visitors)) - 1
+        stack = [node]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node = pop()
+            active = everyone
+            if type(node) is tuple:
+                if len(node) == 3:
+                    leaves, node, active = node
+                    for bit, leave in leaves:
+                        if active & bit:
+                            leave(node)
+                    continue
+                node, active = node
+            cls = type(node)
+            try:
+                visits, leaves, children = dispatch[cls]
+            except KeyError:
+                visits, leaves, children = self._handlers(cls)
+            for bit, visit in visits:
+                if active & bit and visit(node) is SKIP:
+                    active &= ~bit
+            if not active:
+                continue
+            if leaves:
+                push((leaves, node, active))
+            for name, is_list in children:
+                value = getattr(node, name)
+                if value is None:
+                    continue
+                if active == everyone:
+                    if is_list:
+                        stack.extend(reversed(value))
+                    else:
+                        push(value)
+                elif is_list:
+                    stack.extend([(x, active) for x in reversed(value)])
+                else:
+                    push((value, active))
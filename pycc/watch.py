@@ -0,0 +1,162 @@
+import dataclasses
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import FileCache
+from .file import Recording
+
+
+@dataclasses.dataclass
+class DependencyGraph:
+    """The files each file depends on, and the reverse edges.
+
+    A translation unit depends on every file read while compiling it, and a
+    header may record the headers it includes in turn, so that a change
+    reaches everything that depends on it transitively.
+    """
+
+    dependencies: Dict[str, Set[str]] = dataclasses.field(default_factory=dict)
+    dependents: Dict[str, Set[str]] = dataclasses.field(default_factory=dict)
+
+    def record(self, filename: str, dependencies: Iterable[str]) -> None:
+        """Replaces the dependencies of ``filename``."""
+        for old in self.dependencies.get(filename, ()):
+            self.dependents[old].discard(filename)
+        new = set(dependencies)
+        new.discard(filename)
+        self.dependencies[filename] = new
+        for dependency in new:
+            self.dependents.setdefault(dependency, set()).add(filename)
+
+    def remove(self, filename: str) -> None:
+        self.record(filename, ())
+        del self.dependencies[filename]
+
+    @property
+    def files(self) -> Set[str]:
+        files = set(self.dependencies)
+        for dependencies in self.dependencies.values():
+            files |= dependencies
+        return files
+
+    def affected(self, changed: Iterable[str]) -> Set[str]:
+        """Returns ``changed`` and every file depending on them, directly or
+        not."""
+        result = set(changed)
+        stack = list(result)
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in result:
+                    result.add(dependent)
+                    stack.append(dependent)
+        return result
+
+
+@dataclasses.dataclass
+class Rebuild:
+    changed: List[str]
+    units: List[str]
+    seconds: float
+
+
+# (st_mtime_ns, st_size) of a file, or None if it cannot be stat'ed
+Stamp = Optional[Tuple[int, int]]
+
+
+def _stamp(filename: str) -> Stamp:
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+@dataclasses.dataclass
+class Watcher:
+    """Keeps the results of compiling ``units`` up to date.
+
+    ``build`` compiles one unit, reading files through ``cache``; the files
+    it reads are recorded as the unit's dependencies. ``poll`` stats every
+    file of the dependency graph, and a file whose stamp moved is read
+    again but only counts as changed if its digest differs too. Only the
+    units depending on changed files are built again, and the cache keeps
+    the tokens of every other file.
+    """
+
+    units: List[str]
+    build: Callable[[str], object]
+    cache: FileCache = dataclasses.field(default_factory=FileCache)
+    graph: DependencyGraph = dataclasses.field(default_factory=DependencyGraph)
+    results: Dict[str, object] = dataclasses.field(default_factory=dict)
+    stamps: Dict[str, Stamp] = dataclasses.field(default_factory=dict)
+    digests: Dict[str, Optional[bytes]] = dataclasses.field(default_factory=dict)
+
+    def _build(self, unit: str) -> None:
+        with Recording() as recording:
+            self.results[unit] = self.build(unit)
+        # a unit which cannot be read still depends on itself
+        self.graph.record(unit, recording.opened)
+        for filename in recording.opened | {unit}:
+            if filename not in self.stamps:
+                self.stamps[filename] = _stamp(filename)
+                self.digests[filename] = self._digest(filename)
+
+    def _digest(self, filename: str) -> Optional[bytes]:
+        try:
+            return self.cache.get(filename).digest
+        except OSError:
+            return None
+
+    def build_all(self) -> Rebuild:
+        start = time.perf_counter()
+        for unit in self.units:
+            self._build(unit)
+        return Rebuild([], list(self.units), time.perf_counter() - start)
+
+    def poll(self) -> List[str]:
+        """Returns the files whose contents changed since the last poll."""
+        changed = []
+        for filename in sorted(self.graph.files):
+            stamp = _stamp(filename)
+            if stamp == self.stamps.get(filename):
+                continue
+            self.stamps[filename] = stamp
+            digest = self._digest(filename)
+            if digest != self.digests.get(filename):
+                self.digests[filename] = digest
+                changed.append(filename)
+        return changed
+
+    def rebuild(self, changed: Iterable[str]) -> Rebuild:
+        """Builds the units depending on ``changed`` again, in the order of
+        ``units``."""
+        start = time.perf_counter()
+        changed = list(changed)
+        affected = self.graph.affected(changed)
+        units = [x for x in self.units if x in affected]
+        for unit in units:
+            self._build(unit)
+        # forget the files no unit depends on any more
+        for filename in set(self.stamps) - self.graph.files:
+            del self.stamps[filename]
+            del self.digests[filename]
+            self.cache.invalidate(filename)
+        return Rebuild(changed, units, time.perf_counter() - start)
+
+    def run(
+        self,
+        on_rebuild: Callable[[Rebuild], None],
+        interval: float = 0.25,
+        iterations: Optional[int] = None,
+    ) -> None:
+        """Polls every ``interval`` seconds and rebuilds on changes, until
+        interrupted or after ``iterations`` polls."""
+        count = 0
+        while iterations is None or count < iterations:
+            changed = self.poll()
+            if changed:
+                on_rebuild(self.rebuild(changed))
+            count += 1
+            if iterations is None or count < iterations:
+                time.sleep(interval)
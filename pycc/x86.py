@@ -0,0 +1,282 @@
+import dataclasses
+from typing import List, Optional, Sequence, Tuple, Union
+
+from .ir import NONE
+
+# register numbers are the hardware encodings
+RAX, RCX, RDX, RBX, RSP, RBP, RSI, RDI = range(8)
+R8, R9, R10, R11, R12, R13, R14, R15 = range(8, 16)
+# the base of a memory operand relative to the next instruction
+RIP = 16
+# registers from here on are virtual, assigned by the register allocator
+FIRST_VIRTUAL = 32
+
+ARGUMENT_REGISTERS = (RDI, RSI, RDX, RCX, R8, R9)
+CALLER_SAVED = (RAX, RCX, RDX, RSI, RDI, R8, R9, R10, R11)
+CALLEE_SAVED = (RBX, R12, R13, R14, R15)
+# kept out of allocation for moves between memory locations and cycles
+SCRATCH = R11
+# in order of preference: registers which need not be saved come first
+ALLOCATABLE = (RAX, RCX, RDX, RSI, RDI, R8, R9, R10, RBX, R12, R13, R14, R15)
+
+_NAMES = {
+    8: "rax rcx rdx rbx rsp rbp rsi rdi r8 r9 r10 r11 r12 r13 r14 r15".split(),
+    4: "eax ecx edx ebx esp ebp esi edi".split() + [f"r{k}d" for k in range(8, 16)],
+    2: "ax cx dx bx sp bp si di".split() + [f"r{k}w" for k in range(8, 16)],
+    1: "al cl dl bl spl bpl sil dil".split() + [f"r{k}b" for k in range(8, 16)],
+}
+SUFFIXES = {1: "b", 2: "w", 4: "l", 8: "q"}
+
+# condition codes and the ones which hold with the operands swapped
+CONDITIONS = ("e", "ne", "l", "le", "g", "ge", "b", "be", "a", "ae")
+SWAPPED = {
+    "e": "e",
+    "ne": "ne",
+    "l": "g",
+    "le": "ge",
+    "g": "l",
+    "ge": "le",
+    "b": "a",
+    "be": "ae",
+    "a": "b",
+    "ae": "be",
+}
+NEGATED = {
+    "e": "ne",
+    "ne": "e",
+    "l": "ge",
+    "le": "g",
+    "g": "le",
+    "ge": "l",
+    "b": "ae",
+    "be": "a",
+    "a": "be",
+    "ae": "b",
+}
+
+
+def register_name(reg: int, size: int = 8) -> str:
+    if reg >= FIRST_VIRTUAL:
+        return f"%v{reg - FIRST_VIRTUAL}.{size}"
+    return "%" + _NAMES[size][reg]
+
+
+def fits_imm32(value: int) -> bool:
+    return -(1 << 31) <= value < (1 << 31)
+
+
+@dataclasses.dataclass(frozen=True)
+class Imm:
+    value: int
+
+
+@dataclasses.dataclass(frozen=True)
+class Mem:
+    """``disp(base, index, scale)``, or ``symbol+disp(%rip)`` when the base
+    is RIP; ``got`` refers to the symbol's GOT entry instead."""
+
+    base: int = NONE
+    index: int = NONE
+    scale: int = 1
+    disp: int = 0
+    symbol: Optional[str] = None
+    got: bool = False
+
+    def registers(self) -> List[int]:
+        return [x for x in (self.base, self.index) if x != NONE and x != RIP]
+
+    def replace(self, mapping) -> "Mem":
+        base = self.base if self.base in (NONE, RIP) else mapping(self.base)
+        index = self.index if self.index == NONE else mapping(self.index)
+        return dataclasses.replace(self, base=base, index=index)
+
+
+@dataclasses.dataclass(frozen=True)
+class Sym:
+    """A call target; ``plt`` calls an external function through the PLT."""
+
+    name: str
+    plt: bool = False
+
+
+@dataclasses.dataclass(frozen=True)
+class Label:
+    name: str
+
+
+Operand = Union[int, Imm, Mem, Sym, Label]
+
+# two operand instructions which read and write their destination
+TWO_ADDRESS = frozenset({"add", "sub", "and", "or", "xor", "imul", "shl", "sar", "shr"})
+# instructions which only read their operands
+COMPARE = frozenset({"cmp", "test"})
+
+
+@dataclasses.dataclass(eq=False)
+class Inst:
+    """A machine instruction with AT&T operand order, sources first.
+
+    ``size`` is the operand size in bytes; ``src_size`` is the size of the
+    source of a sign or zero extension; ``cond`` is the condition code of
+    ``set`` and ``j``. A ``call`` reads the first ``nargs`` argument
+    registers and a ``ret`` reads RAX if ``nargs`` is 1.
+    """
+
+    op: str
+    size: int = 8
+    args: List[Operand] = dataclasses.field(default_factory=list)
+    cond: str = ""
+    src_size: int = 0
+    nargs: int = 0
+
+    def registers(self) -> Tuple[List[int], List[int]]:
+        """Returns the registers written and read, including implicit
+        ones."""
+        op = self.op
+        args = self.args
+        defs: List[int] = []
+        uses: List[int] = []
+        for arg in args:
+            if isinstance(arg, Mem):
+                uses.extend(arg.registers())
+        if op in ("set", "pop"):
+            if isinstance(args[0], int):
+                defs.append(args[0])
+        elif op in ("mov", "movs", "movz", "lea"):
+            if isinstance(args[0], int):
+                uses.append(args[0])
+            if isinstance(args[1], int):
+                defs.append(args[1])
+        elif op in TWO_ADDRESS:
+            if len(args) == 3:
+                # imul $imm, src, dst
+                if isinstance(args[1], int):
+                    uses.append(args[1])
+                defs.append(args[2])
+            else:
+                if isinstance(args[0], int):
+                    uses.append(args[0])
+                if isinstance(args[1], int):
+                    uses.append(args[1])
+                    defs.append(args[1])
+        elif op in ("neg", "not"):
+            if isinstance(args[0], int):
+                uses.append(args[0])
+                defs.append(args[0])
+        elif op in COMPARE or op == "push":
+            uses.extend(x for x in args if isinstance(x, int))
+        elif op == "cqto":
+            uses.append(RAX)
+            defs.append(RDX)
+        elif op in ("idiv", "div"):
+            uses.extend(x for x in args if isinstance(x, int))
+            uses.extend((RAX, RDX))
+            defs.extend((RAX, RDX))
+        elif op == "call":
+            uses.extend(x for x in args if isinstance(x, int))
+            uses.extend(ARGUMENT_REGISTERS[: self.nargs])
+            # variadic functions take the number of vector registers in %al
+            uses.append(RAX)
+            defs.extend(CALLER_SAVED)
+        elif op == "ret":
+            if self.nargs:
+                uses.append(RAX)
+        return defs, uses
+
+    def map_registers(self, use, define) -> None:
+        """Replaces every register operand ``r`` with ``use(r)`` where it is
+        read and ``define(r)`` where it is only written."""
+        op = self.op
+        written_only = None
+        if op in ("mov", "movs", "movz", "lea", "set", "pop") or (
+            op in TWO_ADDRESS and len(self.args) == 3
+        ):
+            written_only = len(self.args) - 1
+        args = []
+        for k, arg in enumerate(self.args):
+            if isinstance(arg, Mem):
+                arg = arg.replace(use)
+            elif isinstance(arg, int):
+                arg = define(arg) if k == written_only else use(arg)
+            args.append(arg)
+        self.args = args
+
+    def __str__(self) -> str:
+        return format_inst(self)
+
+
+def _operand(arg: Operand, size: int) -> str:
+    if isinstance(arg, int):
+        return register_name(arg, size)
+    if isinstance(arg, Imm):
+        return f"${arg.value}"
+    if isinstance(arg, Mem):
+        if arg.base == RIP:
+            suffix = "@GOTPCREL" if arg.got else ""
+            disp = f"{arg.disp:+d}" if arg.disp else ""
+            return f"{arg.symbol}{suffix}{disp}(%rip)"
+        disp = str(arg.disp) if arg.disp else ""
+        parts = register_name(arg.base) if arg.base != NONE else ""
+        if arg.index != NONE:
+            parts += f",{register_name(arg.index)},{arg.scale}"
+        return f"{disp}({parts})"
+    if isinstance(arg, Sym):
+        return arg.name + ("@PLT" if arg.plt else "")
+    return arg.name
+
+
+def format_inst(inst: Inst) -> str:
+    op = inst.op
+    size = inst.size
+    args = inst.args
+    suffix = SUFFIXES[size]
+    if op in ("movs", "movz"):
+        if op == "movz" and inst.src_size == 4:
+            # writing a 32-bit register clears the upper half
+            return f"movl {_operand(args[0], 4)}, {_operand(args[1], 4)}"
+        name = op + SUFFIXES[inst.src_size] + suffix
+        return f"{name} {_operand(args[0], inst.src_size)}, {_operand(args[1], size)}"
+    if op == "mov" and isinstance(args[0], Imm) and not fits_imm32(args[0].value):
+        return f"movabsq {_operand(args[0], 8)}, {_operand(args[1], 8)}"
+    if op == "set":
+        return f"set{inst.cond} {_operand(args[0], 1)}"
+    if op == "j":
+        return f"j{inst.cond} {_operand(args[0], 8)}"
+    if op == "jmp":
+        return f"jmp {_operand(args[0], 8)}"
+    if op == "call":
+        target = args[0]
+        if isinstance(target, Sym):
+            return f"call {_operand(target, 8)}"
+        return f"call *{_operand(target, 8)}"
+    if op == "cqto":
+        return "cqto" if size == 8 else "cltd"
+    if op in ("ret", "leave"):
+        return op
+    if op in ("shl", "sar", "shr") and len(args) == 2 and isinstance(args[0], int):
+        return f"{op}{suffix} %cl, {_operand(args[1], size)}"
+    return f"{op}{suffix} " + ", ".join(_operand(x, size) for x in args)
+
+
+@dataclasses.dataclass(eq=False)
+class MBlock:
+    label: str
+    insts: List[Inst] = dataclasses.field(default_factory=list)
+    succs: List[int] = dataclasses.field(default_factory=list)
+    preds: List[int] = dataclasses.field(default_factory=list)
+    # how many times the block ran in the profile, or -1 if unknown
+    count: int = -1
+
+
+@dataclasses.dataclass(eq=False)
+class MFunction:
+    name: str
+    blocks: List[MBlock] = dataclasses.field(default_factory=list)
+    # bytes of stack slots below %rbp for allocas and spills
+    frame_size: int = 0
+    # bytes for arguments passed on the stack at the bottom of the frame
+    outgoing_size: int = 0
+    static: bool = False
+    saved: Sequence[int] = ()
+    # the index of the first block placed in the cold section, if any
+    cold: Optional[int] = None
@@ -0,0 +1,120 @@
+import pytest
+
+
+class Test_Assembler:
+    @pytest.fixture
+    def factory(self):
+        from pycc.assembler import Assembler
+
+        def factory(*insts):
+            assembler = Assembler()
+            assembler.assemble(insts)
+            assembler.resolve()
+            return assembler
+
+        return factory
+
+    @pytest.mark.parametrize(
+        "op, size, args, expected",
+        [
+            ("push", 8, ["RBP"], "55"),
+            ("push", 8, ["R12"], "41 54"),
+            ("mov", 8, ["RSP", "RBP"], "48 89 e5"),
+            ("mov", 4, [5, "RAX"], "c7 c0 05 00 00 00"),
+            ("mov", 8, [0x123456789, "RAX"], "48 b8 89 67 45 23 01 00 00 00"),
+            ("mov", 8, [("RBP", -8), "RAX"], "48 8b 45 f8"),
+            ("mov", 8, [("R12", 0), "RAX"], "49 8b 04 24"),
+            ("mov", 8, [("R13", 0), "RAX"], "49 8b 45 00"),
+            ("mov", 4, [("RBP", -400), "R9"], "44 8b 8d 70 fe ff ff"),
+            ("mov", 1, ["RSI", ("RDI", 0)], "40 88 37"),
+            ("mov", 2, [7, ("RAX", 0)], "66 c7 00 07 00"),
+            ("sub", 8, [16, "RSP"], "48 83 ec 10"),
+            ("add", 4, [1000, "R10"], "41 81 c2 e8 03 00 00"),
+            ("xor", 8, ["R15", "RBX"], "4c 31 fb"),
+            ("cmp", 4, [("RAX", 4), "ECX"], "3b 48 04"),
+            ("test", 4, ["RDX", "RDX"], "85 d2"),
+            ("imul", 8, [10, "RCX", "RDX"], "48 6b d1 0a"),
+            ("imul", 4, ["RSI", "RDI"], "0f af fe"),
+            ("shl", 4, ["RCX", "RDX"], "d3 e2"),
+            ("sar", 8, [3, "R8"], "49 c1 f8 03"),
+            ("neg", 4, ["RAX"], "f7 d8"),
+            ("idiv", 4, ["RCX"], "f7 f9"),
+            ("cqto", 8, [], "48 99"),
+            ("cqto", 4, [], "99"),
+            ("leave", 8, [], "c9"),
+            ("ret", 8, [], "c3"),
+            ("call", 8, ["R10"], "41 ff d2"),
+        ],
+    )
+    def test_encoding(self, factory, op, size, args, expected):
+        from pycc import x86
+        from pycc.x86 import Imm, Inst, Mem
+
+        def operand(x):
+            if isinstance(x, str):
+                return getattr(x86, x.replace("ECX", "RCX"))
+            if isinstance(x, tuple):
+                return Mem(getattr(x86, x[0]), disp=x[1])
+            return Imm(x)
+
+        assembler = factory(Inst(op, size, [operand(x) for x in args]))
+        assert assembler.code.hex(" ") == expected
+
+    def test_indexed(self, factory):
+        from pycc.x86 import RAX, RBP, RDI, RSI, R13, Inst, Mem
+
+        assembler = factory(
+            Inst("lea", 8, [Mem(RDI, RSI, 8), RAX]),
+            Inst("mov", 8, [Mem(RBP, R13, 4, -16), RAX]),
+        )
+        assert assembler.code.hex(" ") == "48 8d 04 f7 4a 8b 44 ad f0"
+
+    def test_set_byte_registers(self, factory):
+        from pycc.x86 import RAX, RSI, Inst
+
+        assembler = factory(
+            Inst("set", 1, [RAX], cond="l"), Inst("set", 1, [RSI], cond="e")
+        )
+        # %sil needs a REX prefix to be told apart from %dh
+        assert assembler.code.hex(" ") == "0f 9c c0 40 0f 94 c6"
+
+    def test_relocations(self, factory):
+        from pycc.assembler import R_X86_64_GOTPCREL, R_X86_64_PC32, R_X86_64_PLT32
+        from pycc.x86 import RAX, RIP, Imm, Inst, Mem, Sym
+
+        assembler = factory(
+            Inst("lea", 8, [Mem(RIP, symbol="x"), RAX]),
+            Inst("cmp", 4, [Imm(5), Mem(RIP, symbol="y", disp=8)]),
+            Inst("mov", 8, [Mem(RIP, symbol="z", got=True), RAX]),
+            Inst("call", 8, [Sym("f", plt=True)]),
+        )
+        assert [
+            (r.offset, r.symbol, r.type, r.addend) for r in assembler.relocations
+        ] == [
+            (3, "x", R_X86_64_PC32, -4),
+            # the immediate follows the displacement
+            (9, "y", R_X86_64_PC32, 3),
+            (17, "z", R_X86_64_GOTPCREL, -4),
+            (22, "f", R_X86_64_PLT32, -4),
+        ]
+
+    def test_jumps(self, factory):
+        from pycc.x86 import Inst, Label
+
+        assembler = factory(
+            "top",
+            Inst("j", 8, [Label("end")], cond="ne"),
+            Inst("jmp", 8, [Label("top")]),
+            "end",
+            Inst("ret"),
+        )
+        assert assembler.code.hex(" ") == "0f 85 05 00 00 00 e9 f5 ff ff ff c3"
+
+    def test_undefined_label(self):
+        from pycc.assembler import Assembler, EncodingError
+        from pycc.x86 import Inst, Label
+
+        assembler = Assembler()
+        assembler.instruction(Inst("jmp", 8, [Label("nowhere")]))
+        with pytest.raises(EncodingError):
+            assembler.resolve()
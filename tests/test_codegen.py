@@ -0,0 +1,260 @@
+import shutil
+import subprocess
+
+import pytest
+
+needs_gcc = pytest.mark.skipif(
+    shutil.which("gcc") is None, reason="assembling needs gcc"
+)
+
+PROGRAM = r"""
+int printf(const char *, ...);
+struct P { int x; long y; char c; };
+int table[4] = {1, 2, 3, 4};
+int *second = table + 1;
+static int counter;
+
+int fib(int n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+long sum(long *a, int n) {
+    long s = 0;
+    for (int i = 0; i < n; i++)
+        s += a[i];
+    return s;
+}
+int many(int a, int b, int c, int d, int e, int f, int g, int h) {
+    return a - b + c * d - e / f + g % h;
+}
+int apply(int (*f)(int), int v) { return f(v); }
+int pressure(int n) {
+    int a = n + 1, b = n + 2, c = n + 3, d = n + 4, e = n + 5, f = n + 6;
+    int g = n + 7, h = n + 8, i = n + 9, j = n + 10, k = n + 11, l = n + 12;
+    int m = n + 13, o = n + 14, p = n + 15, q = n + 16, r = n + 17;
+    for (int t = 0; t < n; t++) {
+        a += b; b += c; c += d; d += e; e += f; f += g; g += h; h += i;
+        i += j; j += k; k += l; l += m; m += o; o += p; p += q; q += r;
+        r += a + fib(t % 3);
+    }
+    return a ^ b ^ c ^ d ^ e ^ f ^ g ^ h ^ i ^ j ^ k ^ l ^ m ^ o ^ p ^ q ^ r;
+}
+int swap(int n) {
+    int x = 1, y = 2;
+    for (int i = 0; i < n; i++) { int t = x; x = y; y = t; }
+    return x * 10 + y;
+}
+int main(void) {
+    long a[10];
+    struct P s;
+    signed char sc = -5;
+    unsigned char uc = 250;
+    unsigned u = 4000000000u;
+    for (int i = 0; i < 10; i++)
+        a[i] = i * i;
+    s.x = 3; s.y = 1L << 40; s.c = 'a';
+    counter += 5;
+    printf("%d %ld %d %d\n", fib(15), sum(a, 10), many(1, 2, 3, 4, 10, 3, 9, 5),
+           apply(fib, 10));
+    printf("%d %ld %c %d %d %u %d\n", s.x, s.y, s.c, sc, uc, u / 3, -7 % 3);
+    printf("%d %d %d %d\n", pressure(10), swap(3), *second, (uc + sc) >> 2);
+    return counter;
+}
+"""
+EXPECTED = (
+    "610 285 12 55\n"
+    "3 1099511627776 a -5 250 1333333333 -1\n"
+    "20716 21 2 61\n"
+)
+
+
+class Test_Codegen:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.lower import lower
+        from pycc.opt import optimize
+
+        def factory(text, optimized=True, level=1):
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            module = lower(parser.iter_declarations(), reporter)
+            assert not reporter.errors
+            if optimized:
+                optimize(module, level=level)
+            return module
+
+        return factory
+
+    @pytest.fixture
+    def run(self, factory, tmp_path):
+        from pycc.codegen import generate
+
+        def run(text, allocator="linear-scan", optimized=True):
+            source = tmp_path / "a.s"
+            source.write_text(generate(factory(text, optimized), allocator))
+            binary = tmp_path / "a.out"
+            subprocess.run(["gcc", "-o", str(binary), str(source)], check=True)
+            return subprocess.run([str(binary)], capture_output=True, text=True)
+
+        return run
+
+    @needs_gcc
+    @pytest.mark.parametrize("allocator", ["linear-scan", "naive"])
+    @pytest.mark.parametrize("optimized", [False, True])
+    def test_program(self, run, allocator, optimized):
+        result = run(PROGRAM, allocator, optimized)
+        assert result.stdout == EXPECTED
+        assert result.returncode == 5
+
+    @needs_gcc
+    @pytest.mark.parametrize("level", [2, 3])
+    def test_optimization_levels(self, factory, tmp_path, level):
+        from pycc.codegen import generate
+
+        source = tmp_path / "a.s"
+        source.write_text(generate(factory(PROGRAM, level=level)))
+        binary = tmp_path / "a.out"
+        subprocess.run(["gcc", "-o", str(binary), str(source)], check=True)
+        result = subprocess.run([str(binary)], capture_output=True, text=True)
+        assert result.stdout == EXPECTED
+        assert result.returncode == 5
+
+    @needs_gcc
+    def test_stack_arguments(self, run):
+        result = run(
+            """
+            long f(long a, long b, long c, long d, long e, long f, long g,
+                   long h, long i) {
+                return a + b * 2 + c * 3 + d * 4 + e * 5 + f * 6 + g * 7 + h * 8
+                    + i * 9;
+            }
+            int main(void) { return f(1, 1, 1, 1, 1, 1, 1, 1, 1) - 45 + f(0, 0, 0,
+                0, 0, 0, 0, 0, 2) - 18; }
+            """
+        )
+        assert result.returncode == 0
+
+    @needs_gcc
+    def test_division(self, run):
+        result = run(
+            """
+            int printf(const char *, ...);
+            int main(void) {
+                long m = -9223372036854775807L;
+                unsigned long big = 18446744073709551615UL;
+                int x = -17, y = 5;
+                printf("%ld %lu %d %d %u\\n", m / 3, big / 7, x / y, x % y,
+                       (unsigned)x / y);
+                return 0;
+            }
+            """
+        )
+        assert result.stdout == (
+            "-3074457345618258602 2635249153387078802 -3 -2 858993455\n"
+        )
+
+    def test_split_critical_edges(self, factory):
+        from pycc.codegen import split_critical_edges
+        from pycc.ssa import verify
+
+        module = factory(
+            "int f(int x) { int y = 0; if (x) y = 1; return y + x; }", False
+        )
+        [fn] = module.functions
+        split_critical_edges(fn)
+        verify(fn)
+        for block in fn.blocks:
+            if len(block.succs) > 1:
+                assert all(len(fn.blocks[x].preds) == 1 for x in block.succs)
+
+    def test_addressing_modes(self, factory):
+        from pycc.codegen import generate
+
+        text = generate(
+            factory("long f(long *a, long i) { return a[i] + a[i + 1]; }")
+        )
+        # the index is scaled by the addressing mode and the second load is
+        # an operand of the addition
+        assert "shl" not in text and "imul" not in text
+        assert ",8)" in text
+        assert "addq (%" in text
+
+    def test_fused_branch(self, factory):
+        from pycc.codegen import generate
+
+        text = generate(
+            factory("int f(int n) { int s = 0; while (n > 0) s += n--; return s; }")
+        )
+        assert "set" not in text
+        assert "cmpl $0," in text
+
+    def test_register_allocation(self, factory):
+        from pycc.codegen import generate
+
+        text = generate(factory("int f(int a, int b) { return a * b + a; }"))
+        # no stack traffic is needed beyond the frame pointer
+        assert "(%rbp)" not in text
+        naive = generate(
+            factory("int f(int a, int b) { return a * b + a; }"), "naive"
+        )
+        assert "(%rbp)" in naive
+
+    def test_globals(self, factory):
+        from pycc.codegen import generate
+
+        text = generate(
+            factory(
+                """
+                int table[3] = {1, 2};
+                int *p = table + 2;
+                const char *s = "ab";
+                static long zero;
+                """
+            )
+        )
+        assert ".globl table\n" in text
+        assert ".byte 1,0,0,0,2,0,0,0,0,0,0,0" in text
+        assert ".quad table+8" in text
+        assert "\t.bss\n" in text
+        assert ".globl zero" not in text
+
+    @needs_gcc
+    def test_string_suffixes(self, factory, tmp_path):
+        from pycc.codegen import generate, generate_object
+
+        module = factory(
+            """
+            int puts(const char *);
+            const char *world = "world";
+            int main(void) {
+                puts("hello, world");
+                puts(world);
+                return puts("hello, " "world") < 0;
+            }
+            """
+        )
+        text = generate(module)
+        # "world" is stored at the end of "hello, world"
+        assert text.count(".byte 104,101") == 1
+        assert "\t.byte 104,101,108,108,111,44,32\n.L.str.0:\n" in text
+        (tmp_path / "a.s").write_text(text)
+        (tmp_path / "b.o").write_bytes(generate_object(module))
+        for name in ["a.s", "b.o"]:
+            binary = str(tmp_path / (name + ".out"))
+            subprocess.run(["gcc", "-o", binary, str(tmp_path / name)], check=True)
+            result = subprocess.run([binary], capture_output=True, text=True)
+            assert result.stdout == "hello, world\nworld\nhello, world\n"
+
+    @needs_gcc
+    @pytest.mark.parametrize("allocator", ["linear-scan", "naive"])
+    def test_object(self, factory, tmp_path, allocator):
+        from pycc.codegen import generate_object
+
+        obj = tmp_path / "a.o"
+        obj.write_bytes(generate_object(factory(PROGRAM), allocator))
+        binary = tmp_path / "a.out"
+        subprocess.run(["gcc", "-o", str(binary), str(obj)], check=True)
+        result = subprocess.run([str(binary)], capture_output=True, text=True)
+        assert result.stdout == EXPECTED
+        assert result.returncode == 5
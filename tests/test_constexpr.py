@@ -0,0 +1,110 @@
+import pytest
+from pycc import types
+
+
+class Test_Evaluator:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.constexpr import Evaluator
+
+        def factory(text, **kwargs):
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            return parser.parse_expr(), Evaluator(reporter, **kwargs)
+
+        return factory
+
+    @pytest.mark.parametrize(
+        "src, type, value",
+        [
+            ("1 + 2 * 3", types.INT, 7),
+            ("(1 + 2) * 3", types.INT, 9),
+            ("-7 / 2", types.INT, -3),
+            ("-7 % 2", types.INT, -1),
+            ("7 % -2", types.INT, 1),
+            ("1 << 4 | 1", types.INT, 17),
+            ("-1 >> 1", types.INT, -1),
+            ("~0u", types.UNSIGNED_INT, 0xFFFFFFFF),
+            ("-1 < 0u", types.INT, 0),
+            ("-1 < 0", types.INT, 1),
+            ("-1L < 0u", types.INT, 1),
+            ("0u - 1", types.UNSIGNED_INT, 0xFFFFFFFF),
+            ("0ul - 1", types.UNSIGNED_LONG, 0xFFFFFFFFFFFFFFFF),
+            ("2147483648", types.LONG, 2147483648),
+            ("0x80000000", types.UNSIGNED_INT, 0x80000000),
+            ("0xFFFFFFFFFFFFFFFF", types.UNSIGNED_LONG, 0xFFFFFFFFFFFFFFFF),
+            ("1ll", types.LONG_LONG, 1),
+            ("1 ? -1 : 0u", types.UNSIGNED_INT, 0xFFFFFFFF),
+            ("0 ? 1 / 0 : 2", types.INT, 2),
+            ("0 && 1 / 0", types.INT, 0),
+            ("1 || 1 / 0", types.INT, 1),
+            ("!5", types.INT, 0),
+            ("'a'", types.INT, 97),
+            (r"'\377'", types.INT, -1),
+            ("'ab'", types.INT, 0x6162),
+        ],
+    )
+    def test_evaluate(self, factory, src, type, value):
+        from pycc.constexpr import Constant
+
+        expr, evaluator = factory(src)
+        assert evaluator.evaluate(expr) == Constant(type, value)
+        assert evaluator.reporter.errors == []
+
+    @pytest.mark.parametrize(
+        "src",
+        ["1 / 0", "1 % 0", "1 << 32", "1 << -1", "x", "1.0", "x = 1", "1, 2", "&x"],
+    )
+    def test_not_constant(self, factory, src):
+        from pycc.constexpr import ConstantError
+
+        expr, evaluator = factory(src)
+        with pytest.raises(ConstantError):
+            evaluator.evaluate(expr)
+        assert len(evaluator.reporter.errors) == 1
+
+    def test_overflow(self, factory):
+        expr, evaluator = factory("2147483647 + 1")
+        assert evaluator.evaluate(expr).value == -2147483648
+        assert len(evaluator.reporter.warnings) == 1
+
+    def test_resolve(self, factory):
+        from pycc.constexpr import Constant
+
+        values = {"A": Constant(types.UNSIGNED_INT, 3)}
+        expr, evaluator = factory("A * 2", resolve=values.get)
+        assert evaluator.evaluate(expr) == Constant(types.UNSIGNED_INT, 6)
+
+    def test_cache(self, factory):
+        expr, evaluator = factory("1 + 2")
+        result = evaluator.evaluate(expr)
+        assert evaluator.evaluate(expr) is result
+        assert len(evaluator.cache) == 3
+
+    def test_preprocessor(self, factory):
+        from pycc.constexpr import Constant
+
+        expr, evaluator = factory("UNDEFINED + 0x7fffffff + 1", preprocessor=True)
+        assert evaluator.evaluate(expr) == Constant(types.INTMAX, 0x80000000)
+        expr, evaluator = factory("-1 > 0u", preprocessor=True)
+        assert evaluator.evaluate(expr) == Constant(types.INTMAX, 1)
+
+    def test_evaluate_tokens(self):
+        from pycc.constexpr import Constant, Evaluator
+        from pycc.error import Reporter
+        from pycc.file import File
+        from pycc.parser import tokenize
+        from pycc.scanner import Scanner
+
+        def tokens(text):
+            scanner = Scanner(File("", text), Reporter())
+            return [x for x in tokenize(scanner)][:-1]
+
+        evaluator = Evaluator(Reporter(), preprocessor=True)
+        result = evaluator.evaluate_tokens(tokens("FOO >= 2 || 3 * 4 == 12"))
+        assert result == Constant(types.INTMAX, 1)
+        assert evaluator.evaluate_tokens(tokens("FOO>=2||3*4==12")) is result
@@ -0,0 +1,213 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+SOURCE = r"""int printf(const char *, ...);
+/* squares */ static int sq(int x) { return x * x; } // helper
+int main(void) {
+    printf("%d\n",
+           sq(7));
+    return 0;
+}
+"""
+
+# the modules of the package every mode may import; anything else, like the
+# code generator in -fsyntax-only, is a regression of the start-up time
+MODULES = {
+    "-E": {"driver", "error", "file", "scanner", "token"},
+    "-fsyntax-only": {"ast", "constexpr", "parser", "strings", "symtab", "types"},
+    "-S": {"codegen", "inline", "ir", "lower", "opt", "regalloc", "ssa", "x86"},
+    "-c": {"assembler", "elf"},
+}
+# the import time of a mode relative to -c, which loads everything
+BUDGETS = {"-E": 0.6, "-fsyntax-only": 0.9}
+# the import time of a mode as a multiple of the imports of the interpreter's
+# own start-up, about 1.5 times what it takes; unlike the budgets this
+# catches a slow import which every mode makes, such as asyncio's at 10 times
+CEILINGS = {"-E": 9, "-fsyntax-only": 24, "-S": 32, "-c": 32}
+
+# import times depend on the load of the machine and on its disk cache, so
+# the tight budgets are only checked on request; the imported modules and
+# the generous ceilings are always checked
+timing = pytest.mark.skipif(
+    not os.environ.get("PYCC_TIMING_TESTS"),
+    reason="set PYCC_TIMING_TESTS=1 to check wall-clock times",
+)
+
+
+def import_times(mode, path, output):
+    """Runs the driver under ``-X importtime`` and returns the modules it
+    imported and the total cumulative import time of the package."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"from pycc.driver import main; main([{mode!r}, {path!r}, '-o', {output!r}])"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=root),
+        check=True,
+    )
+    modules = set()
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules.add(name.strip())
+        # a top-level entry includes everything imported under it
+        if name.startswith(" pycc.") and not name.startswith("  "):
+            total += int(cumulative)
+    return modules, total
+
+
+def startup_time():
+    """Returns the total import time of ``python -c pass``, which imports
+    ``site`` and what it needs."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total += int(cumulative)
+    return total
+
+
+class Test_Driver:
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "a.c"
+        path.write_text(SOURCE)
+        return path
+
+    def test_preprocess(self, source, capsys):
+        from pycc.driver import main
+
+        assert main(["-E", str(source)]) == 0
+        assert capsys.readouterr().out == (
+            "int printf(const char *, ...);\n"
+            "              static int sq(int x) { return x * x; }\n"
+            "int main(void) {\n"
+            '    printf("%d\\n",\n'
+            "           sq(7));\n"
+            "    return 0;\n"
+            "}\n"
+        )
+
+    def test_syntax_only(self, tmp_path, capsys):
+        from pycc.driver import main
+
+        path = tmp_path / "a.c"
+        path.write_text("int x y;\n")
+        assert main(["-fsyntax-only", str(path), str(tmp_path / "missing.c")]) == 1
+        err = capsys.readouterr().err
+        assert f"{path}:1:6: error: expected ;" in err
+        assert "missing.c: No such file or directory" in err
+        assert list(tmp_path.iterdir()) == [path]
+
+    @pytest.mark.parametrize("flags, errors", [([], 20), (["-ferror-limit=5"], 5)])
+    def test_error_limit(self, tmp_path, capsys, flags, errors):
+        from pycc.driver import main
+
+        path = tmp_path / "a.c"
+        path.write_text("int x y;\n" * 30)
+        assert main(["-fsyntax-only", *flags, str(path)]) == 1
+        err = capsys.readouterr().err.splitlines()
+        assert len(err) == errors + 1
+        assert err[errors - 1] == f"{path}:{errors}:6: error: expected ;"
+        assert err[-1].endswith("fatal error: too many errors emitted, stopping now")
+        assert main(["-fsyntax-only", "-ferror-limit=0", str(path)]) == 1
+        assert len(capsys.readouterr().err.splitlines()) == 30
+
+    def test_options(self, source, capsys):
+        from pycc.driver import main
+
+        with pytest.raises(SystemExit):
+            main([str(source)])
+        with pytest.raises(SystemExit):
+            main(["-c", "-o", "x.o", str(source), str(source)])
+        with pytest.raises(SystemExit):
+            main(["-S", "-O4", str(source)])
+        capsys.readouterr()
+        with pytest.raises(SystemExit):
+            main(["--help"])
+        out = capsys.readouterr().out
+        assert "check the syntax and stop after the parser" in out
+        assert "compile to an object file" in out
+        assert " only only" not in out
+
+    @pytest.mark.skipif(shutil.which("gcc") is None, reason="linking needs gcc")
+    @pytest.mark.parametrize("mode, suffix", [("-S", ".s"), ("-c", ".o")])
+    def test_compile(self, source, tmp_path, monkeypatch, mode, suffix):
+        from pycc.driver import main
+
+        monkeypatch.chdir(tmp_path)
+        assert main([mode, "-O2", str(source)]) == 0
+        binary = str(tmp_path / "a.out")
+        subprocess.run(["gcc", "-o", binary, "a" + suffix], check=True)
+        result = subprocess.run([binary], capture_output=True, text=True)
+        assert result.stdout == "49\n"
+
+    def test_watch(self, tmp_path, monkeypatch, capsys):
+        import time
+
+        from pycc.driver import main
+
+        a = tmp_path / "a.c"
+        a.write_text("int a;\n")
+        b = tmp_path / "b.c"
+        b.write_text("int b;\n")
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 1:
+                a.write_text("int a b;\n")
+            else:
+                raise KeyboardInterrupt
+
+        monkeypatch.setattr(time, "sleep", sleep)
+        argv = ["-fsyntax-only", "--watch", "--interval", "0.1", str(a), str(b)]
+        assert main(argv) == 0
+        err = capsys.readouterr().err.splitlines()
+        assert err[0].startswith("pycc: built 2 files in ")
+        assert err[1] == f"{a}:1:6: error: expected ;"
+        assert err[2].startswith("pycc: rebuilt 1 of 2 files in ")
+        assert err[2].endswith(f"ms ({a} changed)")
+        assert sleeps == [0.1, 0.1]
+
+    def test_imports(self, source, tmp_path):
+        output = str(tmp_path / "out")
+        expected = set()
+        for mode, modules in MODULES.items():
+            expected |= {"pycc." + x for x in modules}
+            imported, _ = import_times(mode, str(source), output)
+            assert {x for x in imported if x.startswith("pycc.")} == expected
+            # diagnostics are recorded, not logged
+            assert "logging" not in imported
+
+    def test_import_ceiling(self, source, tmp_path):
+        output = str(tmp_path / "out")
+        startup = min(startup_time() for _ in range(5))
+        for mode, ceiling in CEILINGS.items():
+            time = min(import_times(mode, str(source), output)[1] for _ in range(5))
+            assert time <= ceiling * startup, (mode, time, startup)
+
+    @timing
+    def test_import_time(self, source, tmp_path):
+        output = str(tmp_path / "out")
+        times = {}
+        for mode in MODULES:
+            runs = [import_times(mode, str(source), output) for _ in range(5)]
+            times[mode] = min(x[1] for x in runs)
+        for mode, budget in BUDGETS.items():
+            assert times[mode] <= budget * times["-c"], times
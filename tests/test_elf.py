@@ -0,0 +1,92 @@
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+
+class Test_ObjectFile:
+    @pytest.fixture
+    def factory(self):
+        from pycc.assembler import R_X86_64_PLT32, Relocation
+        from pycc.elf import STT_FUNC, STT_OBJECT, ObjectFile
+
+        def factory():
+            obj = ObjectFile()
+            text = obj.section(".text")
+            text.data += b"\xe8\x00\x00\x00\x00\xc3"
+            text.relocations.append(Relocation(1, "puts", R_X86_64_PLT32, -4))
+            obj.define("main", ".text", 0, 6, STT_FUNC)
+            data = b"\1\0\0\0" + bytes(8)
+            offset = obj.add_data(".data", data, 8, [(4, "main", 2)])
+            obj.define("table", ".data", offset, 12, STT_OBJECT, local=True)
+            offset = obj.add_data(".bss", bytes(16), 16)
+            obj.define("zero", ".bss", offset, 16, STT_OBJECT)
+            return obj
+
+        return factory
+
+    def test_layout(self, factory):
+        data = factory().write()
+        assert data[:4] == b"\x7fELF"
+        shoff, = struct.unpack_from("<Q", data, 0x28)
+        shnum, shstrndx = struct.unpack_from("<HH", data, 0x3C)
+        assert shoff % 8 == 0 and shoff + shnum * 64 == len(data)
+
+        headers = [
+            struct.unpack_from("<IIQQQQIIQQ", data, shoff + k * 64)
+            for k in range(shnum)
+        ]
+        strings = headers[shstrndx][4]
+
+        def name(offset):
+            start = strings + offset
+            return data[start : data.index(b"\0", start)].decode()
+
+        names = [name(x[0]) for x in headers]
+        assert names == [
+            "",
+            ".text",
+            ".data",
+            ".bss",
+            ".rela.text",
+            ".rela.data",
+            ".symtab",
+            ".strtab",
+            ".shstrtab",
+        ]
+
+    def test_reserve(self):
+        from pycc.elf import SHT_NOBITS, Section
+
+        section = Section(".data")
+        assert section.reserve(3, 1) == 0
+        assert section.reserve(8, 8) == 8
+        assert len(section.data) == 16 and section.align == 8
+        bss = Section(".bss", SHT_NOBITS)
+        assert bss.reserve(4, 4) == 0
+        assert bss.reserve(4, 16) == 16
+        assert bss.size == 20 and not bss.data
+
+    @pytest.mark.skipif(shutil.which("readelf") is None, reason="needs readelf")
+    def test_readelf(self, factory, tmp_path):
+        path = tmp_path / "a.o"
+        path.write_bytes(factory().write())
+        result = subprocess.run(
+            ["readelf", "-W", "-s", "-r", str(path)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert not result.stderr
+        symbols = {
+            line.split()[-1]: line.split()
+            for line in result.stdout.splitlines()
+            if line.strip()[:1].isdigit() and len(line.split()) == 8
+        }
+        assert symbols["main"][3:5] == ["FUNC", "GLOBAL"]
+        assert symbols["table"][3:5] == ["OBJECT", "LOCAL"]
+        assert symbols["zero"][2] == "16"
+        assert symbols["puts"][4:7] == ["GLOBAL", "DEFAULT", "UND"]
+        assert "R_X86_64_PLT32" in result.stdout
+        assert "R_X86_64_64" in result.stdout
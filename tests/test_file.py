@@ -0,0 +1,40 @@
+import pytest
+from pycc.file import File, translate
+
+
+class Test_Translate:
+    @pytest.mark.parametrize(
+        "src, expected",
+        [
+            ("ab\\\ncd", "abcd"),
+            ("ab\\\r\ncd\\\rx", "abcdx"),
+            ("??=define ??(??)", "#define []"),
+            ("a??/\nb", "ab"),
+            ("??'??<??!??>??-", "^{|}~"),
+            ("???=", "?#"),
+            ("??a \\ \n", "??a \\ \n"),
+        ],
+    )
+    def test_translate(self, src, expected):
+        assert translate(src)[0] == expected
+
+    def test_zero_copy(self):
+        src = "int x;\n" * 1000
+        text, source_map = File("", src).translate()
+        assert text is src
+        assert source_map is None
+
+    def test_lookup(self):
+        src = "a\\\nb??=c\\\n\\\nd"
+        text, source_map = translate(src)
+        assert text == "ab#cd"
+        for pos, c in enumerate(text):
+            original, _ = source_map.lookup(pos)
+            assert src[original] == c or src[original : original + 3] == "??="
+        assert [source_map.lookup(pos)[1] for pos in range(len(text))] == [
+            0,
+            1,
+            1,
+            1,
+            3,
+        ]
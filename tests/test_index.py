@@ -0,0 +1,181 @@
+import os
+
+import pytest
+
+A = """typedef struct point { int x, y; } point;
+extern int count;
+int norm(point *p);
+int norm(point *p) {
+    count++;
+    return p->x * p->x + p->y * p->y;
+}
+"""
+B = """int count = 0;
+enum { RED, GREEN };
+int norm(void *);
+int main(void) { return norm(0) + count + GREEN; }
+"""
+
+
+class Test_Index:
+    @pytest.fixture
+    def factory(self, tmp_path):
+        from pycc.index import Index
+
+        files = []
+        for name, text in [("a.c", A), ("b.c", B)]:
+            path = tmp_path / name
+            path.write_text(text)
+            # the index stores real paths
+            files.append(os.path.realpath(path))
+
+        def factory():
+            return Index(str(tmp_path / "index.db"))
+
+        yield factory, files
+
+    def test_lookup(self, factory):
+        from pycc.index import Kind, Role
+
+        factory, (a, b) = factory
+        with factory() as index:
+            stats = index.update([a, b])
+            assert (stats.indexed, stats.unchanged) == (2, 0)
+            symbols = index.lookup("count")
+            assert [
+                (x.start.filename, x.start.line, x.kind, x.role) for x in symbols
+            ] == [
+                (a, 2, Kind.VARIABLE, Role.DECLARATION),
+                (a, 5, None, Role.REFERENCE),
+                (b, 1, Kind.VARIABLE, Role.DEFINITION),
+                (b, 4, None, Role.REFERENCE),
+            ]
+            (definition,) = index.lookup("norm", Role.DEFINITION)
+            assert (definition.start.line, definition.end.line) == (4, 7)
+            assert [x.kind for x in index.lookup("p")] == [
+                Kind.PARAMETER,
+                Kind.PARAMETER,
+                None,
+                None,
+                None,
+                None,
+            ]
+            assert [x.kind for x in index.lookup("y")] == [Kind.FIELD]
+            assert [x.kind for x in index.lookup("point")] == [Kind.TYPEDEF, Kind.TAG]
+            assert index.lookup("GREEN")[0].kind == Kind.ENUMERATOR
+            assert index.lookup("missing") == []
+
+    def test_prefix(self, factory):
+        factory, files = factory
+        with factory() as index:
+            index.update(files)
+            assert {x.name for x in index.prefix("no")} == {"norm"}
+            assert {x.name for x in index.prefix("")} >= {"count", "main", "RED"}
+            assert len(index.prefix("", limit=3)) == 3
+
+    def test_prefix_bounds(self, factory):
+        from pycc.index import UpdateStats
+
+        factory, _ = factory
+        # the scanner takes no such identifiers, so the rows are written as is
+        names = ["\U0010ffffa", "a\U0010ffff", "a\U0010ffffb", "b"]
+        names += ["x\ud7ffy", "x\ue000"]
+        rows = [(x, "variable", "definition", 0, 1, 0, 1, 1, 1) for x in names]
+        with factory() as index:
+            index._write_batch([("c.c", b"", rows)], UpdateStats())
+            assert [x.name for x in index.prefix("\U0010ffff")] == names[:1]
+            assert [x.name for x in index.prefix("a\U0010ffff")] == names[1:3]
+            assert [x.name for x in index.prefix("x\ud7ff")] == names[4:5]
+            assert [x.name for x in index.prefix("")] == sorted(names)
+
+    def test_spellings(self, factory, tmp_path, monkeypatch):
+        factory, (a, b) = factory
+        monkeypatch.chdir(tmp_path)
+        os.mkdir("src")
+        os.symlink(a, os.path.join("src", "link.c"))
+        with factory() as index:
+            index.update([a, "a.c", "./a.c", "src/../a.c", "src/link.c"])
+            assert index.filenames == [a]
+            index.update(["./b.c"])
+            assert index.update([b]).unchanged == 1
+            assert len(index.lookup("main")) == 1
+            assert [x.name for x in index.at("./a.c", 5, 4)] == ["count", "norm"]
+            index.remove("src/link.c")
+            assert index.filenames == [b]
+
+    def test_at(self, factory):
+        from pycc.index import Kind, Role
+
+        factory, (a, b) = factory
+        with factory() as index:
+            index.update([a, b])
+            # the reference, then the function it is in
+            reference, function = index.at(b, 4, 38)
+            assert (reference.name, reference.role) == ("count", Role.REFERENCE)
+            assert (function.name, function.kind) == ("main", Kind.FUNCTION)
+            assert [x.name for x in index.at(a, 5, 4)] == ["count", "norm"]
+            assert index.at(a, 8, 0) == []
+
+    def test_incremental(self, factory, tmp_path):
+        factory, (a, b) = factory
+        with factory() as index:
+            index.update([a, b])
+        with factory() as index:
+            stats = index.update([a, b])
+            assert (stats.indexed, stats.unchanged) == (0, 2)
+            (tmp_path / "b.c").write_text("int renamed;\n")
+            stats = index.update([a, b])
+            assert (stats.indexed, stats.unchanged) == (1, 1)
+            assert [x.start.filename for x in index.lookup("count")] == [a, a]
+            assert len(index.lookup("renamed")) == 1
+            (tmp_path / "b.c").unlink()
+            assert index.update([a, b]).removed == 1
+            assert index.filenames == [a]
+            index.remove(a)
+            assert index.lookup("norm") == []
+
+    def test_jobs(self, factory, tmp_path):
+        factory, files = factory
+        for n in range(8):
+            path = tmp_path / f"f{n}.c"
+            path.write_text(f"int f{n}(void) {{ return g{n}; }}\n")
+            files.append(str(path))
+        with factory() as index:
+            index.batch_size = 3
+            stats = index.update(files, jobs=2)
+            assert stats.indexed == 10
+            serial = [(x.name, x.start) for x in index.prefix("")]
+        with factory() as index:
+            for path in files:
+                index.remove(path)
+            index.update(files)
+            assert [(x.name, x.start) for x in index.prefix("")] == serial
+
+    def test_syntax_error(self, factory, tmp_path):
+        factory, _ = factory
+        path = tmp_path / "c.c"
+        path.write_text("int good;\nint x y;\nint after;\n" + "(" * 200)
+        with factory() as index:
+            index.update([str(path)])
+            # the erroneous declaration is dropped by the recovery
+            assert {x.name for x in index.prefix("")} == {"good", "after"}
+
+    def test_schema_version(self, factory):
+        factory, files = factory
+        with factory() as index:
+            index.update(files)
+            index.connection.execute("PRAGMA user_version = 0")
+        with factory() as index:
+            assert index.filenames == []
+
+    def test_main(self, factory, tmp_path, capsys):
+        from pycc.index import main
+
+        _, (a, b) = factory
+        database = str(tmp_path / "cli.db")
+        assert main([database, "update", a, b]) == 0
+        assert capsys.readouterr().out.startswith("2 indexed, 0 unchanged")
+        assert main([database, "lookup", "main"]) == 0
+        assert capsys.readouterr().out == f"{b}:4:0: definition function main\n"
+        assert main([database, "at", f"{a}:1:0"]) == 0
+        assert main([database, "prefix", "zz"]) == 1
@@ -0,0 +1,163 @@
+import pytest
+
+
+class Test_Inliner:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.lower import lower
+
+        def factory(text):
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            module = lower(parser.iter_declarations(), reporter)
+            assert not reporter.errors
+            return module
+
+        return factory
+
+    @pytest.fixture
+    def optimized(self, factory):
+        from pycc.opt import optimize
+        from pycc.ssa import verify
+
+        def optimized(text, level=2):
+            module = factory(text)
+            manager = optimize(module, level=level)
+            for fn in module.functions:
+                verify(fn)
+            return {fn.name: fn for fn in module.functions}, manager
+
+        return optimized
+
+    def calls(self, fn):
+        from pycc.inline import callee
+        from pycc.ir import Op
+
+        return [callee(fn, i) for i in fn.instructions() if fn.op[i] == Op.CALL]
+
+    def test_call_graph(self, factory):
+        from pycc.inline import CallGraph
+
+        graph = CallGraph.build(
+            factory(
+                """
+                int leaf(int x) { return x; }
+                int odd(int n);
+                int even(int n) { return n ? odd(n - 1) : leaf(1); }
+                int odd(int n) { return n ? even(n - 1) : 0; }
+                int (*pointer)(int) = leaf;
+                int main(void) { return even(4) + leaf(2); }
+                """
+            )
+        )
+        assert graph.calls["main"] == ["even", "leaf"]
+        # callees come before their callers
+        assert graph.order == [["leaf"], ["odd", "even"], ["main"]]
+        assert graph.recursive("odd", "even")
+        assert not graph.recursive("main", "leaf")
+        assert graph.address_taken == {"leaf"}
+
+    def test_static_inline(self, optimized):
+        from pycc.ir import Op
+
+        functions, manager = optimized(
+            """
+            static inline int square(int x) { return x * x; }
+            int f(int a) { return square(a) + square(3); }
+            """
+        )
+        f = functions["f"]
+        assert self.calls(f) == []
+        # square(3) folds away entirely
+        assert [f.op[i] for i in f.instructions()].count(Op.MUL) == 1
+        assert manager.inlined == 2
+        assert manager.removed == ["square"] and "square" not in functions
+
+    def test_multiple_returns(self, optimized):
+        from pycc.ir import Op
+
+        functions, _ = optimized(
+            """
+            static int sign(int x) {
+                if (x < 0)
+                    return -1;
+                if (x > 0)
+                    return 1;
+                return 0;
+            }
+            int f(int a, int b) { return sign(a) * 10 + sign(b); }
+            """
+        )
+        f = functions["f"]
+        assert self.calls(f) == []
+        assert Op.PHI in [f.op[i] for i in f.instructions()]
+
+    def test_not_inlined(self, optimized):
+        functions, manager = optimized(
+            """
+            int fib(int n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+            static int twice(int x) { return 2 * x; }
+            int (*table[1])(int) = {twice};
+            int f(int n) { return fib(n) + twice(n); }
+            """,
+            level=1,
+        )
+        assert self.calls(functions["f"]) == ["fib", "twice"]
+        assert manager.inlined == 0
+        functions, manager = optimized(
+            """
+            int fib(int n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+            static int twice(int x) { return 2 * x; }
+            int (*table[1])(int) = {twice};
+            int f(int n) { return fib(n) + twice(n); }
+            """
+        )
+        # fib is inlined once into f but never into itself, and twice is
+        # kept for the table
+        assert self.calls(functions["f"]) == ["fib", "fib"]
+        assert self.calls(functions["fib"]) == ["fib", "fib"]
+        assert "twice" in functions
+
+    def test_cost_model(self, factory):
+        from pycc.inline import CostModel, size
+        from pycc.ir import Op
+
+        module = factory(
+            """
+            static int big(int x) {
+                int s = 0;
+                for (int i = 0; i < x; i++)
+                    s = s * 31 + (i ^ x) - (s >> 3);
+                return s;
+            }
+            int f(int a) { return big(a) + big(7); }
+            """
+        )
+        big, f = module.functions
+        calls = [i for i in f.instructions() if f.op[i] == Op.CALL]
+        model = CostModel()
+        variable, constant = (model.cost(f, x, big, False) for x in calls)
+        assert variable == size(big) - model.call_cost - 1
+        assert constant == variable - model.constant_argument
+        assert model.cost(f, calls[0], big, True) == variable - size(big)
+        big.inline = True
+        assert model.threshold_for(big) == model.threshold + model.inline_bonus
+
+    def test_growth_limit(self, factory):
+        from pycc.inline import CallGraph, CostModel, Inliner, size
+        from pycc.opt import optimize
+
+        module = factory(
+            "static int g(int x) { return x * 3 + 1; }\n"
+            "int f(int a) { return " + " + ".join(["g(a)"] * 50) + "; }"
+        )
+        optimize(module)
+        g, f = module.functions
+        inliner = Inliner(CallGraph.build(module), CostModel(max_size=size(f) + 20))
+        inliner.run(f)
+        assert inliner.inlined == 20 // size(g)
+        assert len(self.calls(f)) == 50 - inliner.inlined
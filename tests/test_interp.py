@@ -0,0 +1,251 @@
+import io
+import shutil
+import subprocess
+
+import pytest
+
+needs_gcc = pytest.mark.skipif(shutil.which("gcc") is None, reason="needs gcc")
+
+
+class Test_Interpreter:
+    @pytest.fixture
+    def factory(self):
+        from pycc.error import RecordingReporter
+        from pycc.file import File
+        from pycc.interp import Interpreter
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+
+        def factory(text):
+            reporter = RecordingReporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            interp = Interpreter(reporter, stdout=io.StringIO())
+            interp.load(parser.iter_declarations())
+            return interp
+
+        return factory
+
+    @pytest.fixture
+    def call(self, factory):
+        def call(text, *args, name="f"):
+            interp = factory(text)
+            assert not interp.reporter.errors
+            return interp.call(name, *args)
+
+        return call
+
+    def test_wraparound(self, call):
+        assert call("int f(int x) { return x + 1; }", 2147483647) == -2147483648
+        assert call("int f(int x) { return x * 65537; }", 65537) == 131073
+        assert call("unsigned f(unsigned x) { return x - 1; }", 0) == 4294967295
+        assert call("char f(int x) { return x; }", 200) == -56
+        assert call("_Bool f(int x) { return x; }", 256) == 1
+        assert call("long f(long x) { return -x; }", -(1 << 63)) == -(1 << 63)
+        assert call("int f(void) { unsigned char c = 255; c++; return c; }") == 0
+
+    def test_conversions(self, call):
+        assert call("int f(int x) { return x < 0u; }", -1) == 0
+        assert call("int f(int x) { return x < 0L; }", -1) == 1
+        assert call("long f(int x) { return x; }", -1) == -1
+        assert call("long f(unsigned x) { return x; }", 4294967295) == 4294967295
+        assert call("unsigned long f(int x) { return x; }", -1) == (1 << 64) - 1
+        assert call("int f(void) { return -1 / 2u; }") == 2147483647
+        assert call("int f(void) { return sizeof(long) + sizeof 'a'; }") == 12
+
+    def test_division(self, call):
+        assert call("int f(int a, int b) { return a / b; }", -7, 2) == -3
+        assert call("int f(int a, int b) { return a % b; }", -7, 2) == -1
+        assert call("int f(int a, int b) { return a % b; }", 7, -2) == 1
+        source = "unsigned f(unsigned a) { return a / 3; }"
+        assert call(source, 4294967295) == 1431655765
+
+    def test_shifts(self, call):
+        assert call("int f(int x) { return x >> 1; }", -5) == -3
+        source = "unsigned f(unsigned x) { return x >> 1; }"
+        assert call(source, 4294967291) == 2147483645
+        assert call("int f(int x) { return 1 << x; }", 31) == -2147483648
+        # the count is masked as x86 does
+        assert call("int f(int x) { return 1 << x; }", 33) == 2
+        assert call("long f(int x) { return 1L << x; }", 40) == 1 << 40
+
+    def test_pointers(self, call):
+        source = """
+        struct node { int value; struct node *next; };
+        int sum(struct node *p) {
+            int total = 0;
+            for (; p; p = p->next)
+                total += p->value;
+            return total;
+        }
+        int f(void) {
+            struct node nodes[3];
+            int a[6] = {10, 20, 30, [5] = 60};
+            int *p = a + 1, *q = &a[5];
+            for (int i = 0; i < 3; i++) {
+                nodes[i].value = a[i];
+                nodes[i].next = i < 2 ? &nodes[i + 1] : 0;
+            }
+            *p += 2;
+            return sum(nodes) + (q - p) * 1000 + sizeof a;
+        }
+        """
+        assert call(source) == 60 + 4000 + 24
+
+    def test_address_of_local(self, call):
+        source = """
+        void swap(int *a, int *b) { int t = *a; *a = *b; *b = t; }
+        int f(int x, int y) { swap(&x, &y); return x * 10 + y; }
+        """
+        assert call(source, 1, 2) == 21
+
+    def test_strings(self, factory):
+        interp = factory(
+            """
+            int printf(const char *, ...);
+            char greeting[] = "hello";
+            int main(void) {
+                char *s = greeting;
+                unsigned long n = 0;
+                while (s[n])
+                    n++;
+                printf("%s %lu %c %5d|%-3x|%u %%\\n", s, n, s[1], -42, 255, -1);
+                return sizeof greeting;
+            }
+            """
+        )
+        assert interp.run() == 6
+        assert interp.stdout.getvalue() == "hello 5 e   -42|ff |4294967295 %\n"
+
+    def test_control_flow(self, call):
+        source = """
+        int f(int n) {
+            int total = 0;
+            for (int i = 0; i < n; i++) {
+                if (i % 2)
+                    continue;
+                if (i > 8)
+                    break;
+                switch (i) {
+                case 0:
+                    total += 100;
+                case 2:
+                case 4:
+                    total += i;
+                    break;
+                default:
+                    total += 1000;
+                }
+            }
+            do total++; while (total % 7);
+            return total;
+        }
+        """
+        assert call(source, 20) == 2107
+
+    def test_recursion(self, call):
+        source = "int f(int n) { return n < 2 ? n : f(n - 1) + f(n - 2); }"
+        assert call(source, 20) == 6765
+
+    def test_statics(self, call):
+        source = """
+        int counter = 5;
+        enum { STEP = 3 };
+        int next(void) { static int n = 10; n += STEP; return n; }
+        int f(void) { next(); counter++; return next() + counter; }
+        """
+        assert call(source) == 22
+
+    def test_function_pointers(self, call):
+        source = """
+        int add(int a, int b) { return a + b; }
+        int mul(int a, int b) { return a * b; }
+        int (*ops[2])(int, int) = {add, mul};
+        int f(int k) { int (*op)(int, int) = ops[k]; return op(6, 7); }
+        """
+        assert call(source, 0) == 13
+        assert call(source, 1) == 42
+
+    def test_builtins(self, factory):
+        interp = factory(
+            """
+            void exit(int);
+            int main(void) {
+                int *p = malloc(4 * sizeof(int));
+                memset(p, 0, 16);
+                p[3] = 7;
+                putchar('0' + p[3]);
+                exit(p[3] + p[0]);
+                return 1;
+            }
+            """
+        )
+        assert interp.run() == 7
+        assert interp.stdout.getvalue() == "7"
+        assert [str(x) for x in interp.reporter.diagnostics] == [
+            ":4:25: warning: implicit declaration of function 'malloc'",
+            ":5:16: warning: implicit declaration of function 'memset'",
+            ":7:16: warning: implicit declaration of function 'putchar'",
+        ]
+
+    def test_runtime_errors(self, call):
+        from pycc.interp import InterpreterError
+
+        with pytest.raises(InterpreterError, match="division by zero"):
+            call("int f(int x) { return 1 / x; }", 0)
+        with pytest.raises(InterpreterError, match="invalid memory access"):
+            call("int f(void) { int *p = 0; return *p; }")
+        with pytest.raises(InterpreterError, match="stack overflow"):
+            call("int f(void) { int a[1000]; a[0] = f(); return a[0]; }")
+        with pytest.raises(InterpreterError, match="'g' is not defined"):
+            call("int g(void); int f(void) { return g(); }")
+
+    def test_unsupported(self, factory):
+        interp = factory(
+            """
+            int f(void) { goto out; out: return 1; }
+            double g(double x) { return x; }
+            int h(void) { return 2; }
+            struct B { int a:3; };
+            int k(struct B *p) { return p->a; }
+            """
+        )
+        assert [str(x) for x in interp.reporter.diagnostics] == [
+            ":2:26: error: 'goto' is not supported",
+            ":3:40: error: floating point is not supported",
+            ":6:40: error: bit-field members are not supported",
+        ]
+        assert interp.call("h") == 2
+
+    def test_program(self, factory):
+        from test_codegen import EXPECTED, PROGRAM
+
+        interp = factory(PROGRAM)
+        assert not interp.reporter.diagnostics
+        assert interp.run() == 5
+        assert interp.stdout.getvalue() == EXPECTED
+
+    @needs_gcc
+    def test_matches_gcc(self, factory, tmp_path):
+        source = r"""
+        int printf(const char *, ...);
+        int main(void) {
+            unsigned h = 2166136261u;
+            signed char c = 0;
+            long acc = 0;
+            for (int i = 0; i < 300; i++) {
+                h = (h ^ (unsigned)i) * 16777619u;
+                c += i * 7;
+                acc = acc * 31 + (int)(h >> (i & 31)) - c;
+            }
+            printf("%u %d %ld %x\n", h, c, acc, (int)h >> 3);
+            return (int)(h % 256);
+        }
+        """
+        path = tmp_path / "a.c"
+        path.write_text(source)
+        binary = tmp_path / "a.out"
+        subprocess.run(["gcc", "-o", str(binary), str(path)], check=True)
+        native = subprocess.run([str(binary)], capture_output=True, text=True)
+        interp = factory(source)
+        assert interp.run() == native.returncode
+        assert interp.stdout.getvalue() == native.stdout
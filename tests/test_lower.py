@@ -0,0 +1,202 @@
+import pytest
+
+
+class Test_Lowering:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.lower import lower
+
+        def factory(text):
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            return lower(parser.iter_declarations(), reporter), reporter
+
+        return factory
+
+    def ops(self, fn):
+        from pycc.ir import Op
+
+        return [Op(fn.op[i]) for i in fn.instructions()]
+
+    def test_straight_line(self, factory):
+        from pycc.ir import Op, ValueType, format_function
+        from pycc.ssa import verify
+
+        module, reporter = factory("int add(int a, int b) { int c = a + b; return c; }")
+        assert not reporter.errors
+        [fn] = module.functions
+        verify(fn)
+        assert fn.params == [ValueType.I32, ValueType.I32]
+        assert fn.ret == ValueType.I32
+        # both parameters and the local are promoted out of memory
+        assert Op.ALLOCA not in self.ops(fn)
+        assert Op.LOAD not in self.ops(fn)
+        assert "i32 add %" in format_function(fn)
+
+    def test_loop_phis(self, factory):
+        from pycc.ir import Op
+        from pycc.ssa import verify
+
+        module, reporter = factory(
+            """
+            int sum(int n) {
+                int s = 0;
+                for (int i = 0; i < n; i++) {
+                    if (i % 2 && i != 5)
+                        continue;
+                    s += i;
+                }
+                return s;
+            }
+            """
+        )
+        assert not reporter.errors
+        [fn] = module.functions
+        verify(fn)
+        ops = self.ops(fn)
+        # s and i at the loop header, s again where continue joins the step
+        assert ops.count(Op.PHI) == 3
+        assert Op.LOAD not in ops and Op.STORE not in ops
+
+    def test_address_taken(self, factory):
+        from pycc.ir import Op
+        from pycc.ssa import verify
+
+        module, reporter = factory(
+            "void g(int *); int f(void) { int x = 1; g(&x); return x; }"
+        )
+        assert not reporter.errors
+        [fn] = module.functions
+        verify(fn)
+        ops = self.ops(fn)
+        assert Op.ALLOCA in ops and Op.LOAD in ops and Op.CALL in ops
+
+    def test_conversions(self, factory):
+        from pycc.ir import Op
+
+        module, reporter = factory(
+            """
+            unsigned f(char c, unsigned char u, long l) {
+                return c + u + l / 2;
+            }
+            """
+        )
+        assert not reporter.errors
+        ops = self.ops(module.functions[0])
+        assert Op.SEXT in ops and Op.ZEXT in ops and Op.TRUNC in ops
+        assert Op.SDIV in ops
+
+    def test_pointer_arithmetic(self, factory):
+        from pycc.ir import format_function
+
+        module, reporter = factory("long f(int *p, int *q) { return p[2] + (q - p); }")
+        assert not reporter.errors
+        text = format_function(module.functions[0])
+        assert "i64 mul" in text
+        assert "i64 sdiv" in text
+
+    def test_switch(self, factory):
+        from pycc.ir import Op
+        from pycc.ssa import verify
+
+        module, reporter = factory(
+            """
+            int f(int x) {
+                switch (x) {
+                case 1: return 10;
+                case 2: x++;
+                default: break;
+                }
+                return x > 0 ? x : -x;
+            }
+            """
+        )
+        assert not reporter.errors
+        [fn] = module.functions
+        verify(fn)
+        ops = self.ops(fn)
+        assert ops.count(Op.EQ) == 2
+        assert ops.count(Op.RET) == 2
+
+    def test_goto(self, factory):
+        from pycc.ssa import verify
+
+        module, reporter = factory(
+            "int f(int n) { again: if (n > 10) { n -= 10; goto again; } return n; }"
+        )
+        assert not reporter.errors
+        verify(module.functions[0])
+
+    def test_globals(self, factory):
+        module, reporter = factory(
+            """
+            int g = 3;
+            int a[4] = {1, 2, [3] = 9};
+            char *s = "hi";
+            int *p = &a[0] + 0;
+            int *q = a + 1;
+            int t;
+            int t;
+            static int f(void) { static int c; return ++c; }
+            """
+        )
+        globals = {g.name: g for g in module.globals}
+        assert globals["g"].data == (3).to_bytes(4, "little")
+        assert globals["a"].data == b"".join(
+            x.to_bytes(4, "little") for x in (1, 2, 0, 9)
+        )
+        assert globals["s"].relocations == [(0, ".L.str.0", 0)]
+        assert globals[".L.str.0"].data == b"hi\0"
+        assert globals[".L.str.0"].readonly
+        assert globals["q"].relocations == [(0, "a", 4)]
+        assert globals["t"].data is None
+        assert sum(g.name == "t" for g in module.globals) == 1
+        assert globals["f.c.0"].static
+        assert module.functions[0].static
+
+    def test_string_literals(self, factory):
+        module, reporter = factory(
+            'const char *a = "hi", *b = "h" "i";'
+            'const char *f(void) { return "hi"; }'
+        )
+        assert not reporter.errors
+        literals = [g for g in module.globals if g.literal]
+        assert [(g.name, g.data) for g in literals] == [(".L.str.0", b"hi\0")]
+        globals = {g.name: g for g in module.globals}
+        assert globals["b"].relocations == [(0, ".L.str.0", 0)]
+
+    @pytest.mark.parametrize(
+        "src, message",
+        [
+            ("int f(void) { return x; }", "use of undeclared identifier 'x'"),
+            ("void f(void) { break; }", "not in loop or switch statement"),
+            ("void f(void) { goto out; }", "use of undeclared label 'out'"),
+            ("void f(void) { 1 = 2; }", "expression is not assignable"),
+            ("double f(void) { return 1.0; }", "not supported"),
+            (
+                "struct B { int a:3; }; int f(struct B *p) { return p->a; }",
+                "bit-field members are not supported",
+            ),
+            (
+                "struct B { int a:3; }; int f(void) { struct B b = {7}; return 0; }",
+                "bit-field members are not supported",
+            ),
+        ],
+    )
+    def test_errors(self, factory, src, message, caplog):
+        module, reporter = factory(src + " int ok(void) { return 0; }")
+        assert len(reporter.errors) == 1
+        assert message in caplog.text
+        # the function with the error is left out
+        assert [fn.name for fn in module.functions] == ["ok"]
+
+    def test_implicit_declaration(self, factory):
+        from pycc.error import Warning
+
+        module, reporter = factory("int f(void) { return g(1); }")
+        assert not reporter.errors
+        assert reporter.warnings[0][1] == Warning.IMPLICIT_FUNCTION_DECLARATION
@@ -0,0 +1,117 @@
+import os
+import tracemalloc
+
+import pytest
+
+FUNCTION = """
+long f{n}(long *a, int n) {{
+    long s = {n};
+    for (int i = 0; i < n; i++)
+        s += a[i] * {n} + (a[i] >> 3);
+    return s;
+}}
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "a.c"
+    path.write_text("".join(FUNCTION.format(n=n) for n in range(50)))
+    return str(path)
+
+
+class Test_Memory:
+    def test_parse_budget(self):
+        from pycc.memory import parse_budget, parse_size
+
+        assert parse_size("512") == 512
+        assert parse_size("64K") == 64 << 10
+        assert parse_size("16MB") == 16 << 20
+        assert parse_size("1GiB") == 1 << 30
+        assert parse_budget("ast=2m") == ("ast", 2 << 20)
+        assert parse_budget("total=1G") == ("total", 1 << 30)
+        for text in ("ast", "lower=1M", "scan=lots", "scan=-1"):
+            with pytest.raises(ValueError):
+                parse_budget(text)
+
+    def test_account(self, source):
+        from pycc.error import Reporter
+        from pycc.memory import PHASES, account
+
+        reporter = Reporter()
+        accounting = account(source, reporter)
+        report = accounting.report
+        assert not tracemalloc.is_tracing()
+        assert not reporter.errors
+        assert [x.name for x in report.phases] == list(PHASES)
+        assert all(x.peak >= x.retained > 0 for x in report.phases)
+        assert report.peak >= max(x.peak for x in report.phases)
+        assert report.tokens == len(accounting.tokens) > 50 * 40
+        # a token holds two locations and its text
+        assert 100 < report.bytes_per_token < 2000
+        assert len(accounting.declarations) == 50
+        assert report.nodes["FunctionDecl"].count == 50
+        assert report.nodes["ForStmt"].count == 50
+        assert all(x.average > 0 for x in report.nodes.values())
+        assert 0 < len(report.sites) <= 10
+        assert report.sites == sorted(report.sites, key=lambda x: -x.bytes)
+        text = report.format()
+        assert "bytes per TokenData" in text
+        assert "FunctionDecl" in text
+
+    def test_without_reset_peak(self, source, monkeypatch):
+        from pycc.error import Reporter
+        from pycc.memory import account
+
+        # tracemalloc.reset_peak is new in Python 3.9
+        monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+        report = account(source, Reporter()).report
+        # the peak of the scan is past the peak of opening the file
+        scan = report.phase("scan")
+        assert scan.peak >= scan.retained > report.phase("open").peak
+
+    @pytest.mark.parametrize(
+        "budget, phase", [("scan", "scan"), ("ast", "ast"), ("total", "front end")]
+    )
+    def test_budget(self, source, budget, phase):
+        from pycc.error import Error, FatalError, Reporter
+        from pycc.memory import account
+
+        reporter = Reporter()
+        message = f"the {phase}.* over its budget of 1.0KiB"
+        with pytest.raises(FatalError, match=message):
+            account(source, reporter, {budget: 1024})
+        [(location, error)] = reporter.errors
+        assert error == Error.MEMORY_BUDGET_EXCEEDED
+        # stops long before the end of the file
+        assert location.line < 50
+        assert not tracemalloc.is_tracing()
+
+    def test_open_budget(self, source):
+        from pycc.error import FatalError, Reporter
+        from pycc.memory import account
+
+        # the file is not read, its size is enough
+        size = os.path.getsize(source)
+        message = f"the open phase allocated .*KiB \\({size} bytes\\)"
+        with pytest.raises(FatalError, match=message):
+            account(source, Reporter(), {"open": 4096})
+
+    def test_driver(self, source, tmp_path, capsys):
+        from pycc.driver import main
+
+        output = str(tmp_path / "a.s")
+        assert main(["-S", source, "-o", output]) == 0
+        with open(output) as fp:
+            expected = fp.read()
+        assert main(["-S", "--memory-report", source, "-o", output]) == 0
+        with open(output) as fp:
+            assert fp.read() == expected
+        assert "bytes per TokenData" in capsys.readouterr().err
+        budget = ["--memory-budget", "scan=16M", "--memory-budget", "ast=1K"]
+        assert main(["-S", *budget, source, "-o", output]) == 1
+        err = capsys.readouterr().err
+        assert "fatal error: the ast phase allocated" in err
+        assert "memory of" not in err
+        with pytest.raises(SystemExit):
+            main(["-S", "--memory-budget", "parse=1M", source])
@@ -0,0 +1,287 @@
+import pytest
+
+
+class Test_Optimizer:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.lower import lower
+        from pycc.opt import optimize
+        from pycc.ssa import verify
+
+        def factory(text, passes=None, level=1):
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            module = lower(parser.iter_declarations(), reporter)
+            assert not reporter.errors
+            manager = optimize(module, passes, level)
+            for fn in module.functions:
+                verify(fn)
+            return module.functions[0], manager
+
+        return factory
+
+    def ops(self, fn):
+        from pycc.ir import Op
+
+        return [Op(fn.op[i]) for i in fn.instructions()]
+
+    def loop_ops(self, fn):
+        from pycc.ir import Op
+        from pycc.ssa import immediate_dominators, natural_loops
+
+        [loop] = natural_loops(fn, immediate_dominators(fn))
+        return [
+            Op(fn.op[i]) for i in fn.instructions() if fn.block_of[i] in loop.blocks
+        ]
+
+    def test_constant_propagation(self, factory):
+        from pycc.ir import format_function
+
+        fn, _ = factory(
+            """
+            int f(void) {
+                int x = 2;
+                int y = x * 3;
+                if (y > 5)
+                    return y + 1;
+                return 0;
+            }
+            """
+        )
+        assert format_function(fn).splitlines()[1:] == [
+            "b0:",
+            "  %14 = i32 const 7",
+            "  ret %14",
+        ]
+
+    def test_conditional_constant(self, factory):
+        from pycc.ir import Op
+
+        # k is only ever 3 along the executable paths, so the else branch and
+        # the phi for k go away
+        fn, _ = factory(
+            """
+            int f(int n) {
+                int s = 0;
+                int k = 3;
+                for (int i = 0; i < n; i++) {
+                    if (k == 3)
+                        s += i;
+                    else {
+                        s -= i;
+                        k = 4;
+                    }
+                }
+                return s;
+            }
+            """
+        )
+        ops = self.ops(fn)
+        assert Op.SUB not in ops
+        assert ops.count(Op.PHI) == 2
+        assert ops.count(Op.BRANCH) == 1
+
+    @pytest.mark.parametrize(
+        "expr, value",
+        [
+            ("-7 / 2", -3),
+            ("-7 % 2", -1),
+            ("(unsigned)-1 / 2", 0x7FFFFFFF),
+            ("-1 >> 1", -1),
+            ("(unsigned)-1 >> 28", 15),
+            ("(char)300", 44),
+            ("(unsigned char)-1", 255),
+            ("-1 < 0u", 0),
+            ("1 << 31", -(1 << 31)),
+        ],
+    )
+    def test_fold(self, factory, expr, value):
+        from pycc.ir import Op
+
+        fn, _ = factory(f"int f(void) {{ int x = {expr}; return x; }}")
+        [const, ret] = fn.instructions()
+        assert fn.op[const] == Op.CONST and fn.op[ret] == Op.RET
+        assert fn.a[const] == value
+
+    def test_division_by_zero_is_kept(self, factory):
+        from pycc.ir import Op
+
+        fn, _ = factory("int f(void) { int zero = 0; return 1 / zero; }")
+        assert Op.SDIV in self.ops(fn)
+
+    def test_common_subexpressions(self, factory):
+        from pycc.ir import Op
+
+        fn, _ = factory(
+            """
+            int f(int a, int b) {
+                int c = a * b + 1;
+                int d = b * a + 1;
+                if (a)
+                    return (a * b + 1) * 2;
+                return c - d;
+            }
+            """
+        )
+        ops = self.ops(fn)
+        assert ops.count(Op.MUL) == 2
+        assert ops.count(Op.SUB) == 0
+
+    def test_dead_code(self, factory):
+        from pycc.ir import Op
+
+        fn, _ = factory(
+            """
+            int g(int);
+            int f(int n) {
+                int unused = n * 7;
+                int s = 0;
+                for (int i = 0; i < n; i++)
+                    s += i;
+                g(n);
+                return 0;
+            }
+            """
+        )
+        ops = self.ops(fn)
+        # only the loop counter is left
+        assert Op.MUL not in ops
+        assert ops.count(Op.ADD) == 1 and ops.count(Op.PHI) == 1
+        assert Op.CALL in ops
+
+    def test_simplify_cfg(self, factory):
+        from pycc.opt import SimplifyCFG
+
+        fn, _ = factory(
+            """
+            int f(int a) {
+                int x = 0;
+                { { if (a) goto one; goto two; } }
+            one:
+                x = 1;
+            two:
+                return x;
+            }
+            """,
+            [SimplifyCFG()],
+        )
+        # the entry branches to the block storing 1 and both reach the return
+        assert len(fn.blocks) == 3
+        assert [len(b.preds) for b in fn.blocks] == [0, 1, 2]
+
+    def test_statistics(self, factory):
+        fn, manager = factory(
+            "int f(int a) { int x = a + 0; int y = a + 0; return x - y; }"
+        )
+        stats = manager.statistics
+        assert list(stats) == ["simplifycfg", "sccp", "gvn", "dce"]
+        assert stats["simplifycfg"].runs == 2
+        assert stats["gvn"].delta < 0
+        # everything folds to "ret 0"
+        assert fn.instruction_count() == 2
+        assert stats["dce"].delta < 0
+        report = manager.report()
+        assert "gvn" in report and "analyses computed" in report
+
+    def test_analyses_cached(self):
+        from pycc.ir import Function, Op, ValueType
+        from pycc.opt import DCE, GVN, Analyses
+
+        fn = Function("f", [], ValueType.I32)
+        fn.new_block()
+        x = fn.const(0, ValueType.I32, 1)
+        fn.const(0, ValueType.I32, 1)
+        fn.append(0, Op.RET, a=x)
+        analyses = Analyses(fn)
+        dominators = analyses.get("dominators")
+        assert analyses.get("dominators") is dominators
+        assert GVN().run(fn, analyses)
+        analyses.invalidate(GVN.preserves)
+        assert analyses.get("dominators") is dominators
+        assert "uses" not in analyses.cache
+        assert not DCE().run(fn, analyses)
+        assert analyses.computed == 2
+
+    def test_loop_invariant_code_motion(self, factory):
+        from pycc.ir import Op
+
+        fn, manager = factory(
+            """
+            long f(long *a, int n, long k) {
+                long s = 0;
+                for (int i = 0; i < n; i++)
+                    s += a[i] + k * 5 + (k ^ 3);
+                return s;
+            }
+            """,
+            level=2,
+        )
+        ops = self.loop_ops(fn)
+        # the scaling of i by 8 stays, as an addressing mode
+        assert ops.count(Op.MUL) == 1 and Op.XOR not in ops
+        assert self.ops(fn).count(Op.MUL) == 2
+        assert manager.statistics["licm"].changed == 1
+
+    def test_preheader(self, factory):
+        from pycc.ir import Op
+
+        # the loop is entered from two places with different values of i
+        fn, _ = factory(
+            """
+            int f(int a, int n, int k) {
+                int i = 0, s = 0;
+                if (a) {
+                    i = 3;
+                    goto body;
+                }
+                i = n;
+            body:
+                do {
+                    s += k * 7;
+                    i++;
+                } while (i < n);
+                return s;
+            }
+            """,
+            level=2,
+        )
+        [mul] = [i for i in fn.instructions() if fn.op[i] == Op.MUL]
+        pre = fn.blocks[fn.block_of[mul]]
+        assert len(pre.succs) == 1 and len(pre.preds) == 2
+        assert Op.PHI in [Op(fn.op[i]) for i in pre.insts]
+
+    def test_strength_reduction(self, factory):
+        from pycc.ir import Op
+
+        fn, manager = factory(
+            """
+            long a[100][30];
+            long f(int n, int j) {
+                long s = 0;
+                for (int i = 0; i < n; i += 2)
+                    s += a[i][j] + i * 100;
+                return s;
+            }
+            """,
+            level=2,
+        )
+        # the products by 240 and 100 are now phis growing by 480 and 200
+        assert Op.MUL not in self.loop_ops(fn)
+        steps = {fn.a[i] for i in fn.instructions() if fn.op[i] == Op.CONST}
+        assert {480, 200} <= steps
+        assert manager.statistics["ivsr"].changed == 1
+
+    def test_levels(self, factory):
+        from pycc.opt import inlining, pipeline
+
+        assert pipeline(0) == [] and inlining(1) is None
+        names = [p.name for p in pipeline(2)]
+        assert names.index("licm") < names.index("ivsr")
+        assert inlining(3).threshold > inlining(2).threshold
+        _, manager = factory("int f(int x) { return x; }", level=2)
+        assert list(manager.statistics)[0] == "inline"
+        assert "calls inlined: 0" in manager.report()
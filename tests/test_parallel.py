@@ -0,0 +1,106 @@
+import pickle
+
+import pytest
+
+PROGRAM = r"""
+int printf(const char *, ...);
+static int table[8] = {3, 1, 4, 1, 5, 9, 2, 6};
+static const char *names[] = {"zero", "one", "two"};
+static inline int square(int x) { return x * x; }
+static int fib(int n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+long sum(int n) {
+    long s = 0;
+    for (int i = 0; i < n; i++)
+        s += square(table[i % 8]);
+    return s;
+}
+int gcd(int a, int b) {
+    while (b) { int t = a % b; a = b; b = t; }
+    return a;
+}
+int classify(int n) {
+    switch (n % 3) { case 0: return 10; case 1: return 20; default: break; }
+    return n > 100 ? gcd(n, 12) : fib(n % 12);
+}
+int main(void) {
+    printf("%ld %d %s\n", sum(100), classify(7), names[gcd(4, 6)]);
+    return 0;
+}
+"""
+
+
+def lowered(text=PROGRAM):
+    from pycc.parser import Parser, TokenStream
+    from pycc.scanner import Scanner
+    from pycc.file import File
+    from pycc.error import Reporter
+    from pycc.lower import lower
+
+    reporter = Reporter()
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    module = lower(parser.iter_declarations(), reporter)
+    assert not reporter.errors
+    return module
+
+
+def serial(level, obj):
+    from pycc.codegen import generate, generate_object
+    from pycc.opt import optimize
+
+    module = lowered()
+    optimize(module, level=level)
+    return generate_object(module) if obj else generate(module)
+
+
+class Test_Parallel:
+    def test_encode(self):
+        from pycc.parallel import decode, encode
+        from pycc.opt import optimize
+
+        module = lowered()
+        optimize(module, level=2)
+        for fn in module.functions:
+            data = encode(fn)
+            assert len(data) < len(pickle.dumps(fn))
+            copy = decode(data)
+            assert repr(copy) == repr(fn)
+            indices = [copy.name_index(x) for x in fn.names]
+            assert indices == list(range(len(fn.names)))
+
+    @pytest.mark.parametrize("obj", [False, True])
+    @pytest.mark.parametrize("level", [0, 1, 2, 3])
+    def test_same_output(self, level, obj):
+        from pycc.parallel import compile_module
+
+        expected = serial(level, obj)
+        assert compile_module(lowered(), level, jobs=3, obj=obj) == expected
+        # in this process
+        assert compile_module(lowered(), level, jobs=1, obj=obj) == expected
+
+    def test_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        import pycc.parallel
+        from pycc.parallel import compile_module
+
+        # serial builds on separate threads, as in the compile server, with
+        # settings of their own
+        cases = [(level, obj) for level in (0, 1) for obj in (False, True)] * 4
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            outputs = pool.map(
+                lambda x: compile_module(lowered(), x[0], jobs=1, obj=x[1]), cases
+            )
+            assert list(outputs) == [serial(*x) for x in cases]
+        assert pycc.parallel._worker is None
+
+    def test_driver(self, tmp_path):
+        from pycc.driver import main
+
+        path = tmp_path / "a.c"
+        path.write_text(PROGRAM)
+        outputs = []
+        for jobs in ("1", "2"):
+            output = tmp_path / f"a{jobs}.o"
+            assert main(["-c", "-O2", "-j", jobs, str(path), "-o", str(output)]) == 0
+            outputs.append(output.read_bytes())
+        assert outputs[0] == outputs[1]
@@ -0,0 +1,429 @@
+import pytest
+from pycc import ast
+from pycc.error import Error
+from pycc.symtab import Kind
+from pycc.token import Token
+
+
+class Test_Parser:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+
+        def factory(text):
+            reporter = Reporter()
+            return Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+
+        return factory
+
+    def test_typedef_name_is_not_expr(self, factory):
+        parser = factory("T;")
+        parser.symbols.declare("T", Kind.TYPEDEF)
+        assert isinstance(parser.parse_stmt(), ast.ErrorStmt)
+        assert len(parser.reporter.errors) == 1
+
+    def test_speculate(self, factory):
+        parser = factory("x; y;")
+
+        def speculate(name):
+            def parse():
+                parser.symbols.declare(name, Kind.TYPEDEF)
+                parser.parse_stmt()
+
+            return parser._speculate(parse)
+
+        assert speculate("y")
+        assert not parser.symbols.is_typedef_name("y")
+        assert not speculate("x")
+        assert not parser.symbols.is_typedef_name("x")
+        assert parser.reporter.errors == []
+        stmt = parser.parse_stmt()
+        assert isinstance(stmt.expr, ast.RefDeclExpr)
+        assert stmt.expr.name == "x"
+
+    def test_unknown_type_name(self, factory):
+        parser = factory("{ T x = 1, *p; T y; x + y; }")
+        stmt = parser.parse_stmt()
+        assert [type(x) for x in stmt.stmts] == [ast.DeclStmt] * 2 + [ast.ExprStmt]
+        assert [x.name for x in stmt.stmts[0].decls] == ["x", "p"]
+        [(location, error)] = parser.reporter.errors
+        assert error == Error.UNKNOWN_TYPE_NAME
+        assert location.column == 2
+
+    def test_unknown_type_name_rollback(self, factory):
+        # not a declaration: the speculative typedef and ``y`` are undone
+        parser = factory("{ x y + 1; y; }")
+        stmt = parser.parse_stmt()
+        assert [type(x) for x in stmt.stmts] == [ast.ErrorStmt, ast.ExprStmt]
+        assert [x for _, x in parser.reporter.errors] == [Error.UNEXPECTED_TOKEN]
+        assert parser.symbols.lookup("x") is None
+        assert parser.symbols.lookup("y") is None
+        assert parser.symbols.log == []
+
+    def test_unknown_type_name_external(self, factory):
+        parser = factory("T f(T a) { return a; } T x;")
+        decls = parser.parse().decls
+        assert [type(x) for x in decls] == [ast.FunctionDecl, ast.VarDecl]
+        assert [x for _, x in parser.reporter.errors] == [Error.UNKNOWN_TYPE_NAME]
+
+    def test_paren_expr(self, factory):
+        parser = factory("((x));")
+        stmt = parser.parse_stmt()
+        assert isinstance(stmt.expr, ast.ParenExpr)
+        assert isinstance(stmt.expr.expr.expr, ast.RefDeclExpr)
+        assert stmt.end.pos == 6
+
+    @pytest.mark.parametrize(
+        "src, kinds, errors",
+        [
+            ("{ x; y; }", [ast.ExprStmt, ast.ExprStmt], 0),
+            ("{ x y z; w; }", [ast.ErrorStmt, ast.ExprStmt], 1),
+            ("{ x; ); (y; z }", [ast.ExprStmt] + [ast.ErrorStmt] * 3, 3),
+            ("{ ( { a; b; } c; d; }", [ast.ErrorStmt, ast.ExprStmt, ast.ExprStmt], 1),
+            ("{ { x y } z; }", [ast.CompoundStmt, ast.ExprStmt], 1),
+        ],
+    )
+    def test_recovery(self, factory, src, kinds, errors):
+        parser = factory(src)
+        stmt = parser.parse_stmt()
+        assert isinstance(stmt, ast.CompoundStmt)
+        assert [type(x) for x in stmt.stmts] == kinds
+        assert len(parser.reporter.errors) == errors
+        assert parser.tokens.LA(1) == Token.EOF
+
+    def test_unterminated_compound_stmt(self, factory):
+        parser = factory("{ x;")
+        assert isinstance(parser.parse_stmt(), ast.ErrorStmt)
+        assert len(parser.reporter.errors) == 1
+
+    def test_error_limit(self, factory):
+        from pycc.error import FatalError
+
+        parser = factory("{" + " x y z;" * 100 + "}")
+        parser.reporter.error_limit = 5
+        with pytest.raises(FatalError):
+            parser.parse_stmt()
+        assert len(parser.reporter.errors) == 5
+
+
+class Test_Declarations:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+
+        def factory(text):
+            reporter = Reporter()
+            return Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+
+        return factory
+
+    def test_streaming(self, factory):
+        from pycc.parser import Parser, TokenStream, tokenize
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+
+        reporter = Reporter()
+        pulled = []
+
+        def source():
+            text = "int x; int f(void) {} int y;"
+            for tok in tokenize(Scanner(File("", text), reporter)):
+                pulled.append(tok)
+                yield tok
+
+        parser = Parser(TokenStream.from_tokens(source()), reporter)
+        decls = parser.iter_declarations()
+        assert next(decls).name == "x"
+        # only the lookahead past the first declaration has been scanned
+        assert [x.text for x in pulled] == ["int", "x", ";", "int"]
+        assert [x.name for x in decls] == ["f", "y"]
+
+    def test_streaming_keeps_nothing(self, factory):
+        import weakref
+
+        parser = factory(
+            "enum { A = 1 << 2, B = A + 1 }; int a[B * 2];"
+            "_Static_assert(sizeof(a) == 40, \"a\"); int x;"
+        )
+        refs = []
+        for decl in parser.iter_declarations():
+            refs.append(weakref.ref(decl))
+            del decl
+        assert not parser.evaluator.cache
+        assert all(ref() is None for ref in refs)
+
+    @pytest.mark.parametrize(
+        "src, expected",
+        [
+            ("int x;", "int"),
+            ("unsigned long int x;", "unsigned long"),
+            ("long long unsigned x;", "unsigned long long"),
+            ("signed char x;", "signed char"),
+            ("long double x;", "long double"),
+            ("const char *x;", "char *"),
+            ("int *x[3];", "int * [3]"),
+            ("int (*x)[3];", "int [3] *"),
+            ("int x[] = {1, 2, 3};", "int [3]"),
+            ("char x[] = \"ab\";", "char [3]"),
+            ("int (*x)(int, ...);", "int (int, ...) *"),
+            ("int x(int a[], void f(void));", "int (int *, void (void) *)"),
+            ("int (*x(int))(char);", "int (char) * (int)"),
+        ],
+    )
+    def test_declarator_type(self, factory, src, expected):
+        parser = factory(src)
+        (decl,) = parser.iter_declarations()
+        assert decl.name == "x"
+        assert str(decl.type) == expected
+        assert parser.reporter.errors == []
+
+    def test_typedef_name(self, factory):
+        parser = factory(
+            "typedef int T; T f(T a) { T b = (T)a; { int T; T = b; } return T(b); }"
+        )
+        typedef, f = parser.parse().decls
+        assert isinstance(typedef, ast.TypedefDecl)
+        assert str(f.type) == "int (int)"
+        decl, block, ret = f.body.stmts
+        assert isinstance(decl, ast.DeclStmt)
+        assert isinstance(ret, ast.ErrorStmt)
+        assert isinstance(decl.decls[0].init, ast.CastExpr)
+        assert isinstance(block.stmts[1], ast.ExprStmt)
+        # the inner declaration of T has gone out of scope
+        assert len(parser.reporter.errors) == 1
+        assert parser.symbols.is_typedef_name("T")
+
+    def test_struct(self, factory):
+        parser = factory("struct S *p; struct S { char c; int i; } s; struct S t;")
+        decls = list(parser.iter_declarations())
+        assert [type(x) for x in decls] == [
+            ast.VarDecl,
+            ast.RecordDecl,
+            ast.VarDecl,
+            ast.VarDecl,
+        ]
+        t = decls[1].type
+        assert decls[0].type.base is t and decls[3].type is t
+        assert (t.size, t.align) == (8, 4)
+        assert t.field("i") == (decls[3].type.fields[1][1], 4)
+
+    def test_bit_fields(self, factory):
+        # the sizes gcc gives on x86-64
+        parser = factory(
+            "struct B { int a:3; unsigned b:2; };"
+            "struct C { char c; int a:30; };"
+            "struct D { char c; int a:20; long :0; char d; };"
+            "union U { int a:3; char c; };"
+            "struct E { char c; int :3; };"
+            "struct G { char c; int :0; char d; };"
+            "struct H { long a:40; int b:20; };"
+            "_Static_assert(sizeof(struct B) == 4, \"B\");"
+            "struct X { int a:33; int b:-1; int c:0; double d:2; };"
+        )
+        decls = list(parser.iter_declarations())
+        sizes = [x.type.size for x in decls[:7]]
+        assert sizes == [4, 8, 12, 4, 2, 5, 8]
+        b, c, h = decls[0].type, decls[1].type, decls[6].type
+        assert b.widths == [3, 2] and b.offsets == [0, 0]
+        assert c.field("a")[1] == 4 and c.bit_width("c") is None
+        assert h.offsets == [0, 4]
+        errors = parser.reporter.errors
+        assert [x[1] for x in errors] == [Error.INVALID_BIT_FIELD] * 4
+        # invalid widths are laid out as whole members
+        assert decls[8].type.widths == [None] * 4
+
+    def test_enum_and_static_assert(self, factory):
+        parser = factory(
+            "enum { A, B = A + 5, C };"
+            "_Static_assert(C == 6 && sizeof(long) == 8, \"ok\");"
+            "_Static_assert(B < A, \"order\");"
+        )
+        enum, ok, failed = parser.iter_declarations()
+        assert [(x.name, x.value) for x in enum.constants] == [
+            ("A", 0),
+            ("B", 5),
+            ("C", 6),
+        ]
+        (error,) = parser.reporter.errors
+        assert error[1] == Error.STATIC_ASSERT_FAILED
+        assert error[0] == failed.start
+
+    @pytest.mark.parametrize(
+        "shape",
+        [
+            lambda n: "int x = " + "(" * n + "1" + ")" * n + ";",
+            lambda n: "int x = " + "- " * n + "1;",
+            lambda n: "int x = " + "(int)" * n + "1;",
+            lambda n: "int x = " + "sizeof " * n + "1;",
+            lambda n: "int f(int a) { " + "a = " * n + "1; }",
+            lambda n: "int x = " + "1 ? " * n + "1" + " : 1" * n + ";",
+            lambda n: "int f(int); int x = " + "f(" * n + "1" + ")" * n + ";",
+            lambda n: "int *a; int x = " + "a[" * n + "0" + "]" * n + ";",
+            lambda n: "void f(void) {" + "{" * n + "}" * n + "}",
+            lambda n: "void f(int a) {" + "if (a) " * n + ";}",
+            lambda n: "int " + "(" * n + "x" + ")" * n + ";",
+            lambda n: "int x" + "(int (*)" * n + "(void)" + ")" * n + ";",
+            lambda n: "struct {" * n + "int x;" + "} a;" * n,
+            lambda n: "int x[1] = " + "{" * n + "1" + "}" * n + ";",
+        ],
+    )
+    def test_nesting_limit(self, factory, shape):
+        from pycc.error import FatalError
+
+        parser = factory(shape(45))
+        list(parser.iter_declarations())
+        assert parser.reporter.errors == []
+        parser = factory(shape(10000))
+        with pytest.raises(FatalError):
+            list(parser.iter_declarations())
+        (error,) = parser.reporter.errors
+        assert error[1] == Error.NESTING_TOO_DEEP
+        parser = factory(shape(4))
+        parser.max_nesting = 3
+        with pytest.raises(FatalError):
+            list(parser.iter_declarations())
+
+    def test_nesting_within_recursion_limit(self, factory):
+        # parentheses take the most Python frames per level of nesting
+        parser = factory("int x = " + "(" * 100 + "1" + ")" * 100 + ";")
+        assert parser.max_nesting == 100
+        list(parser.iter_declarations())
+        assert parser.reporter.errors == []
+
+    def test_string_concatenation(self, factory):
+        parser = factory(
+            'const char *a = "ab" "c" "d", *b = "abcd";'
+            '_Static_assert(0, "too" " late");'
+        )
+        a, b, failed = parser.iter_declarations()
+        a, b = a.init, b.init
+        assert a.value == "abcd"
+        assert a.text == '"ab" "c" "d"'
+        assert (a.start.pos, a.end.pos) == (16, 28)
+        # equal literals share one string
+        assert a.value is b.value
+        assert failed.message.value == "too late"
+        assert parser.strings.hits == 1
+
+    def test_statements(self, factory):
+        parser = factory(
+            "void f(int n) {"
+            " for (int i = 0; i < n; i++) if (i) continue; else break;"
+            " while (n) n--; do n++; while (n < 3);"
+            " switch (n) { case 1: goto out; default: ; }"
+            " out: return;"
+            "}"
+        )
+        (f,) = parser.iter_declarations()
+        assert [type(x) for x in f.body.stmts] == [
+            ast.ForStmt,
+            ast.WhileStmt,
+            ast.DoStmt,
+            ast.SwitchStmt,
+            ast.LabelStmt,
+        ]
+        assert parser.reporter.errors == []
+
+    @pytest.mark.parametrize(
+        "src, kinds, errors",
+        [
+            ("int x y; int z;", [ast.ErrorDecl, ast.VarDecl], 1),
+            ("int f(void) { x } int z;", [ast.FunctionDecl, ast.VarDecl], 1),
+            ("} int z;", [ast.ErrorDecl, ast.VarDecl], 1),
+            ("int x = ;\nint z;", [ast.ErrorDecl, ast.VarDecl], 1),
+        ],
+    )
+    def test_recovery(self, factory, src, kinds, errors):
+        parser = factory(src)
+        assert [type(x) for x in parser.iter_declarations()] == kinds
+        assert len(parser.reporter.errors) == errors
+
+
+THREADED_SOURCE = r"""
+typedef struct point { int x, y; } point;
+enum { N = 4, M = N * 2 };
+_Static_assert(M == 8, "m" "is" "eight");
+static const char *names[N] = {"a", "b", "a" "b", "??=\
+"};
+int dot(point *p, point *q) { return p->x * q->x + p->y * q->y; }
+int f(int n) { int s = 0; for (int i = 0; i < n; i++) s += i ? 0x1fu : 'x'; }
+int g(void) { return $; }
+"""
+
+
+class Test_Threads:
+    def scan(self, file):
+        from pycc.parser import tokenize
+        from pycc.scanner import Scanner
+        from pycc.error import RecordingReporter
+
+        reporter = RecordingReporter()
+        tokens = [
+            (x.kind, x.start, x.end, x.text, x.value)
+            for x in tokenize(Scanner(file, reporter))
+        ]
+        return tokens, [str(x) for x in reporter.diagnostics]
+
+    def parse(self, file):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.error import RecordingReporter
+
+        reporter = RecordingReporter()
+        parser = Parser(TokenStream(Scanner(file, reporter)), reporter)
+        declarations = [repr(x) for x in parser.iter_declarations()]
+        return declarations, [str(x) for x in reporter.diagnostics]
+
+    @pytest.mark.parametrize("method, count", [("scan", 1000), ("parse", 100)])
+    def test_concurrent(self, method, count):
+        import sys
+        from concurrent.futures import ThreadPoolExecutor
+        from pycc.file import File
+
+        function = getattr(self, method)
+        expected = function(File("t.c", THREADED_SOURCE))
+        assert len(expected[1]) == 1
+        # one file shared by half of the tasks, whose translation is cached
+        shared = File("t.c", THREADED_SOURCE)
+        files = [
+            shared if n % 2 else File("t.c", THREADED_SOURCE) for n in range(count)
+        ]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-4)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(function, files))
+        finally:
+            sys.setswitchinterval(interval)
+        assert all(x == expected for x in results)
+
+    def test_loggers(self, caplog):
+        import logging
+        from concurrent.futures import ThreadPoolExecutor
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+
+        def parse(n):
+            reporter = Reporter(logger=logging.getLogger(f"pycc.test.{n}"))
+            source = f"int x{n} = $;"
+            parser = Parser(TokenStream(Scanner(File("", source), reporter)), reporter)
+            list(parser.iter_declarations())
+            return reporter
+
+        with caplog.at_level(logging.ERROR):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                reporters = list(pool.map(parse, range(100)))
+        assert all(len(x.errors) == 1 for x in reporters)
+        # every reporter logs to its own logger
+        assert sorted(x.name for x in caplog.records) == sorted(
+            f"pycc.test.{n}" for n in range(100)
+        )
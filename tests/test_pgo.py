@@ -0,0 +1,176 @@
+import shutil
+import subprocess
+
+import pytest
+
+needs_gcc = pytest.mark.skipif(shutil.which("gcc") is None, reason="linking needs gcc")
+
+PROGRAM = r"""
+int printf(const char *, ...);
+static int check(int x) {
+    if (x < 0) {
+        printf("negative %d\n", x);
+        return -1;
+    }
+    return x & 1;
+}
+long step(long h, int c) { return (h ^ c) * 1099511628211L; }
+int main(void) {
+    long h = 1469598103934665603L;
+    int odd = 0;
+    for (int i = 0; i < 3000; i++) {
+        odd += check(i);
+        if (i % 100 == 99)
+            h = step(h, i);
+    }
+    printf("%d %ld\n", odd, h);
+    return 0;
+}
+"""
+EXPECTED = "1500 7243626271271640769\n"
+
+
+def lowered(text=PROGRAM):
+    from pycc.parser import Parser, TokenStream
+    from pycc.scanner import Scanner
+    from pycc.file import File
+    from pycc.error import Reporter
+    from pycc.lower import lower
+
+    reporter = Reporter()
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    module = lower(parser.iter_declarations(), reporter)
+    assert not reporter.errors
+    return module
+
+
+class Test_Profile:
+    def test_read_profile(self, tmp_path):
+        from pycc.pgo import read_profile
+
+        path = tmp_path / "p"
+        path.write_text(
+            "unit a.c\nfunction f 7 1 2\nfunction g 1 5\n"
+            "unit b.c\nfunction f 3 4\n"
+            "unit a.c\nfunction f 7 10 20\nfunction g 2 6\n"
+        )
+        profile = read_profile(str(path))
+        assert profile.functions == {
+            ("a.c", "f"): (7, [11, 22]),
+            ("a.c", "g"): (2, [6]),
+            ("b.c", "f"): (3, [4]),
+        }
+
+    def test_annotate(self):
+        from pycc.pgo import Profile, annotate, checksum
+
+        module = lowered()
+        profile = Profile()
+        for fn in module.functions:
+            counts = list(range(len(fn.blocks)))
+            profile.add("a.c", fn.name, checksum(fn), counts)
+        profile.add("a.c", "step", 0, [1])
+        assert annotate(module, profile, "a.c") == ["step"]
+        for fn in module.functions:
+            counts = [x.count for x in fn.blocks]
+            if fn.name == "step":
+                assert counts == [-1] * len(fn.blocks)
+            else:
+                assert counts == list(range(len(fn.blocks)))
+
+    def test_checksum(self):
+        from pycc.pgo import checksum
+
+        changed = PROGRAM.replace("i % 100 == 99", "i % 100 == 99 && odd")
+        before = {fn.name: checksum(fn) for fn in lowered().functions}
+        after = {fn.name: checksum(fn) for fn in lowered(changed).functions}
+        assert before["check"] == after["check"]
+        assert before["main"] != after["main"]
+
+    def test_cold_section(self):
+        from pycc.codegen import generate
+        from pycc.opt import optimize
+
+        module = lowered()
+        check = next(fn for fn in module.functions if fn.name == "check")
+        # the branch to the error path is never taken
+        for block in check.blocks:
+            block.count = 10
+        check.blocks[check.blocks[1].succs[0]].count = 0
+        optimize(module, level=1)
+        assembly = generate(module)
+        cold = assembly.split(".section .text.unlikely")[1].split(".size")[0]
+        assert "check.cold:" in cold
+        assert "printf" in cold
+        assert ".text.unlikely" not in generate(lowered())
+
+    def test_layout(self):
+        from pycc.codegen import place_blocks
+        from pycc.x86 import MBlock, MFunction
+
+        # 0 -> 1 -> {2, 3} -> 4, where 3 is the hot side
+        blocks = [
+            MBlock("a", succs=[1], count=5),
+            MBlock("b", succs=[2, 3], preds=[0], count=5),
+            MBlock("c", succs=[4], preds=[1], count=1),
+            MBlock("d", succs=[4], preds=[1], count=4),
+            MBlock("e", preds=[2, 3], count=-1),
+        ]
+        mfn = MFunction("f", blocks)
+        place_blocks(mfn)
+        assert [x.label for x in mfn.blocks] == ["a", "b", "d", "e", "c"]
+        assert mfn.blocks[1].succs == [4, 2]
+        assert mfn.blocks[3].preds == [4, 2]
+        assert mfn.cold is None
+
+    def test_inlining_bias(self):
+        from pycc.inline import CostModel
+        from pycc.ir import Function
+
+        model = CostModel()
+        fn = Function("f")
+        assert model.threshold_for(fn) == model.threshold
+        assert model.threshold_for(fn, 0, 1000) == 0
+        assert model.threshold_for(fn, 5, 1000) == model.threshold
+        assert model.threshold_for(fn, 500, 1000) == model.threshold + model.hot_bonus
+
+    @needs_gcc
+    @pytest.mark.parametrize("mode", ["-S", "-c"])
+    def test_driver(self, tmp_path, mode):
+        from pycc.driver import main
+
+        source = tmp_path / "k.c"
+        source.write_text(PROGRAM)
+        profile = ["-fprofile-path", str(tmp_path / "k.profile")]
+
+        def build(name, *flags):
+            output = tmp_path / (name + (".s" if mode == "-S" else ".o"))
+            assert main([mode, "-O2", *flags, str(source), "-o", str(output)]) == 0
+            binary = tmp_path / name
+            subprocess.run(["gcc", "-o", str(binary), str(output)], check=True)
+            result = subprocess.run([str(binary)], capture_output=True, text=True)
+            assert result.stdout == EXPECTED
+            return output.read_bytes()
+
+        build("instrumented", "-fprofile-generate", *profile)
+        build("instrumented", "-fprofile-generate", *profile)
+        text = (tmp_path / "k.profile").read_text()
+        assert text.count(f"unit {source}\n") == 2
+        code = build("guided", "-fprofile-use", *profile)
+        # check is inlined into main, and its error path never ran
+        assert b"main.cold" in code
+        assert b"main.cold" not in build("plain")
+        assert build("parallel", "-fprofile-use", "-j", "2", *profile) == code
+
+    def test_stale_profile(self, tmp_path, capsys):
+        from pycc.driver import main
+
+        source = tmp_path / "k.c"
+        source.write_text(PROGRAM)
+        profile = tmp_path / "k.profile"
+        profile.write_text(f"unit {source}\nfunction main 1 2 3\n")
+        output = str(tmp_path / "k.s")
+        args = ["-S", "-fprofile-use", "-fprofile-path", str(profile)]
+        assert main([*args, str(source), "-o", output]) == 0
+        assert "profile does not match the function" in capsys.readouterr().err
+        assert main([*args[:-1], str(tmp_path / "missing"), str(source)]) == 1
@@ -0,0 +1,105 @@
+import pytest
+
+
+class Test_LinearScan:
+    @pytest.fixture
+    def factory(self):
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.lower import lower
+        from pycc.opt import optimize
+        from pycc.codegen import select
+
+        def factory(text):
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            module = lower(parser.iter_declarations(), reporter)
+            assert not reporter.errors
+            optimize(module)
+            return select(module)[0]
+
+        return factory
+
+    def test_parallel_moves(self):
+        from pycc.regalloc import _sequence
+        from pycc.x86 import RAX, RBX, RCX, SCRATCH, Mem, RBP
+
+        slot = Mem(RBP, disp=-8)
+        insts = _sequence([(RAX, RBX), (RBX, RAX), (RCX, slot), (slot, RCX)])
+        # simulate the moves on symbolic contents
+        state = {RAX: "a", RBX: "b", RCX: "c", slot: "s"}
+        for inst in insts:
+            assert inst.op == "mov"
+            src, dst = inst.args
+            state[dst] = state[src]
+        assert state[RAX] == "b" and state[RBX] == "a"
+        assert state[RCX] == "s" and state[slot] == "c"
+        assert any(SCRATCH in inst.args for inst in insts)
+
+    def test_liveness(self, factory):
+        from pycc.regalloc import liveness
+        from pycc.x86 import FIRST_VIRTUAL
+
+        fn = factory("int f(int n) { int s = 0; while (n) s += n--; return s; }")
+        registers = [x.registers() for b in fn.blocks for x in b.insts]
+        live_in, live_out = liveness(fn, registers)
+        assert not live_in[0]
+        # the loop carries the sum and the counter
+        header = max(range(len(fn.blocks)), key=lambda b: len(live_in[b]))
+        assert len(live_in[header]) == 2
+        assert all(r >= FIRST_VIRTUAL for r in live_in[header])
+        assert live_out[header] >= live_in[header]
+
+    def test_values_across_calls(self, factory):
+        from pycc.regalloc import allocate
+        from pycc.x86 import CALLER_SAVED, FIRST_VIRTUAL, RAX, Mem
+
+        fn = factory(
+            """
+            int g(int);
+            int f(int a, int b) { return g(a) + g(b) + a * b; }
+            """
+        )
+        allocate(fn, 0)
+        for block in fn.blocks:
+            for inst in block.insts:
+                defs, uses = inst.registers()
+                assert all(r < FIRST_VIRTUAL for r in defs + uses)
+        # a and b live across the calls in registers which calls preserve:
+        # no caller-saved register but the result is read before it is
+        # written again
+        insts = [x for b in fn.blocks for x in b.insts]
+        for k, inst in enumerate(insts):
+            if inst.op != "call":
+                continue
+            written = {RAX}
+            for x in insts[k + 1 :]:
+                defs, uses = x.registers()
+                assert not (set(uses) - written) & set(CALLER_SAVED)
+                written.update(defs)
+        assert not any(isinstance(a, Mem) for x in insts for a in x.args)
+
+    def test_spilling(self, factory):
+        from pycc.regalloc import allocate
+        from pycc.x86 import Mem, RBP
+
+        names = [f"v{k}" for k in range(20)]
+        decls = " ".join(f"int {v} = n * {k};" for k, v in enumerate(names))
+        body = " ".join(f"{v} += {w};" for v, w in zip(names, names[1:] + names[:1]))
+        fn = factory(
+            f"int f(int n) {{ {decls} while (n--) {{ {body} }} "
+            f"return {' ^ '.join(names)}; }}"
+        )
+        allocate(fn, 16)
+        slots = {
+            a
+            for b in fn.blocks
+            for x in b.insts
+            for a in x.args
+            if isinstance(a, Mem) and a.base == RBP
+        }
+        assert slots
+        assert all(slot.disp <= -24 for slot in slots)
+        assert fn.frame_size == 16 + 8 * len(slots)
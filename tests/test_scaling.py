@@ -0,0 +1,218 @@
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+# each input is generated at SIZES times its base size; the calls, memory
+# and time must grow at most linearly, with some slack for timer noise: a
+# quadratic path has a slope of 2 on the log-log fit
+SIZES = (1, 2, 4, 8)
+MAX_CALL_SLOPE = 1.1
+MAX_MEMORY_SLOPE = 1.15
+MAX_TIME_SLOPE = 1.4
+# the time of a single token at the largest size against the smallest one:
+# a linear scan takes 8 times as long, a quadratic one 64 times
+MAX_TOKEN_TIME_RATIO = 3 * SIZES[-1]
+
+# wall-clock times depend on the load of the machine, so they are only
+# checked on request; the call counts are the same on every run
+timing = pytest.mark.skipif(
+    not os.environ.get("PYCC_TIMING_TESTS"),
+    reason="set PYCC_TIMING_TESTS=1 to check wall-clock times",
+)
+
+
+def slope(sizes, values):
+    """The least-squares slope of log(values) against log(sizes)."""
+    xs = [math.log(x) for x in sizes]
+    ys = [math.log(max(y, 1e-9)) for y in values]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum(
+        (x - mx) ** 2 for x in xs
+    )
+
+
+def scan(text):
+    from pycc.parser import tokenize
+    from pycc.scanner import Scanner
+    from pycc.file import File
+    from pycc.error import RecordingReporter
+
+    # every error is reported, so that the whole input is scanned
+    for _ in tokenize(Scanner(File("", text), RecordingReporter(error_limit=0))):
+        pass
+
+
+def parse(text):
+    from pycc.parser import Parser, TokenStream
+    from pycc.scanner import Scanner
+    from pycc.file import File
+    from pycc.error import FatalError, RecordingReporter
+
+    reporter = RecordingReporter(error_limit=0)
+    parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+    try:
+        for _ in parser.iter_declarations():
+            pass
+    except FatalError:
+        pass
+    return reporter
+
+
+SCANNER_SHAPES = {
+    "string escapes": (lambda n: '"' + "\\n\\x41\\101" * (n // 10) + '"', 10000),
+    "splices": (lambda n: "a\\\n" * (n // 3), 10000),
+    "trigraphs": (lambda n: '"' + "??=" * (n // 3) + '"', 10000),
+    "tokens": (lambda n: "x+1;" * (n // 4), 1000),
+}
+
+# a single token is scanned by a few calls of string methods and regular
+# expressions whatever its length, so its calls do not grow with the input;
+# its time is checked instead, on inputs long enough to time
+TOKEN_SHAPES = {
+    "string": (lambda n: '"' + "a" * n + '"', 200000),
+    "unterminated string": (lambda n: '"' + "a" * n, 200000),
+    "unterminated comment": (lambda n: "/*" + " *\n" * (n // 3), 200000),
+    "comment": (lambda n: "/*" + "a" * n + "*/", 200000),
+    "identifier": (lambda n: "a" * n, 200000),
+    "invalid digits": (lambda n: "0" + "9" * n, 200000),
+    "hexadecimal float": (lambda n: "0x" + "f" * n + ".8p1", 200000),
+    "newlines": (lambda n: "\n" * n, 200000),
+}
+
+PARSER_SHAPES = {
+    "binary chain": (lambda n: "int x = 1" + " + 1" * (n // 4) + ";", 1000),
+    "adjacent strings": (lambda n: 'char *s = "a"' + ' "a"' * (n // 4) + ";", 1000),
+    "arguments": (lambda n: "int f(); int x = f(1" + ", 1" * (n // 3) + ");", 1000),
+    "initializer": (lambda n: "int x[] = {1" + ", 1" * (n // 3) + "};", 1000),
+    "declarations": (lambda n: "int x;" * (n // 6), 1000),
+    "statements": (lambda n: "void f(int a) {" + "a++;" * (n // 4) + "}", 1000),
+    "nested parens": (
+        lambda n: "int x = " + ("(" * 40 + "1" + ")" * 40 + " + ") * (n // 84) + "1;",
+        1000,
+    ),
+    # nesting stays below the parser's limit of 100, past which it stops
+    "deep nesting": (
+        lambda n: "int x = " + ("(" * 90 + "1" + ")" * 90 + " + ") * (n // 184) + "1;",
+        2000,
+    ),
+    "unclosed parens": (lambda n: ("int x = " + "(" * 90 + ";\n") * (n // 100), 1000),
+    "errors": (lambda n: "int x y;" * (n // 8), 1000),
+}
+
+
+def calls(function, text):
+    """The number of Python and builtin function calls, and resumptions of
+    generators, made by ``function(text)``."""
+    count = 0
+
+    def profile(frame, event, arg):
+        nonlocal count
+        if event == "call" or event == "c_call":
+            count += 1
+
+    sys.setprofile(profile)
+    try:
+        function(text)
+    finally:
+        sys.setprofile(None)
+    return count
+
+
+def count_calls(function, shape, base):
+    # a first run does whatever is done once, such as importing modules
+    function(shape(base))
+    return [calls(function, shape(base * k)) for k in SIZES]
+
+
+def measure(function, shape, base, runs=3, sizes=SIZES):
+    times = []
+    for k in sizes:
+        text = shape(base * k)
+        best = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            function(text)
+            best = min(best, time.perf_counter() - start)
+        times.append(best)
+    return times
+
+
+def peak_memory(function, shape, base):
+    peaks = []
+    for k in SIZES:
+        text = shape(base * k)
+        tracemalloc.start()
+        function(text)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+    return peaks
+
+
+class Test_Scaling:
+    @pytest.mark.parametrize("name", SCANNER_SHAPES)
+    def test_scanner_calls(self, name):
+        shape, base = SCANNER_SHAPES[name]
+        counts = count_calls(scan, shape, base)
+        assert slope(SIZES, counts) < MAX_CALL_SLOPE, counts
+
+    @pytest.mark.parametrize("name", PARSER_SHAPES)
+    def test_parser_calls(self, name):
+        shape, base = PARSER_SHAPES[name]
+        # a parse stopped by a limit does the same work at every size
+        reporter = parse(shape(base * SIZES[-1]))
+        assert all(x.severity != "fatal error" for x in reporter.diagnostics)
+        counts = count_calls(parse, shape, base)
+        assert slope(SIZES, counts) < MAX_CALL_SLOPE, counts
+
+    @pytest.mark.parametrize("name", TOKEN_SHAPES)
+    def test_token_time(self, name):
+        shape, base = TOKEN_SHAPES[name]
+        sizes = (SIZES[0], SIZES[-1])
+        small, large = measure(scan, shape, base, runs=5, sizes=sizes)
+        assert large / small < MAX_TOKEN_TIME_RATIO, (small, large)
+
+    @timing
+    @pytest.mark.parametrize("name", SCANNER_SHAPES)
+    def test_scanner_time(self, name):
+        shape, base = SCANNER_SHAPES[name]
+        times = measure(scan, shape, base)
+        assert slope(SIZES, times) < MAX_TIME_SLOPE, times
+
+    @timing
+    @pytest.mark.parametrize("name", PARSER_SHAPES)
+    def test_parser_time(self, name):
+        shape, base = PARSER_SHAPES[name]
+        times = measure(parse, shape, base)
+        assert slope(SIZES, times) < MAX_TIME_SLOPE, times
+
+    @pytest.mark.parametrize(
+        "function, shapes",
+        [(scan, {**SCANNER_SHAPES, **TOKEN_SHAPES}), (parse, PARSER_SHAPES)],
+        ids=["scanner", "parser"],
+    )
+    def test_memory(self, function, shapes):
+        for name, (shape, base) in shapes.items():
+            peaks = peak_memory(function, shape, base // 8)
+            assert slope(SIZES, peaks) < MAX_MEMORY_SLOPE, (name, peaks)
+
+    def test_slope(self):
+        assert slope(SIZES, [2 * x for x in SIZES]) == pytest.approx(1)
+        assert slope(SIZES, [x * x for x in SIZES]) == pytest.approx(2)
+
+    def test_calls(self):
+        def quadratic(text):
+            for i in range(len(text)):
+                text.find("b", 0, i)
+                for _ in range(i):
+                    abs(i)
+
+        counts = count_calls(quadratic, lambda n: "a" * n, 50)
+        assert slope(SIZES, counts) > 1.8
+        counts = count_calls(scan, lambda n: "x+1;" * n, 50)
+        assert slope(SIZES, counts) == pytest.approx(1, abs=0.05)
@@ -1,5 +1,5 @@
 import pytest
-from pycc.token import Token, KEYWORDS, PUNCTUATORS
+from pycc.token import Token, Suffix, KEYWORDS, PUNCTUATORS
 
 
 class Test_Scanner:
@@ -109,6 +109,24 @@ class Test_Scanner:
         assert scanner.text == src
         assert scanner.value == value
 
+    @pytest.mark.parametrize(
+        "src, suffix",
+        [
+            ("1", Suffix.NONE),
+            ("1u", Suffix.UNSIGNED),
+            ("1L", Suffix.LONG),
+            ("1lu", Suffix.UNSIGNED | Suffix.LONG),
+            ("1ll", Suffix.LONG_LONG),
+            ("1ULL", Suffix.UNSIGNED | Suffix.LONG_LONG),
+            ("1.0f", Suffix.FLOAT),
+            ("1.0L", Suffix.LONG),
+        ],
+    )
+    def test_number_suffix(self, factory, src, suffix):
+        scanner = factory(src)
+        scanner.scan()
+        assert scanner.suffix == suffix
+
     @pytest.mark.parametrize(
         "src, tok, value",
         [
@@ -162,6 +180,41 @@ class Test_Scanner:
         assert scanner.text == src
         assert scanner.value == value
 
+    @pytest.mark.parametrize(
+        "src, tok, value",
+        [
+            ('""', Token.STRING_CONSTANT, ""),
+            ('"abc"', Token.STRING_CONSTANT, "abc"),
+            (r'"a\tb\n"', Token.STRING_CONSTANT, "a\tb\n"),
+            (r'"\x41\101\0"', Token.STRING_CONSTANT, "AA\0"),
+            ('"a\\\nb"', Token.STRING_CONSTANT, "ab"),
+            ('"a\\\r\nb"', Token.STRING_CONSTANT, "ab"),
+            (r'"\q"', Token.STRING_CONSTANT, "q"),
+            ('"abc', Token.INVALID, None),
+            ('"a\nb"', Token.INVALID, None),
+            (r'"\x"', Token.INVALID, None),
+        ],
+    )
+    def test_string_constant(self, factory, src, tok, value):
+        scanner = factory(src)
+        assert scanner.scan() == tok
+        assert scanner.value == value
+
+    def test_lazy_value(self, factory):
+        scanner = factory(r'0x1F "a\n"')
+        assert scanner.scan() == Token.INTEGER_CONSTANT
+        literal = scanner.literal
+        assert (literal.start, literal.end, literal.base) == (2, 4, 16)
+        assert scanner.scan() == Token.STRING_CONSTANT
+        assert literal.value == 0x1F
+        assert scanner.value == "a\n"
+
+    def test_escape_newline(self, factory):
+        scanner = factory('"a\\\nb" x')
+        assert scanner.scan() == Token.STRING_CONSTANT
+        assert scanner.scan() == Token.IDENTIFIER
+        assert scanner.start.line == 2
+
     @pytest.mark.parametrize(
         "src", ["// aaa bbb", "// aaa bbb\n", "// aaabbb \r\n", "// aaa bbb\r"]
     )
@@ -185,3 +238,29 @@ class Test_Scanner:
         assert scanner.scan() == Token.MULTI_LINE_COMMENT
         assert scanner.text == src
         assert scanner.line == len(src.splitlines())
+
+    def test_line_splice(self, factory):
+        scanner = factory("in\\\nt x = ??-1;\\\n y")
+        tokens = []
+        while True:
+            tok = scanner.scan()
+            tokens.append((tok, scanner.text, scanner.start.line, scanner.start.column))
+            if tok == Token.EOF:
+                break
+        assert tokens == [
+            (Token.INT, "int", 1, 0),
+            (Token.IDENTIFIER, "x", 2, 2),
+            (Token.EQUALS, "=", 2, 4),
+            (Token.TILDE, "~", 2, 6),
+            (Token.INTEGER_CONSTANT, "1", 2, 9),
+            (Token.SEMICOLON, ";", 2, 10),
+            (Token.IDENTIFIER, "y", 3, 1),
+            (Token.EOF, "", 3, 2),
+        ]
+        assert scanner.start.pos == len(scanner.file.source)
+
+    def test_spliced_comment(self, factory):
+        scanner = factory("// a \\\n b\nx")
+        assert scanner.scan() == Token.SINGLE_LINE_COMMENT
+        assert scanner.scan() == Token.IDENTIFIER
+        assert (scanner.start.line, scanner.start.column) == (3, 0)
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+
+class Test_FileCache:
+    def test_hit(self, tmp_path):
+        from pycc.cache import FileCache
+
+        path = tmp_path / "a.c"
+        path.write_text("x;")
+        cache = FileCache()
+        entry = cache.get(str(path))
+        entry.derived["x"] = 1
+        assert cache.get(str(path)) is entry
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_touch_keeps_derived(self, tmp_path):
+        from pycc.cache import FileCache
+
+        path = tmp_path / "a.c"
+        path.write_text("x;")
+        cache = FileCache()
+        cache.get(str(path)).derived["x"] = 1
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        assert cache.get(str(path)).derived == {"x": 1}
+
+    def test_spellings(self, tmp_path, monkeypatch):
+        from pycc.cache import FileCache
+
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.c").write_text("x;")
+        cache = FileCache()
+        entry = cache.get("a.c")
+        assert cache.get("./a.c") is entry
+        assert cache.get(str(tmp_path / "a.c")) is entry
+        cache.invalidate("./a.c")
+        assert not cache.entries
+
+    def test_modified(self, tmp_path):
+        from pycc.cache import FileCache
+
+        path = tmp_path / "a.c"
+        path.write_text("x;")
+        cache = FileCache()
+        cache.get(str(path)).derived["x"] = 1
+        path.write_text("yy;")
+        entry = cache.get(str(path))
+        assert entry.derived == {}
+        assert entry.file.source == "yy;"
+
+
+class Test_Session:
+    def test_tokens(self, tmp_path):
+        from pycc.session import Session
+
+        path = tmp_path / "a.c"
+        path.write_text("x 1")
+        result = Session().compile(str(path), "tokens")
+        assert result.ok
+        assert result.output == (
+            "1:0: IDENTIFIER x\n" "1:2: INTEGER_CONSTANT 1\n" "1:3: EOF \n"
+        )
+
+    def test_diagnostics(self, tmp_path):
+        from pycc.session import Session
+
+        path = tmp_path / "a.c"
+        path.write_text("@")
+        session = Session()
+        for _ in range(2):
+            result = session.compile(str(path))
+            assert not result.ok
+            assert [x.message for x in result.diagnostics] == ["unknown character"]
+
+    def test_syntax_only(self, tmp_path):
+        from pycc.session import Session
+
+        path = tmp_path / "a.c"
+        path.write_text("int x y;")
+        session = Session()
+        for _ in range(2):
+            (diagnostic,) = session.compile(str(path)).diagnostics
+            assert str(diagnostic) == f"{path}:1:6: error: expected ;"
+        assert session.compile(str(path), "tokens").ok
+
+    def test_fatal_error(self, tmp_path):
+        from pycc.session import Session
+
+        path = tmp_path / "a.c"
+        path.write_text("int x = " + "(" * 10000 + "1;")
+        (diagnostic,) = Session().compile(str(path)).diagnostics
+        assert diagnostic.severity == "fatal error"
+        assert diagnostic.message == "nesting level exceeded maximum of 100"
+
+    def test_error_limit(self, tmp_path):
+        from pycc.session import Session
+
+        path = tmp_path / "a.c"
+        path.write_text("@" * 30)
+        result = Session().compile(str(path))
+        assert len(result.diagnostics) == 21
+        assert result.diagnostics[-1].severity == "fatal error"
+
+    def test_missing_file(self, tmp_path):
+        from pycc.session import Session
+
+        result = Session().compile(str(tmp_path / "missing.c"))
+        assert not result.ok
+
+    @pytest.mark.parametrize(
+        "request_",
+        [
+            {"command": "compile"},
+            {"command": "compile", "files": "a.c"},
+            {"command": "compile", "files": ["a.c", 1]},
+            {"command": "invalidate", "filename": ["a.c"]},
+        ],
+    )
+    def test_invalid_request(self, request_):
+        from pycc.session import Session
+
+        session = Session()
+        assert session.handle(request_)["status"] == "error"
+        assert not session.cache.entries
+
+
+class Test_Server:
+    @pytest.fixture
+    def server(self, tmp_path):
+        from pycc.server import Server
+
+        server = Server(str(tmp_path / "pycc.sock"))
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(server.start())
+            started.set()
+            loop.run_until_complete(server.serve_forever())
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        started.wait()
+        yield server
+        from pycc.client import request
+
+        request({"command": "shutdown"}, server.path)
+        thread.join()
+        loop.close()
+
+    def test_compile(self, server, tmp_path):
+        from pycc.client import compile, request
+
+        path = tmp_path / "a.c"
+        path.write_text("@")
+        for _ in range(2):
+            (result,) = compile([str(path)], path=server.path)
+            assert [x.message for x in result.diagnostics] == ["unknown character"]
+        stats = request({"command": "stats"}, server.path)
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_relative(self, server, tmp_path, monkeypatch):
+        from pycc.client import compile
+
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.c").write_text("@")
+        # the server runs in another directory
+        (result,) = compile(["a.c"], path=server.path)
+        assert result.filename == str(tmp_path / "a.c")
+        assert [x.message for x in result.diagnostics] == ["unknown character"]
+
+    def test_long_request(self, server, tmp_path):
+        from pycc.client import request
+
+        path = tmp_path / "a.c"
+        path.write_text("x;")
+        # over the 64 KiB asyncio reads by default
+        files = [str(path)] * 10000
+        response = request({"files": files, "mode": "tokens"}, server.path)
+        assert len(response["results"]) == 10000
+
+    def test_too_long(self, tmp_path, monkeypatch):
+        import pycc.server
+        from pycc.client import request
+
+        monkeypatch.setattr(pycc.server, "REQUEST_LIMIT", 1024)
+        path = str(tmp_path / "pycc.sock")
+
+        async def run():
+            server = pycc.server.Server(path)
+            await server.start()
+            loop = asyncio.get_event_loop()
+            message = {"files": ["a.c"] * 1000}
+            response = await loop.run_in_executor(None, request, message, path)
+            await server.close()
+            return response
+
+        assert asyncio.run(run()) == {"status": "error", "message": "request too long"}
+
+    def test_malformed(self, server, tmp_path):
+        from pycc.client import request
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(server.path)
+            with sock.makefile("rwb") as fp:
+                for line in (b"[1]", b'"x"', b"{", b'{"files": "a.c"}'):
+                    fp.write(line + b"\n")
+                    fp.flush()
+                    assert json.loads(fp.readline())["status"] == "error"
+        assert request({"command": "stats"}, server.path)["files"] == 0
+
+    def test_off_the_event_loop(self, server, tmp_path, monkeypatch):
+        from pycc.client import request
+
+        handle = server.session.handle
+        entered = threading.Event()
+        release = threading.Event()
+
+        def slow(message):
+            entered.set()
+            release.wait()
+            return handle(message)
+
+        monkeypatch.setattr(server.session, "handle", slow)
+        thread = threading.Thread(target=request, args=({}, server.path))
+        thread.start()
+        entered.wait()
+        # the loop still accepts connections while a request is handled
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(5)
+                sock.connect(server.path)
+                sock.sendall(b"[]\n")
+                assert json.loads(sock.makefile("rb").readline())["status"] == "error"
+        finally:
+            release.set()
+            thread.join()
+
+    def test_live_socket(self, server):
+        from pycc.server import Server
+
+        with pytest.raises(OSError, match="already listening"):
+            asyncio.run(Server(server.path).start())
+        assert os.path.exists(server.path)
+
+    def test_stale_socket(self, tmp_path):
+        from pycc.client import request
+        from pycc.server import Server
+
+        path = str(tmp_path / "pycc.sock")
+        # a socket left behind by a server which was killed
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(path)
+
+        async def run():
+            server = Server(path)
+            await server.start()
+            loop = asyncio.get_event_loop()
+            response = await loop.run_in_executor(
+                None, request, {"command": "stats"}, path
+            )
+            await server.close()
+            return response
+
+        assert asyncio.run(run())["status"] == "ok"
+        assert not os.path.exists(path)
+
+    def test_fallback(self, tmp_path):
+        from pycc.client import compile
+
+        path = tmp_path / "a.c"
+        path.write_text("x")
+        (result,) = compile([str(path)], "tokens", str(tmp_path / "none.sock"))
+        assert result.ok
+        assert result.output.startswith("1:0: IDENTIFIER x\n")
@@ -0,0 +1,113 @@
+import pytest
+
+
+class Test_SSA:
+    @pytest.fixture
+    def diamond(self):
+        from pycc.ir import Function, Op, ValueType
+
+        # b0 -> b1, b2 -> b3
+        fn = Function("f", [ValueType.I32], ValueType.I32)
+        for _ in range(4):
+            fn.new_block()
+        slot = fn.append(0, Op.ALLOCA, ValueType.I64, 4, 4)
+        x = fn.append(0, Op.PARAM, ValueType.I32, 0)
+        fn.append(0, Op.BRANCH, a=x, b=1, c=2)
+        fn.append(1, Op.STORE, a=slot, b=fn.const(1, ValueType.I32, 1))
+        fn.append(1, Op.JUMP, a=3)
+        fn.append(2, Op.STORE, a=slot, b=fn.const(2, ValueType.I32, 2))
+        fn.append(2, Op.JUMP, a=3)
+        value = fn.append(3, Op.LOAD, ValueType.I32, slot)
+        fn.append(3, Op.RET, a=value)
+        return fn
+
+    def test_dominators(self, diamond):
+        from pycc.ssa import dominance_frontiers, dominates, immediate_dominators
+
+        idom = immediate_dominators(diamond)
+        assert idom == [0, 0, 0, 0]
+        assert dominance_frontiers(diamond, idom) == [[], [3], [3], []]
+        assert dominates(idom, 0, 3)
+        assert not dominates(idom, 1, 3)
+
+    def test_construct_ssa(self, diamond):
+        from pycc.ir import Op, format_function
+        from pycc.ssa import construct_ssa, verify
+
+        construct_ssa(diamond)
+        verify(diamond)
+        ops = [Op(diamond.op[i]) for i in diamond.instructions()]
+        assert Op.ALLOCA not in ops and Op.LOAD not in ops and Op.STORE not in ops
+        assert "phi [b1: %3], [b2: %6]" in format_function(diamond)
+
+    def test_undefined_value(self):
+        from pycc.ir import Function, Op, ValueType
+        from pycc.ssa import construct_ssa, verify
+
+        fn = Function("f", [], ValueType.I32)
+        fn.new_block()
+        slot = fn.append(0, Op.ALLOCA, ValueType.I64, 4, 4)
+        fn.append(0, Op.RET, a=fn.append(0, Op.LOAD, ValueType.I32, slot))
+        construct_ssa(fn)
+        verify(fn)
+        assert [Op(fn.op[i]) for i in fn.instructions()] == [Op.UNDEF, Op.RET]
+
+    def test_verify(self, diamond):
+        from pycc.ir import Op, ValueType
+        from pycc.ssa import verify
+
+        # a value defined in b1 does not dominate b3
+        value = diamond.blocks[1].insts[0]
+        diamond.append(3, Op.NEG, ValueType.I32, value)
+        with pytest.raises(ValueError, match="does not end in a terminator"):
+            verify(diamond)
+        insts = diamond.blocks[3].insts
+        insts[-1], insts[-2] = insts[-2], insts[-1]
+        with pytest.raises(ValueError, match="does not dominate"):
+            verify(diamond)
+
+    def test_natural_loops(self):
+        from pycc.ir import Function, Op, ValueType
+        from pycc.ssa import immediate_dominators, natural_loops
+
+        # b0 -> b1 -> b2 -> b3 -> b1, b2 -> b2, b1 -> b4
+        fn = Function("f", [ValueType.I32])
+        for _ in range(5):
+            fn.new_block()
+        x = fn.append(0, Op.PARAM, ValueType.I32, 0)
+        fn.append(0, Op.JUMP, a=1)
+        fn.append(1, Op.BRANCH, a=x, b=2, c=4)
+        fn.append(2, Op.BRANCH, a=x, b=2, c=3)
+        fn.append(3, Op.JUMP, a=1)
+        fn.append(4, Op.RET)
+        inner, outer = natural_loops(fn, immediate_dominators(fn))
+        assert (inner.header, inner.blocks, inner.latches) == (2, {2}, [2])
+        assert inner.preheader == -1
+        assert (outer.header, outer.blocks, outer.latches) == (1, {1, 2, 3}, [3])
+        assert outer.preheader == 0
+
+    def test_scaling(self):
+        """Construction is linear: a function 8 times larger takes much less
+        than 64 times longer."""
+        import time
+        from pycc.parser import Parser, TokenStream
+        from pycc.scanner import Scanner
+        from pycc.file import File
+        from pycc.error import Reporter
+        from pycc.lower import lower
+
+        def measure(n):
+            body = "".join(
+                f"if (x > {k}) y = y + x * {k}; else x = x - y;\n" for k in range(n)
+            )
+            text = f"int f(int x) {{ int y = 0;\n{body} return x + y; }}"
+            reporter = Reporter()
+            parser = Parser(TokenStream(Scanner(File("", text), reporter)), reporter)
+            start = time.perf_counter()
+            [fn] = lower(parser.iter_declarations(), reporter).functions
+            return time.perf_counter() - start, fn
+
+        small, _ = measure(250)
+        large, fn = measure(2000)
+        assert len(fn) > 20000
+        assert large < small * 8 * 4
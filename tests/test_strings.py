@@ -0,0 +1,32 @@
+class Test_StringPool:
+    def test_intern(self):
+        from pycc.strings import StringPool
+
+        pool = StringPool()
+        a = pool.intern("".join(["for", "mat"]))
+        b = pool.intern("".join(["form", "at"]))
+        assert a is b
+        assert pool.hits == 1
+        assert pool.concatenate(["fo", "rm", "at"]) is a
+        assert pool.concatenate(["x"]) == "x"
+        assert pool.hits == 2
+
+    def test_share_suffixes(self):
+        from pycc.strings import layout, share_suffixes
+
+        literals = [
+            ("a", b"world\0"),
+            ("b", b"hello, world\0"),
+            ("c", b"d\0"),
+            ("d", b"word\0"),
+            ("e", b"\0"),
+        ]
+        assert share_suffixes(literals) == {
+            "a": ("b", 7),
+            "c": ("b", 11),
+            "e": ("b", 12),
+        }
+        shared, labels = layout(literals)
+        assert labels == {"b": [(7, "a"), (11, "c"), (12, "e")]}
+        # a literal is not shared with one it only contains
+        assert share_suffixes([("a", b"ab\0"), ("b", b"abc\0")]) == {}
@@ -0,0 +1,69 @@
+import pytest
+from pycc.symtab import Kind, SymbolTable
+
+
+class Test_SymbolTable:
+    def test_shadowing(self):
+        symbols = SymbolTable()
+        symbols.declare("T", Kind.TYPEDEF)
+        assert symbols.is_typedef_name("T")
+        symbols.push_scope()
+        symbols.declare("T", Kind.OBJECT)
+        assert not symbols.is_typedef_name("T")
+        assert symbols.lookup("T").depth == 1
+        symbols.pop_scope()
+        assert symbols.is_typedef_name("T")
+        assert symbols.lookup("T").depth == 0
+
+    def test_redeclaration(self):
+        symbols = SymbolTable()
+        symbols.declare("x", Kind.OBJECT)
+        symbols.declare("x", Kind.TYPEDEF)
+        assert symbols.is_typedef_name("x")
+        assert len(symbols.bindings["x"]) == 1
+
+    def test_pop_file_scope(self):
+        with pytest.raises(ValueError):
+            SymbolTable().pop_scope()
+
+    def test_rollback(self):
+        symbols = SymbolTable()
+        symbols.declare("a", Kind.OBJECT)
+        symbols.push_scope()
+        symbols.declare("T", Kind.TYPEDEF)
+
+        marker = symbols.mark()
+        symbols.declare("a", Kind.TYPEDEF)
+        symbols.declare("T", Kind.OBJECT)
+        symbols.pop_scope()
+        symbols.push_scope()
+        symbols.push_scope()
+        symbols.declare("b", Kind.OBJECT)
+        symbols.release(marker)
+
+        assert symbols.depth == 1
+        assert symbols.lookup("a").depth == 0
+        assert not symbols.is_typedef_name("a")
+        assert symbols.is_typedef_name("T")
+        assert symbols.lookup("b") is None
+        assert symbols.log == []
+        symbols.pop_scope()
+        assert symbols.lookup("T") is None
+
+    def test_nested_markers(self):
+        symbols = SymbolTable()
+        outer = symbols.mark()
+        symbols.declare("a", Kind.OBJECT)
+        inner = symbols.mark()
+        symbols.declare("b", Kind.OBJECT)
+        symbols.release(inner)
+        assert symbols.lookup("a") is not None
+        assert symbols.lookup("b") is None
+        symbols.release(outer)
+        assert symbols.bindings == {}
+
+    def test_no_log_without_marker(self):
+        symbols = SymbolTable()
+        for i in range(100):
+            symbols.declare(f"x{i}", Kind.OBJECT)
+        assert symbols.log == []
@@ -0,0 +1,115 @@
+from pycc import ast
+from pycc.file import Location
+from pycc.visitor import SKIP, Transformer, Visitor, fuse, iter_child_nodes
+
+L = Location("", 0, 1, 0)
+
+
+def ref(name):
+    return ast.RefDeclExpr(L, L, name)
+
+
+def paren(expr, depth=1):
+    for _ in range(depth):
+        expr = ast.ParenExpr(L, L, expr)
+    return expr
+
+
+def compound(*stmts):
+    return ast.CompoundStmt(L, L, list(stmts))
+
+
+def stmt(expr):
+    return ast.ExprStmt(L, L, expr)
+
+
+class Recorder(Visitor):
+    def __init__(self):
+        self.events = []
+
+    def visit_Expr(self, node):
+        self.events.append(("visit", type(node).__name__))
+
+    def visit_CompoundStmt(self, node):
+        self.events.append(("visit", "CompoundStmt"))
+
+    def leave_CompoundStmt(self, node):
+        self.events.append(("leave", "CompoundStmt"))
+
+
+class SkipParens(Visitor):
+    def __init__(self):
+        self.names = []
+
+    def visit_ParenExpr(self, node):
+        return SKIP
+
+    def visit_RefDeclExpr(self, node):
+        self.names.append(node.name)
+
+
+class Test_Visitor:
+    def test_iter_child_nodes(self):
+        a, b = stmt(ref("a")), stmt(ref("b"))
+        assert list(iter_child_nodes(compound(a, b))) == [a, b]
+        assert list(iter_child_nodes(ref("a"))) == []
+
+    def test_order(self):
+        tree = compound(stmt(paren(ref("a"))), compound(), stmt(ref("b")))
+        visitor = Recorder()
+        visitor.visit(tree)
+        assert visitor.events == [
+            ("visit", "CompoundStmt"),
+            ("visit", "ParenExpr"),
+            ("visit", "RefDeclExpr"),
+            ("visit", "CompoundStmt"),
+            ("leave", "CompoundStmt"),
+            ("visit", "RefDeclExpr"),
+            ("leave", "CompoundStmt"),
+        ]
+
+    def test_skip(self):
+        visitor = SkipParens()
+        visitor.visit(compound(stmt(paren(ref("a"))), stmt(ref("b"))))
+        assert visitor.names == ["b"]
+
+    def test_deep_nesting(self):
+        visitor = SkipParens()
+        visitor.visit(stmt(paren(ref("a"), 100000)))
+        assert visitor.names == []
+        visitor = Recorder()
+        visitor.visit(stmt(paren(ref("a"), 100000)))
+        assert len(visitor.events) == 100001
+
+    def test_fuse(self):
+        tree = compound(stmt(paren(ref("a"))), stmt(ref("b")))
+        skip, recorder = SkipParens(), Recorder()
+        fuse(skip, recorder).visit(tree)
+        assert skip.names == ["b"]
+        expected = Recorder()
+        expected.visit(tree)
+        assert recorder.events == expected.events
+
+
+class RenameAndDrop(Transformer):
+    def transform_RefDeclExpr(self, node):
+        return ref(node.name.upper())
+
+    def transform_ParenExpr(self, node):
+        return node.expr
+
+    def transform_ExprStmt(self, node):
+        if node.expr.name == "DROP":
+            return None
+        return node
+
+
+class Test_Transformer:
+    def test_transform(self):
+        tree = compound(stmt(paren(ref("a"), 3)), stmt(ref("drop")), stmt(ref("b")))
+        tree = RenameAndDrop().transform(tree)
+        assert [x.expr.name for x in tree.stmts] == ["A", "B"]
+
+    def test_deep_nesting(self):
+        tree = RenameAndDrop().transform(stmt(paren(ref("a"), 100000)))
+        assert tree.expr.name == "A"
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+
+
+def touch(path, text=None):
+    """Rewrites ``path`` and moves its mtime forward, as timestamps may not
+    tick between two writes in a test."""
+    if text is not None:
+        path.write_text(text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+class Test_DependencyGraph:
+    def test_affected(self):
+        from pycc.watch import DependencyGraph
+
+        graph = DependencyGraph()
+        graph.record("a.c", ["a.c", "x.h"])
+        graph.record("b.c", ["y.h"])
+        graph.record("x.h", ["y.h"])
+        graph.record("c.c", [])
+        assert graph.files == {"a.c", "b.c", "c.c", "x.h", "y.h"}
+        assert graph.affected(["y.h"]) == {"y.h", "x.h", "a.c", "b.c"}
+        assert graph.affected(["x.h"]) == {"x.h", "a.c"}
+        assert graph.affected(["c.c"]) == {"c.c"}
+        # replacing the dependencies drops the old reverse edges
+        graph.record("a.c", ["z.h"])
+        assert graph.affected(["y.h"]) == {"y.h", "x.h", "b.c"}
+        graph.remove("b.c")
+        assert graph.affected(["y.h"]) == {"y.h", "x.h"}
+        assert "b.c" not in graph.files
+
+    def test_cycle(self):
+        from pycc.watch import DependencyGraph
+
+        graph = DependencyGraph()
+        graph.record("a.h", ["b.h"])
+        graph.record("b.h", ["a.h"])
+        assert graph.affected(["a.h"]) == {"a.h", "b.h"}
+
+
+class Test_Watcher:
+    @pytest.fixture
+    def factory(self, tmp_path):
+        from pycc.file import File
+        from pycc.session import cached_tokens
+        from pycc.watch import Watcher
+
+        def factory(sources, headers=()):
+            paths = {}
+            for name, text in {**sources, **dict(headers)}.items():
+                paths[name] = tmp_path / name
+                paths[name].write_text(text)
+            built = []
+
+            def build(unit):
+                # each unit reads the headers, as an #include would
+                built.append(os.path.basename(unit))
+                tokens, _ = cached_tokens(watcher.cache.get(unit))
+                try:
+                    for name in headers:
+                        File.open(str(paths[name]))
+                except OSError:
+                    return None
+                return len(tokens)
+
+            units = [str(paths[x]) for x in sources]
+            watcher = Watcher(units, build)
+            return watcher, paths, built
+
+        return factory
+
+    def test_rebuild(self, factory):
+        watcher, paths, built = factory(
+            {"a.c": "int a;", "b.c": "int b;"}, {"h.h": "int h;"}
+        )
+        watcher.build_all()
+        assert built == ["a.c", "b.c"]
+        assert watcher.poll() == []
+        built.clear()
+        touch(paths["a.c"], "int a, aa;")
+        changed = watcher.poll()
+        assert changed == [str(paths["a.c"])]
+        rebuild = watcher.rebuild(changed)
+        assert built == ["a.c"] and rebuild.units == [str(paths["a.c"])]
+        assert watcher.results[str(paths["a.c"])] == 6
+        # a header reaches every unit which read it
+        built.clear()
+        touch(paths["h.h"], "int h, hh;")
+        watcher.rebuild(watcher.poll())
+        assert built == ["a.c", "b.c"]
+
+    def test_tokens_reused(self, factory):
+        watcher, paths, built = factory({"a.c": "int a;", "b.c": "int b;"})
+        watcher.build_all()
+        entry = watcher.cache.entries[str(paths["b.c"])]
+        tokens = entry.derived["tokens"]
+        touch(paths["a.c"], "int a, aa;")
+        watcher.rebuild(watcher.poll())
+        assert watcher.cache.entries[str(paths["b.c"])].derived["tokens"] is tokens
+
+    def test_touch_without_change(self, factory):
+        watcher, paths, built = factory({"a.c": "int a;"})
+        watcher.build_all()
+        touch(paths["a.c"])
+        assert watcher.poll() == []
+
+    def test_deleted(self, factory):
+        watcher, paths, built = factory({"a.c": "int a;"}, {"h.h": "int h;"})
+        watcher.build_all()
+        paths["h.h"].unlink()
+        changed = watcher.poll()
+        assert changed == [str(paths["h.h"])]
+        built.clear()
+        watcher.rebuild(changed)
+        assert built == ["a.c"] and watcher.results[str(paths["a.c"])] is None
+        # the missing header is still watched
+        built.clear()
+        paths["h.h"].write_text("int h;")
+        watcher.rebuild(watcher.poll())
+        assert built == ["a.c"] and watcher.results[str(paths["a.c"])] == 4
+
+    def test_run(self, factory, monkeypatch):
+        import time
+
+        watcher, paths, built = factory({"a.c": "int a;"})
+        watcher.build_all()
+        rebuilds = []
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            touch(paths["a.c"], "int a%d;" % len(sleeps))
+
+        monkeypatch.setattr(time, "sleep", sleep)
+        watcher.run(rebuilds.append, interval=0.5, iterations=3)
+        assert sleeps == [0.5, 0.5]
+        assert [x.units for x in rebuilds] == [[str(paths["a.c"])]] * 2